@@ -0,0 +1,28 @@
+"""add cache_ttl_seconds to reports
+
+Per-report TTL for the in-process query result cache. NULL means the server
+default (REPORT_RESULT_CACHE_DEFAULT_TTL_SECONDS) applies, 0 disables caching
+for the report.
+
+Revision ID: add_cache_ttl_001
+Revises: add_can_view_wo_001
+Create Date: 2026-10-16 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_cache_ttl_001'
+down_revision = 'add_can_view_wo_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('reports', sa.Column('cache_ttl_seconds', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('reports', 'cache_ttl_seconds')
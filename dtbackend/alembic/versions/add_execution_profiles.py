@@ -0,0 +1,30 @@
+"""add execution_profile to reports and report_queries
+
+Named ClickHouse execution profile (interactive, heavy or export) whose
+settings are sent with the report's queries. A query's profile overrides its
+report's; NULL on both means interactive.
+
+Revision ID: add_execution_profiles_001
+Revises: add_query_log_001
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_execution_profiles_001'
+down_revision = 'add_query_log_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('reports', sa.Column('execution_profile', sa.String(length=20), nullable=True))
+    op.add_column('report_queries', sa.Column('execution_profile', sa.String(length=20), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('report_queries', 'execution_profile')
+    op.drop_column('reports', 'execution_profile')
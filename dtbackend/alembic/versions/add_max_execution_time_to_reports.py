@@ -0,0 +1,29 @@
+"""add max_execution_time_seconds to reports
+
+Per-report time limit enforced by the source database for each query
+(ClickHouse max_execution_time, PostgreSQL statement_timeout, MSSQL query
+timeout). NULL means the server default (REPORT_DEFAULT_MAX_EXECUTION_TIME_SECONDS)
+applies, 0 disables the limit for the report.
+
+Revision ID: add_max_exec_time_001
+Revises: add_cache_ttl_001
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_max_exec_time_001'
+down_revision = 'add_cache_ttl_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('reports', sa.Column('max_execution_time_seconds', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('reports', 'max_execution_time_seconds')
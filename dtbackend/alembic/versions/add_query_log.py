@@ -0,0 +1,58 @@
+"""add query log
+
+Per-query telemetry of report executions (timings, rows, bytes, cache and
+coalescing hits), written in batches by the query log writer when
+REPORT_QUERY_LOG_ENABLED is set and summarized by
+GET /reports/admin/slow-queries?source=database.
+
+Revision ID: add_query_log_001
+Revises: add_report_snapshots_001
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_query_log_001'
+down_revision = 'add_report_snapshots_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'query_log',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('report_id', sa.Integer(), nullable=True),
+        sa.Column('query_id', sa.Integer(), nullable=True),
+        sa.Column('query_name', sa.String(length=255), nullable=True),
+        sa.Column('db_type', sa.String(length=50), nullable=True),
+        sa.Column('platform', sa.String(length=50), nullable=True),
+        sa.Column('username', sa.String(length=255), nullable=True),
+        sa.Column('success', sa.Boolean(), nullable=False),
+        sa.Column('cache_hit', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('coalesced', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('queue_ms', sa.Float(), nullable=True),
+        sa.Column('fetch_ms', sa.Float(), nullable=True),
+        sa.Column('count_ms', sa.Float(), nullable=True),
+        sa.Column('serialize_ms', sa.Float(), nullable=True),
+        sa.Column('total_ms', sa.Float(), nullable=False),
+        sa.Column('rows', sa.Integer(), nullable=True),
+        sa.Column('total_rows', sa.Integer(), nullable=True),
+        sa.Column('bytes', sa.BigInteger(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_query_log_id', 'query_log', ['id'])
+    op.create_index('ix_query_log_created_at', 'query_log', ['created_at'])
+    op.create_index('ix_query_log_report_id', 'query_log', ['report_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_query_log_report_id', table_name='query_log')
+    op.drop_index('ix_query_log_created_at', table_name='query_log')
+    op.drop_index('ix_query_log_id', table_name='query_log')
+    op.drop_table('query_log')
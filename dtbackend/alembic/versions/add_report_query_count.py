@@ -0,0 +1,45 @@
+"""add query_count and list ordering index to reports
+
+The report list showed each report's number of queries by joining
+report_queries and grouping, and paged with OFFSET. query_count now stores
+that number on the report (kept in sync whenever its queries are written),
+and the list pages by keyset on (coalesce(updated_at, created_at), id)
+through ix_reports_list_order. The ACL arrays already have GIN indexes
+(add_indexes_003).
+
+Revision ID: add_report_query_count_001
+Revises: add_execution_profiles_001
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_report_query_count_001'
+down_revision = 'add_execution_profiles_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('reports', sa.Column('query_count', sa.Integer(), nullable=False, server_default='0'))
+    op.execute("""
+        UPDATE reports
+        SET query_count = counts.query_count
+        FROM (SELECT report_id, count(*) AS query_count FROM report_queries GROUP BY report_id) AS counts
+        WHERE reports.id = counts.report_id
+    """)
+
+    # Matches the list's ORDER BY, so a page reads limit + 1 index entries past the cursor
+    op.execute("""
+        CREATE INDEX ix_reports_list_order
+        ON reports ((coalesce(updated_at, created_at)) DESC, id DESC)
+        WHERE deleted_at IS NULL
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_reports_list_order")
+    op.drop_column('reports', 'query_count')
@@ -0,0 +1,50 @@
+"""add report snapshots
+
+Reports with snapshot_enabled have their queries run with default filters on
+snapshot_cron by the snapshot scheduler. The results are stored in
+report_snapshots (one row per query) and served by execute_report when a
+request asks for the defaults.
+
+Revision ID: add_report_snapshots_001
+Revises: add_max_exec_time_001
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_report_snapshots_001'
+down_revision = 'add_max_exec_time_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('reports', sa.Column('snapshot_enabled', sa.Boolean(), nullable=True, server_default=sa.false()))
+    op.add_column('reports', sa.Column('snapshot_cron', sa.String(length=100), nullable=True))
+
+    op.create_table(
+        'report_snapshots',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('report_id', sa.Integer(), nullable=False),
+        sa.Column('query_id', sa.Integer(), nullable=False),
+        sa.Column('result', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('generated_at', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['report_id'], ['reports.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['query_id'], ['report_queries.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('query_id', name='uq_report_snapshots_query_id'),
+    )
+    op.create_index('ix_report_snapshots_id', 'report_snapshots', ['id'])
+    op.create_index('ix_report_snapshots_report_id', 'report_snapshots', ['report_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_report_snapshots_report_id', table_name='report_snapshots')
+    op.drop_index('ix_report_snapshots_id', table_name='report_snapshots')
+    op.drop_table('report_snapshots')
+    op.drop_column('reports', 'snapshot_cron')
+    op.drop_column('reports', 'snapshot_enabled')
@@ -1,8 +1,9 @@
+import asyncio
 import io
 from typing import Any
 
 from clickhouse_driver import Client
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from sqlalchemy import text
@@ -13,8 +14,10 @@ from app.core.platform_db import DatabaseConnectionFactory
 from app.core.platform_middleware import get_optional_platform
 from app.models.postgres_models import Platform
 from app.schemas.data import WidgetQueryRequest
+from app.services.columnar_response import encode_widget_data, negotiate_response_format
 from app.services.csuite_history_service import CSuiteHistoryService
 from app.services.data_service import DataService, WidgetFactory
+from app.services.query_cancellation import run_until_disconnected
 
 router = APIRouter()
 
@@ -40,7 +43,8 @@ def get_db_client(
             elif db_type == "mssql":
                 return DatabaseConnectionFactory.get_mssql_connection(platform)
             elif db_type == "postgresql":
-                return DatabaseConnectionFactory.get_postgresql_connection(platform)
+                # Widget and data endpoints only read: use a read replica when one is healthy
+                return DatabaseConnectionFactory.get_postgresql_connection(platform, read_only=True)
             else:
                 # Fallback to default if unsupported type
                 return default_client
@@ -53,15 +57,26 @@ def get_db_client(
 @router.post("/widget")
 async def get_widget_data(
     request: WidgetQueryRequest,
+    http_request: Request,
+    format: str | None = Query(None, pattern="^(rows|columnar|arrow)$", description="rows (default), columnar or arrow"),
+    platform: Platform | None = Depends(get_optional_platform),
     db_client = Depends(get_db_client)
 ):
-    """Get widget data from platform-specific database or ClickHouse"""
+    """Get widget data from platform-specific database or ClickHouse
+
+    Widgets returning a list of records can be requested column-major (format=columnar)
+    or as an Arrow stream (format=arrow), see columnar_response.
+    """
     try:
-        data = DataService.get_widget_data(
+        response_format = negotiate_response_format(http_request, format)
+        # Run the blocking query on a worker thread; it is cancelled if the client disconnects
+        data = await run_until_disconnected(http_request, lambda: asyncio.to_thread(
+            DataService.get_widget_data,
             db_client=db_client,
             widget_type=request.widget_type,
-            filters=request.filters
-        )
+            filters=request.filters,
+            db_config=platform.db_config if platform else None
+        ))
 
         # Check if data service returned an error response
         if data and data.get("error"):
@@ -95,6 +110,8 @@ async def get_widget_data(
             )
 
         # For other widget types, return JSON data
+        if response_format != "rows":
+            return await asyncio.to_thread(encode_widget_data, data, response_format)
         return data
 
     except ValueError as ve:
@@ -1,9 +1,12 @@
+import asyncio
 import io
+import json
 import re
 import time
+from datetime import datetime, timedelta, timezone
 
 from clickhouse_driver import Client
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from fastapi.responses import PlainTextResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -14,24 +17,39 @@ from app.core.platform_middleware import get_current_platform, get_optional_plat
 from app.models.postgres_models import Platform
 from app.schemas.data import ReportPreviewRequest, ReportPreviewResponse
 from app.schemas.reports import (
+    FilterValue,
     Report,
     ReportCreate,
     ReportExecutionRequest,
     ReportExecutionResponse,
     ReportFullUpdate,
+    ReportJobRequest,
+    ReportJobStatus,
     ReportList,
     ReportUpdate,
     SampleQueriesResponse,
+    SlowQueriesResponse,
     SqlValidationResponse,
 )
 from app.schemas.user import User
-from app.services.reports_service import ReportsService, ConnectionPool
+from app.services.columnar_response import (
+    check_report_response_format,
+    encode_report_execution,
+    negotiate_response_format,
+)
+from app.services.query_cancellation import run_until_disconnected
+from app.services.query_telemetry import query_log_summary, query_telemetry
+from app.services.report_jobs import (
+    JOB_FAILED,
+    ReportJob,
+    ReportJobLimitError,
+    report_job_queue,
+)
+from app.services.report_streams import ReportStreamLimitError, report_streams
+from app.services.reports_service import ReportsService
 
 router = APIRouter()
 
-# Get singleton connection pool instance
-_connection_pool = ConnectionPool()
-
 def sanitize_sql_query(query: str) -> str:
     """
     Basic SQL injection protection and query sanitization
@@ -55,113 +73,56 @@ def sanitize_sql_query(query: str) -> str:
 
     return sanitized_query
 
+def _format_preview_rows(rows) -> list[list]:
+    """Rows as JSON-friendly lists: primitives as they are, dates and other types as strings"""
+    formatted_data = []
+    for row in rows:
+        formatted_row = []
+        for item in row:
+            if isinstance(item, (int, float, str, bool)) or item is None:
+                formatted_row.append(item)
+            else:
+                formatted_row.append(str(item))
+        formatted_data.append(formatted_row)
+    return formatted_data
+
+def _query_error_message(error: Exception) -> str:
+    error_msg = str(error)
+    if "Code:" in error_msg:
+        # Extract ClickHouse error message
+        error_msg = error_msg.split("Code:")[1].strip()
+    return error_msg
+
 @router.post("/preview", response_model=ReportPreviewResponse)
 async def preview_report_query(
     request: ReportPreviewRequest,
+    http_request: Request,
     platform: Platform | None = Depends(get_optional_platform),
-    db_client: Client = Depends(get_clickhouse_db)
+    current_user: User = Depends(check_authenticated),
+    db: AsyncSession = Depends(get_postgres_db)
 ):
     """
     Preview the results of a SQL query for report building.
     Supports multiple database types based on platform configuration or custom db_config.
+
+    The query runs on the pooled report execution path: at most limit rows (capped by
+    REPORT_PREVIEW_MAX_ROWS in the SQL itself), a time limit, a per-user concurrency limit,
+    and cancellation when the client disconnects.
     """
     try:
         # Sanitize the SQL query
         sanitized_query = sanitize_sql_query(request.sql_query)
 
-        # Determine database type - prioritize request's db_config
-        if request.db_config:
-            db_type = request.db_config.get('db_type', 'clickhouse').lower()
-        elif platform:
-            db_type = platform.db_type.lower()
-        else:
-            db_type = "clickhouse"
-        print(sanitized_query)
-        # Add LIMIT to the query if not present (database-specific)
-        if db_type == "mssql":
-            # MSSQL uses TOP instead of LIMIT
-            if 'TOP' not in sanitized_query.upper() and 'LIMIT' not in sanitized_query.upper():
-                sanitized_query = sanitized_query.replace("SELECT", f"SELECT TOP {request.limit}", 1)
-        elif 'LIMIT' not in sanitized_query.upper():
-            if request.limit:
-                sanitized_query = f"{sanitized_query} LIMIT {request.limit}"
-            else:
-                sanitized_query = f"{sanitized_query}"
-
-
-        # Record execution start time
+        service = ReportsService(db)
         start_time = time.time()
-
-        # Execute the query based on database type
-        if db_type == "clickhouse":
-            # Use ClickHouse client (existing logic)
-            result = db_client.execute(sanitized_query, with_column_types=True)
-
-            # Extract columns and data for ClickHouse
-            if result and len(result) > 0:
-                columns = [col[0] for col in result[1]] if len(result) > 1 else []
-                data = result[0] if result[0] else []
-            else:
-                columns = []
-                data = []
-
-        elif db_type == "postgresql":
-            # Use PostgreSQL connection from pool - prioritize request's db_config
-            if request.db_config:
-                conn = _connection_pool.get_connection(db_config=request.db_config, db_type=db_type)
-            elif platform:
-                conn = _connection_pool.get_connection(platform=platform, db_type=db_type)
-            else:
-                raise ValueError("Database configuration required for PostgreSQL queries")
-
-            cursor = conn.cursor()
-
-            try:
-                cursor.execute(sanitized_query)
-                columns = [desc[0] for desc in cursor.description] if cursor.description else []
-                data = cursor.fetchall()
-            finally:
-                cursor.close()
-                # Return connection to pool
-                _connection_pool.return_connection(conn, db_config=request.db_config, platform=platform, db_type=db_type)
-
-        elif db_type == "mssql":
-            # Use MSSQL connection from pool - prioritize request's db_config
-            if request.db_config:
-                conn = _connection_pool.get_connection(db_config=request.db_config, db_type=db_type)
-            elif platform:
-                conn = _connection_pool.get_connection(platform=platform, db_type=db_type)
-            else:
-                raise ValueError("Database configuration required for MSSQL queries")
-            
-            cursor = conn.cursor()
-
-            try:
-                cursor.execute(sanitized_query)
-                columns = [column[0] for column in cursor.description] if cursor.description else []
-                data = cursor.fetchall()
-            finally:
-                cursor.close()
-                # Return connection to pool
-                _connection_pool.return_connection(conn, db_config=request.db_config, platform=platform, db_type=db_type)
-        else:
-            raise ValueError(f"Unsupported database type: {db_type}")
-
-        # Calculate execution time
+        db_type, columns, data, cost_warning = await run_until_disconnected(
+            http_request,
+            lambda: service.preview_query(sanitized_query, request.db_config, platform, request.limit, current_user.username)
+        )
         execution_time_ms = (time.time() - start_time) * 1000
 
-        # Convert data to list of lists for JSON serialization (common for all database types)
-        formatted_data = []
-        for row in data:
-            formatted_row = []
-            for item in row:
-                # Handle different data types for JSON serialization
-                if isinstance(item, (int, float, str, bool)) or item is None:
-                    formatted_row.append(item)
-                else:
-                    # Handle datetime, date, and other types
-                    formatted_row.append(str(item))
-            formatted_data.append(formatted_row)
+        # Convert data to list of lists for JSON serialization (CPU work for large previews, off the event loop)
+        formatted_data = await asyncio.to_thread(_format_preview_rows, data)
 
         return ReportPreviewResponse(
             columns=columns,
@@ -169,9 +130,12 @@ async def preview_report_query(
             total_rows=len(formatted_data),
             execution_time_ms=round(execution_time_ms, 2),
             success=True,
-            message=f"Query executed successfully on {db_type.upper()}. Retrieved {len(formatted_data)} rows."
+            message=f"Query executed successfully on {db_type.upper()}. Retrieved {len(formatted_data)} rows.",
+            cost_warning=cost_warning
         )
 
+    except HTTPException:
+        raise
     except ValueError as ve:
         # Handle validation/security errors
         return ReportPreviewResponse(
@@ -184,37 +148,34 @@ async def preview_report_query(
         )
     except Exception as e:
         # Handle database or other errors
-        error_msg = str(e)
-        if "Code:" in error_msg:
-            # Extract ClickHouse error message
-            error_msg = error_msg.split("Code:")[1].strip()
-
         return ReportPreviewResponse(
             columns=[],
             data=[],
             total_rows=0,
             execution_time_ms=0,
             success=False,
-            message=f"Query execution failed: {error_msg}"
+            message=f"Query execution failed: {_query_error_message(e)}"
         )
 
 @router.get("/validate-syntax", response_model=SqlValidationResponse)
 async def validate_sql_syntax(
+    http_request: Request,
     query: str = Query(..., description="SQL query to validate"),
     db_config: str | None = Query(None, description="JSON string of database configuration"),
     platform: Platform | None = Depends(get_optional_platform),
-    db_client: Client = Depends(get_clickhouse_db)
+    current_user: User = Depends(check_authenticated),
+    db: AsyncSession = Depends(get_postgres_db)
 ):
     """
     Validate SQL syntax without executing the query.
     Supports multiple database types based on platform configuration or custom db_config.
+    Runs through the same pooled, time-limited path and per-user limit as /reports/preview.
     """
     try:
         # Sanitize the query
         sanitized_query = sanitize_sql_query(query)
 
         # Parse db_config if provided
-        import json
         db_config_dict = None
         if db_config:
             try:
@@ -222,68 +183,12 @@ async def validate_sql_syntax(
             except json.JSONDecodeError:
                 raise ValueError("Invalid db_config JSON")
 
-        # Determine database type - prioritize db_config
-        if db_config_dict:
-            db_type = db_config_dict.get('db_type', 'clickhouse').lower()
-        elif platform:
-            db_type = platform.db_type.lower()
-        else:
-            db_type = "clickhouse"
-
-        # Use EXPLAIN to validate syntax without executing
-        explain_query = f"EXPLAIN {sanitized_query}"
-
+        service = ReportsService(db)
         start_time = time.time()
-
-        # Execute EXPLAIN based on database type
-        if db_type == "clickhouse":
-            result = db_client.execute(explain_query)
-            explain_plan = result
-
-        elif db_type == "postgresql":
-            # Use PostgreSQL connection from pool - prioritize db_config
-            if db_config_dict:
-                conn = _connection_pool.get_connection(db_config=db_config_dict, db_type=db_type)
-            elif platform:
-                conn = _connection_pool.get_connection(platform=platform, db_type=db_type)
-            else:
-                raise ValueError("Database configuration required for PostgreSQL queries")
-
-            cursor = conn.cursor()
-
-            try:
-                cursor.execute(explain_query)
-                explain_plan = [list(row) for row in cursor.fetchall()]
-            finally:
-                cursor.close()
-                # Return connection to pool
-                _connection_pool.return_connection(conn, db_config=db_config_dict, platform=platform, db_type=db_type)
-
-        elif db_type == "mssql":
-            # MSSQL doesn't support EXPLAIN in the same way
-            # We can use SET SHOWPLAN_TEXT ON
-            if db_config_dict:
-                conn = _connection_pool.get_connection(db_config=db_config_dict, db_type=db_type)
-            elif platform:
-                conn = _connection_pool.get_connection(platform=platform, db_type=db_type)
-            else:
-                raise ValueError("Database configuration required for MSSQL queries")
-            
-            cursor = conn.cursor()
-
-            try:
-                # MSSQL uses SET SHOWPLAN_TEXT ON for query plans
-                cursor.execute("SET SHOWPLAN_TEXT ON")
-                cursor.execute(sanitized_query)
-                explain_plan = [list(row) for row in cursor.fetchall()]
-                cursor.execute("SET SHOWPLAN_TEXT OFF")
-            finally:
-                cursor.close()
-                # Return connection to pool
-                _connection_pool.return_connection(conn, db_config=db_config_dict, platform=platform, db_type=db_type)
-        else:
-            raise ValueError(f"Unsupported database type: {db_type}")
-
+        db_type, explain_plan = await run_until_disconnected(
+            http_request,
+            lambda: service.validate_query_syntax(sanitized_query, db_config_dict, platform, current_user.username)
+        )
         execution_time_ms = (time.time() - start_time) * 1000
 
         return SqlValidationResponse(
@@ -293,6 +198,8 @@ async def validate_sql_syntax(
             explain_plan=explain_plan
         )
 
+    except HTTPException:
+        raise
     except ValueError as ve:
         return SqlValidationResponse(
             success=False,
@@ -300,13 +207,9 @@ async def validate_sql_syntax(
             execution_time_ms=0
         )
     except Exception as e:
-        error_msg = str(e)
-        if "Code:" in error_msg:
-            error_msg = error_msg.split("Code:")[1].strip()
-
         return SqlValidationResponse(
             success=False,
-            message=f"Syntax validation failed: {error_msg}",
+            message=f"Syntax validation failed: {_query_error_message(e)}",
             execution_time_ms=0
         )
 
@@ -398,17 +301,28 @@ async def create_report(
 
 @router.get("/", response_model=list[ReportList])
 async def get_reports(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     my_reports_only: bool = Query(False),
     subplatform: str | None = None,
+    cursor: str | None = Query(None, description="X-Next-Cursor header of the previous page"),
     platform: Platform | None = Depends(get_current_platform),
     current_user: User = Depends(check_authenticated),
     db: AsyncSession = Depends(get_postgres_db)
 ):
-    """Get reports list (owned + public, or only owned) - optionally filtered by subplatform"""
+    """Get reports list (owned + public, or only owned) - optionally filtered by subplatform
+
+    Newest changes first. When more reports follow, the X-Next-Cursor response header
+    holds the cursor of the next page.
+    """
     service = ReportsService(db)
-    reports = await service.get_reports_list(current_user, skip, limit, my_reports_only, platform, subplatform)
+    try:
+        reports, next_cursor = await service.get_reports_list(current_user, skip, limit, my_reports_only, platform, subplatform, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return reports
 
 
@@ -549,17 +463,189 @@ async def get_filter_options(
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.get("/{report_id}/queries/{query_id}/export")
+async def export_query_results(
+    report_id: int,
+    query_id: int,
+    format: str = Query("csv", pattern="^(csv|parquet|xlsx)$"),
+    filters: str | None = Query(None, description="JSON list of filter values: [{\"field_name\": ..., \"value\": ..., \"operator\": ...}]"),
+    sort_by: str | None = None,
+    sort_direction: str | None = None,
+    current_user: User = Depends(check_authenticated),
+    db: AsyncSession = Depends(get_postgres_db)
+):
+    """Stream the full filtered result of a report query as CSV, Parquet or XLSX"""
+    try:
+        filter_values = [FilterValue(**item) for item in json.loads(filters)] if filters else []
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid filters: {e!s}")
+
+    service = ReportsService(db)
+    try:
+        body, media_type, filename = await service.export_query(
+            report_id, query_id, current_user, format, filter_values, sort_by, sort_direction
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
 # Report Execution Endpoints
 @router.post("/execute", response_model=ReportExecutionResponse)
 async def execute_report(
     request: ReportExecutionRequest,
+    http_request: Request,
+    format: str | None = Query(None, pattern="^(rows|columnar|arrow)$", description="rows (default), columnar or arrow"),
     current_user: User = Depends(check_authenticated),
     db: AsyncSession = Depends(get_postgres_db),
     clickhouse_client: Client = Depends(get_clickhouse_db)
 ):
-    """Execute a report with optional filters"""
+    """Execute a report with optional filters
+
+    Running queries are cancelled on the database if the client disconnects.
+    Large results can be requested column-major (format=columnar) or as an Arrow
+    stream (format=arrow or Accept: application/vnd.apache.arrow.stream), see columnar_response.
+    """
     service = ReportsService(db, clickhouse_client)
     try:
-        return await service.execute_report(request, current_user)
+        response_format = negotiate_response_format(http_request, format)
+        check_report_response_format(response_format, request.query_id)
+        result = await run_until_disconnected(http_request, lambda: service.execute_report(request, current_user))
+        if response_format == "rows":
+            return result
+        # Encoding 50k-row results is CPU work, keep it off the event loop
+        return await asyncio.to_thread(encode_report_execution, result, response_format)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/{report_id}/jobs", response_model=ReportJobStatus, status_code=202)
+async def create_report_job(
+    report_id: int,
+    request: ReportJobRequest,
+    current_user: User = Depends(check_authenticated),
+    db: AsyncSession = Depends(get_postgres_db)
+):
+    """Queue a report execution in the background and return its job id
+
+    Poll GET /reports/jobs/{job_id} for progress and fetch GET /reports/jobs/{job_id}/result when it has finished.
+    """
+    service = ReportsService(db)
+    report = await service.get_report(report_id, current_user)
+    if not report:
+        raise HTTPException(status_code=404, detail="Report not found")
+
+    query_names = {q.id: q.name for q in report.queries if request.query_id is None or q.id == request.query_id}
+    if not query_names:
+        raise HTTPException(status_code=404, detail="Query not found in report")
+
+    job = ReportJob(ReportExecutionRequest(report_id=report_id, **request.model_dump()), current_user, query_names)
+    try:
+        report_job_queue.submit(job)
+    except ReportJobLimitError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return job.status_response()
+
+@router.get("/{report_id}/stream")
+async def stream_report(
+    report_id: int,
+    http_request: Request,
+    filters: str | None = Query(None, description="JSON list of filter values: [{\"field_name\": ..., \"value\": ..., \"operator\": ...}]"),
+    query_id: int | None = None,
+    limit: int | None = 1000,
+    interval: int | None = Query(None, ge=1, description="Refresh interval in seconds (REPORT_STREAM_INTERVAL_SECONDS by default)"),
+    current_user: User = Depends(check_authenticated),
+    db: AsyncSession = Depends(get_postgres_db)
+):
+    """Live report results as Server-Sent Events
+
+    Viewers of the same report and filters share one server-side refresh; after an initial
+    snapshot only changed queries (or row deltas) are pushed, see report_streams.
+    """
+    try:
+        filter_values = [FilterValue(**item) for item in json.loads(filters)] if filters else []
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid filters: {e!s}")
+
+    service = ReportsService(db)
+    report = await service.get_report(report_id, current_user)
+    if not report:
+        raise HTTPException(status_code=404, detail="Report not found")
+    if query_id is not None and not any(q.id == query_id for q in report.queries):
+        raise HTTPException(status_code=404, detail="Query not found in report")
+
+    request = ReportExecutionRequest(report_id=report_id, query_id=query_id, filters=filter_values, limit=limit)
+    # Department-filtered reports return different rows per department, so those viewers cannot share a stream
+    department = current_user.department if report.filter_by_department or report.filter_by_step_department else None
+    try:
+        stream, queue = report_streams.subscribe(request, current_user, interval, department)
+    except ReportStreamLimitError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+    return StreamingResponse(
+        report_streams.events(stream, queue, http_request.is_disconnected),
+        media_type="text/event-stream",
+        # Proxies must pass events through as they are written
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _get_user_job(job_id: str, current_user: User) -> ReportJob:
+    """A job of the current user (or any job for admins), 404 otherwise"""
+    job = report_job_queue.get(job_id)
+    is_admin = any((role or "").lower() == "miras:admin" for role in (current_user.role or []))
+    if not job or (job.username != current_user.username and not is_admin):
+        raise HTTPException(status_code=404, detail="Report job not found")
+    return job
+
+@router.get("/jobs/{job_id}", response_model=ReportJobStatus)
+async def get_report_job(
+    job_id: str,
+    current_user: User = Depends(check_authenticated)
+):
+    """Status of a background report job with the progress of each query"""
+    return _get_user_job(job_id, current_user).status_response()
+
+@router.get("/jobs/{job_id}/result", response_model=ReportExecutionResponse)
+async def get_report_job_result(
+    job_id: str,
+    http_request: Request,
+    format: str | None = Query(None, pattern="^(rows|columnar|arrow)$", description="rows (default), columnar or arrow"),
+    current_user: User = Depends(check_authenticated)
+):
+    """Result of a finished background report job, in the same formats as /reports/execute"""
+    job = _get_user_job(job_id, current_user)
+    response_format = negotiate_response_format(http_request, format)
+    check_report_response_format(response_format, job.request.query_id)
+    if job.status == JOB_FAILED:
+        raise HTTPException(status_code=400, detail=job.message or "Report job failed")
+    if job.result is None:
+        raise HTTPException(status_code=409, detail=f"Report job is {job.status}")
+
+    if response_format == "rows":
+        return job.result
+    return await asyncio.to_thread(encode_report_execution, job.result, response_format)
+
+@router.get("/admin/slow-queries", response_model=SlowQueriesResponse)
+async def get_slow_queries(
+    limit: int = Query(20, ge=1, le=200, description="Slowest calls and queries to return"),
+    minutes: int = Query(60, ge=1, le=60 * 24 * 90, description="Look back this many minutes"),
+    report_id: int | None = Query(None, description="Only this report's queries"),
+    include_cached: bool = Query(False, description="Include result cache hits and coalesced calls"),
+    source: str = Query("memory", pattern="^(memory|database)$", description="memory (this process, recent calls) or database (query_log)"),
+    current_user: User = Depends(check_authenticated),
+    db: AsyncSession = Depends(get_postgres_db)
+):
+    """Slowest report query executions and latency percentiles per query (admins only)"""
+    if not any((role or "").lower() == "miras:admin" for role in (current_user.role or [])):
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    since = datetime.now(timezone.utc) - timedelta(minutes=minutes)
+    if source == "database":
+        return await query_log_summary(db, limit, since, report_id, include_cached)
+    return query_telemetry.slow_queries(limit, since, report_id, include_cached)
@@ -115,6 +115,271 @@ class Settings(BaseSettings):
         default_factory=lambda: int(os.getenv("CSUITE_HISTORY_SCHEDULER_INTERVAL_SECONDS", str(6 * 60 * 60)))
     )
 
+    # Report query result cache (in-process; the backend runs as a single uvicorn process).
+    # REPORT_RESULT_CACHE_DEFAULT_TTL_SECONDS applies when a report has no cache_ttl_seconds;
+    # a report with cache_ttl_seconds=0 is never cached.
+    REPORT_RESULT_CACHE_ENABLED: bool = Field(
+        default_factory=lambda: os.getenv("REPORT_RESULT_CACHE_ENABLED", "true").lower() in {"1", "true", "yes", "on"}
+    )
+    REPORT_RESULT_CACHE_MAX_ENTRIES: int = Field(
+        default_factory=lambda: int(os.getenv("REPORT_RESULT_CACHE_MAX_ENTRIES", "512"))
+    )
+    REPORT_RESULT_CACHE_DEFAULT_TTL_SECONDS: int = Field(
+        default_factory=lambda: int(os.getenv("REPORT_RESULT_CACHE_DEFAULT_TTL_SECONDS", "60"))
+    )
+    REPORT_RESULT_CACHE_MAX_ROWS: int = Field(
+        default_factory=lambda: int(os.getenv("REPORT_RESULT_CACHE_MAX_ROWS", "50000"))
+    )
+
+    # Compiled report query templates (parsed SQL + filter definitions per query version)
+    QUERY_TEMPLATE_CACHE_MAX_ENTRIES: int = Field(
+        default_factory=lambda: int(os.getenv("QUERY_TEMPLATE_CACHE_MAX_ENTRIES", "2048"))
+    )
+    QUERY_TEMPLATE_CACHE_TTL_SECONDS: int = Field(
+        default_factory=lambda: int(os.getenv("QUERY_TEMPLATE_CACHE_TTL_SECONDS", "3600"))
+    )
+
+    # Cached report definitions (queries, filters, platform db_config, ACL) for execute/get report.
+    # Report writes invalidate immediately; the TTL bounds staleness from writes that bypass ReportsService.
+    REPORT_DEFINITION_CACHE_MAX_ENTRIES: int = Field(
+        default_factory=lambda: int(os.getenv("REPORT_DEFINITION_CACHE_MAX_ENTRIES", "1024"))
+    )
+    REPORT_DEFINITION_CACHE_TTL_SECONDS: int = Field(
+        default_factory=lambda: int(os.getenv("REPORT_DEFINITION_CACHE_TTL_SECONDS", "300"))
+    )
+
+    # Line/area chart downsampling (opt-in per visualization with chart_options.downsampling)
+    REPORT_DOWNSAMPLING_DEFAULT_TARGET_POINTS: int = Field(
+        default_factory=lambda: int(os.getenv("REPORT_DOWNSAMPLING_DEFAULT_TARGET_POINTS", "1000"))
+    )
+
+    # Rows of closed date buckets for queries with chart_options.incremental (see time_buckets)
+    REPORT_TIME_BUCKET_CACHE_MAX_ENTRIES: int = Field(
+        default_factory=lambda: int(os.getenv("REPORT_TIME_BUCKET_CACHE_MAX_ENTRIES", "20000"))
+    )
+    REPORT_TIME_BUCKET_CACHE_TTL_SECONDS: int = Field(
+        default_factory=lambda: int(os.getenv("REPORT_TIME_BUCKET_CACHE_TTL_SECONDS", "604800"))
+    )
+
+    # Dropdown filter options: distinct values per filter, searched and paged in memory.
+    # Filters with more than MAX_OPTIONS rows keep querying the database for every search.
+    FILTER_OPTION_CACHE_ENABLED: bool = Field(
+        default_factory=lambda: os.getenv("FILTER_OPTION_CACHE_ENABLED", "true").lower() in {"1", "true", "yes", "on"}
+    )
+    FILTER_OPTION_CACHE_TTL_SECONDS: int = Field(
+        default_factory=lambda: int(os.getenv("FILTER_OPTION_CACHE_TTL_SECONDS", "600"))
+    )
+    FILTER_OPTION_CACHE_MAX_FILTERS: int = Field(
+        default_factory=lambda: int(os.getenv("FILTER_OPTION_CACHE_MAX_FILTERS", "512"))
+    )
+    FILTER_OPTION_CACHE_MAX_OPTIONS: int = Field(
+        default_factory=lambda: int(os.getenv("FILTER_OPTION_CACHE_MAX_OPTIONS", "50000"))
+    )
+    # Load the options of every dropdown filter in the background when a report is opened
+    FILTER_OPTION_CACHE_PREWARM: bool = Field(
+        default_factory=lambda: os.getenv("FILTER_OPTION_CACHE_PREWARM", "false").lower() in {"1", "true", "yes", "on"}
+    )
+
+    # Report query admission control: concurrent queries per database target (platform or db_config).
+    # A platform/report db_config can override the per-target limit with "max_concurrent_queries".
+    REPORT_ADMISSION_ENABLED: bool = Field(
+        default_factory=lambda: os.getenv("REPORT_ADMISSION_ENABLED", "true").lower() in {"1", "true", "yes", "on"}
+    )
+    REPORT_ADMISSION_MAX_CONCURRENT_PER_DB: int = Field(
+        default_factory=lambda: int(os.getenv("REPORT_ADMISSION_MAX_CONCURRENT_PER_DB", "8"))
+    )
+    REPORT_ADMISSION_MAX_CONCURRENT_PER_USER: int = Field(
+        default_factory=lambda: int(os.getenv("REPORT_ADMISSION_MAX_CONCURRENT_PER_USER", "4"))
+    )
+    REPORT_ADMISSION_QUEUE_TIMEOUT_SECONDS: float = Field(
+        default_factory=lambda: float(os.getenv("REPORT_ADMISSION_QUEUE_TIMEOUT_SECONDS", "30"))
+    )
+
+    # Report query cancellation: how often a running /reports/execute or /data/widget request checks
+    # for a client disconnect, and the time limit for reports without max_execution_time_seconds (0 = none)
+    REPORT_DISCONNECT_POLL_SECONDS: float = Field(
+        default_factory=lambda: float(os.getenv("REPORT_DISCONNECT_POLL_SECONDS", "0.5"))
+    )
+    REPORT_DEFAULT_MAX_EXECUTION_TIME_SECONDS: int = Field(
+        default_factory=lambda: int(os.getenv("REPORT_DEFAULT_MAX_EXECUTION_TIME_SECONDS", "0"))
+    )
+
+    # Background report jobs (POST /reports/{id}/jobs): worker tasks, jobs kept in memory,
+    # unfinished jobs per user and how long finished results can be fetched
+    REPORT_JOB_WORKERS: int = Field(
+        default_factory=lambda: int(os.getenv("REPORT_JOB_WORKERS", "2"))
+    )
+    REPORT_JOB_MAX_JOBS: int = Field(
+        default_factory=lambda: int(os.getenv("REPORT_JOB_MAX_JOBS", "200"))
+    )
+    REPORT_JOB_MAX_PER_USER: int = Field(
+        default_factory=lambda: int(os.getenv("REPORT_JOB_MAX_PER_USER", "5"))
+    )
+    REPORT_JOB_RESULT_TTL_SECONDS: int = Field(
+        default_factory=lambda: int(os.getenv("REPORT_JOB_RESULT_TTL_SECONDS", "3600"))
+    )
+
+    # Report previews and syntax checks (/reports/preview, /reports/validate-syntax): row cap pushed
+    # into the SQL (dashboard widgets read up to 1M rows through preview), time limit, and a gate
+    # separate from report executions with per-database and per-user concurrency limits
+    REPORT_PREVIEW_MAX_ROWS: int = Field(
+        default_factory=lambda: int(os.getenv("REPORT_PREVIEW_MAX_ROWS", "1000000"))
+    )
+    REPORT_PREVIEW_MAX_EXECUTION_TIME_SECONDS: int = Field(
+        default_factory=lambda: int(os.getenv("REPORT_PREVIEW_MAX_EXECUTION_TIME_SECONDS", "60"))
+    )
+    REPORT_PREVIEW_MAX_CONCURRENT_PER_DB: int = Field(
+        default_factory=lambda: int(os.getenv("REPORT_PREVIEW_MAX_CONCURRENT_PER_DB", "6"))
+    )
+    REPORT_PREVIEW_MAX_CONCURRENT_PER_USER: int = Field(
+        default_factory=lambda: int(os.getenv("REPORT_PREVIEW_MAX_CONCURRENT_PER_USER", "4"))
+    )
+    REPORT_PREVIEW_QUEUE_TIMEOUT_SECONDS: float = Field(
+        default_factory=lambda: float(os.getenv("REPORT_PREVIEW_QUEUE_TIMEOUT_SECONDS", "30"))
+    )
+
+    # Live report streams (GET /reports/{id}/stream, see report_streams): refresh interval
+    # (clients may ask for a longer or, down to the minimum, shorter one), distinct streams
+    # kept running, keepalive comments and the largest results sent as row deltas
+    REPORT_STREAM_INTERVAL_SECONDS: int = Field(
+        default_factory=lambda: int(os.getenv("REPORT_STREAM_INTERVAL_SECONDS", "30"))
+    )
+    REPORT_STREAM_MIN_INTERVAL_SECONDS: int = Field(
+        default_factory=lambda: int(os.getenv("REPORT_STREAM_MIN_INTERVAL_SECONDS", "5"))
+    )
+    REPORT_STREAM_MAX_STREAMS: int = Field(
+        default_factory=lambda: int(os.getenv("REPORT_STREAM_MAX_STREAMS", "100"))
+    )
+    REPORT_STREAM_KEEPALIVE_SECONDS: int = Field(
+        default_factory=lambda: int(os.getenv("REPORT_STREAM_KEEPALIVE_SECONDS", "15"))
+    )
+    REPORT_STREAM_DELTA_MAX_ROWS: int = Field(
+        default_factory=lambda: int(os.getenv("REPORT_STREAM_DELTA_MAX_ROWS", "5000"))
+    )
+
+    # Per-query telemetry (see query_telemetry): an in-memory ring buffer behind
+    # GET /reports/admin/slow-queries and, optionally, batched writes to the query_log table
+    REPORT_TELEMETRY_ENABLED: bool = Field(
+        default_factory=lambda: os.getenv("REPORT_TELEMETRY_ENABLED", "true").lower() in {"1", "true", "yes", "on"}
+    )
+    REPORT_TELEMETRY_BUFFER_SIZE: int = Field(
+        default_factory=lambda: int(os.getenv("REPORT_TELEMETRY_BUFFER_SIZE", "5000"))
+    )
+    REPORT_QUERY_LOG_ENABLED: bool = Field(
+        default_factory=lambda: os.getenv("REPORT_QUERY_LOG_ENABLED", "false").lower() in {"1", "true", "yes", "on"}
+    )
+    REPORT_QUERY_LOG_FLUSH_SECONDS: int = Field(
+        default_factory=lambda: int(os.getenv("REPORT_QUERY_LOG_FLUSH_SECONDS", "10"))
+    )
+    REPORT_QUERY_LOG_RETENTION_DAYS: int = Field(
+        default_factory=lambda: int(os.getenv("REPORT_QUERY_LOG_RETENTION_DAYS", "30"))
+    )
+
+    # PostgreSQL/MSSQL reads go to healthy read_replicas of their db_config (see read_replicas)
+    REPORT_READ_REPLICAS_ENABLED: bool = Field(
+        default_factory=lambda: os.getenv("REPORT_READ_REPLICAS_ENABLED", "true").lower() in {"1", "true", "yes", "on"}
+    )
+    REPORT_REPLICA_HEALTH_CHECK_SECONDS: int = Field(
+        default_factory=lambda: int(os.getenv("REPORT_REPLICA_HEALTH_CHECK_SECONDS", "15"))
+    )
+    REPORT_REPLICA_HEALTH_CHECK_TIMEOUT_SECONDS: int = Field(
+        default_factory=lambda: int(os.getenv("REPORT_REPLICA_HEALTH_CHECK_TIMEOUT_SECONDS", "5"))
+    )
+    # Default max_replication_lag_seconds of replicas (0 = any lag)
+    REPORT_REPLICA_MAX_LAG_SECONDS: int = Field(
+        default_factory=lambda: int(os.getenv("REPORT_REPLICA_MAX_LAG_SECONDS", "30"))
+    )
+
+    # Concurrent identical report queries share one database execution (see query_coalescing)
+    REPORT_QUERY_COALESCING_ENABLED: bool = Field(
+        default_factory=lambda: os.getenv("REPORT_QUERY_COALESCING_ENABLED", "true").lower() in {"1", "true", "yes", "on"}
+    )
+
+    # EXPLAIN cost guard for report queries and /reports/preview (see query_cost_guard). Limits of 0
+    # disable a check; report and platform db_configs can override them per database.
+    REPORT_COST_GUARD_MODE: str = Field(
+        default_factory=lambda: os.getenv("REPORT_COST_GUARD_MODE", "reject").lower()
+    )
+    REPORT_COST_GUARD_MAX_ESTIMATED_ROWS: float = Field(
+        default_factory=lambda: float(os.getenv("REPORT_COST_GUARD_MAX_ESTIMATED_ROWS", "0"))
+    )
+    REPORT_COST_GUARD_MAX_ESTIMATED_COST: float = Field(
+        default_factory=lambda: float(os.getenv("REPORT_COST_GUARD_MAX_ESTIMATED_COST", "0"))
+    )
+    REPORT_COST_GUARD_CACHE_TTL_SECONDS: int = Field(
+        default_factory=lambda: int(os.getenv("REPORT_COST_GUARD_CACHE_TTL_SECONDS", "600"))
+    )
+    REPORT_COST_GUARD_CACHE_MAX_ENTRIES: int = Field(
+        default_factory=lambda: int(os.getenv("REPORT_COST_GUARD_CACHE_MAX_ENTRIES", "2048"))
+    )
+
+    # Scheduled report snapshots: how often the scheduler checks snapshot-enabled reports for a due cron
+    REPORT_SNAPSHOT_SCHEDULER_ENABLED: bool = Field(
+        default_factory=lambda: os.getenv("REPORT_SNAPSHOT_SCHEDULER_ENABLED", "true").lower() in {"1", "true", "yes", "on"}
+    )
+    REPORT_SNAPSHOT_SCHEDULER_INTERVAL_SECONDS: int = Field(
+        default_factory=lambda: int(os.getenv("REPORT_SNAPSHOT_SCHEDULER_INTERVAL_SECONDS", "60"))
+    )
+
+    # ClickHouse settings overrides for the interactive/heavy/export execution profiles, as JSON
+    # (see execution_profiles), e.g. {"interactive": {"max_threads": 4}}
+    REPORT_EXECUTION_PROFILES: str = Field(
+        default_factory=lambda: os.getenv("REPORT_EXECUTION_PROFILES", "")
+    )
+
+    # Streaming report exports (/reports/{id}/queries/{query_id}/export)
+    REPORT_EXPORT_CHUNK_SIZE: int = Field(
+        default_factory=lambda: int(os.getenv("REPORT_EXPORT_CHUNK_SIZE", "5000"))
+    )
+
+    # ClickHouse client pools for report queries (one pool per database target)
+    CLICKHOUSE_POOL_MAX_SIZE: int = Field(
+        default_factory=lambda: int(os.getenv("CLICKHOUSE_POOL_MAX_SIZE", "16"))
+    )
+    CLICKHOUSE_POOL_IDLE_TIMEOUT_SECONDS: int = Field(
+        default_factory=lambda: int(os.getenv("CLICKHOUSE_POOL_IDLE_TIMEOUT_SECONDS", "300"))
+    )
+    CLICKHOUSE_POOL_CHECKOUT_TIMEOUT_SECONDS: int = Field(
+        default_factory=lambda: int(os.getenv("CLICKHOUSE_POOL_CHECKOUT_TIMEOUT_SECONDS", "30"))
+    )
+
+    # asyncpg pools for PostgreSQL report databases (one pool per platform / db_config target)
+    ASYNCPG_POOL_MIN_SIZE: int = Field(
+        default_factory=lambda: int(os.getenv("ASYNCPG_POOL_MIN_SIZE", "2"))
+    )
+    ASYNCPG_POOL_MAX_SIZE: int = Field(
+        default_factory=lambda: int(os.getenv("ASYNCPG_POOL_MAX_SIZE", "20"))
+    )
+    ASYNCPG_POOL_MAX_INACTIVE_SECONDS: int = Field(
+        default_factory=lambda: int(os.getenv("ASYNCPG_POOL_MAX_INACTIVE_SECONDS", "300"))
+    )
+    ASYNCPG_POOL_ACQUIRE_TIMEOUT_SECONDS: int = Field(
+        default_factory=lambda: int(os.getenv("ASYNCPG_POOL_ACQUIRE_TIMEOUT_SECONDS", "30"))
+    )
+
+    # MSSQL report connection pools (one pool per platform / db_config target)
+    MSSQL_POOL_MIN_SIZE: int = Field(
+        default_factory=lambda: int(os.getenv("MSSQL_POOL_MIN_SIZE", "1"))
+    )
+    MSSQL_POOL_MAX_SIZE: int = Field(
+        default_factory=lambda: int(os.getenv("MSSQL_POOL_MAX_SIZE", "10"))
+    )
+    MSSQL_POOL_IDLE_TIMEOUT_SECONDS: int = Field(
+        default_factory=lambda: int(os.getenv("MSSQL_POOL_IDLE_TIMEOUT_SECONDS", "600"))
+    )
+    MSSQL_POOL_CHECKOUT_TIMEOUT_SECONDS: int = Field(
+        default_factory=lambda: int(os.getenv("MSSQL_POOL_CHECKOUT_TIMEOUT_SECONDS", "30"))
+    )
+    MSSQL_POOL_VALIDATE_AFTER_SECONDS: int = Field(
+        default_factory=lambda: int(os.getenv("MSSQL_POOL_VALIDATE_AFTER_SECONDS", "30"))
+    )
+    MSSQL_POOL_MAX_USES: int = Field(
+        default_factory=lambda: int(os.getenv("MSSQL_POOL_MAX_USES", "1000"))
+    )
+    MSSQL_POOL_MAX_LIFETIME_SECONDS: int = Field(
+        default_factory=lambda: int(os.getenv("MSSQL_POOL_MAX_LIFETIME_SECONDS", "1800"))
+    )
+
     # ServiceChecker: proxy to Flask app for /api/v1/service-status.
     # Missing env → default http://127.0.0.1:5000 (local ServiceChecker).
     # SERVICE_CHECKER_BASE_URL= (empty) disables integration.
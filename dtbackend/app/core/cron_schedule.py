@@ -0,0 +1,95 @@
+"""
+Minimal five-field cron expressions for background schedules.
+
+    minute hour day-of-month month day-of-week
+
+Each field accepts *, a number, a range (a-b), a step (*/n or a-b/n) and
+comma-separated lists of those. Day of week is 0-6 with Sunday as 0 (7 is
+also Sunday). As in cron, when both day fields are restricted a day matches
+if either of them does. Names (JAN, MON) and macros (@hourly) are not
+supported.
+"""
+
+from datetime import datetime, timedelta
+
+_FIELDS = (
+    ("minute", 0, 59),
+    ("hour", 0, 23),
+    ("day of month", 1, 31),
+    ("month", 1, 12),
+    ("day of week", 0, 7),
+)
+
+# next_after gives up after this many days without a match (e.g. "0 0 31 2 *")
+_MAX_SEARCH_DAYS = 4 * 366
+
+
+def _parse_field(text: str, name: str, low: int, high: int) -> frozenset[int]:
+    values: set[int] = set()
+    for part in text.split(","):
+        spec, _, step_text = part.partition("/")
+        step = int(step_text) if step_text else 1
+        if step < 1:
+            raise ValueError(f"invalid step in {name} field: {part}")
+        if spec == "*":
+            start, end = low, high
+        elif "-" in spec:
+            start_text, _, end_text = spec.partition("-")
+            start, end = int(start_text), int(end_text)
+        else:
+            start = int(spec)
+            end = high if step_text else start
+        if not low <= start <= end <= high:
+            raise ValueError(f"{name} field out of range {low}-{high}: {part}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+class CronSchedule:
+    """A parsed cron expression; times are naive datetimes in the caller's timezone"""
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != len(_FIELDS):
+            raise ValueError(f"Cron expression needs 5 fields (minute hour day month weekday): {expression!r}")
+        try:
+            parsed = [_parse_field(text, *spec) for text, spec in zip(fields, _FIELDS)]
+        except ValueError as e:
+            raise ValueError(f"Invalid cron expression {expression!r}: {e}") from e
+
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = frozenset(day % 7 for day in weekdays)
+        self._any_day = fields[2].startswith("*")
+        self._any_weekday = fields[4].startswith("*")
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day_ok = moment.day in self.days
+        # isoweekday(): Monday=1 .. Sunday=7
+        weekday_ok = moment.isoweekday() % 7 in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def matches(self, moment: datetime) -> bool:
+        return (
+            moment.minute in self.minutes
+            and moment.hour in self.hours
+            and moment.month in self.months
+            and self._day_matches(moment)
+        )
+
+    def next_after(self, moment: datetime) -> datetime | None:
+        """First matching minute strictly after moment, or None if there is none within four years"""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=_MAX_SEARCH_DAYS)
+        while candidate < limit:
+            if candidate.month not in self.months or not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        return None
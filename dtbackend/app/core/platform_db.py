@@ -15,6 +15,7 @@ import psycopg2
 from clickhouse_driver import Client as ClickHouseClient
 from psycopg2.extras import RealDictCursor
 
+from app.core.read_replicas import is_connection_error, is_read_only, replica_router
 from app.models.postgres_models import Platform
 
 
@@ -110,12 +111,14 @@ class DatabaseConnectionFactory:
     #     return pyodbc.connect(connection_string)
 
     @staticmethod
-    def get_postgresql_connection(platform: Platform) -> psycopg2.extensions.connection:
+    def get_postgresql_connection(platform: Platform, read_only: bool = False) -> psycopg2.extensions.connection:
         """
         Create PostgreSQL connection for platform
 
         Args:
             platform: Platform model instance
+            read_only: Connect to a healthy read replica of the platform database when it
+                lists read_replicas (see read_replicas), falling back to the primary
 
         Returns:
             psycopg2 connection instance
@@ -123,8 +126,20 @@ class DatabaseConnectionFactory:
         if platform.db_type.lower() != "postgresql":
             raise ValueError(f"Platform {platform.code} is not configured for PostgreSQL")
 
-        db_config = platform.db_config or {}
+        if read_only:
+            replica = replica_router.choose("postgresql", platform=platform)
+            if replica is not None:
+                try:
+                    return DatabaseConnectionFactory._connect_postgresql(replica.db_config)
+                except Exception as e:
+                    if not is_connection_error(e):
+                        raise
+                    replica_router.mark_failed(replica, e)
+
+        return DatabaseConnectionFactory._connect_postgresql(platform.db_config or {})
 
+    @staticmethod
+    def _connect_postgresql(db_config: dict[str, Any]) -> psycopg2.extensions.connection:
         conn = psycopg2.connect(
             host=db_config.get("host", "localhost"),
             port=int(db_config.get("port", 5432)),
@@ -161,7 +176,8 @@ class DatabaseConnectionFactory:
         elif db_type == "mssql":
             return DatabaseConnectionFactory._execute_mssql(platform, query, params)
         elif db_type == "postgresql":
-            return DatabaseConnectionFactory._execute_postgresql(platform, query, params)
+            # Read-only statements may run on a read replica
+            return DatabaseConnectionFactory._execute_postgresql(platform, query, params, read_only=is_read_only(query))
         else:
             raise ValueError(f"Unsupported database type: {db_type}")
 
@@ -210,9 +226,9 @@ class DatabaseConnectionFactory:
             conn.close()
 
     @staticmethod
-    def _execute_postgresql(platform: Platform, query: str, params: dict | None = None) -> dict:
+    def _execute_postgresql(platform: Platform, query: str, params: dict | None = None, read_only: bool = False) -> dict:
         """Execute PostgreSQL query"""
-        conn = DatabaseConnectionFactory.get_postgresql_connection(platform)
+        conn = DatabaseConnectionFactory.get_postgresql_connection(platform, read_only=read_only)
         cursor = conn.cursor()
 
         try:
@@ -0,0 +1,377 @@
+"""
+Read-replica routing for report and widget queries.
+
+A PostgreSQL or MSSQL db_config (a report's or a platform's) can list read
+replicas. Report queries, dropdown options and DatabaseConnectionFactory
+reads then run on a healthy replica and leave the primary to writes:
+
+    {
+        "host": "pg-primary", "port": 5432, "database": "mes", ...,
+        "read_replicas": [
+            {"host": "pg-replica-1", "weight": 2},
+            {"host": "pg-replica-2", "port": 5433, "user": "reader", "password": "..."}
+        ],
+        "max_replication_lag_seconds": 30
+    }
+
+Each replica entry overrides the primary's connection fields (host, port,
+database, user, password, driver); weight (default 1, 0 disables the
+replica) sets its share of the reads among the healthy replicas, in the
+order listed. max_replication_lag_seconds (per replica or for all of them,
+default REPORT_REPLICA_MAX_LAG_SECONDS; 0 accepts any lag) is the staleness
+reads can tolerate.
+
+ReplicaHealthMonitor checks every replica in use every
+REPORT_REPLICA_HEALTH_CHECK_SECONDS: it connects, and measures the replay
+lag (pg_last_xact_replay_timestamp on PostgreSQL, secondary_lag_seconds of
+the Always On replica states on MSSQL, which needs VIEW SERVER STATE). A
+replica is only used while its last check succeeded, is recent and found
+the lag within the limit; a replica whose lag cannot be measured is only
+used when the limit is 0. Replicas are never used before their first check,
+so reads start on the primary. A read that fails to connect to a replica
+marks it down until the next successful check and is retried on the
+primary; SQL errors and query timeouts are not retried. Statements that
+write (see is_read_only) always run on the primary.
+
+A replica set that no query has targeted for REPLICA_SET_IDLE_SECONDS (its
+primary's db_config was edited or removed) is forgotten and its replicas
+are no longer checked.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+from typing import Any
+
+from app.core.config import settings
+from app.models.postgres_models import Platform
+
+logger = logging.getLogger(__name__)
+
+REPLICA_DB_TYPES = ("postgresql", "mssql")
+
+# Replica sets not targeted for this long are dropped from the router
+REPLICA_SET_IDLE_SECONDS = 3600
+
+# db_config keys that describe the replica set rather than a connection
+_ROUTING_KEYS = ("read_replicas", "max_replication_lag_seconds")
+
+# SQLSTATE classes of connection failures: connection exception, operator
+# intervention (shutdown, starting up), too many connections, connection timeout
+_CONNECTION_SQLSTATES = ("08", "57P01", "57P02", "57P03", "53300", "HYT01")
+
+# Data-modifying CTEs, SELECT ... INTO and row locks need the primary
+_WRITE_PATTERN = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE|INTO)\b|\bFOR\s+(NO\s+KEY\s+)?(UPDATE|SHARE)\b", re.IGNORECASE)
+
+_POSTGRES_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+_MSSQL_LAG_SQL = """
+    SELECT MAX(secondary_lag_seconds)
+    FROM sys.dm_hadr_database_replica_states
+    WHERE is_local = 1 AND database_id = DB_ID()
+"""
+
+
+def is_read_only(sql: str) -> bool:
+    """Whether a statement only reads (SELECT or WITH, without INTO or row locks), so a replica can run it"""
+    words = sql.lstrip(" \t\r\n(").split(None, 1)
+    if not words or words[0].upper() not in ("SELECT", "WITH"):
+        return False
+    return _WRITE_PATTERN.search(sql) is None
+
+
+def is_connection_error(exc: BaseException) -> bool:
+    """Whether a failure means the database could not be reached (worth retrying elsewhere), not a bad statement"""
+    if isinstance(exc, (OSError, asyncio.TimeoutError)):
+        return True
+    # asyncpg errors carry .sqlstate, pyodbc errors the SQLSTATE as their first argument
+    sqlstate = getattr(exc, "sqlstate", None) or getattr(exc, "pgcode", None)
+    if sqlstate is None and exc.args and isinstance(exc.args[0], str) and len(exc.args[0]) == 5:
+        sqlstate = exc.args[0]
+    if sqlstate:
+        return sqlstate.startswith(_CONNECTION_SQLSTATES)
+    # psycopg2 reports failed connects as OperationalError without a code
+    return type(exc).__module__.startswith("psycopg2") and type(exc).__name__ == "OperationalError"
+
+
+class Replica:
+    """A read replica of one primary and the result of its last health check"""
+
+    __slots__ = ("key", "name", "db_type", "db_config", "weight", "max_lag", "healthy", "lag", "checked_at", "error")
+
+    def __init__(self, key: str, db_type: str, db_config: dict[str, Any], weight: float, max_lag: float):
+        self.key = key
+        self.name = f"{db_config.get('host')}:{db_config.get('port') or ''}"
+        self.db_type = db_type
+        # Connection settings of the replica, usable wherever a report db_config is
+        self.db_config = db_config
+        self.weight = weight
+        self.max_lag = max_lag
+        self.healthy: bool | None = None
+        self.lag: float | None = None
+        self.checked_at = 0.0
+        self.error: str | None = None
+
+    def status(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "db_type": self.db_type,
+            "weight": self.weight,
+            "healthy": self.healthy,
+            "lag_seconds": self.lag,
+            "max_lag_seconds": self.max_lag,
+            "error": self.error,
+        }
+
+
+class ReplicaRouter:
+    """
+    Registry of the replicas of every primary seen so far and weighted choice among the healthy ones.
+
+    Thread-safe: DatabaseConnectionFactory reads route from worker threads.
+    """
+
+    def __init__(self, stale_after_seconds: float | None = None, clock=time.monotonic, rng: random.Random | None = None, idle_seconds: float = REPLICA_SET_IDLE_SECONDS):
+        # A check older than this no longer vouches for a replica (the monitor has stopped or is stuck)
+        self._stale_after = stale_after_seconds or 3 * max(1, settings.REPORT_REPLICA_HEALTH_CHECK_SECONDS)
+        self._idle_seconds = idle_seconds
+        self._clock = clock
+        self._rng = rng or random.SystemRandom()
+        self._replicas: dict[str, Replica] = {}
+        # Primary config fingerprint -> keys of its replicas in listed order, and when it was last targeted
+        self._sets: dict[str, list[str]] = {}
+        self._last_used: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _fingerprint(db_type: str, db_config: dict[str, Any]) -> str:
+        text = json.dumps({"db_type": db_type, **db_config}, sort_keys=True, default=str)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def replicas_of(self, db_type: str, db_config: dict[str, Any] | None) -> list[Replica]:
+        """Replicas listed in a primary's db_config (registered for health checks on first sight)"""
+        entries = (db_config or {}).get("read_replicas")
+        if not entries or db_type not in REPLICA_DB_TYPES:
+            return []
+
+        set_key = self._fingerprint(db_type, db_config)
+        with self._lock:
+            keys = self._sets.get(set_key)
+            if keys is None:
+                keys = []
+                primary = {k: v for k, v in db_config.items() if k not in _ROUTING_KEYS}
+                default_max_lag = db_config.get("max_replication_lag_seconds", settings.REPORT_REPLICA_MAX_LAG_SECONDS)
+                for entry in entries:
+                    if not isinstance(entry, dict) or not entry.get("host"):
+                        continue
+                    replica_config = {
+                        **primary,
+                        **{k: v for k, v in entry.items() if k not in ("weight", "max_replication_lag_seconds")},
+                        "db_type": db_type,
+                    }
+                    key = self._fingerprint(db_type, replica_config)
+                    if key not in self._replicas:
+                        self._replicas[key] = Replica(
+                            key, db_type, replica_config,
+                            weight=max(float(entry.get("weight", 1)), 0.0),
+                            max_lag=float(entry.get("max_replication_lag_seconds", default_max_lag) or 0),
+                        )
+                    keys.append(key)
+                self._sets[set_key] = keys
+            self._last_used[set_key] = self._clock()
+            return [self._replicas[key] for key in keys]
+
+    def prune(self) -> int:
+        """Forget replica sets not targeted for idle_seconds and the replicas no remaining set lists; returns how many replicas were dropped"""
+        with self._lock:
+            cutoff = self._clock() - self._idle_seconds
+            for set_key in [k for k, used in self._last_used.items() if used < cutoff]:
+                del self._sets[set_key]
+                del self._last_used[set_key]
+            listed = {key for keys in self._sets.values() for key in keys}
+            dropped = [key for key in self._replicas if key not in listed]
+            for key in dropped:
+                del self._replicas[key]
+            return len(dropped)
+
+    def usable(self, replica: Replica) -> bool:
+        """Whether the last health check allows reads on a replica"""
+        if replica.healthy is not True or replica.weight <= 0:
+            return False
+        if self._clock() - replica.checked_at > self._stale_after:
+            return False
+        if replica.max_lag:
+            return replica.lag is not None and replica.lag <= replica.max_lag
+        return True
+
+    def choose(self, db_type: str, db_config: dict[str, Any] | None = None, platform: Platform | None = None) -> Replica | None:
+        """A healthy replica of the target chosen by weight, or None to use the primary"""
+        if not settings.REPORT_READ_REPLICAS_ENABLED:
+            return None
+        primary_config = db_config or (platform.db_config if platform else None)
+        candidates = [r for r in self.replicas_of(db_type, primary_config) if self.usable(r)]
+        if not candidates:
+            return None
+        return self._rng.choices(candidates, weights=[r.weight for r in candidates])[0]
+
+    def record_check(self, replica: Replica, healthy: bool, lag: float | None = None, error: str | None = None) -> None:
+        with self._lock:
+            if healthy != replica.healthy:
+                logger.info("Read replica %s is %s", replica.name, "healthy" if healthy else f"down: {error}")
+            replica.healthy = healthy
+            replica.lag = lag
+            replica.error = error
+            replica.checked_at = self._clock()
+
+    def mark_failed(self, replica: Replica, error: BaseException) -> None:
+        """Stop routing to a replica that failed to connect until its next successful check"""
+        self.record_check(replica, False, error=str(error))
+
+    def replicas(self) -> list[Replica]:
+        with self._lock:
+            return list(self._replicas.values())
+
+    def status(self) -> list[dict[str, Any]]:
+        return [replica.status() for replica in self.replicas()]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._replicas.clear()
+            self._sets.clear()
+            self._last_used.clear()
+
+
+async def _check_postgresql(db_config: dict[str, Any], check_timeout: float) -> float | None:
+    import asyncpg
+    conn = await asyncpg.connect(
+        host=db_config.get("host", "localhost"),
+        port=int(db_config.get("port", 5432)),
+        database=db_config.get("database"),
+        user=db_config.get("user"),
+        password=db_config.get("password"),
+        timeout=check_timeout,
+    )
+    try:
+        lag = await conn.fetchval(_POSTGRES_LAG_SQL, timeout=check_timeout)
+    finally:
+        await conn.close()
+    return float(lag) if lag is not None else None
+
+
+def _check_mssql(db_config: dict[str, Any], check_timeout: float) -> float | None:
+    import pyodbc
+    driver = db_config.get("driver", "{ODBC Driver 17 for SQL Server}")
+    connection_string = (
+        f"DRIVER={driver};"
+        f"SERVER={db_config.get('host', 'localhost')},{db_config.get('port', 1433)};"
+        f"DATABASE={db_config.get('database')};"
+        f"UID={db_config.get('user')};"
+        f"PWD={db_config.get('password')}"
+    )
+    conn = pyodbc.connect(connection_string, timeout=int(check_timeout))
+    try:
+        conn.timeout = int(check_timeout)
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            try:
+                cursor.execute(_MSSQL_LAG_SQL)
+                row = cursor.fetchone()
+            except pyodbc.Error:
+                # Not an availability group database, or no VIEW SERVER STATE: lag unknown
+                return None
+            return float(row[0]) if row and row[0] is not None else None
+        finally:
+            cursor.close()
+    finally:
+        conn.close()
+
+
+async def check_replica(replica: Replica, router: "ReplicaRouter", check_timeout: float | None = None) -> None:
+    """Connect to a replica, measure its lag and record the result"""
+    check_timeout = check_timeout or settings.REPORT_REPLICA_HEALTH_CHECK_TIMEOUT_SECONDS
+    try:
+        if replica.db_type == "postgresql":
+            lag = await asyncio.wait_for(_check_postgresql(replica.db_config, check_timeout), check_timeout * 2)
+        else:
+            lag = await asyncio.wait_for(asyncio.to_thread(_check_mssql, replica.db_config, check_timeout), check_timeout * 2)
+    except Exception as e:
+        router.record_check(replica, False, error=str(e) or type(e).__name__)
+        return
+    router.record_check(replica, True, lag)
+
+
+class ReplicaHealthMonitor:
+    """
+    Background task that checks every registered read replica.
+
+    Replicas are registered the first time a query targets their primary,
+    so the monitor is idle on deployments without read_replicas.
+    """
+
+    _task: asyncio.Task | None = None
+    _stop_event: asyncio.Event | None = None
+    _interval_seconds = max(1, int(settings.REPORT_REPLICA_HEALTH_CHECK_SECONDS))
+
+    @classmethod
+    def start(cls) -> None:
+        if not settings.REPORT_READ_REPLICAS_ENABLED:
+            return
+        if cls._task and not cls._task.done():
+            return
+        cls._stop_event = asyncio.Event()
+        cls._task = asyncio.create_task(cls._run_loop(), name="replica-health-monitor")
+        logger.info("Read replica health monitor started (interval=%ss)", cls._interval_seconds)
+
+    @classmethod
+    async def stop(cls) -> None:
+        if not cls._task:
+            return
+        if cls._stop_event:
+            cls._stop_event.set()
+        try:
+            await asyncio.wait_for(cls._task, timeout=10)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            pass
+        finally:
+            cls._task = None
+            cls._stop_event = None
+        logger.info("Read replica health monitor stopped")
+
+    @classmethod
+    async def _run_loop(cls) -> None:
+        while True:
+            try:
+                await cls.check_all()
+            except Exception:
+                logger.exception("Read replica health check failed")
+            try:
+                await asyncio.wait_for(cls._stop_event.wait(), timeout=cls._interval_seconds)
+                break
+            except asyncio.TimeoutError:
+                pass
+
+    @classmethod
+    async def check_all(cls) -> None:
+        dropped = replica_router.prune()
+        if dropped:
+            logger.info("Stopped checking %s read replica(s) no longer targeted by any query", dropped)
+        replicas = replica_router.replicas()
+        if replicas:
+            await asyncio.gather(*(check_replica(replica, replica_router) for replica in replicas))
+
+
+# Replica sets of all report databases, shared by every request in this process
+replica_router = ReplicaRouter()
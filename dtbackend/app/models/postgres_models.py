@@ -1,8 +1,10 @@
 from sqlalchemy import (
     ARRAY,
+    BigInteger,
     Boolean,
     Column,
     DateTime,
+    Float,
     ForeignKey,
     Integer,
     String,
@@ -199,6 +201,12 @@ class Report(PostgreSQLBase):
     filter_by_department = Column(Boolean, default=False)  # If true, automatically filter queries by user's department
     department_filter_level = Column(String(50), nullable=True)  # Department hierarchy level: 'sektor', 'direktorluk', 'mudurluk', 'birim', or None (full hierarchy)
     filter_by_step_department = Column(Boolean, default=False)  # If true, automatically filter queries by user's step_department column instead
+    cache_ttl_seconds = Column(Integer, nullable=True)  # Result cache TTL for this report's queries: None = server default, 0 = never cache
+    max_execution_time_seconds = Column(Integer, nullable=True)  # Server-enforced per-query time limit: None = server default, 0 = no limit
+    execution_profile = Column(String(20), nullable=True)  # ClickHouse settings profile: interactive (default), heavy or export
+    snapshot_enabled = Column(Boolean, default=False)  # If true, default-filter results are materialized in report_snapshots on snapshot_cron
+    snapshot_cron = Column(String(100), nullable=True)  # Five-field cron expression (server local time), e.g. '0 * * * *'
+    query_count = Column(Integer, nullable=False, default=0, server_default="0")  # Number of report_queries rows, kept in sync when queries are written
     # Example db_config structure (single config from platform's db_configs array):
     # {
     #   "name": "Primary Database",
@@ -250,6 +258,7 @@ class ReportQuery(PostgreSQLBase):
     sql = Column(Text, nullable=False)
     visualization_config = Column(JSONB, nullable=False)
     order_index = Column(Integer, default=0)
+    execution_profile = Column(String(20), nullable=True)  # Overrides the report's execution profile
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -288,6 +297,43 @@ class ReportQueryFilter(PostgreSQLBase):
         return self.filter_type
 
 
+class ReportSnapshot(PostgreSQLBase):
+    """Materialized default-filter result of a report query, refreshed by the snapshot scheduler"""
+    __tablename__ = "report_snapshots"
+
+    id = Column(Integer, primary_key=True, index=True)
+    report_id = Column(Integer, ForeignKey("reports.id", ondelete="CASCADE"), nullable=False, index=True)
+    query_id = Column(Integer, ForeignKey("report_queries.id", ondelete="CASCADE"), nullable=False, unique=True)
+    result = Column(JSONB, nullable=False)  # QueryExecutionResult as JSON
+    generated_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class QueryLog(PostgreSQLBase):
+    """One report query execution, written by the query log writer (see query_telemetry)"""
+    __tablename__ = "query_log"
+
+    id = Column(Integer, primary_key=True, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+    report_id = Column(Integer, nullable=True, index=True)  # No FK: the log outlives deleted reports
+    query_id = Column(Integer, nullable=True)
+    query_name = Column(String(255), nullable=True)
+    db_type = Column(String(50), nullable=True)
+    platform = Column(String(50), nullable=True)
+    username = Column(String(255), nullable=True)
+    success = Column(Boolean, nullable=False)
+    cache_hit = Column(Boolean, nullable=False, default=False)
+    coalesced = Column(Boolean, nullable=False, default=False)
+    queue_ms = Column(Float, nullable=True)
+    fetch_ms = Column(Float, nullable=True)
+    count_ms = Column(Float, nullable=True)
+    serialize_ms = Column(Float, nullable=True)
+    total_ms = Column(Float, nullable=False)
+    rows = Column(Integer, nullable=True)
+    total_rows = Column(Integer, nullable=True)
+    bytes = Column(BigInteger, nullable=True)
+    error = Column(Text, nullable=True)
+
+
 class ReportUser(PostgreSQLBase):
     """Junction table for Report-User many-to-many relationship with favorites"""
     __tablename__ = "report_users"
@@ -19,3 +19,4 @@ class ReportPreviewResponse(BaseModel):
     execution_time_ms: float
     success: bool
     message: str | None = None
+    cost_warning: str | None = None  # Cost guard in 'warn' mode: why the query plan exceeds the database's limits
@@ -4,6 +4,8 @@ from typing import Any, Literal
 
 from pydantic import BaseModel, Field, field_validator, model_validator
 
+from app.core.cron_schedule import CronSchedule
+
 
 # Enums for type safety
 class VisualizationType(str, Enum):
@@ -50,6 +52,17 @@ class ColumnValueColorRule(BaseModel):
         populate_by_name = True
         from_attributes = True
 
+# Incremental time-bucket execution (see time_buckets service)
+class IncrementalOptions(BaseModel):
+    filter_field: str = Field(..., alias="filterField")  # Date filter that selects the range
+    column: str | None = None  # Result column holding each row's date (defaults to filter_field)
+    bucket: Literal['day', 'month'] = 'day'
+    lag_buckets: int = Field(0, alias="lagBuckets", ge=0)  # Closed buckets still queried live (late data)
+
+    class Config:
+        populate_by_name = True
+        from_attributes = True
+
 # Chart Options Schema
 class ChartOptions(BaseModel):
     # Bar/Line/Area specific
@@ -67,6 +80,13 @@ class ChartOptions(BaseModel):
     smooth: bool | None = False
     show_dots: bool | None = Field(True, alias="showDots")
 
+    # Line/Area: server-side downsampling to about target_points rows (see downsampling service)
+    downsampling: Literal['lttb', 'minmax'] | None = None
+    target_points: int | None = Field(None, alias="targetPoints", ge=3)
+
+    # Date-range aggregations: reuse cached rows of closed days/months, query only the current one
+    incremental: IncrementalOptions | None = None
+
     # Scatter specific
     size_field: str | None = Field(None, alias="sizeField")
 
@@ -184,6 +204,7 @@ class QueryConfigBase(BaseModel):
     visualization: VisualizationConfig
     order_index: int | None = Field(0, alias="orderIndex")
     tab_id: int | None = Field(None, alias="tabId", description="Optional tab ID this query belongs to")
+    execution_profile: Literal['interactive', 'heavy', 'export'] | None = Field(None, alias="executionProfile", description="ClickHouse execution profile for this query (overrides the report's)")
 
     @field_validator('sql')
     @classmethod
@@ -205,6 +226,7 @@ class QueryConfigUpdate(BaseModel):
     sql: str | None = None
     visualization: VisualizationConfig | None = None
     order_index: int | None = Field(None, alias="orderIndex")
+    execution_profile: Literal['interactive', 'heavy', 'export'] | None = Field(None, alias="executionProfile")
 
     class Config:
         populate_by_name = True  # Allow both field names and aliases
@@ -255,6 +277,12 @@ class TabConfig(TabConfigBase):
         from_attributes = True
 
 # Report Schemas
+def _validate_cron(v: str | None) -> str | None:
+    if v is None or not v.strip():
+        return None
+    CronSchedule(v.strip())  # Raises ValueError with the offending field
+    return " ".join(v.split())
+
 class ReportBase(BaseModel):
     name: str = Field(..., min_length=1, max_length=255, description="Report name")
     description: str | None = Field(None, max_length=1000, description="Report description")
@@ -271,6 +299,16 @@ class ReportBase(BaseModel):
     filter_by_department: bool | None = Field(False, alias="filterByDepartment", description="If true, automatically filter query results by user's department")
     department_filter_level: str | None = Field(None, alias="departmentFilterLevel", description="Department hierarchy level to filter by: 'sektor', 'direktorluk', 'mudurluk', 'birim', or None (full hierarchy)")
     filter_by_step_department: bool | None = Field(False, alias="filterByStepDepartment", description="If true, automatically filter query results by user's step_department column")
+    cache_ttl_seconds: int | None = Field(None, ge=0, alias="cacheTtlSeconds", description="Result cache TTL in seconds for this report's queries (None = server default, 0 = disabled)")
+    max_execution_time_seconds: int | None = Field(None, ge=0, alias="maxExecutionTimeSeconds", description="Server-enforced time limit in seconds for each of this report's queries (None = server default, 0 = no limit)")
+    execution_profile: Literal['interactive', 'heavy', 'export'] | None = Field(None, alias="executionProfile", description="ClickHouse execution profile: interactive (default), heavy or export")
+    snapshot_enabled: bool | None = Field(False, alias="snapshotEnabled", description="If true, a background job materializes the queries' default-filter results on snapshot_cron")
+    snapshot_cron: str | None = Field(None, max_length=100, alias="snapshotCron", description="Five-field cron expression (server local time) for refreshing snapshots, e.g. '0 * * * *'")
+
+    @field_validator('snapshot_cron')
+    @classmethod
+    def validate_snapshot_cron(cls, v):
+        return _validate_cron(v)
 
     class Config:
         populate_by_name = True  # Allow both field names and aliases
@@ -319,6 +357,16 @@ class ReportUpdate(BaseModel):
     filter_by_department: bool | None = Field(None, alias="filterByDepartment")
     department_filter_level: str | None = Field(None, alias="departmentFilterLevel")
     filter_by_step_department: bool | None = Field(None, alias="filterByStepDepartment")
+    cache_ttl_seconds: int | None = Field(None, ge=0, alias="cacheTtlSeconds")
+    max_execution_time_seconds: int | None = Field(None, ge=0, alias="maxExecutionTimeSeconds")
+    execution_profile: Literal['interactive', 'heavy', 'export'] | None = Field(None, alias="executionProfile")
+    snapshot_enabled: bool | None = Field(None, alias="snapshotEnabled")
+    snapshot_cron: str | None = Field(None, max_length=100, alias="snapshotCron")
+
+    @field_validator('snapshot_cron')
+    @classmethod
+    def validate_snapshot_cron(cls, v):
+        return _validate_cron(v)
 
     class Config:
         populate_by_name = True
@@ -342,6 +390,16 @@ class ReportFullUpdate(BaseModel):
     filter_by_department: bool | None = Field(None, alias="filterByDepartment")
     department_filter_level: str | None = Field(None, alias="departmentFilterLevel")
     filter_by_step_department: bool | None = Field(None, alias="filterByStepDepartment")
+    cache_ttl_seconds: int | None = Field(None, ge=0, alias="cacheTtlSeconds")
+    max_execution_time_seconds: int | None = Field(None, ge=0, alias="maxExecutionTimeSeconds")
+    execution_profile: Literal['interactive', 'heavy', 'export'] | None = Field(None, alias="executionProfile")
+    snapshot_enabled: bool | None = Field(None, alias="snapshotEnabled")
+    snapshot_cron: str | None = Field(None, max_length=100, alias="snapshotCron")
+
+    @field_validator('snapshot_cron')
+    @classmethod
+    def validate_snapshot_cron(cls, v):
+        return _validate_cron(v)
 
     @model_validator(mode='after')
     def validate_queries_and_direct_link(self):
@@ -420,6 +478,10 @@ class ReportExecutionRequest(BaseModel):
     page_limit: int | None = None  # Page number (1-based, for pagination)
     sort_by: str | None = None  # Column name to sort by
     sort_direction: str | None = None  # Sort direction: 'asc' or 'desc'
+    pagination_mode: str | None = None  # 'offset' (page_limit, default) or 'keyset' (cursor)
+    cursor: str | None = None  # Keyset pagination: next_cursor from the previous page
+    tiebreaker: str | None = None  # Keyset pagination: unique column appended to sort_by
+    target_points: int | None = Field(None, ge=3)  # Downsampled line/area charts: points to return (overrides chart_options)
 
 class QueryExecutionResult(BaseModel):
     query_id: int
@@ -431,6 +493,14 @@ class QueryExecutionResult(BaseModel):
     success: bool
     message: str | None = None
     has_more: bool | None = False  # Indicates if there are more pages available
+    from_cache: bool | None = False  # True when served from the report result cache
+    next_cursor: str | None = None  # Keyset pagination: pass as cursor to fetch the next page
+    queue_time_ms: float | None = 0  # Time spent waiting for a query slot on the report's database
+    downsampled_from: int | None = None  # Row count before chart downsampling (None when not downsampled)
+    snapshot_generated_at: datetime | None = None  # Set when served from the report's scheduled snapshot
+    cost_warning: str | None = None  # Cost guard in 'warn' mode: why the query plan exceeds the database's limits
+    coalesced: bool | None = False  # True when the result was shared from an identical query already in flight
+    cached_buckets: int | None = None  # Incremental queries: closed date buckets served from the bucket cache
 
 class ReportExecutionResponse(BaseModel):
     report_id: int
@@ -440,6 +510,80 @@ class ReportExecutionResponse(BaseModel):
     success: bool
     message: str | None = None
 
+# Background report jobs
+class ReportJobRequest(BaseModel):
+    query_id: int | None = None  # If None, execute all queries
+    filters: list[FilterValue] | None = []
+    limit: int | None = 1000
+    sort_by: str | None = None
+    sort_direction: str | None = None
+    target_points: int | None = Field(None, ge=3)
+
+class ReportJobQueryStatus(BaseModel):
+    query_id: int
+    query_name: str
+    status: str  # queued, running, completed, failed
+    total_rows: int | None = None
+    execution_time_ms: float | None = None
+    message: str | None = None
+
+class ReportJobStatus(BaseModel):
+    job_id: str
+    report_id: int
+    status: str  # queued, running, completed (see the result for per-query success), failed
+    message: str | None = None
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    total_queries: int
+    completed_queries: int
+    queries: list[ReportJobQueryStatus] = []
+
+# Query telemetry (/reports/admin/slow-queries)
+class LatencyPercentiles(BaseModel):
+    """Latency distribution in milliseconds; percentiles are absent when count is 0"""
+    count: int
+    p50: float | None = None
+    p90: float | None = None
+    p95: float | None = None
+    p99: float | None = None
+    max: float | None = None
+
+class QueryLatencyStats(LatencyPercentiles):
+    report_id: int | None = None
+    query_id: int | None = None
+    query_name: str | None = None
+    db_type: str | None = None
+    failures: int = 0
+    avg_rows: float | None = None
+
+class QueryTelemetryEntry(BaseModel):
+    created_at: datetime
+    report_id: int | None = None
+    query_id: int | None = None
+    query_name: str | None = None
+    db_type: str | None = None
+    platform: str | None = None
+    username: str | None = None
+    success: bool
+    cache_hit: bool = False
+    coalesced: bool = False
+    queue_ms: float | None = None
+    fetch_ms: float | None = None
+    count_ms: float | None = None
+    serialize_ms: float | None = None
+    total_ms: float
+    rows: int | None = None
+    total_rows: int | None = None
+    bytes: int | None = None
+    error: str | None = None
+
+class SlowQueriesResponse(BaseModel):
+    source: str  # memory (this process's ring buffer) or database (query_log)
+    overall: LatencyPercentiles
+    queries: list[QueryLatencyStats] = []  # Slowest first by p95
+    slowest: list[QueryTelemetryEntry] = []
+
 # Report Preview Schemas (for single query testing)
 class ReportPreviewRequest(BaseModel):
     sql_query: str
@@ -461,7 +605,7 @@ class SqlValidationResponse(BaseModel):
     success: bool
     message: str
     execution_time_ms: float
-    explain_plan: list[dict[str, Any]] | None = None
+    explain_plan: list[list[Any]] | None = None  # Plan rows as returned by EXPLAIN (SHOWPLAN_TEXT on MSSQL)
 
 # Sample Queries Schemas
 class SampleQuery(BaseModel):
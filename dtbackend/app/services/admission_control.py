@@ -0,0 +1,236 @@
+"""
+Admission control for report queries.
+
+Every database target (platform id or db_config hash, the same keys as the
+connection pools) gets its own gate with a concurrency limit, so a busy
+report can only saturate its own database's slots and never another
+tenant's (bulkheads). Queries over the limit wait in a fair queue: waiting
+users are served round-robin, so one user opening a 12-panel report does
+not get all slots ahead of everyone else, and a user can additionally be
+capped per target.
+
+The limit comes from "max_concurrent_queries" in the report's or platform's
+db_config, falling back to REPORT_ADMISSION_MAX_CONCURRENT_PER_DB.
+
+Gates are asyncio objects: use them from the event loop only.
+"""
+
+import asyncio
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+
+from app.core.config import settings
+
+
+class AdmissionTimeoutError(TimeoutError):
+    """Raised when a query waited longer than the queue timeout for a slot on its database"""
+
+
+class AdmissionTicket:
+    """Handed to the admitted caller; queue_time_ms is how long it waited for its slot"""
+    __slots__ = ("queue_time_ms",)
+
+    def __init__(self, queue_time_ms: float = 0.0):
+        self.queue_time_ms = queue_time_ms
+
+
+class _TargetGate:
+    """Concurrency limit and fair wait queue for one database target"""
+
+    def __init__(self, limit: int, per_user_limit: int):
+        self.limit = limit
+        self.per_user_limit = per_user_limit
+        self.active = 0
+        self.active_by_user: dict[str, int] = {}
+        # user -> their waiters in arrival order; turns is the round-robin order of users with waiters
+        self.waiters: dict[str, deque[asyncio.Future]] = {}
+        self.turns: deque[str] = deque()
+        self.admitted = 0
+        self.queued = 0
+        self.timeouts = 0
+        self.total_queue_time = 0.0
+        self.max_queue_time = 0.0
+
+    def _has_capacity(self, user: str) -> bool:
+        if self.active >= self.limit:
+            return False
+        return self.per_user_limit <= 0 or self.active_by_user.get(user, 0) < self.per_user_limit
+
+    def _grant(self, user: str) -> None:
+        self.active += 1
+        self.active_by_user[user] = self.active_by_user.get(user, 0) + 1
+        self.admitted += 1
+
+    def release(self, user: str) -> None:
+        self.active -= 1
+        remaining = self.active_by_user.get(user, 0) - 1
+        if remaining > 0:
+            self.active_by_user[user] = remaining
+        else:
+            self.active_by_user.pop(user, None)
+        self.dispatch()
+
+    def dispatch(self) -> None:
+        """Admit waiters while there is capacity, taking one per user in round-robin order"""
+        skipped = 0
+        while self.turns and self.active < self.limit and skipped < len(self.turns):
+            user = self.turns.popleft()
+            queue = self.waiters[user]
+            while queue and queue[0].done():
+                queue.popleft()
+            if not queue:
+                del self.waiters[user]
+                continue
+            if not self._has_capacity(user):
+                # This user is at their per-target cap, let the next user go first
+                self.turns.append(user)
+                skipped += 1
+                continue
+
+            self._grant(user)
+            queue.popleft().set_result(None)
+            skipped = 0
+            if queue:
+                self.turns.append(user)
+            else:
+                del self.waiters[user]
+
+    def _forget(self, user: str, future: asyncio.Future) -> None:
+        queue = self.waiters.get(user)
+        if queue is None:
+            return
+        try:
+            queue.remove(future)
+        except ValueError:
+            pass
+        if not queue:
+            del self.waiters[user]
+            try:
+                self.turns.remove(user)
+            except ValueError:
+                pass
+
+    async def acquire(self, user: str, queue_timeout: float) -> float:
+        """Wait up to queue_timeout seconds (0 = no limit) for a slot and return the time spent queued in seconds"""
+        # Fast path: nobody is waiting, so taking a free slot can't jump the queue
+        if not self.waiters and self._has_capacity(user):
+            self._grant(user)
+            return 0.0
+
+        start = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        if user not in self.waiters:
+            self.waiters[user] = deque()
+            self.turns.append(user)
+        self.waiters[user].append(future)
+        self.queued += 1
+        self.dispatch()
+
+        try:
+            await asyncio.wait_for(future, queue_timeout if queue_timeout > 0 else None)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # Admitted just as the wait was abandoned: hand the slot to the next waiter
+                self.release(user)
+            else:
+                self._forget(user, future)
+                self.dispatch()
+            if isinstance(e, TimeoutError):
+                self.timeouts += 1
+                raise AdmissionTimeoutError(
+                    f"Database is busy: no query slot became free within {queue_timeout:g}s"
+                ) from None
+            raise
+
+        waited = time.monotonic() - start
+        self.total_queue_time += waited
+        self.max_queue_time = max(self.max_queue_time, waited)
+        return waited
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "per_user_limit": self.per_user_limit,
+            "active": self.active,
+            "waiting": sum(len(q) for q in self.waiters.values()),
+            "waiting_users": len(self.waiters),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "timeouts": self.timeouts,
+            "avg_queue_time_ms": round(self.total_queue_time / self.queued * 1000, 2) if self.queued else 0.0,
+            "max_queue_time_ms": round(self.max_queue_time * 1000, 2),
+        }
+
+
+class AdmissionController:
+    """Per-database-target admission gates
+
+    Args:
+        default_limit: Concurrent queries per target when the db_config sets no max_concurrent_queries
+        per_user_limit: Concurrent queries per user per target (0 = no per-user cap)
+        queue_timeout: Seconds a query may wait for a slot before AdmissionTimeoutError (0 = no timeout)
+        enabled: When False, admit() never waits
+    """
+
+    def __init__(self, default_limit: int | None = None, per_user_limit: int | None = None, queue_timeout: float | None = None, enabled: bool | None = None):
+        self.default_limit = settings.REPORT_ADMISSION_MAX_CONCURRENT_PER_DB if default_limit is None else default_limit
+        self.per_user_limit = settings.REPORT_ADMISSION_MAX_CONCURRENT_PER_USER if per_user_limit is None else per_user_limit
+        self.queue_timeout = settings.REPORT_ADMISSION_QUEUE_TIMEOUT_SECONDS if queue_timeout is None else queue_timeout
+        self.enabled = settings.REPORT_ADMISSION_ENABLED if enabled is None else enabled
+        self._gates: dict[str, _TargetGate] = {}
+
+    @staticmethod
+    def limit_from_config(db_config: dict[str, Any] | None) -> int | None:
+        """The max_concurrent_queries set in a report or platform db_config, if any"""
+        if not db_config or db_config.get("max_concurrent_queries") in (None, ""):
+            return None
+        try:
+            return int(db_config["max_concurrent_queries"])
+        except (TypeError, ValueError):
+            return None
+
+    @asynccontextmanager
+    async def admit(self, target: str, user: str | None, limit: int | None = None) -> AsyncIterator[AdmissionTicket]:
+        """Hold one of target's query slots for the duration of the block
+
+        Raises:
+            AdmissionTimeoutError: If no slot became free within the queue timeout
+        """
+        if not self.enabled:
+            yield AdmissionTicket()
+            return
+
+        effective_limit = max(1, limit or self.default_limit)
+        gate = self._gates.get(target)
+        if gate is None:
+            gate = self._gates[target] = _TargetGate(effective_limit, self.per_user_limit)
+        elif gate.limit != effective_limit:
+            # Limit edited in the platform/report config: applies to the next admissions
+            gate.limit = effective_limit
+            gate.dispatch()
+
+        user_key = user or "anonymous"
+        waited = await gate.acquire(user_key, self.queue_timeout)
+        try:
+            yield AdmissionTicket(round(waited * 1000, 2))
+        finally:
+            gate.release(user_key)
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        return {target: gate.stats() for target, gate in self._gates.items()}
+
+
+# Report executions, snapshot refreshes and exports (a CSV export holds its slot until the body is streamed);
+# limits count this process's queries only
+admission_controller = AdmissionController()
+
+# Report previews and syntax checks queue separately, so authoring cannot take report executions' slots
+preview_admission_controller = AdmissionController(
+    default_limit=settings.REPORT_PREVIEW_MAX_CONCURRENT_PER_DB,
+    per_user_limit=settings.REPORT_PREVIEW_MAX_CONCURRENT_PER_USER,
+    queue_timeout=settings.REPORT_PREVIEW_QUEUE_TIMEOUT_SECONDS,
+    enabled=True,
+)
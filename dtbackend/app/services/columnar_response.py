@@ -0,0 +1,230 @@
+"""
+Compact columnar response formats for report and widget results.
+
+By default /reports/execute and /data/widget return rows as lists (or
+dicts) that go through FastAPI's jsonable_encoder, which dominates the
+response time of large tables and charts. Clients can opt in to:
+
+    columnar  ?format=columnar, or Accept: application/vnd.dtbackend.columnar+json
+              JSON with one array per column and a type per column:
+                  int, float, bool, string  plain values
+                  timestamp                 epoch milliseconds (naive values are taken as UTC)
+                  date                      days since 1970-01-01
+                  dictionary                {"dictionary": [...], "indices": [...]} for
+                                            low-cardinality string columns
+                  json                      anything else, as it would be serialized
+    arrow     ?format=arrow, or Accept: application/vnd.apache.arrow.stream
+              Apache Arrow IPC stream of one query result; low-cardinality string
+              columns are dictionary-encoded and the other result fields are
+              stored as JSON under the "result" schema metadata key
+
+Both are encoded straight to bytes and returned as a Response, skipping
+response_model validation and jsonable_encoder.
+"""
+
+import datetime
+import decimal
+import json
+from collections.abc import Callable, Sequence
+from types import NoneType
+from typing import Any
+
+from fastapi import HTTPException, Request, Response
+from pydantic_core import to_json
+
+from app.schemas.reports import ReportExecutionResponse
+from app.services.report_export import arrow_table
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+COLUMNAR_MEDIA_TYPE = "application/vnd.dtbackend.columnar+json"
+
+RESPONSE_FORMATS = ("rows", "columnar", "arrow")
+
+# String columns with at most this share of distinct values are dictionary-encoded
+_DICTIONARY_MAX_DISTINCT_RATIO = 0.5
+
+_ARROW_SINGLE_QUERY = "Arrow responses need a single query, pass query_id"
+
+_EPOCH_DATE = datetime.date(1970, 1, 1)
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+_NAIVE_EPOCH = datetime.datetime(1970, 1, 1)
+_MILLISECOND = datetime.timedelta(milliseconds=1)
+
+
+def negotiate_response_format(request: Request, requested: str | None = None) -> str:
+    """Response format from the format query parameter, else the Accept header, else "rows"""
+    if requested:
+        if requested not in RESPONSE_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Unsupported response format: {requested}")
+        return requested
+    accept = request.headers.get("accept", "")
+    if ARROW_STREAM_MEDIA_TYPE in accept:
+        return "arrow"
+    if COLUMNAR_MEDIA_TYPE in accept:
+        return "columnar"
+    return "rows"
+
+
+def check_report_response_format(response_format: str, query_id: int | None) -> None:
+    """Reject an Arrow request for a whole report before any of its queries run
+
+    Raises:
+        HTTPException: 406 when Arrow is requested without a query_id
+    """
+    if response_format == "arrow" and query_id is None:
+        raise HTTPException(status_code=406, detail=_ARROW_SINGLE_QUERY)
+
+
+def _timestamp_ms(value: datetime.datetime) -> int:
+    # Naive values are subtracted from a naive epoch, which is how they are taken as UTC
+    return (value - (_NAIVE_EPOCH if value.tzinfo is None else _EPOCH)) // _MILLISECOND
+
+
+def _days_since_epoch(value: datetime.date) -> int:
+    return (value - _EPOCH_DATE).days
+
+
+def _json_value(value: Any) -> Any:
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (list, tuple)):
+        return [_json_value(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _json_value(v) for k, v in value.items()}
+    return str(value)
+
+
+def _column_type(kinds: set[type]) -> str:
+    if not kinds:
+        return "string"
+    if kinds == {bool}:
+        return "bool"
+    if kinds == {int}:
+        return "int"
+    if kinds <= {int, float, decimal.Decimal}:
+        return "float"
+    if kinds == {str}:
+        return "string"
+    if all(issubclass(kind, datetime.datetime) for kind in kinds):
+        return "timestamp"
+    if kinds == {datetime.date}:
+        return "date"
+    return "json"
+
+
+def _convert(function: Callable[[Any], Any], values: Sequence, has_nulls: bool) -> list:
+    # map() keeps the per-value loop in C when there are no NULLs to skip
+    if not has_nulls:
+        return list(map(function, values))
+    return [None if v is None else function(v) for v in values]
+
+
+def encode_column(values: Sequence) -> tuple[str, Any]:
+    """Return (type, encoded values) for one column"""
+    kinds = set(map(type, values))
+    has_nulls = NoneType in kinds
+    kinds.discard(NoneType)
+    column_type = _column_type(kinds)
+
+    if column_type == "float":
+        return column_type, _convert(float, values, has_nulls)
+    if column_type == "timestamp":
+        return column_type, _convert(_timestamp_ms, values, has_nulls)
+    if column_type == "date":
+        return column_type, _convert(_days_since_epoch, values, has_nulls)
+    if column_type == "json":
+        return column_type, [_json_value(v) for v in values]
+    if column_type == "string" and len(values) > 1:
+        dictionary = list(dict.fromkeys(values))
+        if len(dictionary) <= len(values) * _DICTIONARY_MAX_DISTINCT_RATIO:
+            positions = {value: i for i, value in enumerate(dictionary)}
+            return "dictionary", {"dictionary": dictionary, "indices": list(map(positions.__getitem__, values))}
+    return column_type, values
+
+
+def encode_columns(columns: list[str], rows: Sequence[Sequence[Any]]) -> dict[str, Any]:
+    """Column-major, typed encoding of row-major results: {"columns", "column_types", "data"}"""
+    values_by_column = list(zip(*rows)) if rows else [() for _ in columns]
+    encoded = [encode_column(values) for values in values_by_column]
+    return {
+        "columns": columns,
+        "column_types": [column_type for column_type, _ in encoded],
+        "data": [values for _, values in encoded],
+    }
+
+
+def _records_to_rows(records: list[dict[str, Any]]) -> tuple[list[str], list[list]]:
+    columns: dict[str, None] = {}
+    for record in records:
+        columns.update(dict.fromkeys(record))
+    names = list(columns)
+    return names, [[record.get(name) for name in names] for record in records]
+
+
+def _json_response(payload: dict[str, Any]) -> Response:
+    # Every value is JSON-native by now, so pydantic-core's encoder can write it directly
+    return Response(content=to_json(payload), media_type="application/json", headers={"X-Response-Format": "columnar"})
+
+
+def _arrow_response(columns: list[str], rows: list, metadata: dict[str, Any]) -> Response:
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise ValueError("Arrow responses require the pyarrow package") from e
+
+    table = arrow_table(columns, rows)
+    for i, column in enumerate(table.columns):
+        if pa.types.is_string(column.type) and len(column) > 1:
+            encoded = column.dictionary_encode()
+            if len(encoded.chunk(0).dictionary) <= len(column) * _DICTIONARY_MAX_DISTINCT_RATIO:
+                table = table.set_column(i, table.field(i).with_type(encoded.type), encoded)
+    table = table.replace_schema_metadata({"result": json.dumps(metadata, default=_json_value)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return Response(content=sink.getvalue().to_pybytes(), media_type=ARROW_STREAM_MEDIA_TYPE)
+
+
+def encode_report_execution(response: ReportExecutionResponse, response_format: str) -> Response:
+    """Encode an execute_report response as columnar JSON or an Arrow stream (one query only)
+
+    Raises:
+        HTTPException: 406 when Arrow is requested for more than one query result
+            (endpoints reject that earlier with check_report_response_format)
+    """
+    if response_format == "arrow":
+        if len(response.results) != 1:
+            raise HTTPException(status_code=406, detail=_ARROW_SINGLE_QUERY)
+        result = response.results[0]
+        metadata = {
+            **response.model_dump(mode="json", exclude={"results"}),
+            **result.model_dump(mode="json", exclude={"columns", "data"}),
+        }
+        return _arrow_response(result.columns, result.data, metadata)
+
+    payload = response.model_dump(mode="json", exclude={"results"})
+    payload["results"] = [
+        {**result.model_dump(mode="json", exclude={"columns", "data"}), **encode_columns(result.columns, result.data)}
+        for result in response.results
+    ]
+    return _json_response(payload)
+
+
+def encode_widget_data(data: dict[str, Any], response_format: str) -> dict[str, Any] | Response:
+    """Encode a widget's record list (data["data"]) as columnar JSON or an Arrow stream
+
+    Widgets whose data is not a list of records are returned unchanged.
+    """
+    records = data.get("data")
+    if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+        return data
+
+    columns, rows = _records_to_rows(records)
+    rest = {key: value for key, value in data.items() if key != "data"}
+    if response_format == "arrow":
+        return _arrow_response(columns, rows, rest)
+    return _json_response({**_json_value(rest), **encode_columns(columns, rows)})
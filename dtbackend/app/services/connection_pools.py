@@ -0,0 +1,284 @@
+"""
+Thread-safe bounded connection pools for report source databases.
+
+Report queries are executed from worker threads (asyncio.to_thread), so every
+thread must check out its own connection instead of sharing one client.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(TimeoutError):
+    """Raised when no connection becomes available within the checkout timeout"""
+
+
+class _PooledConnection:
+    __slots__ = ("conn", "created_at", "last_used_at", "uses")
+
+    def __init__(self, conn: Any):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used_at = now
+        self.uses = 0
+
+
+class BoundedConnectionPool:
+    """Generic checkout/checkin pool with a max size, idle eviction and wait-time accounting
+
+    Args:
+        factory: Creates a new connection
+        close: Closes a connection (errors are logged and ignored)
+        max_size: Maximum number of open connections (idle + checked out)
+        idle_timeout: Idle connections older than this many seconds are closed
+        checkout_timeout: Seconds to wait for a free connection before PoolTimeoutError
+        name: Label used in logs and stats
+        min_size: Idle eviction never shrinks the pool below this many connections
+        validate: Optional liveness check run on checkout; a connection that fails it is replaced
+        validate_after: Only validate connections that have been idle at least this many seconds
+        reset: Optional hook run on checkin (e.g. rollback); a connection that fails it is closed
+        max_uses: Recycle a connection after this many checkouts (0 = unlimited)
+        max_lifetime: Recycle a connection this many seconds after it was opened (0 = unlimited)
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        close: Callable[[Any], None],
+        max_size: int = 10,
+        idle_timeout: float = 300.0,
+        checkout_timeout: float = 30.0,
+        name: str = "pool",
+        min_size: int = 0,
+        validate: Callable[[Any], None] | None = None,
+        validate_after: float = 0.0,
+        reset: Callable[[Any], None] | None = None,
+        max_uses: int = 0,
+        max_lifetime: float = 0.0,
+    ):
+        self._factory = factory
+        self._close = close
+        self._max_size = max(1, max_size)
+        self._min_size = max(0, min(min_size, self._max_size))
+        self._idle_timeout = idle_timeout
+        self._checkout_timeout = checkout_timeout
+        self._validate = validate
+        self._validate_after = validate_after
+        self._reset = reset
+        self._max_uses = max_uses
+        self._max_lifetime = max_lifetime
+        self.name = name
+
+        self._cond = threading.Condition()
+        self._idle: deque[_PooledConnection] = deque()
+        self._in_use: dict[int, _PooledConnection] = {}
+        self._size = 0  # idle + checked out + being created
+
+        # Wait-time accounting
+        self._checkouts = 0
+        self._waited_checkouts = 0
+        self._total_wait_seconds = 0.0
+        self._max_wait_seconds = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._closed = 0
+        self._recycled = 0
+        self._validation_failures = 0
+
+    def checkout(self) -> Any:
+        """Check out a connection, creating one if below max_size, otherwise wait for a free one"""
+        start = time.monotonic()
+        deadline = start + self._checkout_timeout
+        waited = False
+
+        while True:
+            entry, slot_waited = self._reserve(deadline)
+            waited = waited or slot_waited
+            if entry is None:
+                entry = self._open_reserved()
+                break
+            if self._is_usable(entry):
+                break
+            # Stale or broken idle connection: drop it and try again
+            self._drop(entry)
+
+        wait_seconds = time.monotonic() - start
+        with self._cond:
+            entry.uses += 1
+            self._in_use[id(entry.conn)] = entry
+            self._checkouts += 1
+            if waited:
+                self._waited_checkouts += 1
+            self._total_wait_seconds += wait_seconds
+            self._max_wait_seconds = max(self._max_wait_seconds, wait_seconds)
+
+        return entry.conn
+
+    def checkin(self, conn: Any, discard: bool = False) -> None:
+        """Return a connection to the pool; discard=True closes it (e.g. after a protocol error)"""
+        with self._cond:
+            entry = self._in_use.pop(id(conn), None)
+
+        if entry is None:
+            # Unknown connections (not checked out from this pool) are simply closed
+            self._close_all([conn])
+            return
+
+        if not discard and self._reset:
+            try:
+                self._reset(conn)
+            except Exception as e:
+                logger.warning("Discarding connection from %s after failed reset: %s", self.name, e)
+                discard = True
+
+        if not discard and self._should_recycle(entry):
+            discard = True
+            with self._cond:
+                self._recycled += 1
+
+        if discard:
+            self._drop(entry)
+            return
+
+        with self._cond:
+            entry.last_used_at = time.monotonic()
+            self._idle.append(entry)
+            self._cond.notify()
+
+    def prefill(self) -> None:
+        """Open connections until the pool holds min_size of them"""
+        while True:
+            with self._cond:
+                if self._size >= self._min_size:
+                    return
+                self._size += 1
+            entry = self._open_reserved()
+            with self._cond:
+                self._idle.append(entry)
+                self._cond.notify()
+
+    def _reserve(self, deadline: float) -> tuple[_PooledConnection | None, bool]:
+        """Take an idle connection, or reserve a slot for a new one (entry None); waits while the pool is full"""
+        waited = False
+        to_close: list[Any] = []
+        try:
+            with self._cond:
+                while True:
+                    to_close.extend(self._evict_idle_locked())
+                    if self._idle:
+                        # LIFO keeps the most recently used (warm) connections in rotation
+                        return self._idle.pop(), waited
+                    if self._size < self._max_size:
+                        self._size += 1
+                        return None, waited
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeoutError(
+                            f"Timed out after {self._checkout_timeout:.0f}s waiting for a connection from {self.name} "
+                            f"(max_size={self._max_size})"
+                        )
+                    waited = True
+                    self._cond.wait(remaining)
+        finally:
+            self._close_all(to_close)
+
+    def _open_reserved(self) -> _PooledConnection:
+        """Open a connection for a slot already counted in _size"""
+        try:
+            entry = _PooledConnection(self._factory())
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._created += 1
+        return entry
+
+    def _is_usable(self, entry: _PooledConnection) -> bool:
+        now = time.monotonic()
+        if self._max_lifetime > 0 and now - entry.created_at >= self._max_lifetime:
+            with self._cond:
+                self._recycled += 1
+            return False
+        if self._validate and now - entry.last_used_at >= self._validate_after:
+            try:
+                self._validate(entry.conn)
+            except Exception as e:
+                logger.info("Connection from %s failed validation, replacing it: %s", self.name, e)
+                with self._cond:
+                    self._validation_failures += 1
+                return False
+        return True
+
+    def _should_recycle(self, entry: _PooledConnection) -> bool:
+        if self._max_uses > 0 and entry.uses >= self._max_uses:
+            return True
+        return self._max_lifetime > 0 and time.monotonic() - entry.created_at >= self._max_lifetime
+
+    def _drop(self, entry: _PooledConnection) -> None:
+        """Close a connection that is not in the idle list and free its slot"""
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+        self._close_all([entry.conn])
+
+    def close_idle(self) -> None:
+        """Close every idle connection (checked out connections are closed on checkin)"""
+        with self._cond:
+            to_close = [entry.conn for entry in self._idle]
+            self._size -= len(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        self._close_all(to_close)
+
+    def stats(self) -> dict[str, Any]:
+        with self._cond:
+            return {
+                "name": self.name,
+                "max_size": self._max_size,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "checkouts": self._checkouts,
+                "waited_checkouts": self._waited_checkouts,
+                "timeouts": self._timeouts,
+                "total_wait_ms": round(self._total_wait_seconds * 1000, 2),
+                "avg_wait_ms": round(self._total_wait_seconds * 1000 / self._checkouts, 2) if self._checkouts else 0.0,
+                "max_wait_ms": round(self._max_wait_seconds * 1000, 2),
+                "created": self._created,
+                "closed": self._closed,
+                "recycled": self._recycled,
+                "validation_failures": self._validation_failures,
+            }
+
+    def _evict_idle_locked(self) -> list[Any]:
+        """Remove idle connections unused for longer than idle_timeout; caller must hold the lock"""
+        if self._idle_timeout <= 0:
+            return []
+        cutoff = time.monotonic() - self._idle_timeout
+        evicted = []
+        # The left end of the deque holds the least recently used connections
+        while self._idle and self._idle[0].last_used_at < cutoff and self._size > self._min_size:
+            evicted.append(self._idle.popleft().conn)
+            self._size -= 1
+        return evicted
+
+    def _close_all(self, conns: list[Any]) -> None:
+        for conn in conns:
+            try:
+                self._close(conn)
+            except Exception as e:
+                logger.warning("Failed to close connection from %s: %s", self.name, e)
+        if conns:
+            with self._cond:
+                self._closed += len(conns)
@@ -10,13 +10,15 @@ class DataService:
     def get_widget_data(
         db_client,
         widget_type: str,
-        filters: dict[str, Any] | None = None
+        filters: dict[str, Any] | None = None,
+        db_config: dict[str, Any] | None = None
     ) -> dict[str, Any]:
         """Get widget data using widget factory"""
         return WidgetFactory.create_widget_data(
             db_client=db_client,
             widget_type=widget_type,
-            filters=filters
+            filters=filters,
+            db_config=db_config
         )
 
     @staticmethod
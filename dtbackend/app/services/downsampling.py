@@ -0,0 +1,172 @@
+"""
+Server-side downsampling of line and area chart results.
+
+A line chart a few hundred pixels wide cannot show tens of thousands of
+points, but it receives every row the SQL returns. Visualizations can opt in
+with chart_options.downsampling and chart_options.target_points (the
+execute request's target_points overrides the latter):
+
+    lttb    Largest-Triangle-Three-Buckets: keeps the points that preserve
+            the visual shape of the series
+    minmax  splits the rows into target_points / 2 buckets and keeps the
+            minimum and maximum of each, so spikes are never dropped
+
+Rows are downsampled after fetch, in the order the SQL returns them (charts
+are expected to ORDER BY their x axis), and whole rows are kept so tooltip
+fields still match. When the visualization has a group_by column, each
+series is downsampled separately. The x axis may be numeric or a
+date/datetime; any other x is treated as evenly spaced.
+"""
+
+import datetime
+import decimal
+from collections.abc import Sequence
+from typing import Any, NamedTuple
+
+from app.core.config import settings
+
+DOWNSAMPLING_MODES = ("lttb", "minmax")
+DOWNSAMPLED_VISUALIZATIONS = ("line", "area")
+
+# Fewer points than this can't describe a series (first, last and one in between)
+_MIN_TARGET_POINTS = 3
+
+
+class DownsamplingSpec(NamedTuple):
+    mode: str
+    target_points: int
+    x_axis: str | None
+    y_axis: str | None
+    group_by: str | None
+
+
+def downsampling_spec(visualization_config: dict[str, Any] | None, target_points: int | None = None) -> DownsamplingSpec | None:
+    """Downsampling configured for a visualization, or None when it does not opt in"""
+    config = visualization_config or {}
+    chart_options = config.get("chart_options") or {}
+    mode = chart_options.get("downsampling")
+    if config.get("type") not in DOWNSAMPLED_VISUALIZATIONS or mode not in DOWNSAMPLING_MODES:
+        return None
+
+    target = target_points or chart_options.get("target_points") or settings.REPORT_DOWNSAMPLING_DEFAULT_TARGET_POINTS
+    return DownsamplingSpec(
+        mode=mode,
+        target_points=max(int(target), _MIN_TARGET_POINTS),
+        x_axis=config.get("x_axis"),
+        y_axis=config.get("y_axis"),
+        group_by=config.get("group_by"),
+    )
+
+
+def _x_values(values: Sequence[Any]) -> list[float]:
+    converted = []
+    for value in values:
+        if isinstance(value, datetime.datetime):
+            converted.append(value.timestamp())
+        elif isinstance(value, datetime.date):
+            converted.append(float(value.toordinal()))
+        elif isinstance(value, (int, float, decimal.Decimal)) and not isinstance(value, bool):
+            converted.append(float(value))
+        else:
+            # Categories or mixed values: fall back to evenly spaced points
+            return [float(i) for i in range(len(values))]
+    return converted
+
+
+def _y_values(values: Sequence[Any]) -> list[float | None] | None:
+    converted = []
+    for value in values:
+        if value is None:
+            converted.append(None)
+        elif isinstance(value, (int, float, decimal.Decimal)) and not isinstance(value, bool):
+            converted.append(float(value))
+        else:
+            return None
+    return converted
+
+
+def lttb_indices(xs: Sequence[float], ys: Sequence[float | None], target_points: int) -> list[int]:
+    """Indices of the points Largest-Triangle-Three-Buckets keeps (NULL y values count as 0)"""
+    n = len(xs)
+    if target_points >= n or target_points < _MIN_TARGET_POINTS:
+        return list(range(n))
+
+    ys = [0.0 if y is None else y for y in ys]
+    # The first and last points are always kept, the rest are split into target_points - 2 buckets
+    bucket_size = (n - 2) / (target_points - 2)
+    selected = [0]
+    a = 0
+    for bucket in range(target_points - 2):
+        # Average of the next bucket is the third vertex of the triangle
+        next_start = int((bucket + 1) * bucket_size) + 1
+        next_end = min(max(int((bucket + 2) * bucket_size) + 1, next_start + 1), n)
+        count = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / count
+        avg_y = sum(ys[next_start:next_end]) / count
+
+        ax, ay = xs[a], ys[a]
+        best_area = -1.0
+        best = start = int(bucket * bucket_size) + 1
+        for j in range(start, int((bucket + 1) * bucket_size) + 1):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = j
+        selected.append(best)
+        a = best
+    selected.append(n - 1)
+    return selected
+
+
+def min_max_indices(ys: Sequence[float | None], target_points: int) -> list[int]:
+    """Indices of the minimum and maximum of each of target_points / 2 buckets, plus the first and last point"""
+    n = len(ys)
+    if target_points >= n:
+        return list(range(n))
+
+    buckets = max(target_points // 2, 1)
+    selected = {0, n - 1}
+    for bucket in range(buckets):
+        start = bucket * n // buckets
+        end = (bucket + 1) * n // buckets
+        present = [i for i in range(start, end) if ys[i] is not None]
+        if present:
+            selected.add(min(present, key=ys.__getitem__))
+            selected.add(max(present, key=ys.__getitem__))
+    return sorted(selected)
+
+
+def _series_indices(xs: list[float], ys: list[float | None], spec: DownsamplingSpec) -> list[int]:
+    if spec.mode == "minmax":
+        return min_max_indices(ys, spec.target_points)
+    return lttb_indices(xs, ys, spec.target_points)
+
+
+def downsample_rows(columns: list[str], rows: Sequence[Sequence[Any]], spec: DownsamplingSpec) -> list:
+    """Rows kept by the downsampling spec, in their original order
+
+    Without an x_axis/y_axis the chart's defaults apply: the first and second
+    column. Rows are returned unchanged when the y axis is not numeric.
+    """
+    if len(rows) <= spec.target_points or len(columns) < 2:
+        return list(rows)
+
+    x_index = columns.index(spec.x_axis) if spec.x_axis in columns else 0
+    y_index = columns.index(spec.y_axis) if spec.y_axis in columns else 1
+
+    if spec.group_by in columns:
+        group_index = columns.index(spec.group_by)
+        series: dict[Any, list[int]] = {}
+        for i, row in enumerate(rows):
+            series.setdefault(row[group_index], []).append(i)
+    else:
+        series = {None: list(range(len(rows)))}
+
+    kept = []
+    for positions in series.values():
+        ys = _y_values([rows[i][y_index] for i in positions])
+        if ys is None:
+            return list(rows)
+        xs = _x_values([rows[i][x_index] for i in positions])
+        kept.extend(positions[i] for i in _series_indices(xs, ys, spec))
+    return [rows[i] for i in sorted(kept)]
@@ -0,0 +1,83 @@
+"""
+Named ClickHouse execution profiles for report and widget queries.
+
+Every ClickHouse statement the reports engine sends carries the settings of
+one profile, so cheap dashboard queries cannot take every core and the
+server's memory while an export is running:
+
+    interactive  dashboards and report views (default): a bounded share of
+                 threads and memory, highest priority, ClickHouse query
+                 cache for repeated identical reads
+    heavy        reports known to scan a lot (set per report or query):
+                 server thread/memory defaults, lower priority
+    export       streaming exports and export widgets: few threads and the
+                 lowest priority, so they run in the background
+
+Lower ClickHouse priority values win; 0 disables prioritization. Reports
+and queries choose a profile with execution_profile (a query's overrides
+its report's). The built-in settings can be overridden per profile with
+REPORT_EXECUTION_PROFILES (JSON, e.g. {"heavy": {"max_memory_usage": 20000000000}})
+and per database with an "execution_profiles" object in the report's or
+platform's db_config. A profile's max_execution_time is the time limit for
+reports without max_execution_time_seconds, on every database type.
+
+Settings are sent as non-important, so servers that do not know a setting
+(use_query_cache before 23.1) ignore it.
+"""
+
+import json
+import logging
+from typing import Any
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+EXECUTION_PROFILES = ("interactive", "heavy", "export")
+DEFAULT_PROFILE = "interactive"
+
+_BUILTIN_SETTINGS: dict[str, dict[str, Any]] = {
+    "interactive": {
+        "max_threads": 8,
+        "max_memory_usage": 10_000_000_000,
+        "priority": 1,
+        "use_query_cache": 1,
+        "query_cache_ttl": 60,
+        # Queries using now()/today() are simply not cached instead of failing
+        "query_cache_nondeterministic_function_handling": "ignore",
+    },
+    "heavy": {
+        "priority": 5,
+    },
+    "export": {
+        "max_threads": 4,
+        "max_memory_usage": 10_000_000_000,
+        "priority": 10,
+    },
+}
+
+
+def _load_overrides(raw: str) -> dict[str, dict[str, Any]]:
+    if not raw.strip():
+        return {}
+    try:
+        overrides = json.loads(raw)
+    except json.JSONDecodeError as e:
+        logger.warning("Ignoring REPORT_EXECUTION_PROFILES: %s", e)
+        return {}
+    return {name: values for name, values in overrides.items() if name in EXECUTION_PROFILES and isinstance(values, dict)}
+
+
+_OVERRIDES = _load_overrides(settings.REPORT_EXECUTION_PROFILES)
+
+
+def resolve_profile(*names: str | None) -> str:
+    """The first known profile name, or DEFAULT_PROFILE"""
+    return next((name for name in names if name in EXECUTION_PROFILES), DEFAULT_PROFILE)
+
+
+def profile_settings(profile: str | None, db_config: dict[str, Any] | None = None) -> dict[str, Any]:
+    """ClickHouse settings of a profile: built-in, then REPORT_EXECUTION_PROFILES, then the database's db_config"""
+    profile = resolve_profile(profile)
+    per_database = ((db_config or {}).get("execution_profiles") or {}).get(profile) or {}
+    return {**_BUILTIN_SETTINGS[profile], **_OVERRIDES.get(profile, {}), **per_database}
@@ -0,0 +1,136 @@
+"""
+Cached dropdown filter options.
+
+get_filter_options used to run a search query plus a count query against the
+report's database for every keystroke in a dropdown filter. Instead, the
+filter's dropdown query is now run once and its option rows are kept in a
+FilterOptionIndex, which serves search and pagination from memory with the
+same results as those queries: a case-insensitive substring match on the
+value (and on the label too when the dropdown query has a WHERE clause), in
+the dropdown query's own order. While the user keeps typing, each search
+scans only the matches of the previous (shorter) search term.
+
+Filters whose dropdown query returns more than FILTER_OPTION_CACHE_MAX_OPTIONS
+rows are remembered as too large and keep using the per-request database
+queries. Concurrent misses for the same filter share one load.
+"""
+
+import asyncio
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Sequence
+from typing import Any
+
+from app.core.config import settings
+from app.services.report_result_cache import ReportResultCache
+
+# Search terms whose matches are remembered per index (pagination and narrowing while typing)
+_REMEMBERED_SEARCHES = 32
+
+# Cached in place of an index for filters with too many options
+_TOO_MANY_OPTIONS = object()
+
+
+class FilterOptionIndex:
+    """Options of one dropdown filter, searchable in memory"""
+
+    def __init__(self, options: list[dict[str, Any]]):
+        # In the dropdown query's order, duplicates included (the count query counted them too)
+        self.options = options
+        self._values = [str(option["value"]).lower() for option in options]
+        self._labels = [str(option["label"]).lower() for option in options]
+        self._searches: OrderedDict[tuple[str, bool], list[int]] = OrderedDict()
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Sequence[Any]]) -> "FilterOptionIndex":
+        """Build an index from dropdown query rows (value, label) or (value,)"""
+        return cls([{"value": row[0], "label": row[1] if len(row) >= 2 else str(row[0])} for row in rows if row])
+
+    def __len__(self) -> int:
+        return len(self.options)
+
+    def search(self, term: str, offset: int, limit: int, match_labels: bool = False) -> tuple[list[dict[str, Any]], int]:
+        """Return (options, total) for one page of the options matching term (all options for an empty term)
+
+        Like the database search: term is matched anywhere in the value, and
+        also in the label when match_labels is set.
+        """
+        offset = max(offset, 0)
+        if not term:
+            return self.options[offset:offset + limit], len(self.options)
+
+        positions = self._matches(term.lower(), match_labels)
+        return [self.options[p] for p in positions[offset:offset + limit]], len(positions)
+
+    def _matches(self, term: str, match_labels: bool) -> list[int]:
+        positions = self._searches.get((term, match_labels))
+        if positions is not None:
+            self._searches.move_to_end((term, match_labels))
+            return positions
+
+        # Anything matching term also matches each of its prefixes, so narrow from the longest remembered one
+        candidates: Sequence[int] = range(len(self.options))
+        for end in range(len(term) - 1, 0, -1):
+            narrower = self._searches.get((term[:end], match_labels))
+            if narrower is not None:
+                candidates = narrower
+                break
+
+        positions = [p for p in candidates if term in self._values[p] or (match_labels and term in self._labels[p])]
+
+        self._searches[(term, match_labels)] = positions
+        while len(self._searches) > _REMEMBERED_SEARCHES:
+            self._searches.popitem(last=False)
+        return positions
+
+
+class FilterOptionCache:
+    """Per-filter option indexes with a TTL, per-report invalidation and coalesced loads"""
+
+    build_key = staticmethod(ReportResultCache.build_key)
+
+    def __init__(self, max_filters: int = 512, max_options: int = 50000):
+        self._entries = ReportResultCache(max_entries=max_filters)
+        self._loading: dict[str, asyncio.Future] = {}
+        self.max_options = max_options
+
+    async def get_or_load(
+        self,
+        key: str,
+        load_rows: Callable[[int], Awaitable[Sequence[Sequence[Any]]]],
+        ttl_seconds: float,
+        report_id: int | None = None,
+    ) -> FilterOptionIndex | None:
+        """Cached index for key, loading it with load_rows(max_rows) on a miss
+
+        Returns None when the dropdown query has more than max_options rows; the
+        caller should then query the database directly.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            pending = self._loading.get(key)
+            if pending is None:
+                pending = asyncio.ensure_future(self._load(key, load_rows, ttl_seconds, report_id))
+                self._loading[key] = pending
+                pending.add_done_callback(lambda future: self._loading.pop(key, None))
+            # Shielded: a request cancelled mid-load must not cancel the load for the others waiting on it
+            entry = await asyncio.shield(pending)
+        return None if entry is _TOO_MANY_OPTIONS else entry
+
+    async def _load(self, key, load_rows, ttl_seconds, report_id):
+        rows = await load_rows(self.max_options + 1)
+        entry = _TOO_MANY_OPTIONS if len(rows) > self.max_options else FilterOptionIndex.from_rows(rows)
+        self._entries.set(key, entry, ttl_seconds, report_id=report_id)
+        return entry
+
+    def invalidate_report(self, report_id: int) -> int:
+        return self._entries.invalidate_report(report_id)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+# Keyed by dropdown query and database target
+filter_option_cache = FilterOptionCache(
+    max_filters=settings.FILTER_OPTION_CACHE_MAX_FILTERS,
+    max_options=settings.FILTER_OPTION_CACHE_MAX_OPTIONS,
+)
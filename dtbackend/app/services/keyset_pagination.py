@@ -0,0 +1,216 @@
+"""
+Keyset (seek) pagination for paginated report tables.
+
+Instead of LIMIT/OFFSET, every page is ordered by the sort column plus a
+unique tiebreaker column, and the next page seeks past the last row sent:
+
+    WHERE (sort_col, tiebreaker) > (last_sort_value, last_tiebreaker_value)
+
+so deep pages cost the same as the first one. The position is handed to the
+client as an opaque cursor token that also carries the total row count, so
+the count runs once per filter set instead of once per page.
+
+The query is wrapped as a subquery, so the order columns refer to the
+query's output column names. Rows whose order columns are NULL cannot be
+seeked past and should be excluded by the query.
+
+Cursor values are the driver's values of the last row. Datetimes, dates,
+times and decimals keep their type in the token and are rendered as typed
+literals, so the seek compares like with like on every database.
+"""
+
+import base64
+import datetime
+import decimal
+import hashlib
+import json
+import math
+from typing import Any
+
+_CURSOR_VALUE_TYPES = (bool, int, float, str)
+
+# Cursor token tag -> parser of typed values
+_TYPED_VALUES = {
+    "datetime": datetime.datetime.fromisoformat,
+    "date": datetime.date.fromisoformat,
+    "time": datetime.time.fromisoformat,
+    "decimal": decimal.Decimal,
+}
+
+
+def _token_value(value: Any) -> Any:
+    if isinstance(value, _CURSOR_VALUE_TYPES):
+        return value
+    # datetime before date: datetime is a date subclass
+    for tag, kind in (("datetime", datetime.datetime), ("date", datetime.date), ("time", datetime.time), ("decimal", decimal.Decimal)):
+        if isinstance(value, kind):
+            return {"t": tag, "v": value.isoformat() if tag != "decimal" else str(value)}
+    # UUIDs and other driver types compare as their text
+    return str(value)
+
+
+def _cursor_value(token_value: Any) -> Any:
+    if isinstance(token_value, _CURSOR_VALUE_TYPES):
+        return token_value
+    if not isinstance(token_value, dict) or token_value.get("t") not in _TYPED_VALUES or not isinstance(token_value.get("v"), str):
+        raise ValueError("Invalid pagination cursor")
+    try:
+        value = _TYPED_VALUES[token_value["t"]](token_value["v"])
+    except (ValueError, decimal.InvalidOperation) as e:
+        raise ValueError("Invalid pagination cursor") from e
+    if isinstance(value, decimal.Decimal) and not value.is_finite():
+        raise ValueError("Invalid pagination cursor")
+    return value
+
+
+def keyset_fingerprint(sql: str, order_columns: list[str], direction: str, params: dict[str, Any] | None = None) -> str:
+    """Identify the filtered query (statement and bound filter values) and ordering a cursor belongs to"""
+    payload = json.dumps({"sql": sql, "params": params or {}, "order": order_columns, "direction": direction}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def encode_cursor(values: list[Any], total_rows: int | None, fingerprint: str) -> str:
+    """Encode the last row's order column values as an opaque, URL-safe token"""
+    payload = json.dumps({"v": [_token_value(v) for v in values], "t": total_rows, "f": fingerprint}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, fingerprint: str) -> tuple[list[Any], int | None]:
+    """Decode a cursor token into (order column values, total row count)
+
+    Raises:
+        ValueError: If the token is malformed or was issued for a different query, filter set or ordering
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        values = payload["v"]
+        total_rows = payload.get("t")
+        cursor_fingerprint = payload["f"]
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError("Invalid pagination cursor") from e
+
+    if cursor_fingerprint != fingerprint:
+        raise ValueError("Pagination cursor does not match the current query, filters or sort order")
+    if not isinstance(values, list):
+        raise ValueError("Invalid pagination cursor")
+    if total_rows is not None and not isinstance(total_rows, int):
+        raise ValueError("Invalid pagination cursor")
+    return [_cursor_value(v) for v in values], total_rows
+
+
+def output_column_name(column: str) -> str:
+    """Output name of a column reference: strips quotes and any table qualifier"""
+    name = column.strip()
+    if name.startswith('"') and name.endswith('"') and len(name) > 1:
+        return name[1:-1].replace('""', '"')
+    return name.rsplit(".", 1)[-1]
+
+
+def quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def sql_literal(value: Any, db_type: str) -> str:
+    """Render a cursor value as a SQL literal for the given database"""
+    if isinstance(value, bool):
+        if db_type == "mssql":
+            return "1" if value else "0"
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            raise ValueError("Invalid pagination cursor")
+        return repr(value)
+    if isinstance(value, datetime.datetime):
+        return _datetime_literal(value, db_type)
+    if isinstance(value, datetime.date):
+        if db_type == "clickhouse":
+            return f"toDate('{value.isoformat()}')"
+        return f"CAST('{value.isoformat()}' AS date)" if db_type == "mssql" else f"DATE '{value.isoformat()}'"
+    if isinstance(value, datetime.time):
+        if db_type == "mssql":
+            return f"CAST('{value.isoformat()}' AS time(7))"
+        # ClickHouse has no time type: such columns are strings there
+        return f"TIME '{value.isoformat()}'" if db_type == "postgresql" else f"'{value.isoformat()}'"
+    if isinstance(value, decimal.Decimal):
+        if not value.is_finite():
+            raise ValueError("Invalid pagination cursor")
+        digits = format(value, "f")
+        if db_type == "clickhouse":
+            # A Float64 literal cannot be compared with a Decimal column
+            return f"toDecimal128('{digits}', {max(0, -value.as_tuple().exponent)})"
+        return digits
+    if isinstance(value, str):
+        if db_type == "clickhouse":
+            # ClickHouse string literals also treat backslash as an escape character
+            return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+        escaped = value.replace("'", "''")
+        return f"N'{escaped}'" if db_type == "mssql" else f"'{escaped}'"
+    raise ValueError("Invalid pagination cursor")
+
+
+def _datetime_literal(value: datetime.datetime, db_type: str) -> str:
+    if db_type == "clickhouse":
+        if value.tzinfo is not None:
+            utc = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+            return f"toDateTime64('{utc.isoformat(sep=' ')}', 6, 'UTC')"
+        return f"toDateTime64('{value.isoformat(sep=' ')}', 6)"
+    if db_type == "mssql":
+        # datetime2/datetimeoffset take all six fractional digits and an offset; datetime takes neither
+        return f"CAST('{value.isoformat()}' AS {'datetimeoffset(7)' if value.tzinfo else 'datetime2(7)'})"
+    return f"{'TIMESTAMPTZ' if value.tzinfo else 'TIMESTAMP'} '{value.isoformat(sep=' ')}'"
+
+
+def build_keyset_query(sql: str, db_type: str, order_columns: list[str], direction: str, page_size: int, after_values: list[Any] | None = None) -> str:
+    """Wrap a filtered query so it returns one keyset page (page_size + 1 rows to detect more pages)
+
+    Args:
+        sql: Filtered, sanitized query without ORDER BY
+        db_type: 'postgresql', 'mssql' or 'clickhouse'
+        order_columns: Sort column followed by the tiebreaker column(s)
+        direction: 'asc' or 'desc' (applies to every order column)
+        page_size: Rows per page
+        after_values: Order column values of the previous page's last row (None for the first page)
+    """
+    columns = [quote_identifier(output_column_name(c)) for c in order_columns]
+    order_by = ", ".join(f"{c} {direction.upper()}" for c in columns)
+
+    where = ""
+    if after_values is not None:
+        if len(after_values) != len(columns):
+            raise ValueError("Pagination cursor does not match the current sort order")
+        literals = [sql_literal(v, db_type) for v in after_values]
+        op = ">" if direction == "asc" else "<"
+        if db_type == "mssql":
+            # SQL Server has no row value comparison: (a, b) > (x, y) == a > x OR (a = x AND b > y)
+            conditions = []
+            for i, (column, literal) in enumerate(zip(columns, literals)):
+                equal_prefix = [f"{c} = {v}" for c, v in zip(columns[:i], literals[:i])]
+                conditions.append("(" + " AND ".join([*equal_prefix, f"{column} {op} {literal}"]) + ")")
+            where = " WHERE " + " OR ".join(conditions)
+        else:
+            where = f" WHERE ({', '.join(columns)}) {op} ({', '.join(literals)})"
+
+    if db_type == "mssql":
+        return f"SELECT TOP {page_size + 1} * FROM ({sql}) AS keyset_page{where} ORDER BY {order_by}"
+    return f"SELECT * FROM ({sql}) AS keyset_page{where} ORDER BY {order_by} LIMIT {page_size + 1}"
+
+
+def next_cursor_values(columns: list[str], row: list[Any], order_columns: list[str]) -> list[Any]:
+    """Pick the order column values out of a result row"""
+    values = []
+    for order_column in order_columns:
+        name = output_column_name(order_column)
+        if name in columns:
+            index = columns.index(name)
+        else:
+            lowered = [c.lower() for c in columns]
+            if name.lower() not in lowered:
+                raise ValueError(f"Keyset column '{name}' is not in the query result")
+            index = lowered.index(name.lower())
+        if row[index] is None:
+            raise ValueError(f"Keyset column '{name}' must not be NULL")
+        values.append(row[index])
+    return values
@@ -16,6 +16,8 @@ from app.schemas.platform import (
     PlatformStats,
     PlatformUpdate,
 )
+from app.services.filter_option_cache import filter_option_cache
+from app.services.report_definitions import report_definition_cache
 
 
 class PlatformService:
@@ -172,6 +174,10 @@ class PlatformService:
         await db.commit()
         await db.refresh(platform)
 
+        # Cached report definitions and filter options depend on the platform's db_config
+        report_definition_cache.clear()
+        filter_option_cache.clear()
+
         return platform
 
     @staticmethod
@@ -0,0 +1,182 @@
+"""
+Server-side cancellation of report queries when the client goes away.
+
+Endpoints run their work through run_until_disconnected, which installs a
+QueryCancelScope for the request and polls request.is_disconnected(). Each
+query registers how it can be stopped while it runs:
+
+    ClickHouse  KILL QUERY for the query_id the query was tagged with
+    MSSQL       cursor.cancel() (SQLCancel on the statement)
+    PostgreSQL  asyncpg sends a cancel request for the running statement
+                when the awaiting task is cancelled, so nothing to register
+
+When the client disconnects the scope runs every registered canceller and
+the request task is cancelled.
+
+Blocking queries run on worker threads; asyncio.to_thread copies the
+context, so current_cancel_scope is visible there too.
+"""
+
+import asyncio
+import logging
+import threading
+from collections.abc import Awaitable, Callable
+from contextvars import ContextVar
+from typing import Any, TypeVar
+
+from clickhouse_driver import Client
+from fastapi import HTTPException, Request
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Status code nginx uses for "client closed request"
+CLIENT_CLOSED_REQUEST = 499
+
+
+class QueryCancelledError(Exception):
+    """Raised when a query is started in a scope that has already been cancelled"""
+
+
+class QueryCancelScope:
+    """Cancellers of the queries currently running for one request (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cancellers: dict[int, Callable[[], None]] = {}
+        self._next_handle = 0
+        self.cancelled = False
+
+    def register(self, cancel: Callable[[], None]) -> int:
+        """Register how to stop a query that is about to run; unregister the returned handle when it ends
+
+        Raises:
+            QueryCancelledError: If the scope was already cancelled
+        """
+        with self._lock:
+            if self.cancelled:
+                raise QueryCancelledError("Query cancelled: the client disconnected")
+            self._next_handle += 1
+            self._cancellers[self._next_handle] = cancel
+            return self._next_handle
+
+    def unregister(self, handle: int | None) -> None:
+        if handle is None:
+            return
+        with self._lock:
+            self._cancellers.pop(handle, None)
+
+    async def cancel(self) -> None:
+        """Stop every registered query; errors are logged and ignored"""
+        with self._lock:
+            self.cancelled = True
+            cancellers = list(self._cancellers.values())
+            self._cancellers.clear()
+        results = await asyncio.gather(*(asyncio.to_thread(c) for c in cancellers), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.warning("Failed to cancel query: %s", result)
+
+
+current_cancel_scope: ContextVar[QueryCancelScope | None] = ContextVar("current_cancel_scope", default=None)
+
+
+def kill_clickhouse_query(client: Client, query_id: str) -> None:
+    """KILL QUERY on the server a (busy) client is connected to, over a separate connection"""
+    connection = client.connection
+    host, port = connection.hosts[0]
+    killer = Client(
+        host=host,
+        port=port,
+        user=connection.user,
+        password=connection.password,
+        database=connection.database,
+        secure=connection.secure_socket,
+    )
+    try:
+        # query_id is generated by us (uuid hex), safe to inline
+        killer.execute(f"KILL QUERY WHERE query_id = '{query_id}' ASYNC")
+    finally:
+        killer.disconnect()
+
+
+def register_clickhouse_query(client: Client, query_id: str) -> int | None:
+    """Register a ClickHouse query tagged with query_id in the current scope (None outside a scope)"""
+    scope = current_cancel_scope.get()
+    if scope is None:
+        return None
+    return scope.register(lambda: kill_clickhouse_query(client, query_id))
+
+
+def register_cursor(cursor: Any, connection: Any = None) -> int | None:
+    """Register a DB-API cursor (pyodbc cursor.cancel, or psycopg2 connection.cancel) in the current scope"""
+    scope = current_cancel_scope.get()
+    if scope is None:
+        return None
+    cancel = getattr(cursor, "cancel", None) or getattr(connection, "cancel", None)
+    if cancel is None:
+        return None
+    return scope.register(cancel)
+
+
+def unregister_query(handle: int | None) -> None:
+    scope = current_cancel_scope.get()
+    if scope is not None:
+        scope.unregister(handle)
+
+
+async def run_until_disconnected(request: Request, work: Callable[[], Awaitable[T]]) -> T:
+    """Run work() for a request, cancelling its queries if the client disconnects first
+
+    Raises:
+        HTTPException: 499 when the client disconnected (nobody receives the response)
+    """
+    scope = QueryCancelScope()
+    token = current_cancel_scope.set(scope)
+    try:
+        # The task copies the current context, so the scope is visible to everything it runs
+        task = asyncio.ensure_future(work())
+    finally:
+        current_cancel_scope.reset(token)
+
+    work_done = asyncio.Event()
+    task.add_done_callback(lambda _: work_done.set())
+
+    async def watch_disconnect() -> None:
+        # Polls between waits on work_done, so the watcher also ends as soon as the work does
+        while not await request.is_disconnected():
+            try:
+                await asyncio.wait_for(work_done.wait(), settings.REPORT_DISCONNECT_POLL_SECONDS)
+                return
+            except TimeoutError:
+                pass
+
+    watcher = asyncio.ensure_future(watch_disconnect())
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        if task.done():
+            return task.result()
+        if watcher.exception() is not None:
+            # Disconnect detection failed, not a disconnect: let the work finish
+            return await task
+
+        logger.info("Client disconnected, cancelling running queries")
+        await scope.cancel()
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            current = asyncio.current_task()
+            if current is not None and current.cancelling():
+                # This request is being cancelled as well, not just the work
+                raise
+        raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request")
+    finally:
+        if not task.done():
+            # The endpoint itself was cancelled (server shutdown): stop the work too
+            await scope.cancel()
+            task.cancel()
+        watcher.cancel()
@@ -0,0 +1,92 @@
+"""
+In-flight deduplication ("singleflight") of identical report queries.
+
+When a dashboard is open on many screens, or a report link is shared,
+identical /reports/execute requests arrive together, and right after a
+result cache entry expires every one of them misses the cache at once.
+execute_query runs its database work through a QueryCoalescer keyed like
+the result cache (target, final SQL, parameters, downsampling) plus the
+time limit and execution profile, which change how the statement runs.
+The user is not part of the key, as in the result cache: concurrent
+callers with the same key await a single execution, admitted once for the
+caller that started it, and share its result or its error. Nothing is kept
+once the execution finishes.
+
+The shared execution runs in its own QueryCancelScope rather than in the
+scope of the request that started it: one client disconnecting cancels
+only its own wait, and the query itself is stopped once every caller
+waiting on it has gone.
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+from app.services.query_cancellation import QueryCancelScope, current_cancel_scope
+
+T = TypeVar("T")
+
+# Cancellations of abandoned executions, kept referenced until they finish
+_cancel_tasks: set[asyncio.Task] = set()
+
+
+class _Flight:
+    __slots__ = ("task", "scope", "waiters")
+
+    def __init__(self, task: asyncio.Future, scope: QueryCancelScope):
+        self.task = task
+        self.scope = scope
+        self.waiters = 0
+
+
+class QueryCoalescer:
+    """Shares one execution of work() between concurrent callers of the same key"""
+
+    def __init__(self):
+        self._flights: dict[str, _Flight] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def run(self, key: str, work: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+        """Result of work(), started by the first caller of key; the flag is True for callers that joined it"""
+        flight = self._flights.get(key)
+        joined = flight is not None
+        if flight is None:
+            scope = QueryCancelScope()
+            token = current_cancel_scope.set(scope)
+            try:
+                # The task copies the current context, so its queries register in the flight's scope
+                task = asyncio.ensure_future(work())
+            finally:
+                current_cancel_scope.reset(token)
+            flight = _Flight(task, scope)
+            self._flights[key] = flight
+            task.add_done_callback(lambda _: self._forget(key, flight))
+            self.executions += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            # Shielded: a caller that is cancelled must not cancel the execution the others wait on
+            return await asyncio.shield(flight.task), joined
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Every caller went away (e.g. all clients disconnected): stop the query too
+                self._forget(key, flight)
+                cancel = asyncio.ensure_future(flight.scope.cancel())
+                _cancel_tasks.add(cancel)
+                cancel.add_done_callback(_cancel_tasks.discard)
+                flight.task.cancel()
+
+    def _forget(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+
+# In-flight executions by key, empty whenever nothing is running
+query_coalescer = QueryCoalescer()
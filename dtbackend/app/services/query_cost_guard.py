@@ -0,0 +1,129 @@
+"""
+EXPLAIN-based cost guard for report queries and previews.
+
+Before a statement runs, the planner's estimate is compared with the limits
+configured for its database:
+
+    ClickHouse  EXPLAIN ESTIMATE: rows to read from MergeTree tables (no cost)
+    PostgreSQL  EXPLAIN (FORMAT JSON): root Total Cost and the largest
+                Plan Rows of any node
+    MSSQL       SHOWPLAN_XML: StatementSubTreeCost and the largest
+                EstimateRows / EstimatedRowsRead of any operator
+
+Limits come from REPORT_COST_GUARD_* and can be overridden per database in
+a report's or platform's db_config with cost_guard_mode ('off', 'warn' or
+'reject'), max_estimated_rows and max_estimated_cost. A limit of 0 is no
+limit, and with no limit at all no EXPLAIN is run. Estimates are cached per
+database target, statement and parameters. The guard fails open: a
+statement whose plan cannot be estimated is allowed to run.
+"""
+
+import json
+from typing import Any, NamedTuple
+
+from defusedxml import ElementTree
+
+from app.core.config import settings
+from app.services.report_result_cache import ReportResultCache
+
+COST_GUARD_MODES = ("off", "warn", "reject")
+
+
+class QueryCostExceededError(ValueError):
+    """Raised when a statement's estimated rows or cost exceed a rejecting limit"""
+
+
+class CostEstimate(NamedTuple):
+    rows: float | None
+    cost: float | None
+
+
+class CostLimits(NamedTuple):
+    mode: str
+    max_rows: float
+    max_cost: float
+
+    @property
+    def active(self) -> bool:
+        return self.mode != "off" and (self.max_rows > 0 or self.max_cost > 0)
+
+
+def _config_number(db_config: dict[str, Any], key: str, default: float) -> float:
+    value = db_config.get(key)
+    if value in (None, ""):
+        return default
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def cost_limits(db_config: dict[str, Any] | None) -> CostLimits:
+    """Limits for a database: REPORT_COST_GUARD_* overridden by the db_config's own keys"""
+    db_config = db_config or {}
+    mode = str(db_config.get("cost_guard_mode") or settings.REPORT_COST_GUARD_MODE).lower()
+    if mode not in COST_GUARD_MODES:
+        mode = "reject"
+    return CostLimits(
+        mode=mode,
+        max_rows=_config_number(db_config, "max_estimated_rows", settings.REPORT_COST_GUARD_MAX_ESTIMATED_ROWS),
+        max_cost=_config_number(db_config, "max_estimated_cost", settings.REPORT_COST_GUARD_MAX_ESTIMATED_COST),
+    )
+
+
+def parse_clickhouse_estimate(columns: list[str], rows: list) -> CostEstimate:
+    """Total rows to read from an EXPLAIN ESTIMATE result (one row per table)"""
+    if "rows" not in columns:
+        return CostEstimate(None, None)
+    index = columns.index("rows")
+    return CostEstimate(float(sum(int(row[index] or 0) for row in rows)), None)
+
+
+def parse_postgres_plan(plan: Any) -> CostEstimate:
+    """Root cost and largest node row estimate of an EXPLAIN (FORMAT JSON) result"""
+    if isinstance(plan, (str, bytes)):
+        plan = json.loads(plan)
+    if isinstance(plan, list):
+        plan = plan[0] if plan else {}
+    root = plan.get("Plan") or {}
+
+    max_rows = 0.0
+    nodes = [root]
+    while nodes:
+        node = nodes.pop()
+        max_rows = max(max_rows, float(node.get("Plan Rows") or 0))
+        nodes.extend(node.get("Plans") or [])
+    cost = root.get("Total Cost")
+    return CostEstimate(max_rows if root else None, float(cost) if cost is not None else None)
+
+
+def parse_showplan_xml(showplan: str | bytes) -> CostEstimate:
+    """Statement cost and largest operator row estimate of a SHOWPLAN_XML document"""
+    max_rows = max_cost = None
+    for element in ElementTree.fromstring(showplan).iter():
+        tag = element.tag.rsplit("}", 1)[-1]
+        if tag == "StmtSimple" and element.get("StatementSubTreeCost"):
+            cost = float(element.get("StatementSubTreeCost"))
+            max_cost = cost if max_cost is None else max(max_cost, cost)
+        elif tag == "RelOp":
+            for attribute in ("EstimateRows", "EstimatedRowsRead"):
+                if element.get(attribute):
+                    rows = float(element.get(attribute))
+                    max_rows = rows if max_rows is None else max(max_rows, rows)
+    return CostEstimate(max_rows, max_cost)
+
+
+def check_estimate(estimate: CostEstimate, limits: CostLimits) -> str | None:
+    """Why an estimate exceeds the limits, or None when it does not"""
+    problems = []
+    if limits.max_rows > 0 and estimate.rows is not None and estimate.rows > limits.max_rows:
+        problems.append(f"{estimate.rows:,.0f} estimated rows (limit {limits.max_rows:,.0f})")
+    if limits.max_cost > 0 and estimate.cost is not None and estimate.cost > limits.max_cost:
+        problems.append(f"estimated cost {estimate.cost:,.0f} (limit {limits.max_cost:,.0f})")
+    if not problems:
+        return None
+    return f"Query plan exceeds this database's limits: {' and '.join(problems)}"
+
+
+# Planner estimates keyed by database target, statement and parameters
+explain_cache = ReportResultCache(max_entries=settings.REPORT_COST_GUARD_CACHE_MAX_ENTRIES)
@@ -0,0 +1,356 @@
+"""
+Structured per-query telemetry for the reports engine.
+
+Every ReportsService.execute_query call produces one QueryTelemetryRecord:
+report, query, database type and platform, the user, where the result came
+from (database, result cache or an identical query in flight), the time
+spent queueing for a slot, fetching, counting (keyset pages) and
+formatting rows, and the number of rows and approximate JSON bytes
+returned.
+
+Records go to an in-process ring buffer of REPORT_TELEMETRY_BUFFER_SIZE
+entries, which GET /reports/admin/slow-queries summarizes as the slowest
+queries and latency percentiles per query. With REPORT_QUERY_LOG_ENABLED
+they are also written in batches to the query_log table by QueryLogWriter,
+so they survive restarts and can be kept for REPORT_QUERY_LOG_RETENTION_DAYS.
+"""
+
+import asyncio
+import functools
+import logging
+import math
+import time
+from collections import deque
+from collections.abc import Iterable
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from typing import Any
+
+from pydantic_core import to_json
+from sqlalchemy import delete, insert, text
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Rows sampled to estimate the JSON size of a result
+_BYTES_SAMPLE_ROWS = 100
+
+
+class QueryStats:
+    """Timings the execution path fills in while a query runs (see current_query_stats)"""
+    __slots__ = ("db_type", "platform", "username", "fetch_ms", "count_ms", "serialize_ms")
+
+    def __init__(self):
+        self.db_type: str | None = None
+        self.platform: str | None = None
+        self.username: str | None = None
+        self.fetch_ms: float | None = None
+        self.count_ms: float | None = None
+        self.serialize_ms: float | None = None
+
+
+# Set by record_query_telemetry for the duration of one execute_query call
+current_query_stats: ContextVar[QueryStats | None] = ContextVar("current_query_stats", default=None)
+
+
+class QueryTelemetryRecord:
+    """One execute_query call"""
+    __slots__ = (
+        "created_at", "report_id", "query_id", "query_name", "db_type", "platform", "username",
+        "success", "cache_hit", "coalesced", "queue_ms", "fetch_ms", "count_ms", "serialize_ms",
+        "total_ms", "rows", "total_rows", "bytes", "error",
+    )
+
+    def __init__(self, **values: Any):
+        for name in self.__slots__:
+            setattr(self, name, values.get(name))
+
+    def as_dict(self) -> dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def estimate_json_bytes(data: list[list[Any]]) -> int:
+    """Approximate JSON size of result rows, extrapolated from the first rows"""
+    if not data:
+        return 2
+    sample = data[:_BYTES_SAMPLE_ROWS]
+    return round(len(to_json(sample, fallback=str)) * len(data) / len(sample))
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    rank = max(math.ceil(fraction * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def latency_summary(values: Iterable[float]) -> dict[str, float | int]:
+    """count, p50, p90, p95, p99 and max of durations in milliseconds"""
+    ordered = sorted(values)
+    if not ordered:
+        return {"count": 0}
+    return {
+        "count": len(ordered),
+        "p50": round(percentile(ordered, 0.50), 2),
+        "p90": round(percentile(ordered, 0.90), 2),
+        "p95": round(percentile(ordered, 0.95), 2),
+        "p99": round(percentile(ordered, 0.99), 2),
+        "max": round(ordered[-1], 2),
+    }
+
+
+class QueryTelemetry:
+    """Ring buffer of recent records plus the batch waiting for the query_log writer"""
+
+    def __init__(self, buffer_size: int = 5000, log_enabled: bool = False, max_pending: int = 10000):
+        self._lock = Lock()
+        self._records: deque[QueryTelemetryRecord] = deque(maxlen=max(1, buffer_size))
+        self.log_enabled = log_enabled
+        # Oldest records are dropped if the database cannot keep up
+        self._pending: deque[QueryTelemetryRecord] = deque(maxlen=max(1, max_pending))
+
+    def record(self, record: QueryTelemetryRecord) -> None:
+        with self._lock:
+            self._records.append(record)
+            if self.log_enabled:
+                self._pending.append(record)
+
+    def take_pending(self) -> list[QueryTelemetryRecord]:
+        with self._lock:
+            pending = list(self._pending)
+            self._pending.clear()
+        return pending
+
+    def records(self, since: datetime | None = None, report_id: int | None = None) -> list[QueryTelemetryRecord]:
+        with self._lock:
+            records = list(self._records)
+        return [
+            r for r in records
+            if (since is None or r.created_at >= since) and (report_id is None or r.report_id == report_id)
+        ]
+
+    def slow_queries(self, limit: int = 20, since: datetime | None = None, report_id: int | None = None, include_cached: bool = False) -> dict[str, Any]:
+        """The slowest calls, overall latency percentiles and per-query percentiles ordered by p95"""
+        records = [r for r in self.records(since, report_id) if include_cached or not (r.cache_hit or r.coalesced)]
+
+        by_query: dict[tuple[int | None, int | None], list[QueryTelemetryRecord]] = {}
+        for record in records:
+            by_query.setdefault((record.report_id, record.query_id), []).append(record)
+        queries = []
+        for (report_id_, query_id), group in by_query.items():
+            queries.append({
+                "report_id": report_id_,
+                "query_id": query_id,
+                "query_name": group[-1].query_name,
+                "db_type": group[-1].db_type,
+                "failures": sum(1 for r in group if not r.success),
+                "avg_rows": round(sum(r.rows or 0 for r in group) / len(group), 1),
+                **latency_summary(r.total_ms for r in group),
+            })
+        queries.sort(key=lambda q: q["p95"], reverse=True)
+
+        slowest = sorted(records, key=lambda r: r.total_ms, reverse=True)[:limit]
+        return {
+            "source": "memory",
+            "overall": latency_summary(r.total_ms for r in records),
+            "queries": queries[:limit],
+            "slowest": [r.as_dict() for r in slowest],
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._records.clear()
+            self._pending.clear()
+
+
+# Fed by record_query_telemetry, drained into query_log by QueryLogWriter.flush
+query_telemetry = QueryTelemetry(
+    buffer_size=settings.REPORT_TELEMETRY_BUFFER_SIZE,
+    log_enabled=settings.REPORT_QUERY_LOG_ENABLED,
+)
+
+
+def record_query_telemetry(execute_query):
+    """Decorator for ReportsService.execute_query: records one QueryTelemetryRecord per call"""
+
+    @functools.wraps(execute_query)
+    async def wrapper(service, query, *args, **kwargs):
+        if not settings.REPORT_TELEMETRY_ENABLED:
+            return await execute_query(service, query, *args, **kwargs)
+
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            result = await execute_query(service, query, *args, **kwargs)
+        finally:
+            current_query_stats.reset(token)
+        total_ms = (time.perf_counter() - started) * 1000
+
+        try:
+            service._telemetry.record(QueryTelemetryRecord(
+                created_at=datetime.now(timezone.utc),
+                report_id=getattr(query, "report_id", None),
+                query_id=query.id,
+                query_name=query.name,
+                db_type=stats.db_type,
+                platform=stats.platform,
+                username=stats.username,
+                success=result.success,
+                cache_hit=bool(result.from_cache),
+                coalesced=bool(result.coalesced),
+                queue_ms=result.queue_time_ms or 0,
+                fetch_ms=stats.fetch_ms,
+                count_ms=stats.count_ms,
+                serialize_ms=stats.serialize_ms,
+                total_ms=round(total_ms, 2),
+                rows=len(result.data),
+                total_rows=result.total_rows,
+                bytes=estimate_json_bytes(result.data),
+                error=None if result.success else result.message,
+            ))
+        except Exception:
+            # Telemetry must never fail the query it describes
+            logger.exception("Failed to record query telemetry")
+        return result
+
+    return wrapper
+
+
+_QUERY_LOG_PERCENTILES = """
+    COUNT(*) AS count,
+    percentile_cont(0.50) WITHIN GROUP (ORDER BY total_ms) AS p50,
+    percentile_cont(0.90) WITHIN GROUP (ORDER BY total_ms) AS p90,
+    percentile_cont(0.95) WITHIN GROUP (ORDER BY total_ms) AS p95,
+    percentile_cont(0.99) WITHIN GROUP (ORDER BY total_ms) AS p99,
+    MAX(total_ms) AS max
+"""
+
+
+async def query_log_summary(db, limit: int = 20, since: datetime | None = None, report_id: int | None = None, include_cached: bool = False) -> dict[str, Any]:
+    """QueryTelemetry.slow_queries computed over the query_log table (interpolated percentiles)"""
+    conditions = ["created_at >= :since"]
+    params: dict[str, Any] = {"since": since or datetime.fromtimestamp(0, timezone.utc), "limit": limit}
+    if report_id is not None:
+        conditions.append("report_id = :report_id")
+        params["report_id"] = report_id
+    if not include_cached:
+        conditions.append("NOT cache_hit AND NOT coalesced")
+    where = " AND ".join(conditions)
+
+    def summary(row) -> dict[str, Any]:
+        values = dict(row._mapping)
+        if not values["count"]:
+            return {"count": 0}
+        return {k: round(float(v), 2) if k in ("p50", "p90", "p95", "p99", "max") else v for k, v in values.items()}
+
+    overall = (await db.execute(text(f"SELECT {_QUERY_LOG_PERCENTILES} FROM query_log WHERE {where}"), params)).one()
+    queries = (await db.execute(text(f"""
+        SELECT
+            report_id,
+            query_id,
+            MAX(query_name) AS query_name,
+            MAX(db_type) AS db_type,
+            COUNT(*) FILTER (WHERE NOT success) AS failures,
+            ROUND(AVG(rows)::numeric, 1)::float AS avg_rows,
+            {_QUERY_LOG_PERCENTILES}
+        FROM query_log
+        WHERE {where}
+        GROUP BY report_id, query_id
+        ORDER BY p95 DESC
+        LIMIT :limit
+    """), params)).fetchall()
+    slowest = (await db.execute(text(f"""
+        SELECT {", ".join(QueryTelemetryRecord.__slots__)}
+        FROM query_log
+        WHERE {where}
+        ORDER BY total_ms DESC
+        LIMIT :limit
+    """), params)).fetchall()
+
+    return {
+        "source": "database",
+        "overall": summary(overall),
+        "queries": [summary(row) for row in queries],
+        "slowest": [dict(row._mapping) for row in slowest],
+    }
+
+
+class QueryLogWriter:
+    """
+    Background writer that flushes telemetry records to the query_log table.
+
+    Records are inserted in one batch every REPORT_QUERY_LOG_FLUSH_SECONDS and
+    rows older than REPORT_QUERY_LOG_RETENTION_DAYS are deleted once an hour.
+    """
+
+    _task: asyncio.Task | None = None
+    _stop_event: asyncio.Event | None = None
+    _interval_seconds = max(1, int(settings.REPORT_QUERY_LOG_FLUSH_SECONDS))
+    _last_cleanup = 0.0
+
+    @classmethod
+    def start(cls) -> None:
+        if not settings.REPORT_QUERY_LOG_ENABLED:
+            return
+        if cls._task and not cls._task.done():
+            return
+        cls._stop_event = asyncio.Event()
+        cls._task = asyncio.create_task(cls._run_loop(), name="query-log-writer")
+        logger.info("Query log writer started (interval=%ss)", cls._interval_seconds)
+
+    @classmethod
+    async def stop(cls) -> None:
+        if not cls._task:
+            return
+        if cls._stop_event:
+            cls._stop_event.set()
+        try:
+            # Let the loop write what is pending before it exits
+            await asyncio.wait_for(cls._task, timeout=10)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            pass
+        finally:
+            cls._task = None
+            cls._stop_event = None
+        logger.info("Query log writer stopped")
+
+    @classmethod
+    async def _run_loop(cls) -> None:
+        while True:
+            stopping = False
+            try:
+                await asyncio.wait_for(cls._stop_event.wait(), timeout=cls._interval_seconds)
+                stopping = True
+            except asyncio.TimeoutError:
+                pass
+
+            try:
+                await cls.flush()
+            except Exception:
+                logger.exception("Query log flush failed")
+            if stopping:
+                break
+
+    @classmethod
+    async def flush(cls) -> int:
+        """Insert pending records (and apply retention hourly); returns how many were written"""
+        # Import here to avoid circular imports
+        from app.core.database import AsyncSessionLocal
+        from app.models.postgres_models import QueryLog
+
+        pending = query_telemetry.take_pending()
+        cleanup_due = time.monotonic() - cls._last_cleanup >= 3600
+        if not pending and not cleanup_due:
+            return 0
+
+        async with AsyncSessionLocal() as session:
+            if pending:
+                await session.execute(insert(QueryLog), [record.as_dict() for record in pending])
+            if cleanup_due:
+                cutoff = datetime.now(timezone.utc) - timedelta(days=settings.REPORT_QUERY_LOG_RETENTION_DAYS)
+                await session.execute(delete(QueryLog).where(QueryLog.created_at < cutoff))
+                cls._last_cleanup = time.monotonic()
+            await session.commit()
+        return len(pending)
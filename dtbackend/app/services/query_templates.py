@@ -0,0 +1,267 @@
+"""
+Compiled report query templates.
+
+A ReportQuery's SQL and its filter definitions (query filters plus the report's
+global filters) are parsed once into a CompiledQueryTemplate: the
+{{dynamic_filters}} insertion point, whether the static SQL already has a WHERE
+clause and where one would be inserted, and each filter's resolved column
+expression. Executions then only render the per-request conditions.
+
+Templates are cached in a ReportResultCache keyed by query id, updated_at and
+the global filter definitions, and are dropped when the report is edited.
+
+Filter values are bound as parameters (see sql_params), so a rendered
+statement only changes with the set of filters in use, not their values.
+"""
+
+import hashlib
+import json
+import re
+from typing import Any
+
+from app.core.config import settings
+from app.services.report_result_cache import ReportResultCache
+from app.services.sql_params import QueryParams
+
+DYNAMIC_FILTERS_PLACEHOLDER = "{{dynamic_filters}}"
+
+# Position to insert a WHERE clause: before GROUP BY, HAVING, ORDER BY or LIMIT
+_WHERE_INSERT_RE = re.compile(r'\s+(GROUP\s+BY|HAVING|ORDER\s+BY|LIMIT)\s+', re.IGNORECASE)
+
+
+class CompiledFilter:
+    """A filter definition with its SQL column expression resolved once"""
+    __slots__ = ("field_name", "display_name", "filter_type", "required", "field_expression", "lower_expression")
+
+    def __init__(self, field_name: str, display_name: str | None, filter_type: str, required: bool = False, sql_expression: str | None = None):
+        self.field_name = field_name
+        self.display_name = display_name
+        self.filter_type = filter_type
+        self.required = required
+
+        # Use sql_expression if provided, otherwise use field_name
+        field_expression = sql_expression if sql_expression else field_name
+
+        # Auto-quote field names that need quoting for PostgreSQL (unless already quoted or using sql_expression)
+        if not sql_expression:
+            if not (field_expression.startswith('"') and field_expression.endswith('"')):
+                # Check if field needs quoting (contains uppercase, spaces, or special chars)
+                if not field_expression.islower() or ' ' in field_expression or not field_expression.replace('_', '').isalnum():
+                    field_expression = f'"{field_expression}"'
+        self.field_expression = field_expression
+
+        # Text filters compare case-insensitively; use CAST for quoted identifiers so LOWER works properly
+        if field_expression.startswith('"') and field_expression.endswith('"'):
+            self.lower_expression = f"LOWER(CAST({field_expression} AS TEXT))"
+        else:
+            self.lower_expression = f"LOWER({field_expression})"
+
+    @classmethod
+    def from_definition(cls, db_filter: Any) -> "CompiledFilter":
+        """Compile a ReportQueryFilter (or any object with the same attributes)"""
+        return cls(
+            db_filter.field_name,
+            db_filter.display_name,
+            db_filter.filter_type,
+            db_filter.required,
+            db_filter.sql_expression
+        )
+
+    @classmethod
+    def from_global_filter(cls, global_filter: dict[str, Any]) -> "CompiledFilter":
+        """Compile a report global filter as stored in Report.global_filters"""
+        return cls(
+            global_filter.get('fieldName'),
+            global_filter.get('displayName'),
+            global_filter.get('type'),
+            global_filter.get('required', False),
+            global_filter.get('sqlExpression')
+        )
+
+
+_COMPARISON_OPERATORS = ("=", "!=", ">", "<", ">=", "<=")
+
+
+def _number_value(value: Any) -> int | float:
+    """Number filter values arrive as numbers or numeric strings; anything else is rejected"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    try:
+        return int(str(value).strip())
+    except ValueError:
+        pass
+    try:
+        return float(str(value).strip())
+    except ValueError:
+        raise ValueError(f"Invalid number filter value: {value}") from None
+
+
+def build_filter_conditions(filters: list[CompiledFilter], filter_values: list, db_type: str, params: QueryParams) -> list[str]:
+    """Build the SQL conditions for the filter values that match a filter definition
+
+    Values are registered in params and only their placeholders appear in the conditions.
+    """
+    # Create a mapping of field names to values
+    filter_map = {fv.field_name: fv for fv in filter_values}
+
+    conditions = []
+    for db_filter in filters:
+        if db_filter.field_name not in filter_map:
+            if db_filter.required:
+                raise ValueError(f"Required filter '{db_filter.display_name}' is missing")
+            continue
+
+        filter_value = filter_map[db_filter.field_name]
+
+        if filter_value.value is None or filter_value.value == "":
+            continue
+
+        field_expression = db_filter.field_expression
+        value = filter_value.value
+        operator = filter_value.operator or "="
+
+        if db_filter.filter_type == "text":
+            # Check if value is a list (from pasted multiselect)
+            if isinstance(value, list):
+                # Treat as IN clause for multiple values
+                placeholders = [params.add(v) for v in value]
+                conditions.append(f"{field_expression} IN ({','.join(placeholders)})")
+            else:
+                # For text filters, use different operators based on the filter condition
+                field_expr = db_filter.lower_expression
+
+                if operator == "CONTAINS":
+                    conditions.append(f"{field_expr} LIKE LOWER({params.add(f'%{value}%')})")
+                elif operator == "NOT_CONTAINS":
+                    conditions.append(f"{field_expr} NOT LIKE LOWER({params.add(f'%{value}%')})")
+                elif operator == "STARTS_WITH":
+                    conditions.append(f"{field_expr} LIKE LOWER({params.add(f'{value}%')})")
+                elif operator == "ENDS_WITH":
+                    conditions.append(f"{field_expr} LIKE LOWER({params.add(f'%{value}')})")
+                elif operator == "=":
+                    conditions.append(f"{field_expr} = LOWER({params.add(value)})")
+                elif operator == "NOT_EQUALS":
+                    conditions.append(f"{field_expr} != LOWER({params.add(value)})")
+                else:
+                    # Default to CONTAINS for backward compatibility
+                    conditions.append(f"{field_expr} LIKE LOWER({params.add(f'%{value}%')})")
+        elif db_filter.filter_type == "number":
+            # Check if value is a list (from pasted multiselect)
+            if isinstance(value, list):
+                # Treat as IN clause for multiple values
+                placeholders = [params.add(_number_value(v)) for v in value]
+                conditions.append(f"{field_expression} IN ({','.join(placeholders)})")
+            else:
+                # For number filters, support =, !=, >, <, >=, <=, NOT_EQUALS
+                if operator == "NOT_EQUALS":
+                    operator = "!="
+                elif operator not in _COMPARISON_OPERATORS:
+                    # Default to equals for backward compatibility
+                    operator = "="
+                conditions.append(f"{field_expression} {operator} {params.add(_number_value(value))}")
+        elif db_filter.filter_type == "date":
+            # Use database-specific date functions; the bound value is a string cast to a date
+            if db_type.lower() == "clickhouse":
+                date_func = "toDate"
+
+                def date_value(v: Any) -> str:
+                    return f"toDate({params.add(v)})"
+            else:
+                date_func = "DATE"
+
+                def date_value(v: Any) -> str:
+                    return f"CAST({params.add(v)} AS DATE)"
+
+            if operator == "BETWEEN" and isinstance(value, list) and len(value) == 2:
+                # For timestamp fields, we need to compare dates properly
+                conditions.append(f"{date_func}({field_expression}) BETWEEN {date_value(value[0])} AND {date_value(value[1])}")
+            else:
+                if operator not in _COMPARISON_OPERATORS:
+                    # The operator is written into the SQL, only allow comparisons
+                    operator = "="
+                conditions.append(f"{date_func}({field_expression}) {operator} {date_value(value)}")
+        elif db_filter.filter_type in ["dropdown", "multiselect"]:
+            if isinstance(value, list) and len(value) > 0:
+                placeholders = [params.add(v) for v in value]
+                conditions.append(f"{field_expression} IN ({','.join(placeholders)})")
+            elif not isinstance(value, list) and value:
+                conditions.append(f"{field_expression} = {params.add(value)}")
+
+    return conditions
+
+
+class CompiledQueryTemplate:
+    """A report query's SQL parsed once into its insertion points and filter definitions
+
+    Instances are shared between concurrent executions and must not be mutated after compilation.
+    """
+
+    def __init__(self, sql: str, filters: list[CompiledFilter]):
+        self.sql = sql
+        self.filters = filters
+        self.has_placeholder = DYNAMIC_FILTERS_PLACEHOLDER in sql
+        self._parts = sql.split(DYNAMIC_FILTERS_PLACEHOLDER)
+
+        # Rendering without any filter values; most executions of unfiltered reports reuse this string as is
+        self.base_sql = "".join(self._parts)
+        self.base_has_where = "WHERE" in self.base_sql.upper()
+        match = None if self.base_has_where else _WHERE_INSERT_RE.search(self.base_sql)
+        self.base_where_insert_pos = match.start() if match else None
+
+        # Set by the service when the static SQL fails sanitization, so cached templates re-raise without re-checking
+        self.sanitize_error: str | None = None
+
+    def render_filters(self, filter_values: list, db_type: str, params: QueryParams) -> tuple[str, list[str]]:
+        """Render the SQL for a set of filter values, binding the values into params
+
+        Returns:
+            (sql, conditions) where conditions are the rendered filter conditions
+        """
+        # Handle empty or None filter_values: just remove the placeholder
+        if not filter_values:
+            return self.base_sql, []
+
+        conditions = build_filter_conditions(self.filters, filter_values, db_type, params)
+        if not conditions:
+            return self.base_sql, []
+
+        if self.has_placeholder:
+            # Replace {{dynamic_filters}} placeholder with actual filter conditions
+            return (" AND " + " AND ".join(conditions)).join(self._parts), conditions
+
+        where_clause = " AND ".join(conditions)
+        if self.base_has_where:
+            return self.base_sql + f" AND ({where_clause})", conditions
+        return self.base_sql + f" WHERE {where_clause}", conditions
+
+    def add_condition(self, sql: str, condition: str) -> str:
+        """AND a condition into rendered SQL, adding a WHERE clause if there is none"""
+        if sql is self.base_sql:
+            has_where, insert_pos = self.base_has_where, self.base_where_insert_pos
+        else:
+            has_where = "WHERE" in sql.upper()
+            match = None if has_where else _WHERE_INSERT_RE.search(sql)
+            insert_pos = match.start() if match else None
+
+        if has_where:
+            # If there's already a WHERE clause, add the condition with AND
+            return sql + f" AND ({condition})"
+        if insert_pos is not None:
+            return sql[:insert_pos] + f" WHERE ({condition})" + sql[insert_pos:]
+        # No GROUP BY, ORDER BY, or LIMIT - just append
+        return sql + f" WHERE ({condition})"
+
+
+def template_cache_key(query: Any, global_filters: list[dict[str, Any]] | None) -> str | None:
+    """Cache key for a query's template, or None for unsaved queries"""
+    if query.id is None:
+        return None
+    version = getattr(query, "updated_at", None) or getattr(query, "created_at", None)
+    global_filters_hash = ""
+    if global_filters:
+        payload = json.dumps(global_filters, sort_keys=True, default=str)
+        global_filters_hash = hashlib.sha256(payload.encode()).hexdigest()
+    return f"{query.id}:{version}:{global_filters_hash}"
+
+
+query_template_cache = ReportResultCache(max_entries=settings.QUERY_TEMPLATE_CACHE_MAX_ENTRIES)
@@ -0,0 +1,143 @@
+"""
+Cached report definitions.
+
+execute_report, export_query and get_report used to reload the Report with
+its queries, filters, tabs, owner and platform (plus the requesting user)
+on every call. A ReportDefinition is a read-only snapshot of everything
+those paths need: the queries and filter definitions, the platform's
+db_config, the ACL lists and the serialized Report response. It records
+the report's updated_at and is cached per report id, so get_report becomes
+a dict lookup plus an in-memory access check (is_accessible_by).
+
+Entries are keyed by report id alone rather than (id, updated_at): knowing
+the current updated_at would take the database read the cache is there to
+save. Instead every report write in ReportsService (update_report,
+update_report_full, delete_report) drops the report's entry and platform
+updates drop every entry. Writes that bypass ReportsService (scripts,
+direct SQL) show up when the entry expires, after
+REPORT_DEFINITION_CACHE_TTL_SECONDS. Running or exporting a report
+additionally checks the ACL columns as currently stored
+(ReportsService.has_current_access), so access revoked outside this
+process stops query execution immediately.
+
+Snapshots are plain objects, not ORM instances, so they can be shared
+between requests and sessions safely.
+"""
+
+import logging
+from datetime import datetime
+from typing import Any
+
+from pydantic import ValidationError
+
+from app.core.config import settings
+from app.schemas.reports import Report as ReportSchema
+from app.services.report_result_cache import ReportResultCache
+
+logger = logging.getLogger(__name__)
+
+
+class FilterDefinition:
+    """Snapshot of a ReportQueryFilter"""
+    __slots__ = ("id", "query_id", "field_name", "display_name", "filter_type", "dropdown_query", "required", "sql_expression", "depends_on")
+
+    def __init__(self, db_filter: Any):
+        for name in self.__slots__:
+            setattr(self, name, getattr(db_filter, name))
+
+
+class QueryDefinition:
+    """Snapshot of a ReportQuery with its filters"""
+    __slots__ = ("id", "report_id", "tab_id", "name", "sql", "visualization_config", "order_index", "execution_profile", "created_at", "updated_at", "filters")
+
+    def __init__(self, query: Any):
+        self.id = query.id
+        self.report_id = query.report_id
+        self.tab_id = query.tab_id
+        self.name = query.name
+        self.sql = query.sql
+        self.visualization_config = query.visualization_config or {}
+        self.order_index = query.order_index
+        self.execution_profile = query.execution_profile
+        self.created_at = query.created_at
+        self.updated_at = query.updated_at
+        self.filters = tuple(FilterDefinition(f) for f in query.filters)
+
+
+class PlatformDefinition:
+    """The platform fields report execution uses to pick a connection pool"""
+    __slots__ = ("id", "code", "db_type", "db_config")
+
+    def __init__(self, platform: Any):
+        self.id = platform.id
+        self.code = platform.code
+        self.db_type = platform.db_type
+        self.db_config = platform.db_config
+
+
+class ReportDefinition:
+    """Read-only snapshot of a report for execution, export and get_report"""
+    __slots__ = (
+        "id", "name", "owner_id", "owner_username", "is_public", "allowed_users", "allowed_departments",
+        "global_filters", "db_config", "filter_by_department", "department_filter_level",
+        "filter_by_step_department", "cache_ttl_seconds", "max_execution_time_seconds", "execution_profile",
+        "snapshot_enabled", "snapshot_cron", "updated_at", "deleted_at", "platform", "queries", "response",
+    )
+
+    def __init__(self, report: Any):
+        self.id = report.id
+        self.name = report.name
+        self.owner_id = report.owner_id
+        self.owner_username = report.owner.username if report.owner else None
+        self.is_public = bool(report.is_public)
+        self.allowed_users = frozenset(report.allowed_users or [])
+        self.allowed_departments = frozenset(report.allowed_departments or [])
+        self.global_filters = report.global_filters or []
+        self.db_config = report.db_config
+        self.filter_by_department = report.filter_by_department or False
+        self.department_filter_level = report.department_filter_level
+        self.filter_by_step_department = report.filter_by_step_department or False
+        self.cache_ttl_seconds = report.cache_ttl_seconds
+        self.max_execution_time_seconds = report.max_execution_time_seconds
+        self.execution_profile = report.execution_profile
+        # Department-filtered results depend on the user, so they cannot be shared as a snapshot
+        self.snapshot_enabled = bool(report.snapshot_enabled and report.snapshot_cron) and not (self.filter_by_department or self.filter_by_step_department)
+        self.snapshot_cron = report.snapshot_cron
+        self.updated_at: datetime | None = report.updated_at
+        self.deleted_at: datetime | None = report.deleted_at
+        self.platform = PlatformDefinition(report.platform) if report.platform else None
+        self.queries = tuple(QueryDefinition(q) for q in report.queries)
+
+        # Serialized once for GET /reports/{id}
+        report.owner_name = report.owner.name if report.owner else None
+        try:
+            self.response: ReportSchema | None = ReportSchema.model_validate(report)
+        except ValidationError as e:
+            logger.warning("Report %s cannot be serialized: %s", report.id, e)
+            self.response = None
+
+    def is_accessible_by(self, user: Any) -> bool:
+        """Access check against the ACL captured in this snapshot (see acl_allows)"""
+        return acl_allows(user, self.owner_username, self.is_public, self.allowed_users, self.allowed_departments)
+
+
+def acl_allows(user: Any, owner_username: str | None, is_public: bool, allowed_users: Any, allowed_departments: Any) -> bool:
+    """Same rules as the reports list: admin, owner, public, allowed user or allowed department (or a parent of it)"""
+    if user.role and "miras:admin" in user.role:
+        return True
+    if is_public or (owner_username is not None and owner_username == user.username):
+        return True
+    if user.username in allowed_users:
+        return True
+    if allowed_departments and user.department:
+        # Check if user's department or any of its parents are in allowed_departments
+        current_dept = ""
+        for part in user.department.split('_'):
+            current_dept = f"{current_dept}_{part}" if current_dept else part
+            if current_dept in allowed_departments:
+                return True
+    return False
+
+
+# Keyed by report id
+report_definition_cache = ReportResultCache(max_entries=settings.REPORT_DEFINITION_CACHE_MAX_ENTRIES)
@@ -0,0 +1,400 @@
+"""
+Streaming export of report query results as CSV, Parquet or XLSX.
+
+Rows are read from the source database in chunks through a server-side
+cursor (psycopg2 named cursor, ClickHouse execute_iter, pyodbc fetchmany)
+and encoded chunk by chunk, so memory stays bounded by the chunk size.
+CSV is streamed as it is produced; Parquet and XLSX need their footer
+written last, so encode_export writes them to a temporary file before it
+returns and the response streams that file. Call it before the response
+starts: a value that does not fit its Parquet column or an XLSX row limit
+then fails the request instead of cutting off a file already being sent.
+
+Parquet column types come from the source database's column types
+(ClickHouse type names, PostgreSQL type OIDs, pyodbc Python types), not from
+the values of the first chunk; columns of other types are written as strings.
+
+The iterators here are synchronous: StreamingResponse iterates them in the
+thread pool.
+"""
+
+import csv
+import datetime
+import decimal
+import io
+import itertools
+import re
+import tempfile
+import uuid
+from collections.abc import Callable, Iterable, Iterator
+from typing import IO, Any, NamedTuple
+
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+from app.services.sql_params import bind_params
+
+# format -> (media type, file extension)
+EXPORT_FORMATS: dict[str, tuple[str, str]] = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+}
+
+XLSX_MAX_ROWS = 1_048_575  # Excel sheet limit minus the header row
+_FILE_READ_SIZE = 1024 * 1024
+
+
+class ResultChunk(NamedTuple):
+    """Rows of a result with its column names and, when the driver reports them, column types
+
+    column_types holds one entry per column: "bool", "int64", "uint64", "float64",
+    "string", "binary", "date", "time", "timestamp", "timestamp_tz",
+    ("decimal", precision, scale), or None when the type has no Parquet
+    counterpart (written as strings).
+    """
+    columns: list[str]
+    rows: list[tuple]
+    column_types: list | None = None
+
+
+# PostgreSQL type OIDs (pg_type) -> column type
+_POSTGRESQL_TYPES: dict[int, str] = {
+    16: "bool", 20: "int64", 21: "int64", 23: "int64", 26: "int64",
+    700: "float64", 701: "float64",
+    18: "string", 19: "string", 25: "string", 1042: "string", 1043: "string",
+    17: "binary",
+    1082: "date", 1083: "time", 1114: "timestamp", 1184: "timestamp_tz",
+}
+
+_MSSQL_TYPES: dict[type, str] = {
+    bool: "bool", int: "int64", float: "float64", str: "string",
+    bytes: "binary", bytearray: "binary",
+    datetime.datetime: "timestamp", datetime.date: "date", datetime.time: "time",
+}
+
+_CLICKHOUSE_TYPES: dict[str, str] = {
+    "Bool": "bool",
+    "Int8": "int64", "Int16": "int64", "Int32": "int64", "Int64": "int64",
+    "UInt8": "int64", "UInt16": "int64", "UInt32": "int64", "UInt64": "uint64",
+    "Float32": "float64", "Float64": "float64",
+    "String": "string", "FixedString": "string", "UUID": "string", "Enum8": "string", "Enum16": "string",
+    "IPv4": "string", "IPv6": "string",
+    "Date": "date", "Date32": "date",
+}
+
+_CLICKHOUSE_WRAPPERS = re.compile(r"^(?:Nullable|LowCardinality)\((.*)\)$")
+_CLICKHOUSE_DECIMAL = re.compile(r"^Decimal(?:32|64|128|256)?\((\d+),\s*(\d+)\)$")
+
+
+def _decimal_type(precision: int | None, scale: int | None) -> tuple | None:
+    if precision is None or scale is None or not 0 < precision <= 76 or not 0 <= scale <= precision:
+        # numeric without a declared precision holds any scale: only a string keeps every digit
+        return None
+    return ("decimal", precision, scale)
+
+
+def clickhouse_column_type(type_name: str) -> Any:
+    """Column type of a ClickHouse type name, e.g. Nullable(Decimal(18, 2))"""
+    match = _CLICKHOUSE_WRAPPERS.match(type_name)
+    while match:
+        type_name = match.group(1)
+        match = _CLICKHOUSE_WRAPPERS.match(type_name)
+    decimal_match = _CLICKHOUSE_DECIMAL.match(type_name)
+    if decimal_match:
+        return _decimal_type(int(decimal_match.group(1)), int(decimal_match.group(2)))
+    if type_name.startswith("DateTime"):
+        # DateTime('Europe/Istanbul') returns aware values
+        return "timestamp_tz" if "(" in type_name and "'" in type_name else "timestamp"
+    return _CLICKHOUSE_TYPES.get(type_name.split("(", 1)[0])
+
+
+def postgresql_column_type(column: Any) -> Any:
+    """Column type of a psycopg2 cursor.description entry"""
+    if column.type_code == 1700:
+        return _decimal_type(column.precision, column.scale)
+    return _POSTGRESQL_TYPES.get(column.type_code)
+
+
+def mssql_column_type(column: tuple) -> Any:
+    """Column type of a pyodbc cursor.description entry (name, type, display size, internal size, precision, scale, nullable)"""
+    if column[1] is decimal.Decimal:
+        return _decimal_type(column[4], column[5])
+    return _MSSQL_TYPES.get(column[1])
+
+
+def iter_query_chunks(connection_pool, db_type: str, sql: str, pool_args: dict[str, Any], chunk_size: int, params: dict[str, Any] | None = None, clickhouse_settings: dict[str, Any] | None = None) -> Iterator[ResultChunk]:
+    """Yield (columns, rows) chunks of a query result read through a server-side cursor
+
+    At least one chunk is always yielded (possibly with no rows) so the header can be written.
+
+    Args:
+        connection_pool: ConnectionPool the connection is checked out from
+        db_type: 'postgresql', 'mssql' or 'clickhouse'
+        sql: Final SQL statement (filtered and sanitized, without a row limit)
+        pool_args: {"db_config": ...} or {"platform": ...} identifying the database target
+        chunk_size: Rows fetched per round trip
+        params: Bind parameters of sql (see sql_params)
+        clickhouse_settings: Execution profile settings for ClickHouse (see execution_profiles)
+    """
+    if db_type == "clickhouse":
+        yield from _iter_clickhouse_chunks(connection_pool, sql, pool_args, chunk_size, params, clickhouse_settings)
+    elif db_type == "postgresql":
+        yield from _iter_postgresql_chunks(connection_pool, sql, pool_args, chunk_size, params)
+    elif db_type == "mssql":
+        yield from _iter_mssql_chunks(connection_pool, sql, pool_args, chunk_size, params)
+    else:
+        raise ValueError(f"Unsupported database type: {db_type}")
+
+
+def _iter_clickhouse_chunks(connection_pool, sql: str, pool_args: dict[str, Any], chunk_size: int, params: dict[str, Any] | None, clickhouse_settings: dict[str, Any] | None = None) -> Iterator[ResultChunk]:
+    client = connection_pool.get_connection(db_type="clickhouse", **pool_args)
+    completed = False
+    try:
+        bound_sql, args = bind_params(sql, params, "clickhouse")
+        rows = client.execute_iter(bound_sql, args, with_column_types=True, settings={**(clickhouse_settings or {}), "max_block_size": chunk_size})
+        # The first item of execute_iter(with_column_types=True) is the list of (name, type) pairs
+        column_info = next(rows)
+        columns = [name for name, _ in column_info]
+        column_types = [clickhouse_column_type(type_name) for _, type_name in column_info]
+        chunk = list(itertools.islice(rows, chunk_size))
+        yield ResultChunk(columns, chunk, column_types)
+        while len(chunk) == chunk_size:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if chunk:
+                yield ResultChunk(columns, chunk, column_types)
+        completed = True
+    finally:
+        # A partially consumed stream leaves unread packets on the socket, don't reuse that client
+        connection_pool.return_connection(client, db_type="clickhouse", discard=not completed, **pool_args)
+
+
+def _iter_postgresql_chunks(connection_pool, sql: str, pool_args: dict[str, Any], chunk_size: int, params: dict[str, Any] | None) -> Iterator[ResultChunk]:
+    conn = connection_pool.get_connection(db_type="postgresql", **pool_args)
+    try:
+        # Named cursors are server-side: rows stay on the server until fetched
+        cursor = conn.cursor(name=f"report_export_{uuid.uuid4().hex}")
+        cursor.itersize = chunk_size
+        try:
+            cursor.execute(*bind_params(sql, params, "psycopg2"))
+            chunk = cursor.fetchmany(chunk_size)
+            # description is only populated after the first fetch on a named cursor
+            columns = [desc[0] for desc in cursor.description] if cursor.description else []
+            column_types = [postgresql_column_type(desc) for desc in cursor.description] if cursor.description else []
+            yield ResultChunk(columns, chunk, column_types)
+            while len(chunk) == chunk_size:
+                chunk = cursor.fetchmany(chunk_size)
+                if chunk:
+                    yield ResultChunk(columns, chunk, column_types)
+        finally:
+            cursor.close()
+    finally:
+        # The pool rolls back the read transaction opened for the named cursor
+        connection_pool.return_connection(conn, db_type="postgresql", **pool_args)
+
+
+def _iter_mssql_chunks(connection_pool, sql: str, pool_args: dict[str, Any], chunk_size: int, params: dict[str, Any] | None) -> Iterator[ResultChunk]:
+    conn = connection_pool.get_connection(db_type="mssql", **pool_args)
+    completed = False
+    try:
+        cursor = conn.cursor()
+        try:
+            bound_sql, args = bind_params(sql, params, "pyodbc")
+            cursor.execute(bound_sql, *(args or []))
+            columns = [column[0] for column in cursor.description] if cursor.description else []
+            column_types = [mssql_column_type(column) for column in cursor.description] if cursor.description else []
+            chunk = cursor.fetchmany(chunk_size)
+            yield ResultChunk(columns, [tuple(row) for row in chunk], column_types)
+            while len(chunk) == chunk_size:
+                chunk = cursor.fetchmany(chunk_size)
+                if chunk:
+                    yield ResultChunk(columns, [tuple(row) for row in chunk], column_types)
+            completed = True
+        finally:
+            cursor.close()
+    finally:
+        connection_pool.return_connection(conn, db_type="mssql", discard=not completed, **pool_args)
+
+
+def encode_export(chunks: Iterable[ResultChunk], export_format: str) -> Iterator[bytes]:
+    """Encode result chunks into the bytes of a CSV, Parquet or XLSX file
+
+    CSV is encoded as the returned iterator is consumed. Parquet and XLSX are
+    written completely before this returns (run it in a thread), so their
+    errors are raised here and not halfway through the response.
+
+    Raises:
+        ValueError: If the format is unknown, a value does not fit its Parquet
+            column type, or the result exceeds the XLSX row limit
+    """
+    if export_format == "csv":
+        return _encode_csv(chunks)
+    if export_format == "parquet":
+        return _spool(_write_parquet, chunks)
+    if export_format == "xlsx":
+        return _spool(_write_xlsx, chunks)
+    raise ValueError(f"Unsupported export format: {export_format}")
+
+
+def _spool(write: Callable[[Iterable[ResultChunk], IO[bytes]], None], chunks: Iterable[ResultChunk]) -> Iterator[bytes]:
+    spool = tempfile.TemporaryFile()
+    try:
+        write(chunks, spool)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return _read_spool(spool)
+
+
+def _read_spool(spool: IO[bytes]) -> Iterator[bytes]:
+    with spool:
+        yield from iter(lambda: spool.read(_FILE_READ_SIZE), b"")
+
+
+def _encode_csv(chunks: Iterable[ResultChunk]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM so Excel opens the UTF-8 file with Turkish characters intact
+    buffer.write("\ufeff")
+    header_written = False
+    for columns, rows, *_ in chunks:
+        if not header_written:
+            writer.writerow(columns)
+            header_written = True
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate(0)
+
+
+def _xlsx_value(value: Any) -> Any:
+    if value is None or isinstance(value, (bool, int, float, decimal.Decimal)):
+        return value
+    if isinstance(value, datetime.datetime):
+        # Excel has no time zones
+        return value.replace(tzinfo=None) if value.tzinfo else value
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value
+    return ILLEGAL_CHARACTERS_RE.sub("", str(value))
+
+
+def _write_xlsx(chunks: Iterable[ResultChunk], spool: IO[bytes]) -> None:
+    # write_only keeps rows in a temporary XML file instead of building cell objects in memory
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Data")
+    header_written = False
+    row_count = 0
+    try:
+        for columns, rows, *_ in chunks:
+            if not header_written:
+                sheet.append(columns)
+                header_written = True
+            row_count += len(rows)
+            if row_count > XLSX_MAX_ROWS:
+                raise ValueError(f"XLSX exports are limited to {XLSX_MAX_ROWS} rows, use csv or parquet")
+            for row in rows:
+                sheet.append([_xlsx_value(value) for value in row])
+    except BaseException:
+        # Removes the sheet's temporary XML file
+        sheet.close()
+        raise
+    workbook.save(spool)
+
+
+_ARROW_NATIVE_TYPES = (bool, int, float, str, decimal.Decimal, datetime.date, datetime.time)
+
+
+def _arrow_value(value: Any) -> Any:
+    if value is None or isinstance(value, _ARROW_NATIVE_TYPES):
+        return value
+    return str(value)
+
+
+def _arrow_values(values: Iterable[Any]) -> list:
+    values = list(values)
+    # Converting value by value is only needed when the column holds types pyarrow can't take
+    if all(kind is type(None) or issubclass(kind, _ARROW_NATIVE_TYPES) for kind in set(map(type, values))):
+        return values
+    return [_arrow_value(v) for v in values]
+
+
+def arrow_table(columns: list[str], rows: list) -> Any:
+    """Build a pyarrow Table from row-major results, inferring column types
+
+    Columns that are entirely NULL are typed as strings. Raises ImportError
+    when pyarrow is not installed.
+    """
+    import pyarrow as pa
+
+    values_by_column = list(zip(*rows)) if rows else [() for _ in columns]
+    arrays = [pa.array(_arrow_values(values)) for values in values_by_column]
+    arrays = [array.cast(pa.string()) if pa.types.is_null(array.type) else array for array in arrays]
+    return pa.Table.from_arrays(arrays, names=columns)
+
+
+def _arrow_type(column_type: Any) -> Any:
+    import pyarrow as pa
+
+    if isinstance(column_type, tuple):
+        _, precision, scale = column_type
+        return pa.decimal128(precision, scale) if precision <= 38 else pa.decimal256(precision, scale)
+    return {
+        "bool": pa.bool_(),
+        "int64": pa.int64(),
+        "uint64": pa.uint64(),
+        "float64": pa.float64(),
+        "binary": pa.binary(),
+        "date": pa.date32(),
+        "time": pa.time64("us"),
+        "timestamp": pa.timestamp("us"),
+        "timestamp_tz": pa.timestamp("us", tz="UTC"),
+    }.get(column_type, pa.string())
+
+
+def _parquet_schema(chunk: ResultChunk) -> Any:
+    import pyarrow as pa
+
+    if chunk.column_types is None:
+        # No driver types (chunks built by hand): the first chunk decides
+        return arrow_table(chunk.columns, chunk.rows).schema
+    return pa.schema([pa.field(name, _arrow_type(column_type)) for name, column_type in zip(chunk.columns, chunk.column_types)])
+
+
+def _parquet_column(name: str, values: list, field_type: Any) -> Any:
+    """Values of one column as an array of the file's type, refusing any lossy conversion"""
+    import pyarrow as pa
+
+    if pa.types.is_string(field_type):
+        return pa.array([None if v is None else v if isinstance(v, str) else str(v) for v in values], type=field_type)
+    try:
+        array = pa.array(_arrow_values(values))
+        if pa.types.is_null(array.type):
+            return pa.nulls(len(array), field_type)
+        # Safe cast: widening (int to float, decimal scale) passes, truncation raises
+        return array if array.type == field_type else array.cast(field_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+        raise ValueError(f"Column {name!r} cannot be written to Parquet as {field_type}: {e}") from e
+
+
+def _write_parquet(chunks: Iterable[ResultChunk], spool: IO[bytes]) -> None:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ValueError("Parquet export requires the pyarrow package") from e
+
+    schema = None
+    writer = None
+    try:
+        for chunk in chunks:
+            chunk = ResultChunk(*chunk)
+            if schema is None:
+                schema = _parquet_schema(chunk)
+                writer = pq.ParquetWriter(spool, schema)
+            values_by_column = [list(values) for values in zip(*chunk.rows)] if chunk.rows else [[] for _ in chunk.columns]
+            arrays = [_parquet_column(field.name, values, field.type) for field, values in zip(schema, values_by_column)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+    finally:
+        if writer is not None:
+            writer.close()
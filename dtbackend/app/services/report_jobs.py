@@ -0,0 +1,217 @@
+"""
+Background report jobs.
+
+POST /reports/{report_id}/jobs queues an execute_report run on a pool of
+local workers and returns a job id straight away. Clients poll
+GET /reports/jobs/{job_id} for the job's status and per-query progress and
+fetch GET /reports/jobs/{job_id}/result once it has finished, so a
+long-running report holds neither a request worker nor a proxy connection
+while it executes.
+
+Jobs live in this process (the backend runs as a single uvicorn process).
+At most REPORT_JOB_MAX_JOBS are kept, REPORT_JOB_MAX_PER_USER of them
+queued or running per user, and finished jobs are dropped after
+REPORT_JOB_RESULT_TTL_SECONDS.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timezone
+from typing import Any
+
+from app.core.config import settings
+from app.schemas.reports import (
+    QueryExecutionResult,
+    ReportExecutionRequest,
+    ReportExecutionResponse,
+    ReportJobQueryStatus,
+    ReportJobStatus,
+)
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"  # execute_report returned a response (individual queries may still have failed)
+JOB_FAILED = "failed"  # execute_report raised (report not found, access denied, ...)
+
+
+class ReportJobLimitError(Exception):
+    """Raised when a job cannot be queued because the queue or the user's share of it is full"""
+
+
+class ReportJob:
+    """One queued execute_report run and its progress"""
+
+    def __init__(self, request: ReportExecutionRequest, user: Any, query_names: dict[int, str]):
+        self.id = uuid.uuid4().hex
+        self.report_id = request.report_id
+        self.request = request
+        self.user = user
+        self.username = user.username
+        self.status = JOB_QUEUED
+        self.message: str | None = None
+        self.created_at = datetime.now(timezone.utc)
+        self.started_at: datetime | None = None
+        self.finished_at: datetime | None = None
+        self.result: ReportExecutionResponse | None = None
+        self.expires_at: float | None = None
+        self.queries = {
+            query_id: ReportJobQueryStatus(query_id=query_id, query_name=name, status=JOB_QUEUED)
+            for query_id, name in query_names.items()
+        }
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (JOB_COMPLETED, JOB_FAILED)
+
+    def query_done(self, result: QueryExecutionResult) -> None:
+        """Progress hook for execute_report: record a finished query"""
+        self.queries[result.query_id] = ReportJobQueryStatus(
+            query_id=result.query_id,
+            query_name=result.query_name,
+            status=JOB_COMPLETED if result.success else JOB_FAILED,
+            total_rows=result.total_rows,
+            execution_time_ms=result.execution_time_ms,
+            message=None if result.success else result.message,
+        )
+
+    def status_response(self) -> ReportJobStatus:
+        queries = list(self.queries.values())
+        return ReportJobStatus(
+            job_id=self.id,
+            report_id=self.report_id,
+            status=self.status,
+            message=self.message,
+            created_at=self.created_at,
+            started_at=self.started_at,
+            finished_at=self.finished_at,
+            total_queries=len(queries),
+            completed_queries=sum(1 for q in queries if q.status in (JOB_COMPLETED, JOB_FAILED)),
+            queries=queries,
+        )
+
+
+async def execute_report_in_new_session(request: ReportExecutionRequest, user: Any, on_query_done: Callable[[QueryExecutionResult], None] | None = None) -> ReportExecutionResponse:
+    """Run execute_report outside a request, with its own database session and ClickHouse client"""
+    # Import here to avoid circular imports
+    from app.core.database import AsyncSessionLocal, get_clickhouse_db
+    from app.services.reports_service import ReportsService
+
+    clickhouse = get_clickhouse_db()
+    try:
+        async with AsyncSessionLocal() as session:
+            service = ReportsService(session, next(clickhouse))
+            return await service.execute_report(request, user, on_query_done=on_query_done)
+    finally:
+        clickhouse.close()
+
+
+async def _execute_with_new_session(job: ReportJob) -> ReportExecutionResponse:
+    return await execute_report_in_new_session(job.request, job.user, on_query_done=job.query_done)
+
+
+class ReportJobQueue:
+    """Bounded in-process queue of report jobs, run by a fixed number of worker tasks started on first use"""
+
+    def __init__(
+        self,
+        workers: int = 2,
+        max_jobs: int = 200,
+        max_per_user: int = 5,
+        result_ttl_seconds: float = 3600,
+        execute: Callable[[ReportJob], Awaitable[ReportExecutionResponse]] = _execute_with_new_session,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._worker_count = max(1, workers)
+        self._max_jobs = max(1, max_jobs)
+        self._max_per_user = max(1, max_per_user)
+        self._result_ttl = result_ttl_seconds
+        self._execute = execute
+        self._clock = clock
+        self._jobs: dict[str, ReportJob] = {}
+        self._queue: asyncio.Queue[ReportJob] | None = None
+        self._workers: list[asyncio.Task] = []
+
+    def submit(self, job: ReportJob) -> ReportJob:
+        """Queue a job
+
+        Raises:
+            ReportJobLimitError: If the user already has max_per_user unfinished jobs or the queue is full
+        """
+        self._prune()
+        active = sum(1 for j in self._jobs.values() if j.username == job.username and not j.finished)
+        if active >= self._max_per_user:
+            raise ReportJobLimitError(f"You already have {active} report jobs queued or running")
+        if len(self._jobs) >= self._max_jobs:
+            # Make room by dropping the oldest finished job
+            oldest = next((j for j in self._jobs.values() if j.finished), None)
+            if oldest is None:
+                raise ReportJobLimitError("The report job queue is full, try again later")
+            del self._jobs[oldest.id]
+
+        self._jobs[job.id] = job
+        self._ensure_workers()
+        self._queue.put_nowait(job)
+        return job
+
+    def get(self, job_id: str) -> ReportJob | None:
+        self._prune()
+        return self._jobs.get(job_id)
+
+    async def stop(self) -> None:
+        """Cancel the workers; queued and running jobs are abandoned"""
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        self._queue = None
+
+    def _ensure_workers(self) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._workers = [w for w in self._workers if not w.done()]
+        while len(self._workers) < self._worker_count:
+            self._workers.append(asyncio.create_task(self._work(), name=f"report-job-worker-{len(self._workers)}"))
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: ReportJob) -> None:
+        job.status = JOB_RUNNING
+        job.started_at = datetime.now(timezone.utc)
+        for query_id, query in job.queries.items():
+            job.queries[query_id] = query.model_copy(update={"status": JOB_RUNNING})
+        try:
+            job.result = await self._execute(job)
+            job.status = JOB_COMPLETED
+            job.message = job.result.message
+        except Exception as e:
+            logger.warning("Report job %s for report %s failed: %s", job.id, job.report_id, e)
+            job.status = JOB_FAILED
+            job.message = str(e)
+        finally:
+            job.finished_at = datetime.now(timezone.utc)
+            job.expires_at = self._clock() + self._result_ttl
+
+    def _prune(self) -> None:
+        now = self._clock()
+        for job_id in [j.id for j in self._jobs.values() if j.expires_at is not None and j.expires_at <= now]:
+            del self._jobs[job_id]
+
+
+# Job ids are only known to this queue, so status and result polls must reach the process that accepted the job
+report_job_queue = ReportJobQueue(
+    workers=settings.REPORT_JOB_WORKERS,
+    max_jobs=settings.REPORT_JOB_MAX_JOBS,
+    max_per_user=settings.REPORT_JOB_MAX_PER_USER,
+    result_ttl_seconds=settings.REPORT_JOB_RESULT_TTL_SECONDS,
+)
@@ -0,0 +1,106 @@
+"""
+In-process result cache for report query executions.
+
+Entries are keyed by the final SQL sent to the source database (after filters,
+department injection, sorting and pagination) together with the resolved
+database target, so two users only share an entry when they would have run
+exactly the same statement against the same database. Entries expire after a
+per-report TTL and are dropped as soon as the owning report is edited.
+"""
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from threading import Lock
+from typing import Any
+
+from app.core.config import settings
+
+
+class ReportResultCache:
+    """Size-bounded LRU cache with per-entry TTL and per-report invalidation"""
+
+    def __init__(self, max_entries: int = 512, clock: Callable[[], float] = time.monotonic):
+        self._max_entries = max(1, max_entries)
+        self._clock = clock
+        self._lock = Lock()
+        # key -> (expires_at, report_id, value)
+        self._entries: OrderedDict[str, tuple[float, int | None, Any]] = OrderedDict()
+        self._keys_by_report: dict[int, set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def build_key(target: str, sql: str, **extra: Any) -> str:
+        """Build a stable cache key from the db target, final SQL and any extra execution options"""
+        payload = json.dumps({"target": target, "sql": sql, **extra}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str) -> Any | None:
+        """Return the cached value for key, or None when missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, _, value = entry
+            if expires_at <= self._clock():
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, ttl_seconds: float, report_id: int | None = None) -> None:
+        """Store value under key for ttl_seconds (non-positive TTLs are ignored)"""
+        if ttl_seconds <= 0:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (self._clock() + ttl_seconds, report_id, value)
+            if report_id is not None:
+                self._keys_by_report.setdefault(report_id, set()).add(key)
+
+            # Evict least recently used entries beyond the size bound
+            while len(self._entries) > self._max_entries:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+
+    def invalidate_report(self, report_id: int) -> int:
+        """Drop every entry belonging to report_id, returns the number of removed entries"""
+        with self._lock:
+            keys = self._keys_by_report.pop(report_id, set())
+            for key in keys:
+                self._entries.pop(key, None)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_report.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: str) -> None:
+        """Remove a single entry; caller must hold the lock"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        report_id = entry[1]
+        if report_id is not None and report_id in self._keys_by_report:
+            self._keys_by_report[report_id].discard(key)
+            if not self._keys_by_report[report_id]:
+                del self._keys_by_report[report_id]
+
+
+# Shared instance used by ReportsService
+report_result_cache = ReportResultCache(max_entries=settings.REPORT_RESULT_CACHE_MAX_ENTRIES)
@@ -0,0 +1,134 @@
+import asyncio
+import logging
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.core.cron_schedule import CronSchedule
+from app.models.postgres_models import Report, ReportSnapshot
+
+logger = logging.getLogger(__name__)
+
+# First key of the two-key pg_try_advisory_xact_lock taken per report ("RS")
+_ADVISORY_LOCK_NAMESPACE = 0x5253
+
+
+def snapshot_is_due(cron: str, generated_at: datetime | None, now: datetime) -> bool:
+    """True when a report has no snapshot yet or its cron has fired since the latest one (now is naive local time)"""
+    if generated_at is None:
+        return True
+    try:
+        schedule = CronSchedule(cron)
+    except ValueError as e:
+        logger.warning("Skipping report snapshot with an invalid schedule: %s", e)
+        return False
+    if generated_at.tzinfo is not None:
+        generated_at = generated_at.astimezone().replace(tzinfo=None)
+    next_run = schedule.next_after(generated_at)
+    return next_run is not None and next_run <= now
+
+
+class ReportSnapshotScheduler:
+    """
+    Background scheduler that refreshes the snapshots of snapshot-enabled reports.
+
+    Each tick finds the reports whose snapshot_cron has fired since their
+    latest snapshot and re-runs their queries with default filters (see
+    ReportsService.refresh_report_snapshots). The backend runs as a single
+    process, but a PostgreSQL advisory lock per report still keeps overlapping
+    refreshes apart: the old and new process during a restart, or another
+    deployment of the backend against the same database.
+    """
+
+    _task: asyncio.Task | None = None
+    _stop_event: asyncio.Event | None = None
+    _interval_seconds = max(10, int(settings.REPORT_SNAPSHOT_SCHEDULER_INTERVAL_SECONDS))
+
+    @classmethod
+    def start(cls) -> None:
+        if not settings.REPORT_SNAPSHOT_SCHEDULER_ENABLED:
+            logger.info("Report snapshot scheduler is disabled by configuration")
+            return
+        if cls._task and not cls._task.done():
+            return
+        cls._stop_event = asyncio.Event()
+        cls._task = asyncio.create_task(cls._run_loop(), name="report-snapshot-scheduler")
+        logger.info("Report snapshot scheduler started (interval=%ss)", cls._interval_seconds)
+
+    @classmethod
+    async def stop(cls) -> None:
+        if not cls._task:
+            return
+        if cls._stop_event:
+            cls._stop_event.set()
+        cls._task.cancel()
+        try:
+            await cls._task
+        except asyncio.CancelledError:
+            pass
+        finally:
+            cls._task = None
+            cls._stop_event = None
+        logger.info("Report snapshot scheduler stopped")
+
+    @classmethod
+    async def _run_loop(cls) -> None:
+        while True:
+            try:
+                await cls.run_once()
+            except Exception:
+                logger.exception("Report snapshot scheduler tick failed")
+
+            if not cls._stop_event:
+                await asyncio.sleep(cls._interval_seconds)
+                continue
+
+            try:
+                await asyncio.wait_for(cls._stop_event.wait(), timeout=cls._interval_seconds)
+                break
+            except asyncio.TimeoutError:
+                continue
+
+    @classmethod
+    async def run_once(cls) -> dict[int, int]:
+        """Refresh every due report; returns the number of stored query snapshots per refreshed report id"""
+        # Import here to avoid circular imports
+        from app.core.database import AsyncSessionLocal
+        from app.services.reports_service import ReportsService
+
+        now = datetime.now()
+        async with AsyncSessionLocal() as session:
+            rows = await session.execute(
+                select(Report.id, Report.snapshot_cron, func.max(ReportSnapshot.generated_at))
+                .outerjoin(ReportSnapshot, ReportSnapshot.report_id == Report.id)
+                .where(
+                    Report.snapshot_enabled.is_(True),
+                    Report.snapshot_cron.isnot(None),
+                    Report.deleted_at.is_(None),
+                    # Department-filtered reports are never snapshotted (see ReportDefinition)
+                    func.coalesce(Report.filter_by_department, False).is_(False),
+                    func.coalesce(Report.filter_by_step_department, False).is_(False),
+                )
+                .group_by(Report.id, Report.snapshot_cron)
+            )
+            due = [(report_id, cron) for report_id, cron, generated_at in rows.all() if snapshot_is_due(cron, generated_at, now)]
+
+        refreshed: dict[int, int] = {}
+        for report_id, cron in due:
+            async with AsyncSessionLocal() as session:
+                # Held until refresh_report_snapshots commits
+                locked = await session.scalar(select(func.pg_try_advisory_xact_lock(_ADVISORY_LOCK_NAMESPACE, report_id)))
+                if not locked:
+                    continue
+                # Another process may have refreshed the report between the scan and the lock
+                generated_at = await session.scalar(
+                    select(func.max(ReportSnapshot.generated_at)).where(ReportSnapshot.report_id == report_id)
+                )
+                if not snapshot_is_due(cron, generated_at, now):
+                    continue
+                try:
+                    refreshed[report_id] = await ReportsService(session).refresh_report_snapshots(report_id)
+                except Exception:
+                    logger.exception("Refreshing snapshots of report %s failed", report_id)
+        return refreshed
@@ -0,0 +1,355 @@
+"""
+Live report refresh over Server-Sent Events.
+
+GET /reports/{report_id}/stream keeps one SSE connection per viewer. Viewers
+of the same report with the same filters (and department, for reports
+filtered by department) share one ReportStream: a background task that runs
+execute_report on a schedule and pushes what changed to all of them, so N
+auto-refreshing dashboards cost one execution per interval instead of N.
+
+Events (data is JSON):
+
+    snapshot  the report's full result, like /reports/execute plus
+              generated_at. Sent to a viewer when it connects (once the
+              stream has executed) and whenever it has to resync.
+    update    only the queries whose result changed since the previous
+              execution, in "queries". An entry either carries the whole
+              result ({"query_id", "result"}) or, when the columns did not
+              change and few rows did, the result without data plus row
+              splices ({"query_id", "result", "ops": [[start, end, rows], ...]}):
+              replace rows[start:end] of the previous data with rows, applying
+              the ops in the order given (they run from the end of the data,
+              so the indexes of later ops stay valid).
+    error     the report can no longer be executed (deleted, or no viewer
+              has access) and the stream ends, or this viewer lost access to
+              the report and is dropped from it.
+
+A comment line (": keepalive") is sent after REPORT_STREAM_KEEPALIVE_SECONDS
+without events so proxies keep the connection open. A viewer that falls too
+far behind gets a snapshot instead of the updates it missed.
+
+Before each execution every viewer's access is checked again against the
+report's stored ACL (one lookup per user, see
+ReportsService.has_current_access), so sharing changes apply to viewers who
+joined an existing stream too. Viewers who lost access are dropped and the
+execution runs as the longest-connected viewer left, so the stream goes on
+for the others when the viewer who opened it leaves or loses access.
+
+A stream refreshes every REPORT_STREAM_INTERVAL_SECONDS, or at the shortest
+interval one of its viewers asked for (at least
+REPORT_STREAM_MIN_INTERVAL_SECONDS), counted from the start of the previous
+execution, and stops with its last viewer. Executions go through the report
+result cache like /reports/execute, so a report's cache_ttl_seconds also
+bounds how fresh its stream is.
+"""
+
+import asyncio
+import difflib
+import hashlib
+import json
+import logging
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from datetime import datetime, timezone
+from typing import Any, NamedTuple
+
+from app.core.config import settings
+from app.schemas.reports import ReportExecutionRequest, ReportExecutionResponse
+from app.services.report_jobs import execute_report_in_new_session
+
+logger = logging.getLogger(__name__)
+
+# Result fields that make up a query's content; timings and cache flags change on every run
+_CONTENT_FIELDS = ("columns", "data", "total_rows", "success", "message", "has_more", "next_cursor", "downsampled_from")
+
+# Events buffered per viewer before it is considered behind
+_VIEWER_QUEUE_SIZE = 8
+
+
+class Viewer(NamedTuple):
+    interval: float
+    user: Any
+
+
+class ReportStreamLimitError(Exception):
+    """Raised when a new stream would exceed REPORT_STREAM_MAX_STREAMS"""
+
+
+class StreamState(NamedTuple):
+    """What a stream last sent: per-query results and content hashes, and the encoded snapshot"""
+    results: dict[int, dict[str, Any]]
+    hashes: dict[int, str]
+    snapshot: str
+
+
+def stream_key(request: ReportExecutionRequest, department: str | None = None) -> str:
+    """Identity of a shared stream: report, query, row limit, filter values and (for department-filtered reports) department"""
+    payload = {
+        "report_id": request.report_id,
+        "query_id": request.query_id,
+        "limit": request.limit,
+        "filters": [f.model_dump(mode="json") for f in request.filters or []],
+        "department": department,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+async def check_access_in_new_session(report_id: int, users: list[Any]) -> list[bool]:
+    """Whether each user may still view a report, checked against the stored ACL in a session of its own"""
+    # Import here to avoid circular imports
+    from app.core.database import AsyncSessionLocal
+    from app.services.reports_service import ReportsService
+
+    async with AsyncSessionLocal() as session:
+        service = ReportsService(session)
+        return [await service.has_current_access(report_id, user) for user in users]
+
+
+def format_event(name: str, data: str) -> str:
+    return f"event: {name}\ndata: {data}\n\n"
+
+
+def _encode(payload: Any) -> str:
+    return json.dumps(payload, separators=(",", ":"), default=str)
+
+
+def row_delta(old_rows: list, new_rows: list, max_rows: int) -> list | None:
+    """Splices turning old_rows into new_rows (last first), or None when sending new_rows whole is about as cheap"""
+    if len(old_rows) > max_rows or len(new_rows) > max_rows:
+        return None
+    matcher = difflib.SequenceMatcher(None, [_encode(row) for row in old_rows], [_encode(row) for row in new_rows], autojunk=False)
+    ops = [[i1, i2, new_rows[j1:j2]] for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != "equal"]
+    if sum(len(rows) for _, _, rows in ops) * 2 > len(new_rows):
+        return None
+    return ops[::-1]
+
+
+def apply_row_delta(rows: list, ops: list) -> list:
+    """Apply row_delta's splices (what a client does with an update)"""
+    rows = list(rows)
+    for start, end, replacement in ops:
+        rows[start:end] = replacement
+    return rows
+
+
+def next_events(previous: StreamState | None, response: ReportExecutionResponse, delta_max_rows: int) -> tuple[StreamState, tuple[str, str] | None]:
+    """The stream's new state after an execution and the event to broadcast (None when nothing changed)
+
+    Pure and CPU-bound (hashing, diffing and encoding every row), so it runs on a worker thread.
+    """
+    header = {
+        "report_id": response.report_id,
+        "report_name": response.report_name,
+        "success": response.success,
+        "message": response.message,
+        "total_execution_time_ms": response.total_execution_time_ms,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+    }
+    results: dict[int, dict[str, Any]] = {}
+    hashes: dict[int, str] = {}
+    changes = []
+    for result in response.results:
+        data = result.model_dump(mode="json")
+        digest = hashlib.sha256(_encode([data.get(field) for field in _CONTENT_FIELDS]).encode()).hexdigest()
+        results[result.query_id] = data
+        hashes[result.query_id] = digest
+        if previous is None or previous.hashes.get(result.query_id) == digest:
+            continue
+
+        old = previous.results.get(result.query_id)
+        ops = row_delta(old["data"], data["data"], delta_max_rows) if old and old["columns"] == data["columns"] else None
+        if ops is None:
+            changes.append({"query_id": result.query_id, "result": data})
+        else:
+            changes.append({"query_id": result.query_id, "result": {k: v for k, v in data.items() if k != "data"}, "ops": ops})
+
+    state = StreamState(results, hashes, _encode({**header, "results": list(results.values())}))
+    if previous is None or set(results) != set(previous.results):
+        # First execution, or queries were added or removed: everybody starts over from a snapshot
+        return state, ("snapshot", state.snapshot)
+    if not changes:
+        return state, None
+    return state, ("update", _encode({**header, "queries": changes}))
+
+
+class ReportStream:
+    """One refresh schedule shared by the viewers of a report with one filter set"""
+
+    def __init__(self, key: str, request: ReportExecutionRequest):
+        self.key = key
+        self.request = request
+        # In joining order: executions run as the first viewer
+        self.viewers: dict[asyncio.Queue, Viewer] = {}
+        self.state: StreamState | None = None
+        self.task: asyncio.Task | None = None
+
+    @property
+    def interval(self) -> float:
+        return min((viewer.interval for viewer in self.viewers.values()), default=settings.REPORT_STREAM_INTERVAL_SECONDS)
+
+    @property
+    def user(self) -> Any:
+        """The user executions run as: the longest-connected viewer (None when the stream has no viewers)"""
+        return next((viewer.user for viewer in self.viewers.values()), None)
+
+
+class ReportStreamHub:
+    """Running report streams of this process, keyed by stream_key"""
+
+    def __init__(
+        self,
+        max_streams: int = 100,
+        delta_max_rows: int = 5000,
+        keepalive_seconds: float = 15,
+        execute: Callable[[ReportExecutionRequest, Any], Awaitable[ReportExecutionResponse]] = execute_report_in_new_session,
+        check_access: Callable[[int, list[Any]], Awaitable[list[bool]]] = check_access_in_new_session,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._max_streams = max(1, max_streams)
+        self._delta_max_rows = delta_max_rows
+        self._keepalive = keepalive_seconds
+        self._execute = execute
+        self._check_access = check_access
+        self._clock = clock
+        self._streams: dict[str, ReportStream] = {}
+
+    def subscribe(self, request: ReportExecutionRequest, user: Any, interval: float | None = None, department: str | None = None) -> tuple[ReportStream, asyncio.Queue]:
+        """Join (or start) the stream for a request; the caller must have checked the user's access to the report
+
+        Raises:
+            ReportStreamLimitError: If starting a stream would exceed max_streams
+        """
+        key = stream_key(request, department)
+        stream = self._streams.get(key)
+        if stream is None:
+            if len(self._streams) >= self._max_streams:
+                raise ReportStreamLimitError("Too many live report streams are running, try again later")
+            stream = self._streams[key] = ReportStream(key, request)
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=_VIEWER_QUEUE_SIZE)
+        interval = max(float(interval or settings.REPORT_STREAM_INTERVAL_SECONDS), float(settings.REPORT_STREAM_MIN_INTERVAL_SECONDS))
+        stream.viewers[queue] = Viewer(interval, user)
+        if stream.state is not None:
+            queue.put_nowait(("snapshot", stream.state.snapshot))
+        if stream.task is None or stream.task.done():
+            stream.task = asyncio.create_task(self._run(stream), name=f"report-stream-{request.report_id}")
+        return stream, queue
+
+    def unsubscribe(self, stream: ReportStream, queue: asyncio.Queue) -> None:
+        """Leave a stream; the last viewer stops it"""
+        stream.viewers.pop(queue, None)
+        if stream.viewers:
+            return
+        if self._streams.get(stream.key) is stream:
+            del self._streams[stream.key]
+        if stream.task and not stream.task.done():
+            stream.task.cancel()
+
+    async def events(self, stream: ReportStream, queue: asyncio.Queue, is_disconnected: Callable[[], Awaitable[bool]] | None = None) -> AsyncIterator[str]:
+        """SSE body for one viewer; leaves the stream when the client goes away"""
+        try:
+            while True:
+                try:
+                    name, data = await asyncio.wait_for(queue.get(), timeout=self._keepalive)
+                except asyncio.TimeoutError:
+                    if is_disconnected and await is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_event(name, data)
+                if name == "error":
+                    break
+        finally:
+            self.unsubscribe(stream, queue)
+
+    def stream_count(self) -> int:
+        return len(self._streams)
+
+    async def stop(self) -> None:
+        """Cancel every stream (application shutdown)"""
+        streams, self._streams = list(self._streams.values()), {}
+        tasks = [s.task for s in streams if s.task and not s.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, stream: ReportStream) -> None:
+        while stream.viewers:
+            started = self._clock()
+            try:
+                await self._drop_revoked_viewers(stream)
+            except Exception as e:
+                # Nothing runs this round; the check is retried at the next interval
+                logger.warning("Access check for the report %s stream failed: %s", stream.request.report_id, e)
+                await asyncio.sleep(max(0.0, stream.interval - (self._clock() - started)))
+                continue
+            if not stream.viewers:
+                self._forget(stream)
+                return
+
+            user = stream.user
+            try:
+                response = await self._execute(stream.request, user)
+            except Exception as e:
+                if await self._lost_access(stream, user):
+                    # Revoked after the check: run again as the next viewer, if any is left
+                    continue
+                logger.warning("Report stream for report %s stopped: %s", stream.request.report_id, e)
+                self._forget(stream)
+                self._publish(stream, ("error", _encode({"message": str(e)})))
+                return
+
+            state, event = await asyncio.to_thread(next_events, stream.state, response, self._delta_max_rows)
+            # Swapped on the event loop, together with the broadcast, so a viewer joining now
+            # gets either the old snapshot and this update or the new snapshot alone
+            stream.state = state
+            if event is not None:
+                self._publish(stream, event)
+            await asyncio.sleep(max(0.0, stream.interval - (self._clock() - started)))
+        self._forget(stream)
+
+    def _forget(self, stream: ReportStream) -> None:
+        if self._streams.get(stream.key) is stream:
+            del self._streams[stream.key]
+
+    async def _lost_access(self, stream: ReportStream, user: Any) -> bool:
+        """Whether a failed execution's user is no longer a viewer, after dropping every viewer who lost access"""
+        try:
+            await self._drop_revoked_viewers(stream)
+        except Exception:
+            return False
+        return all(viewer.user is not user for viewer in stream.viewers.values())
+
+    async def _drop_revoked_viewers(self, stream: ReportStream) -> None:
+        """Send error to the viewers who may no longer see the report and remove them from the stream"""
+        # Viewers joining during the check were access-checked when they subscribed
+        viewers = list(stream.viewers.items())
+        users = {getattr(viewer.user, "username", None): viewer.user for _, viewer in viewers}
+        allowed = dict(zip(users, await self._check_access(stream.request.report_id, list(users.values()))))
+        denied = _encode({"message": "Report access denied"})
+        for queue, viewer in viewers:
+            if allowed[getattr(viewer.user, "username", None)] or queue not in stream.viewers:
+                continue
+            del stream.viewers[queue]
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(("error", denied))
+
+    def _publish(self, stream: ReportStream, event: tuple[str, str]) -> None:
+        for queue in list(stream.viewers):
+            viewer_event = event
+            if queue.full():
+                # A viewer that missed updates cannot apply the next delta: resync it from the snapshot
+                while not queue.empty():
+                    queue.get_nowait()
+                if event[0] == "update":
+                    viewer_event = ("snapshot", stream.state.snapshot)
+            queue.put_nowait(viewer_event)
+
+
+# Viewers share a stream only when their SSE connections reach the same process
+report_streams = ReportStreamHub(
+    max_streams=settings.REPORT_STREAM_MAX_STREAMS,
+    delta_max_rows=settings.REPORT_STREAM_DELTA_MAX_ROWS,
+    keepalive_seconds=settings.REPORT_STREAM_KEEPALIVE_SECONDS,
+)
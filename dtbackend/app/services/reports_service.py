@@ -1,20 +1,34 @@
 import asyncio
+import contextlib
+import itertools
 import re
 import time
+import uuid
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
+from datetime import date, datetime, timezone
 from threading import Lock
 from typing import Any
 
 from clickhouse_driver import Client
-from sqlalchemy import and_, delete, or_, select
+from sqlalchemy import String, and_, cast, delete, func, or_, select, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload, selectinload
 
+from app.core.config import settings
 from app.core.platform_db import DatabaseConnectionFactory
+from app.core.read_replicas import (
+    REPLICA_DB_TYPES,
+    is_connection_error,
+    is_read_only,
+    replica_router,
+)
 from app.models.postgres_models import (
     Platform,
     Report,
     ReportQuery,
     ReportQueryFilter,
+    ReportSnapshot,
     ReportTab,
     ReportUser,
     User,
@@ -29,16 +43,91 @@ from app.schemas.reports import (
     ReportList,
     ReportUpdate,
 )
+from app.schemas.reports import (
+    Report as ReportSchema,
+)
 from app.schemas.user import User as UserSchema
+from app.services.admission_control import (
+    AdmissionController,
+    admission_controller,
+    preview_admission_controller,
+)
+from app.services.connection_pools import BoundedConnectionPool
+from app.services.downsampling import downsample_rows, downsampling_spec
+from app.services.execution_profiles import profile_settings
+from app.services.filter_option_cache import FilterOptionIndex, filter_option_cache
+from app.services.keyset_pagination import (
+    build_keyset_query,
+    decode_cursor,
+    encode_cursor,
+    keyset_fingerprint,
+    next_cursor_values,
+)
+from app.services.query_cancellation import (
+    register_clickhouse_query,
+    register_cursor,
+    unregister_query,
+)
+from app.services.query_coalescing import query_coalescer
+from app.services.query_cost_guard import (
+    CostEstimate,
+    QueryCostExceededError,
+    check_estimate,
+    cost_limits,
+    explain_cache,
+    parse_clickhouse_estimate,
+    parse_postgres_plan,
+    parse_showplan_xml,
+)
+from app.services.query_telemetry import (
+    current_query_stats,
+    query_telemetry,
+    record_query_telemetry,
+)
+from app.services.query_templates import (
+    CompiledFilter,
+    CompiledQueryTemplate,
+    query_template_cache,
+    template_cache_key,
+)
+from app.services.report_definitions import (
+    ReportDefinition,
+    acl_allows,
+    report_definition_cache,
+)
+from app.services.report_export import EXPORT_FORMATS, encode_export, iter_query_chunks
+from app.services.report_result_cache import report_result_cache
+from app.services.sql_params import QueryParams, bind_params, coerce_postgres_args
+from app.services.sql_row_cap import cap_rows
+from app.services.time_buckets import (
+    UNSPLITTABLE,
+    IncrementalSpec,
+    bucket_range,
+    incremental_spec,
+    missing_runs,
+    plan_buckets,
+    requested_range,
+    split_rows,
+    time_bucket_cache,
+)
 from app.services.user_service import UserService
 
+# Snapshots hold what a chart requests by default: no filter values and the first 1000 rows
+SNAPSHOT_ROW_LIMIT = 1000
+SNAPSHOT_USERNAME = "snapshot-scheduler"
+
+# Background filter option prewarms started by get_report
+_prewarm_tasks: set[asyncio.Task] = set()
+
 
 class ConnectionPool:
     """Singleton connection pool for database connections"""
     _instance = None
     _lock = Lock()
     _pools: dict[str, Any] = {}
-    _clickhouse_clients: dict[str, Client] = {}
+    _clickhouse_clients: dict[str, BoundedConnectionPool] = {}
+    _asyncpg_pools: dict[str, Any] = {}
+    _asyncpg_lock: asyncio.Lock | None = None
 
     def __new__(cls):
         if cls._instance is None:
@@ -88,32 +177,30 @@ class ConnectionPool:
         else:
             raise ValueError("Either db_config or platform must be provided")
 
-        # Special handling for ClickHouse (keep persistent client)
+        # ClickHouse clients are not thread-safe: check out a dedicated client per caller
         if actual_db_type == "clickhouse":
             if pool_key not in self._clickhouse_clients:
                 with self._lock:
                     if pool_key not in self._clickhouse_clients:
-                        self._clickhouse_clients[pool_key] = self._create_clickhouse_client(actual_config)
-            return self._clickhouse_clients[pool_key]
+                        self._clickhouse_clients[pool_key] = self._create_clickhouse_pool(actual_config, pool_key)
+            return self._clickhouse_clients[pool_key].checkout()
 
         # For PostgreSQL and MSSQL, use connection pools
         if pool_key not in self._pools:
             with self._lock:
                 if pool_key not in self._pools:
-                    self._pools[pool_key] = self._create_pool(actual_config, actual_db_type)
+                    self._pools[pool_key] = self._create_pool(actual_config, actual_db_type, pool_key)
 
         pool = self._pools[pool_key]
         
         if actual_db_type == "postgresql":
             return pool.getconn()
         elif actual_db_type == "mssql":
-            # MSSQL doesn't have built-in pooling, create new connection
-            # (We could implement a custom pool later if needed)
-            return self._create_mssql_connection(actual_config)
+            return pool.checkout()
         else:
             raise ValueError(f"Unsupported database type: {actual_db_type}")
 
-    def return_connection(self, conn, db_config: dict[str, Any] | None = None, platform: Platform | None = None, db_type: str | None = None):
+    def return_connection(self, conn, db_config: dict[str, Any] | None = None, platform: Platform | None = None, db_type: str | None = None, discard: bool = False):
         """Return connection to pool
         
         Args:
@@ -121,6 +208,7 @@ class ConnectionPool:
             db_config: Database configuration dict (takes priority)
             platform: Platform instance (fallback)
             db_type: Database type
+            discard: Close the connection instead of reusing it (e.g. after a failed query)
         """
         # Determine db_type and pool_key
         if db_config:
@@ -136,8 +224,18 @@ class ConnectionPool:
                 conn.close()
             return
 
-        # Don't return ClickHouse clients - they stay persistent
+        # Return ClickHouse clients to their per-key pool
         if actual_db_type == "clickhouse":
+            pool = self._clickhouse_clients.get(pool_key)
+            if pool:
+                pool.checkin(conn, discard=discard)
+            elif hasattr(conn, 'disconnect'):
+                conn.disconnect()
+            return
+
+        # Return MSSQL connections to their pool; a failed connection is closed instead of reused
+        if actual_db_type == "mssql" and pool_key in self._pools:
+            self._pools[pool_key].checkin(conn, discard=discard)
             return
 
         # Return PostgreSQL connections to pool
@@ -149,11 +247,11 @@ class ConnectionPool:
                 if hasattr(conn, 'close'):
                     conn.close()
         else:
-            # For MSSQL and others, just close the connection
+            # Unknown pool, just close the connection
             if hasattr(conn, 'close'):
                 conn.close()
 
-    def _create_pool(self, db_config: dict[str, Any], db_type: str):
+    def _create_pool(self, db_config: dict[str, Any], db_type: str, pool_key: str = "pool"):
         """Create a connection pool based on database type"""
         if db_type == "postgresql":
             from psycopg2 import pool
@@ -166,9 +264,116 @@ class ConnectionPool:
                 user=db_config.get("user"),
                 password=db_config.get("password")
             )
+        elif db_type == "mssql":
+            mssql_pool = BoundedConnectionPool(
+                factory=lambda: self._create_mssql_connection(db_config),
+                close=lambda conn: conn.close(),
+                max_size=settings.MSSQL_POOL_MAX_SIZE,
+                idle_timeout=settings.MSSQL_POOL_IDLE_TIMEOUT_SECONDS,
+                checkout_timeout=settings.MSSQL_POOL_CHECKOUT_TIMEOUT_SECONDS,
+                name=pool_key,
+                min_size=settings.MSSQL_POOL_MIN_SIZE,
+                validate=self._validate_mssql_connection,
+                validate_after=settings.MSSQL_POOL_VALIDATE_AFTER_SECONDS,
+                reset=lambda conn: conn.rollback(),
+                max_uses=settings.MSSQL_POOL_MAX_USES,
+                max_lifetime=settings.MSSQL_POOL_MAX_LIFETIME_SECONDS
+            )
+            mssql_pool.prefill()
+            return mssql_pool
         else:
             raise ValueError(f"Unsupported database type for pooling: {db_type}")
 
+    async def get_asyncpg_pool(self, db_config: dict[str, Any] | None = None, platform: Platform | None = None):
+        """Get or create the asyncpg pool for a PostgreSQL target (one pool per platform or db_config)
+
+        Args:
+            db_config: Database configuration dict (takes priority)
+            platform: Platform instance (fallback)
+
+        Returns:
+            asyncpg.Pool bound to the running event loop
+        """
+        if db_config:
+            actual_config = db_config
+            pool_key = self._get_pool_key(db_config, "postgresql")
+        elif platform:
+            actual_config = platform.db_config or {}
+            pool_key = self._get_pool_key(actual_config, "postgresql", platform.id)
+        else:
+            raise ValueError("Either db_config or platform must be provided")
+
+        pool = self._asyncpg_pools.get(pool_key)
+        if pool is None:
+            if ConnectionPool._asyncpg_lock is None:
+                ConnectionPool._asyncpg_lock = asyncio.Lock()
+            async with ConnectionPool._asyncpg_lock:
+                pool = self._asyncpg_pools.get(pool_key)
+                if pool is None:
+                    pool = await self._create_asyncpg_pool(actual_config)
+                    self._asyncpg_pools[pool_key] = pool
+        return pool
+
+    async def _create_asyncpg_pool(self, db_config: dict[str, Any]):
+        """Create an asyncpg pool for a PostgreSQL report database"""
+        import asyncpg
+        return await asyncpg.create_pool(
+            host=db_config.get("host", "localhost"),
+            port=int(db_config.get("port", 5432)),
+            database=db_config.get("database"),
+            user=db_config.get("user"),
+            password=db_config.get("password"),
+            min_size=settings.ASYNCPG_POOL_MIN_SIZE,
+            max_size=settings.ASYNCPG_POOL_MAX_SIZE,
+            max_inactive_connection_lifetime=settings.ASYNCPG_POOL_MAX_INACTIVE_SECONDS
+        )
+
+    async def close_asyncpg_pools(self) -> None:
+        """Close every asyncpg pool (called on application shutdown)"""
+        pools = list(self._asyncpg_pools.values())
+        self._asyncpg_pools.clear()
+        for pool in pools:
+            await pool.close()
+
+    def _create_clickhouse_pool(self, db_config: dict[str, Any], pool_key: str) -> BoundedConnectionPool:
+        """Create a bounded pool of ClickHouse clients for one database target"""
+        return BoundedConnectionPool(
+            factory=lambda: self._create_clickhouse_client(db_config),
+            close=lambda client: client.disconnect(),
+            max_size=settings.CLICKHOUSE_POOL_MAX_SIZE,
+            idle_timeout=settings.CLICKHOUSE_POOL_IDLE_TIMEOUT_SECONDS,
+            checkout_timeout=settings.CLICKHOUSE_POOL_CHECKOUT_TIMEOUT_SECONDS,
+            name=pool_key
+        )
+
+    def get_stats(self) -> dict[str, dict[str, Any]]:
+        """Checkout/wait statistics for the ClickHouse and MSSQL pools, sizes for the asyncpg pools"""
+        stats = {key: pool.stats() for key, pool in list(self._clickhouse_clients.items())}
+        for key, pool in list(self._pools.items()):
+            if isinstance(pool, BoundedConnectionPool):
+                stats[key] = pool.stats()
+        for key, pool in list(self._asyncpg_pools.items()):
+            stats[key] = {
+                "name": key,
+                "min_size": pool.get_min_size(),
+                "max_size": pool.get_max_size(),
+                "size": pool.get_size(),
+                "idle": pool.get_idle_size(),
+            }
+        return stats
+
+    @staticmethod
+    def default_clickhouse_config() -> dict[str, Any]:
+        """db_config equivalent of the application's default ClickHouse connection"""
+        return {
+            "db_type": "clickhouse",
+            "host": settings.CLICKHOUSE_HOST,
+            "port": settings.CLICKHOUSE_PORT,
+            "user": settings.CLICKHOUSE_USER,
+            "password": settings.CLICKHOUSE_PASSWORD,
+            "database": settings.CLICKHOUSE_DB,
+        }
+
     def _create_clickhouse_client(self, db_config: dict[str, Any]) -> Client:
         """Create a ClickHouse client"""
         return Client(
@@ -177,7 +382,8 @@ class ConnectionPool:
             user=db_config.get("user", "default"),
             password=db_config.get("password", ""),
             database=db_config.get("database", "default"),
-            settings=db_config.get("settings", {})
+            # Report filters are bound as {name:Type} query parameters substituted by the server
+            settings={**db_config.get("settings", {}), "server_side_params": True}
         )
 
     def _create_mssql_connection(self, db_config: dict[str, Any]):
@@ -193,9 +399,30 @@ class ConnectionPool:
         )
         return pyodbc.connect(connection_string)
 
+    @staticmethod
+    def _validate_mssql_connection(conn) -> None:
+        """Cheap round trip to detect connections dropped by the server or a firewall"""
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+        finally:
+            cursor.close()
+
 
 class ReportsService:
     _connection_pool = ConnectionPool()
+    _result_cache = report_result_cache
+    _query_templates = query_template_cache
+    _admission = admission_controller
+    _preview_admission = preview_admission_controller
+    _report_definitions = report_definition_cache
+    _filter_options = filter_option_cache
+    _explain_cache = explain_cache
+    _coalescer = query_coalescer
+    _telemetry = query_telemetry
+    _time_buckets = time_bucket_cache
+    _replicas = replica_router
 
     def __init__(self, db: AsyncSession, clickhouse_client: Client | None = None):
         self.db = db
@@ -248,7 +475,12 @@ class ReportsService:
             db_config=report_data.db_config,
             filter_by_department=report_data.filter_by_department or False,
             department_filter_level=report_data.department_filter_level,
-            filter_by_step_department=report_data.filter_by_step_department or False
+            filter_by_step_department=report_data.filter_by_step_department or False,
+            cache_ttl_seconds=report_data.cache_ttl_seconds,
+            max_execution_time_seconds=report_data.max_execution_time_seconds,
+            execution_profile=report_data.execution_profile,
+            snapshot_enabled=report_data.snapshot_enabled or False,
+            snapshot_cron=report_data.snapshot_cron
         )
         self.db.add(db_report)
         await self.db.flush()  # Get the report ID
@@ -275,7 +507,8 @@ class ReportsService:
                             name=query_data.name,
                             sql=query_data.sql,
                             visualization_config=query_data.visualization.dict(),
-                            order_index=query_data.order_index or 0
+                            order_index=query_data.order_index or 0,
+                            execution_profile=query_data.execution_profile
                         )
                         self.db.add(db_query)
                         await self.db.flush()  # Get the query ID
@@ -305,7 +538,8 @@ class ReportsService:
                         name=query_data.name,
                         sql=query_data.sql,
                         visualization_config=query_data.visualization.dict(),
-                        order_index=query_data.order_index or 0
+                        order_index=query_data.order_index or 0,
+                        execution_profile=query_data.execution_profile
                     )
                     self.db.add(db_query)
                     await self.db.flush()  # Get the query ID
@@ -326,6 +560,7 @@ class ReportsService:
                         )
                         self.db.add(db_filter)
 
+        await self._sync_query_count(db_report)
         await self.db.commit()
 
         # Refresh and eagerly load relationships
@@ -336,62 +571,22 @@ class ReportsService:
         result = await self.db.execute(stmt)
         return result.scalar_one()
 
-    async def get_report(self, report_id: int, user: UserSchema) -> Report | None:
-        db_user = await UserService.get_user_by_username(self.db, user.username)
-        if not db_user:
-            raise ValueError("User not found")
+    async def _sync_query_count(self, db_report: Report) -> None:
+        """Store the report's number of queries on the report, after its queries were written (the report list reads it instead of counting)"""
+        await self.db.flush()
+        db_report.query_count = await self.db.scalar(select(func.count(ReportQuery.id)).where(ReportQuery.report_id == db_report.id))
 
+    async def get_report(self, report_id: int, user: UserSchema) -> ReportSchema | None:
         """Get a report by ID with all queries and filters (only if user owns it or it's public or has permission)"""
-        from sqlalchemy.orm import joinedload
-        from sqlalchemy import cast, String, literal
-        from sqlalchemy.dialects.postgresql import ARRAY
-
-        # Check if user is admin
-        is_admin = user.role and "miras:admin" in user.role
-
-        if is_admin:
-            # Admin can access all reports
-            stmt = select(Report).options(
-                selectinload(Report.tabs).selectinload(ReportTab.queries).selectinload(ReportQuery.filters),
-                selectinload(Report.queries).selectinload(ReportQuery.filters),
-                joinedload(Report.owner)
-            ).where(and_(Report.id == report_id, Report.deleted_at.is_(None)))
-        else:
-            # Generate all parent departments for the user
-            user_dept = user.department or ""
-            dept_prefixes = []
-            if user_dept:
-                parts = user_dept.split('_')
-                current = ""
-                for part in parts:
-                    current = f"{current}_{part}" if current else part
-                    dept_prefixes.append(current)
-
-            dept_prefixes_array = cast(dept_prefixes, ARRAY(String))
-
-            stmt = select(Report).options(
-                selectinload(Report.tabs).selectinload(ReportTab.queries).selectinload(ReportQuery.filters),
-                selectinload(Report.queries).selectinload(ReportQuery.filters),
-                joinedload(Report.owner)
-            ).where(
-                and_(
-                    Report.id == report_id,
-                    Report.deleted_at.is_(None),  # Exclude deleted reports
-                    or_(
-                        Report.owner_id == db_user.id,
-                        Report.is_public == True,
-                        Report.allowed_users.op('@>')(cast([user.username], ARRAY(String))),
-                        Report.allowed_departments.op('&&')(dept_prefixes_array)
-                    )
-                )
-            )
-        result = await self.db.execute(stmt)
-        report = result.scalar_one_or_none()
-
-        if report:
-            report.owner_name = report.owner.name if report.owner else None
-
-        return report
+        definition = await self._get_report_definition(report_id)
+        # Checked against the cached ACL: writes through this service drop the definition (see report_definitions)
+        if not definition or definition.deleted_at is not None or not definition.is_accessible_by(user):
+            return None
+        if definition.response is None:
+            raise ValueError("Report could not be loaded")
+        if settings.FILTER_OPTION_CACHE_ENABLED and settings.FILTER_OPTION_CACHE_PREWARM:
+            self._prewarm_filter_options(definition)
+        return definition.response
 
     async def get_report_for_export(self, report_id: int) -> Report | None:
         """
@@ -424,9 +619,9 @@ class ReportsService:
             raise ValueError("User not found")
 
         """Get reports for a user with all queries and filters (owned + public or only owned)"""
-        from sqlalchemy.orm import joinedload
-        from sqlalchemy import cast, String
+        from sqlalchemy import String, cast
         from sqlalchemy.dialects.postgresql import ARRAY
+        from sqlalchemy.orm import joinedload
 
         # Check if user is admin
         is_admin = user.role and "miras:admin" in user.role
@@ -485,19 +680,30 @@ class ReportsService:
 
         return reports
 
-    async def get_reports_list(self, user: UserSchema, skip: int = 0, limit: int = 100, my_reports_only: bool = False, platform: Platform | None = None, subplatform: str | None = None) -> list[ReportList]:
-        """Get reports list for a user (without nested queries and filters for performance)"""
+    async def get_reports_list(
+        self,
+        user: UserSchema,
+        skip: int = 0,
+        limit: int = 100,
+        my_reports_only: bool = False,
+        platform: Platform | None = None,
+        subplatform: str | None = None,
+        cursor: str | None = None,
+    ) -> tuple[list[ReportList], str | None]:
+        """Get one page of the reports list for a user (without nested queries and filters for performance)
+
+        Reports are ordered by last change (updated_at, or created_at for reports never
+        updated), newest first, with id as tiebreaker. Pages are read by keyset: pass
+        the returned cursor to get the next page (None when this is the last one).
+        skip still works for old clients but costs a scan of the skipped rows.
+
+        Raises:
+            ValueError: If the user does not exist or the cursor is invalid or was issued for other filters
+        """
         db_user = await UserService.get_user_by_username(self.db, user.username)
         if not db_user:
             raise ValueError("User not found")
 
-        from sqlalchemy import String, and_, cast, func
-        from sqlalchemy.dialects.postgresql import ARRAY
-
-        # Build base conditions
-        from sqlalchemy import or_, and_, cast, String, literal
-        from sqlalchemy.dialects.postgresql import ARRAY
-
         # Check if user is admin
         is_admin = user.role and "miras:admin" in user.role
 
@@ -544,6 +750,21 @@ class ReportsService:
             # Use PostgreSQL array @> operator (contains) with proper type casting
             filters.append(Report.tags.op('@>')(cast([subplatform], ARRAY(String))))
 
+        # Same expression as the ix_reports_list_order index
+        changed_at = func.coalesce(Report.updated_at, Report.created_at)
+        fingerprint = keyset_fingerprint(
+            "reports_list",
+            ["changed_at", "id"],
+            "DESC",
+            {"user": db_user.id, "my_reports_only": my_reports_only, "platform": platform.id if platform else None, "subplatform": subplatform},
+        )
+        if cursor:
+            after_values, _ = decode_cursor(cursor, fingerprint)
+            if len(after_values) != 2 or not isinstance(after_values[0], datetime) or not isinstance(after_values[1], int):
+                raise ValueError("Invalid pagination cursor")
+            after_changed_at, after_id = after_values
+            filters.append(tuple_(changed_at, Report.id) < tuple_(after_changed_at, after_id))
+
         stmt = select(
             Report.id,
             Report.name,
@@ -556,25 +777,21 @@ class ReportsService:
             Report.color,
             Report.is_direct_link,
             Report.direct_link,
-            func.count(ReportQuery.id).label('query_count')
-        ).outerjoin(ReportQuery).group_by(
-            Report.id,
-            Report.name,
-            Report.description,
-            Report.is_public,
-            Report.owner_id,
-            Report.created_at,
-            Report.updated_at,
-            Report.tags,
-            Report.color,
-            Report.is_direct_link,
-            Report.direct_link
+            Report.query_count,
+            changed_at.label('changed_at')
         ).where(
             and_(*filters)
-        ).offset(skip).limit(limit)
+        ).order_by(changed_at.desc(), Report.id.desc()).limit(limit + 1)
+        if skip and not cursor:
+            stmt = stmt.offset(skip)
 
         result = await self.db.execute(stmt)
         report_rows = result.all()
+        next_cursor = None
+        if len(report_rows) > limit:
+            report_rows = report_rows[:limit]
+            last = report_rows[-1]
+            next_cursor = encode_cursor([last.changed_at, last.id], None, fingerprint)
 
         # Get owner names for all reports
         owner_ids = list(set([row.owner_id for row in report_rows]))
@@ -613,7 +830,7 @@ class ReportsService:
                 direct_link=row.direct_link
             ))
 
-        return reports
+        return reports, next_cursor
 
     async def update_report(self, report_id: int, report_data: ReportUpdate, user: UserSchema, is_admin: bool = False) -> Report | None:
         db_user = await UserService.get_user_by_username(self.db, user.username)
@@ -661,8 +878,26 @@ class ReportsService:
             db_report.department_filter_level = report_data.department_filter_level
         if report_data.filter_by_step_department is not None:
             db_report.filter_by_step_department = report_data.filter_by_step_department
-
+        if report_data.cache_ttl_seconds is not None:
+            db_report.cache_ttl_seconds = report_data.cache_ttl_seconds
+        if report_data.max_execution_time_seconds is not None:
+            db_report.max_execution_time_seconds = report_data.max_execution_time_seconds
+        if report_data.execution_profile is not None:
+            db_report.execution_profile = report_data.execution_profile
+        if report_data.snapshot_enabled is not None:
+            db_report.snapshot_enabled = report_data.snapshot_enabled
+        if "snapshot_cron" in report_data.model_fields_set:
+            # An empty cron clears the schedule
+            db_report.snapshot_cron = report_data.snapshot_cron
+
+        # Queries, filters or the schedule may have changed: the next scheduler tick rebuilds the snapshots
+        await self.db.execute(delete(ReportSnapshot).where(ReportSnapshot.report_id == db_report.id))
         await self.db.commit()
+        self._result_cache.invalidate_report(db_report.id)
+        self._query_templates.invalidate_report(db_report.id)
+        self._report_definitions.invalidate_report(db_report.id)
+        self._filter_options.invalidate_report(db_report.id)
+        self._time_buckets.invalidate_report(db_report.id)
 
         # Refresh and eagerly load relationships
         stmt = select(Report).options(
@@ -721,6 +956,17 @@ class ReportsService:
             db_report.department_filter_level = report_data.department_filter_level
         if report_data.filter_by_step_department is not None:
             db_report.filter_by_step_department = report_data.filter_by_step_department
+        if report_data.cache_ttl_seconds is not None:
+            db_report.cache_ttl_seconds = report_data.cache_ttl_seconds
+        if report_data.max_execution_time_seconds is not None:
+            db_report.max_execution_time_seconds = report_data.max_execution_time_seconds
+        if report_data.execution_profile is not None:
+            db_report.execution_profile = report_data.execution_profile
+        if report_data.snapshot_enabled is not None:
+            db_report.snapshot_enabled = report_data.snapshot_enabled
+        if "snapshot_cron" in report_data.model_fields_set:
+            # An empty cron clears the schedule
+            db_report.snapshot_cron = report_data.snapshot_cron
 
         # Update global filters if provided
         if report_data.global_filters is not None:
@@ -810,7 +1056,8 @@ class ReportsService:
                         name=query_data.name,
                         sql=query_data.sql,
                         visualization_config=query_data.visualization.dict(),
-                        order_index=query_data.order_index or 0
+                        order_index=query_data.order_index or 0,
+                        execution_profile=query_data.execution_profile
                     )
                     self.db.add(db_query)
                     await self.db.flush()  # Get the query ID
@@ -883,7 +1130,8 @@ class ReportsService:
                     name=query_data.name,
                     sql=query_data.sql,
                     visualization_config=query_data.visualization.dict(),
-                    order_index=query_data.order_index or 0
+                    order_index=query_data.order_index or 0,
+                    execution_profile=query_data.execution_profile
                 )
                 self.db.add(db_query)
                 await self.db.flush()  # Get the new query ID from database
@@ -924,7 +1172,16 @@ class ReportsService:
 
                 db_report.layout_config = updated_layout
 
+        await self._sync_query_count(db_report)
+
+        # Queries, filters or the schedule may have changed: the next scheduler tick rebuilds the snapshots
+        await self.db.execute(delete(ReportSnapshot).where(ReportSnapshot.report_id == db_report.id))
         await self.db.commit()
+        self._result_cache.invalidate_report(db_report.id)
+        self._query_templates.invalidate_report(db_report.id)
+        self._report_definitions.invalidate_report(db_report.id)
+        self._filter_options.invalidate_report(db_report.id)
+        self._time_buckets.invalidate_report(db_report.id)
 
         # Refresh and eagerly load relationships
         stmt = select(Report).options(
@@ -956,6 +1213,11 @@ class ReportsService:
         from sqlalchemy import func
         db_report.deleted_at = func.now()
         await self.db.commit()
+        self._result_cache.invalidate_report(db_report.id)
+        self._query_templates.invalidate_report(db_report.id)
+        self._report_definitions.invalidate_report(db_report.id)
+        self._filter_options.invalidate_report(db_report.id)
+        self._time_buckets.invalidate_report(db_report.id)
         return True
 
 
@@ -999,17 +1261,17 @@ class ReportsService:
 
 
     # Query Execution
+    _DANGEROUS_SQL_PATTERNS = [
+        r'\b(DROP|DELETE|TRUNCATE|INSERT|UPDATE|ALTER|CREATE|GRANT|REVOKE)\b',
+        r';[\s]*(?:DROP|DELETE|TRUNCATE|INSERT|UPDATE|ALTER|CREATE|GRANT|REVOKE)',
+        r'/\*.*?\*/',  # Multi-line comments
+    ]
+
     def sanitize_sql_query(self, query: str) -> str:
         """Basic SQL injection protection and query sanitization"""
-        dangerous_patterns = [
-            r'\b(DROP|DELETE|TRUNCATE|INSERT|UPDATE|ALTER|CREATE|GRANT|REVOKE)\b',
-            r';[\s]*(?:DROP|DELETE|TRUNCATE|INSERT|UPDATE|ALTER|CREATE|GRANT|REVOKE)',
-            r'/\*.*?\*/',  # Multi-line comments
-        ]
-
         sanitized_query = query.strip()
 
-        for pattern in dangerous_patterns:
+        for pattern in self._DANGEROUS_SQL_PATTERNS:
             if re.search(pattern, sanitized_query, re.IGNORECASE):
                 raise ValueError(f"Query contains potentially dangerous SQL: {pattern}")
 
@@ -1019,7 +1281,18 @@ class ReportsService:
 
         return sanitized_query
 
-    def apply_filters_to_query(self, sql: str, filters: list[ReportQueryFilter], filter_values: list[FilterValue], db_type: str = "clickhouse") -> str:
+    def sanitize_sql_fragment(self, fragment: str) -> None:
+        """Check SQL rendered into an already sanitized template (e.g. the sort column)
+
+        Comment markers are rejected outright since a comment could span the fragment and the template.
+        """
+        for pattern in self._DANGEROUS_SQL_PATTERNS:
+            if re.search(pattern, fragment, re.IGNORECASE):
+                raise ValueError(f"Query contains potentially dangerous SQL: {pattern}")
+        if "/*" in fragment or "*/" in fragment:
+            raise ValueError("Query contains potentially dangerous SQL: comment marker in filter value")
+
+    def apply_filters_to_query(self, sql: str, filters: list[ReportQueryFilter], filter_values: list[FilterValue], db_type: str = "clickhouse") -> tuple[str, QueryParams]:
         """Apply filter values to a SQL query by replacing {{dynamic_filters}} placeholder
 
         Args:
@@ -1027,135 +1300,17 @@ class ReportsService:
             filters: List of filter configurations
             filter_values: List of filter values to apply
             db_type: Database type ('clickhouse', 'postgresql', 'mssql')
-        """
-        # Handle empty or None filter_values
-        if not filter_values:
-            # If no filter values provided, just remove the placeholder
-            if "{{dynamic_filters}}" in sql:
-                sql = sql.replace("{{dynamic_filters}}", "")
-            return sql
-
-        # Create a mapping of field names to values
-        filter_map = {fv.field_name: fv for fv in filter_values}
-
-        # Build WHERE conditions
-        conditions = []
-
-        for db_filter in filters:
-            if db_filter.field_name not in filter_map:
-                if db_filter.required:
-                    raise ValueError(f"Required filter '{db_filter.display_name}' is missing")
-                continue
-
-            filter_value = filter_map[db_filter.field_name]
-
-            if filter_value.value is None or filter_value.value == "":
-                continue
 
-            # Use sql_expression if provided, otherwise use field_name
-            field_expression = db_filter.sql_expression if db_filter.sql_expression else db_filter.field_name
-
-            # Auto-quote field names that need quoting for PostgreSQL (unless already quoted or using sql_expression)
-            if not db_filter.sql_expression:
-                if not (field_expression.startswith('"') and field_expression.endswith('"')):
-                    # Check if field needs quoting (contains uppercase, spaces, or special chars)
-                    if not field_expression.islower() or ' ' in field_expression or not field_expression.replace('_', '').isalnum():
-                        field_expression = f'"{field_expression}"'
-
-            value = filter_value.value
-            operator = filter_value.operator or "="
-
-            if db_filter.filter_type == "text":
-                # Check if value is a list (from pasted multiselect)
-                if isinstance(value, list):
-                    # Treat as IN clause for multiple values
-                    quoted_values = [f"'{v}'" for v in value]
-                    conditions.append(f"{field_expression} IN ({','.join(quoted_values)})")
-                else:
-                    # For text filters, use different operators based on the filter condition
-                    # Use CAST for quoted identifiers to ensure LOWER works properly
-                    field_expr = f"LOWER(CAST({field_expression} AS TEXT))" if field_expression.startswith('"') and field_expression.endswith('"') else f"LOWER({field_expression})"
-                    value_expr = f"LOWER('{value}')"
-
-                    if operator == "CONTAINS":
-                        conditions.append(f"{field_expr} LIKE LOWER('%{value}%')")
-                    elif operator == "NOT_CONTAINS":
-                        conditions.append(f"{field_expr} NOT LIKE LOWER('%{value}%')")
-                    elif operator == "STARTS_WITH":
-                        conditions.append(f"{field_expr} LIKE LOWER('{value}%')")
-                    elif operator == "ENDS_WITH":
-                        conditions.append(f"{field_expr} LIKE LOWER('%{value}')")
-                    elif operator == "=":
-                        conditions.append(f"{field_expr} = {value_expr}")
-                    elif operator == "NOT_EQUALS":
-                        conditions.append(f"{field_expr} != {value_expr}")
-                    else:
-                        # Default to CONTAINS for backward compatibility
-                        conditions.append(f"{field_expr} LIKE LOWER('%{value}%')")
-            elif db_filter.filter_type == "number":
-                # Check if value is a list (from pasted multiselect)
-                if isinstance(value, list):
-                    # Treat as IN clause for multiple values
-                    conditions.append(f"{field_expression} IN ({','.join(str(v) for v in value)})")
-                else:
-                    # For number filters, support =, !=, >, <, >=, <=, NOT_EQUALS
-                    if operator == "NOT_EQUALS":
-                        conditions.append(f"{field_expression} != {value}")
-                    elif operator in ["=", "!=", ">", "<", ">=", "<="]:
-                        conditions.append(f"{field_expression} {operator} {value}")
-                    else:
-                        # Default to equals for backward compatibility
-                        conditions.append(f"{field_expression} = {value}")
-            elif db_filter.filter_type == "date":
-                # Use database-specific date functions
-                if db_type.lower() == "clickhouse":
-                    date_func = "toDate"
-                elif db_type.lower() in ["postgresql", "mssql"]:
-                    date_func = "DATE"
-                else:
-                    date_func = "DATE"  # Default to standard SQL
-
-                if operator == "BETWEEN" and isinstance(value, list) and len(value) == 2:
-                    # For timestamp fields, we need to compare dates properly
-                    condition = f"{date_func}({field_expression}) BETWEEN {date_func}('{value[0]}') AND {date_func}('{value[1]}')"
-                    conditions.append(condition)
-                elif operator == ">=":
-                    condition = f"{date_func}({field_expression}) >= {date_func}('{value}')"
-                    conditions.append(condition)
-                elif operator == "<=":
-                    condition = f"{date_func}({field_expression}) <= {date_func}('{value}')"
-                    conditions.append(condition)
-                else:
-                    condition = f"{date_func}({field_expression}) {operator} {date_func}('{value}')"
-                    conditions.append(condition)
-            elif db_filter.filter_type in ["dropdown", "multiselect"]:
-                if isinstance(value, list) and len(value) > 0:
-                    quoted_values = [f"'{v}'" for v in value]
-                    conditions.append(f"{field_expression} IN ({','.join(quoted_values)})")
-                elif not isinstance(value, list) and value:
-                    conditions.append(f"{field_expression} = '{value}'")
-
-        # Replace {{dynamic_filters}} placeholder with actual filter conditions
-        if "{{dynamic_filters}}" in sql:
-            if conditions:
-                filter_clause = " AND " + " AND ".join(conditions)
-                sql = sql.replace("{{dynamic_filters}}", filter_clause)
-            else:
-                # Remove the placeholder if no filters are applied
-                sql = sql.replace("{{dynamic_filters}}", "")
-        elif conditions:
-            where_clause = " AND ".join(conditions)
-            if "WHERE" in sql.upper():
-                sql = sql + f" AND ({where_clause})"
-            else:
-                sql = sql + f" WHERE {where_clause}"
-
-        return sql
+        Returns:
+            (sql, params): the parameterized statement and its parameter map (see sql_params.bind_params)
+        """
+        template = CompiledQueryTemplate(sql, [CompiledFilter.from_definition(f) for f in filters])
+        params = QueryParams()
+        sql, _ = template.render_filters(filter_values, db_type, params)
+        return sql, params
 
     def apply_sorting_to_query(self, sql: str, sort_by: str, sort_direction: str) -> str:
         """Apply sorting to SQL query, overriding any existing ORDER BY clause"""
-        import re
-
         # Validate inputs
         if not sort_by or not sort_by.strip():
             raise ValueError("sort_by cannot be empty")
@@ -1177,6 +1332,7 @@ class ReportsService:
         for danger in dangerous_chars:
             if danger in sort_by_upper:
                 raise ValueError(f"Invalid column name: {sort_by}. Contains potentially dangerous SQL.")
+        self.sanitize_sql_fragment(sort_by)
 
         # Auto-quote field names that need quoting for PostgreSQL (unless already quoted)
         if not (sort_by.startswith('"') and sort_by.endswith('"')):
@@ -1186,15 +1342,454 @@ class ReportsService:
                 sort_by = f'"{sort_by}"'
 
         # Remove existing ORDER BY clause (case insensitive)
-        # This regex matches ORDER BY followed by any characters until the end or LIMIT
-        sql_without_order = re.sub(r'\s+ORDER\s+BY\s+.*?(?=\s+LIMIT\s+|\s*$)', '', sql, flags=re.IGNORECASE)
+        sql_without_order = self.strip_order_by(sql)
 
         # Add new ORDER BY clause
         new_sql = f"{sql_without_order} ORDER BY {sort_by} {sort_direction.upper()}"
 
         return new_sql
 
-    async def execute_query(self, query: ReportQuery, filter_values: list[FilterValue] = None, limit: int = 1000, page_size: int = None, page_limit: int = None, sort_by: str = None, sort_direction: str = None, visualization_type: str = None, platform: Platform | None = None, global_filters: list[dict[str, Any]] = None, db_config: dict[str, Any] | None = None, filter_by_department: bool = False, user_department: str | None = None, department_filter_level: str | None = None, filter_by_step_department: bool = False) -> QueryExecutionResult:
+    def strip_order_by(self, sql: str) -> str:
+        """Remove a trailing ORDER BY clause (up to LIMIT or the end of the query)"""
+        return re.sub(r'\s+ORDER\s+BY\s+.*?(?=\s+LIMIT\s+|\s*$)', '', sql, flags=re.IGNORECASE)
+
+    def apply_limit_to_query(self, sql: str, db_type: str, limit: int = 1000, page_size: int | None = None, page_limit: int | None = None, visualization_type: str | None = None) -> str:
+        """Add pagination or the table row limit to a sanitized query using the database's syntax
+
+        Paginated queries fetch page_size + 1 rows so has_more can be determined
+        without a COUNT query.
+        """
+        if page_size is not None and page_limit is not None:
+            # Calculate offset (page_limit is 1-based)
+            offset = (page_limit - 1) * page_size
+            if db_type == "mssql":
+                # MSSQL uses OFFSET/FETCH syntax
+                return f"{sql} OFFSET {offset} ROWS FETCH NEXT {page_size + 1} ROWS ONLY"
+            return f"{sql} LIMIT {page_size + 1} OFFSET {offset}"
+
+        # Add limit only for table visualizations (non-paginated query)
+        if visualization_type != 'table':
+            return sql
+        if db_type == "mssql":
+            if 'TOP' not in sql.upper() and 'LIMIT' not in sql.upper():
+                # MSSQL uses TOP instead of LIMIT
+                return sql.replace("SELECT", f"SELECT TOP {limit}", 1)
+            return sql
+        if 'LIMIT' not in sql.upper():
+            return f"{sql} LIMIT {limit}"
+        return sql
+
+    def _get_db_target_key(self, db_type: str, db_config: dict[str, Any] | None = None, platform: Platform | None = None) -> str:
+        """Identify the database a query runs against (same keys as the connection pools)"""
+        if db_config:
+            return self._connection_pool._get_pool_key(db_config, db_type)
+        if platform:
+            return self._connection_pool._get_pool_key(platform.db_config or {}, db_type, platform.id)
+        return f"{db_type}_default"
+
+    def _admission_limit(self, db_config: dict[str, Any] | None = None, platform: Platform | None = None) -> int | None:
+        """Per-target query concurrency configured as max_concurrent_queries in the report's or platform's db_config"""
+        if db_config:
+            return AdmissionController.limit_from_config(db_config)
+        if platform:
+            return AdmissionController.limit_from_config(platform.db_config)
+        return None
+
+    def _get_clickhouse_pool_args(self, db_config: dict[str, Any] | None = None, platform: Platform | None = None) -> dict[str, Any]:
+        """Connection pool arguments for a ClickHouse query (report db_config, platform, or the default server)"""
+        if db_config:
+            return {"db_config": db_config}
+        if platform:
+            return {"platform": platform}
+        return {"db_config": self._connection_pool.default_clickhouse_config()}
+
+    async def _on_read_replica(self, db_type: str, db_config: dict[str, Any] | None, platform: Platform | None, run: Callable[[dict[str, Any] | None, Platform | None], Awaitable[Any]], *, read_only: bool) -> Any:
+        """Call run(db_config, platform) for a healthy read replica of the target, or for the target itself
+
+        Only statements that are read_only (see read_replicas.is_read_only) may go to a replica. A replica
+        that cannot be reached is marked down and the read is retried on the primary.
+        """
+        replica = self._replicas.choose(db_type, db_config, platform) if read_only and db_type in REPLICA_DB_TYPES else None
+        if replica is not None:
+            try:
+                return await run(replica.db_config, None)
+            except Exception as e:
+                if not is_connection_error(e):
+                    raise
+                self._replicas.mark_failed(replica, e)
+                print(f"[REPLICA] {replica.name} unreachable, reading from the primary: {e}")
+        return await run(db_config, platform)
+
+    async def _execute_sql(self, db_type: str, sql: str, db_config: dict[str, Any] | None = None, platform: Platform | None = None, params: dict[str, Any] | None = None, max_execution_time: int | None = None, clickhouse_settings: dict[str, Any] | None = None) -> tuple[list[str], list]:
+        """Run a statement on the report's database (or one of its read replicas) and return (columns, rows)
+
+        params are the statement's bind parameters (see sql_params), bound in the driver's placeholder style.
+        max_execution_time (seconds) is enforced by the database. Running queries are registered in the
+        request's cancel scope (see query_cancellation) so they stop when the client disconnects.
+        clickhouse_settings are the execution profile's settings (see execution_profiles).
+        """
+        return await self._on_read_replica(
+            db_type, db_config, platform,
+            lambda target_config, target_platform: self._execute_on_target(db_type, sql, target_config, target_platform, params, max_execution_time, clickhouse_settings),
+            read_only=is_read_only(sql)
+        )
+
+    async def _execute_on_target(self, db_type: str, sql: str, db_config: dict[str, Any] | None, platform: Platform | None, params: dict[str, Any] | None, max_execution_time: int | None, clickhouse_settings: dict[str, Any] | None) -> tuple[list[str], list]:
+        """Run a statement on exactly the given database target (see _execute_sql)"""
+        if db_type == "clickhouse":
+            pool_args = self._get_clickhouse_pool_args(db_config, platform)
+            bound_sql, args = bind_params(sql, params, "clickhouse")
+            # Tag the query so it can be killed by id if the client goes away
+            query_id = uuid.uuid4().hex
+            # The resolved time limit replaces the profile's (0 = no limit)
+            query_settings = {k: v for k, v in (clickhouse_settings or {}).items() if k != "max_execution_time"}
+            if max_execution_time:
+                query_settings["max_execution_time"] = max_execution_time
+
+            def run_clickhouse():
+                # Checkout, execute and checkin all happen on the worker thread: if the request is
+                # cancelled, the thread keeps the client until the query has actually stopped
+                t1 = time.time()
+                # Check out a dedicated client so parallel queries don't share one connection
+                client = self._connection_pool.get_connection(db_type=db_type, **pool_args)
+                print(f"[PERF] ClickHouse get client: {(time.time() - t1) * 1000:.2f}ms")
+
+                client_failed = True
+                handle = None
+                try:
+                    handle = register_clickhouse_query(client, query_id)
+                    # Execute the query (paginated queries fetch page_size + 1 rows to detect more pages)
+                    t1 = time.time()
+                    result = client.execute(bound_sql, args, with_column_types=True, query_id=query_id, settings=query_settings or None)
+                    print(f"[PERF] ClickHouse execute query: {(time.time() - t1) * 1000:.2f}ms")
+                    client_failed = False
+                    return result
+                finally:
+                    unregister_query(handle)
+                    # A client that raised mid-query may have a broken protocol stream, don't reuse it
+                    self._connection_pool.return_connection(client, db_type=db_type, discard=client_failed, **pool_args)
+
+            # Run blocking operation in thread pool to not block event loop
+            result = await asyncio.to_thread(run_clickhouse)
+
+            # Process ClickHouse results
+            t1 = time.time()
+            if result and len(result) > 0:
+                columns = [col[0] for col in result[1]] if len(result) > 1 else []
+                data = result[0] if result[0] else []
+            else:
+                columns = []
+                data = []
+            print(f"[PERF] Process ClickHouse results: {(time.time() - t1) * 1000:.2f}ms")
+
+        elif db_type == "postgresql":
+            # Native asyncio path: connect, execute, fetch and release without executor hops.
+            # Cancelling the awaiting task makes asyncpg send a cancel request for the running statement.
+            if not db_config and not platform:
+                raise ValueError("Database configuration required for PostgreSQL queries")
+            t1 = time.time()
+            pg_pool = await self._connection_pool.get_asyncpg_pool(db_config=db_config, platform=platform)
+            async with pg_pool.acquire(timeout=settings.ASYNCPG_POOL_ACQUIRE_TIMEOUT_SECONDS) as conn:
+                print(f"[PERF] PostgreSQL get connection: {(time.time() - t1) * 1000:.2f}ms")
+
+                # SET LOCAL scopes the server-side timeout to this read-only transaction
+                transaction = conn.transaction(readonly=True) if max_execution_time else contextlib.nullcontext()
+                async with transaction:
+                    if max_execution_time:
+                        await conn.execute(f"SET LOCAL statement_timeout = {int(max_execution_time) * 1000}")
+
+                    # Execute the query (paginated queries fetch page_size + 1 rows to detect more pages)
+                    t1 = time.time()
+                    bound_sql, args = bind_params(sql, params, "asyncpg")
+                    statement = await conn.prepare(bound_sql)
+                    columns = [attribute.name for attribute in statement.get_attributes()]
+                    data = await statement.fetch(*coerce_postgres_args(statement.get_parameters(), args or []))
+                    print(f"[PERF] PostgreSQL execute query: {(time.time() - t1) * 1000:.2f}ms")
+
+        elif db_type == "mssql":
+            # Use MSSQL connection - prioritize report's db_config
+            if db_config:
+                # Use report's db_config with connection pool
+                pool_args = {"db_config": db_config}
+            elif platform:
+                # Fallback to platform's connection pool
+                pool_args = {"platform": platform}
+            else:
+                raise ValueError("Database configuration required for MSSQL queries")
+            bound_sql, args = bind_params(sql, params, "pyodbc")
+
+            def run_mssql():
+                # Like ClickHouse, the worker thread owns the connection until the statement has stopped
+                conn = self._connection_pool.get_connection(db_type=db_type, **pool_args)
+                try:
+                    # Query timeout enforced by the driver (SQL_ATTR_QUERY_TIMEOUT), reset before checkin
+                    conn.timeout = int(max_execution_time) if max_execution_time else 0
+                    cursor = conn.cursor()
+                    handle = None
+                    try:
+                        handle = register_cursor(cursor)
+                        # Execute the query (paginated queries fetch page_size + 1 rows to detect more pages)
+                        cursor.execute(bound_sql, *(args or []))
+
+                        # Get columns and data
+                        columns = [column[0] for column in cursor.description] if cursor.description else []
+                        return columns, cursor.fetchall()
+                    finally:
+                        unregister_query(handle)
+                        cursor.close()
+                finally:
+                    conn.timeout = 0
+                    # Return connection to pool
+                    self._connection_pool.return_connection(conn, db_type=db_type, **pool_args)
+
+            # Run blocking operation in thread pool
+            columns, data = await asyncio.to_thread(run_mssql)
+        else:
+            raise ValueError(f"Unsupported database type: {db_type}")
+
+        return columns, data
+
+    async def check_query_cost(self, db_type: str, sql: str, db_config: dict[str, Any] | None = None, platform: Platform | None = None, params: dict[str, Any] | None = None) -> str | None:
+        """Compare a statement's planner estimate with its database's cost guard limits (see query_cost_guard)
+
+        Returns the reason in 'warn' mode, or None when the statement is within the limits, no limits are
+        configured or the plan could not be estimated.
+
+        Raises:
+            QueryCostExceededError: If the estimate exceeds the limits in 'reject' mode
+        """
+        limits = cost_limits(db_config or (platform.db_config if platform else None))
+        if not limits.active:
+            return None
+
+        cache_key = self._explain_cache.build_key(self._get_db_target_key(db_type, db_config, platform), sql, params=params or {})
+        estimate = self._explain_cache.get(cache_key)
+        if estimate is None:
+            t1 = time.time()
+            try:
+                estimate = await self._estimate_query_cost(db_type, sql, db_config, platform, params)
+            except Exception as e:
+                # Fail open: a plan the guard cannot read must not block the query
+                print(f"[COST] Could not estimate query cost, running unchecked: {e}")
+                estimate = CostEstimate(None, None)
+            self._explain_cache.set(cache_key, estimate, settings.REPORT_COST_GUARD_CACHE_TTL_SECONDS)
+            print(f"[PERF] Cost estimate (rows={estimate.rows}, cost={estimate.cost}): {(time.time() - t1) * 1000:.2f}ms")
+
+        problem = check_estimate(estimate, limits)
+        if problem and limits.mode == "reject":
+            raise QueryCostExceededError(problem)
+        return problem
+
+    async def _estimate_query_cost(self, db_type: str, sql: str, db_config: dict[str, Any] | None, platform: Platform | None, params: dict[str, Any] | None) -> CostEstimate:
+        """Planner estimate for a statement from the database's own EXPLAIN"""
+        if db_type == "clickhouse":
+            columns, rows = await self._execute_sql(db_type, f"EXPLAIN ESTIMATE {sql}", db_config, platform, params)
+            return parse_clickhouse_estimate(columns, rows)
+        if db_type == "postgresql":
+            _, rows = await self._execute_sql(db_type, f"EXPLAIN (FORMAT JSON) {sql}", db_config, platform, params)
+            return parse_postgres_plan(rows[0][0]) if rows else CostEstimate(None, None)
+        if db_type == "mssql":
+            showplan = await asyncio.to_thread(self._mssql_showplan, sql, db_config, platform, params)
+            return parse_showplan_xml(showplan) if showplan else CostEstimate(None, None)
+        return CostEstimate(None, None)
+
+    def _mssql_showplan(self, sql: str, db_config: dict[str, Any] | None, platform: Platform | None, params: dict[str, Any] | None) -> str | None:
+        """Estimated plan of a statement as SHOWPLAN_XML (runs on a worker thread; the statement is not executed)"""
+        rows = self._mssql_showplan_rows(sql, db_config, platform, params)
+        return rows[0][0] if rows else None
+
+    def _mssql_showplan_rows(self, sql: str, db_config: dict[str, Any] | None, platform: Platform | None, params: dict[str, Any] | None, showplan: str = "SHOWPLAN_XML", max_execution_time: int | None = None) -> list:
+        """Rows of a statement's estimated plan with SET SHOWPLAN_XML or SHOWPLAN_TEXT (runs on a worker thread)
+
+        Planning is registered in the request's cancel scope and limited to max_execution_time seconds, like a query.
+        """
+        if db_config:
+            pool_args = {"db_config": db_config}
+        elif platform:
+            pool_args = {"platform": platform}
+        else:
+            raise ValueError("Database configuration required for MSSQL queries")
+        bound_sql, args = bind_params(sql, params, "pyodbc")
+
+        conn = self._connection_pool.get_connection(db_type="mssql", **pool_args)
+        showplan_reset = False
+        try:
+            conn.timeout = int(max_execution_time) if max_execution_time else 0
+            cursor = conn.cursor()
+            handle = None
+            try:
+                handle = register_cursor(cursor)
+                cursor.execute(f"SET {showplan} ON")
+                try:
+                    cursor.execute(bound_sql, *(args or []))
+                    rows = cursor.fetchall()
+                finally:
+                    cursor.execute(f"SET {showplan} OFF")
+                    showplan_reset = True
+            finally:
+                unregister_query(handle)
+                cursor.close()
+        finally:
+            conn.timeout = 0
+            # Pooled connections must not keep SHOWPLAN on, drop the connection if it could not be reset
+            self._connection_pool.return_connection(conn, db_type="mssql", discard=not showplan_reset, **pool_args)
+        return rows
+
+    def _preview_slot(self, db_type: str, db_config: dict[str, Any] | None, platform: Platform | None, username: str | None):
+        """Slot on the target's preview gate (per-database and per-user limits, separate from report executions)"""
+        return self._preview_admission.admit(f"preview:{self._get_db_target_key(db_type, db_config, platform)}", username)
+
+    async def preview_query(self, sql: str, db_config: dict[str, Any] | None = None, platform: Platform | None = None, limit: int | None = None, username: str | None = None) -> tuple[str, list[str], list, str | None]:
+        """Run a sanitized ad-hoc statement for report authoring and return (db_type, columns, rows, cost_warning)
+
+        The statement is capped at limit rows (at most REPORT_PREVIEW_MAX_ROWS) in its SQL, runs through the
+        pooled, cancellable path of report queries with REPORT_PREVIEW_MAX_EXECUTION_TIME_SECONDS and the
+        heavy execution profile, and waits for a slot on the preview gate.
+        """
+        db_type = self._filter_db_type(db_config, platform)
+        max_rows = min(limit or settings.REPORT_PREVIEW_MAX_ROWS, settings.REPORT_PREVIEW_MAX_ROWS)
+        capped_sql = cap_rows(sql, db_type, max_rows)
+
+        # Reject (or flag) previews whose plan exceeds the database's cost guard limits
+        cost_warning = await self.check_query_cost(db_type, capped_sql, db_config, platform)
+        async with self._preview_slot(db_type, db_config, platform, username):
+            columns, rows = await self._execute_sql(
+                db_type, capped_sql, db_config, platform,
+                max_execution_time=settings.REPORT_PREVIEW_MAX_EXECUTION_TIME_SECONDS,
+                clickhouse_settings=profile_settings("heavy", db_config or (platform.db_config if platform else None))
+            )
+        # TOP only caps the first branch of an MSSQL UNION, and TOP n PERCENT is left as written
+        return db_type, columns, rows[:max_rows], cost_warning
+
+    async def validate_query_syntax(self, sql: str, db_config: dict[str, Any] | None = None, platform: Platform | None = None, username: str | None = None) -> tuple[str, list[list[Any]]]:
+        """Plan a sanitized statement without running it and return (db_type, plan rows)
+
+        Uses EXPLAIN (SHOWPLAN_TEXT on MSSQL) under the same time limit and preview gate as preview_query.
+        """
+        db_type = self._filter_db_type(db_config, platform)
+        async with self._preview_slot(db_type, db_config, platform, username):
+            if db_type == "mssql":
+                rows = await asyncio.to_thread(self._mssql_showplan_rows, sql, db_config, platform, None, "SHOWPLAN_TEXT", settings.REPORT_PREVIEW_MAX_EXECUTION_TIME_SECONDS)
+            else:
+                _, rows = await self._execute_sql(db_type, f"EXPLAIN {sql}", db_config, platform, max_execution_time=settings.REPORT_PREVIEW_MAX_EXECUTION_TIME_SECONDS)
+        return db_type, [list(row) for row in rows]
+
+    async def _count_rows(self, db_type: str, sql: str, db_config: dict[str, Any] | None, platform: Platform | None, ttl: int, report_id: int | None, params: dict[str, Any] | None = None, max_execution_time: int | None = None, clickhouse_settings: dict[str, Any] | None = None) -> int:
+        """COUNT(*) of a filtered query, cached per database target, SQL and parameters so it runs once per filter set"""
+        count_sql = f"SELECT COUNT(*) FROM ({sql}) AS count_subquery"
+        cache_key = self._result_cache.build_key(self._get_db_target_key(db_type, db_config, platform), count_sql, params=params or {})
+        if ttl > 0:
+            cached_total = self._result_cache.get(cache_key)
+            if cached_total is not None:
+                return cached_total
+
+        _, rows = await self._execute_sql(db_type, count_sql, db_config, platform, params, max_execution_time, clickhouse_settings)
+        total = int(rows[0][0]) if rows and rows[0] else 0
+        if ttl > 0:
+            self._result_cache.set(cache_key, total, ttl, report_id=report_id)
+        return total
+
+    def _get_query_template(self, query: ReportQuery, global_filters: list[dict[str, Any]] | None = None) -> CompiledQueryTemplate:
+        """Compiled template for a query's SQL and filters, parsed once per query version (see query_templates)"""
+        cache_key = template_cache_key(query, global_filters)
+        template = self._query_templates.get(cache_key) if cache_key else None
+        if template is None:
+            filters = [CompiledFilter.from_definition(f) for f in query.filters]
+            filters.extend(CompiledFilter.from_global_filter(gf) for gf in global_filters or [])
+            template = CompiledQueryTemplate(query.sql.strip(), filters)
+            try:
+                self.sanitize_sql_query(template.base_sql)
+            except ValueError as e:
+                template.sanitize_error = str(e)
+            if cache_key:
+                self._query_templates.set(cache_key, template, settings.QUERY_TEMPLATE_CACHE_TTL_SECONDS, report_id=query.report_id)
+
+        if template.sanitize_error:
+            raise ValueError(template.sanitize_error)
+        return template
+
+    def build_filtered_sql(self, query: ReportQuery, filter_values: list[FilterValue], db_type: str, global_filters: list[dict[str, Any]] | None = None, filter_by_department: bool = False, user_department: str | None = None, department_filter_level: str | None = None, filter_by_step_department: bool = False) -> tuple[str, QueryParams]:
+        """Apply report/global filters and department filtering to a query's SQL (no sorting or limit)
+
+        The static SQL is sanitized once when its template is compiled, and filter values and the
+        department are bound as parameters rather than written into the SQL, so the result is sanitized.
+
+        Returns:
+            (sql, params): the parameterized statement and its parameter map
+        """
+        t1 = time.time()
+        template = self._get_query_template(query, global_filters)
+        params = QueryParams()
+
+        # Always apply filters (even if empty) to handle {{dynamic_filters}} placeholder
+        sql, _ = template.render_filters(filter_values or [], db_type, params)
+
+        # Apply department filtering if enabled
+        if filter_by_department and user_department:
+            dept_filter_clause = self._department_filter_clause(db_type, user_department, params, department_filter_level, filter_by_step_department)
+            sql = template.add_condition(sql, dept_filter_clause)
+        print(f"[PERF] Apply filters: {(time.time() - t1) * 1000:.2f}ms")
+
+        return sql, params
+
+    def _department_filter_clause(self, db_type: str, user_department: str, params: QueryParams, department_filter_level: str | None = None, filter_by_step_department: bool = False) -> str:
+        """SQL condition restricting rows to the user's department hierarchy (department prefixes are bound into params)"""
+        # Determine which column to filter by
+        column_name = "step_department" if filter_by_step_department else "department"
+
+        # Inject department filter into the query based on the selected hierarchy level
+        # Department structure: A_B_C_D_E where:
+        # - A is root
+        # - B is Sektör (sector)
+        # - C is Direktörlük (directorate)
+        # - D is Müdürlük (department)
+        # - E is Birim (unit)
+
+        dept_parts = user_department.split('_')
+
+        # Determine which department level to filter by
+        if department_filter_level:
+            # Map level names to position in hierarchy (0-indexed)
+            level_map = {
+                'sektor': 2,        # A_B (up to position 2)
+                'direktorluk': 3,   # A_B_C (up to position 3)
+                'mudurluk': 4,      # A_B_C_D (up to position 4)
+                'birim': 5          # A_B_C_D_E (up to position 5, or full)
+            }
+
+            level_position = level_map.get(department_filter_level.lower())
+
+            if level_position and len(dept_parts) >= level_position:
+                # Get the department up to the specified level
+                filtered_dept = '_'.join(dept_parts[:level_position])
+            else:
+                # If level not recognized or user doesn't have that level, use full department
+                filtered_dept = user_department
+        else:
+            # No level specified, use full user department hierarchy
+            # Build list of all parent departments for flexible matching
+            dept_hierarchy = []
+            current = ""
+            for part in dept_parts:
+                current = f"{current}_{part}" if current else part
+                dept_hierarchy.append(current)
+            filtered_dept = None  # Will use hierarchy list instead
+
+        # Create SQL condition - uses the selected column name (department or step_department)
+        if filtered_dept:
+            # Single level filtering - match column that starts with the specified level
+            dept_filter_clause = f"{column_name} LIKE {params.add(f'{filtered_dept}%')}"
+        else:
+            # Full hierarchy filtering - match any parent level
+            dept_conditions = []
+            for dept in dept_hierarchy:
+                dept_conditions.append(f"{column_name} LIKE {params.add(f'{dept}%')}")
+            dept_filter_clause = " OR ".join(dept_conditions)
+
+        return dept_filter_clause
+
+    @record_query_telemetry
+    async def execute_query(self, query: ReportQuery, filter_values: list[FilterValue] = None, limit: int = 1000, page_size: int = None, page_limit: int = None, sort_by: str = None, sort_direction: str = None, visualization_type: str = None, platform: Platform | None = None, global_filters: list[dict[str, Any]] = None, db_config: dict[str, Any] | None = None, filter_by_department: bool = False, user_department: str | None = None, department_filter_level: str | None = None, filter_by_step_department: bool = False, cache_ttl_seconds: int | None = None, pagination_mode: str | None = None, cursor: str | None = None, tiebreaker: str | None = None, username: str | None = None, max_execution_time: int | None = None, target_points: int | None = None, check_cost: bool = True, execution_profile: str | None = None) -> QueryExecutionResult:
         """Execute a single query with optional filters
 
         Args:
@@ -1213,6 +1808,14 @@ class ReportsService:
             user_department: User's department for automatic filtering
             department_filter_level: Department hierarchy level to filter by ('sektor', 'direktorluk', 'mudurluk', 'birim', or None for full)
             filter_by_step_department: If True, filter by step_department column instead of department column
+            cache_ttl_seconds: Result cache TTL for this query (None = server default, 0 = do not cache)
+            max_execution_time: Server-enforced time limit in seconds (None = server default, 0 = no limit)
+            pagination_mode: 'offset' (default, uses page_limit) or 'keyset' (uses cursor, see keyset_pagination)
+            cursor: Keyset cursor returned as next_cursor by the previous page
+            tiebreaker: Unique column appended to sort_by for keyset ordering (defaults to sort_by alone)
+            target_points: Points to downsample line/area charts to, when their visualization opts in (see downsampling)
+            check_cost: Run the EXPLAIN cost guard before executing (see check_query_cost)
+            execution_profile: ClickHouse settings profile (see execution_profiles; defaults to interactive)
         """
         t0 = time.time()
         print(f"\n[PERF] Starting execute_query for query_id={query.id}")
@@ -1230,119 +1833,38 @@ class ReportsService:
                 raise ValueError("Database client not available")
         print(f"[PERF] DB type determination: {(time.time() - t1) * 1000:.2f}ms")
 
-        try:
-            # Get the base SQL
-            t1 = time.time()
-            sql = query.sql
-            print(f"[PERF] Get base SQL: {(time.time() - t1) * 1000:.2f}ms")
-
-            # Merge global filters with query-specific filters
-            t1 = time.time()
-            all_filters = list(query.filters)
-            if global_filters:
-                # Convert global filters dict to ReportQueryFilter objects for processing
-                for gf in global_filters:
-                    # Create a pseudo-filter object that matches ReportQueryFilter structure
-                    filter_obj = type('obj', (object,), {
-                        'field_name': gf.get('fieldName'),
-                        'display_name': gf.get('displayName'),
-                        'filter_type': gf.get('type'),
-                        'dropdown_query': gf.get('dropdownQuery'),
-                        'required': gf.get('required', False),
-                        'sql_expression': gf.get('sqlExpression'),
-                        'depends_on': gf.get('dependsOn')
-                    })()
-                    all_filters.append(filter_obj)
-            print(f"[PERF] Merge global filters: {(time.time() - t1) * 1000:.2f}ms")
-
-            # Always apply filters (even if empty) to handle {{dynamic_filters}} placeholder
-            t1 = time.time()
-            sql = self.apply_filters_to_query(sql, all_filters, filter_values or [], db_type)
-            print(f"[PERF] Apply filters: {(time.time() - t1) * 1000:.2f}ms")
+        # Filled in as the query runs and recorded by record_query_telemetry (see query_telemetry)
+        stats = current_query_stats.get()
+        if stats is not None:
+            stats.db_type = db_type
+            stats.platform = platform.code if platform else None
+            stats.username = username
 
-            # Apply department filtering if enabled
-            t1 = time.time()
-            if filter_by_department and user_department:
-                # Determine which column to filter by
-                column_name = "step_department" if filter_by_step_department else "department"
-                
-                # Inject department filter into the query based on the selected hierarchy level
-                # Department structure: A_B_C_D_E where:
-                # - A is root
-                # - B is Sektör (sector)
-                # - C is Direktörlük (directorate)
-                # - D is Müdürlük (department)
-                # - E is Birim (unit)
-                
-                dept_parts = user_department.split('_')
-                
-                # Determine which department level to filter by
-                if department_filter_level:
-                    # Map level names to position in hierarchy (0-indexed)
-                    level_map = {
-                        'sektor': 2,        # A_B (up to position 2)
-                        'direktorluk': 3,   # A_B_C (up to position 3)
-                        'mudurluk': 4,      # A_B_C_D (up to position 4)
-                        'birim': 5          # A_B_C_D_E (up to position 5, or full)
-                    }
-                    
-                    level_position = level_map.get(department_filter_level.lower())
-                    
-                    if level_position and len(dept_parts) >= level_position:
-                        # Get the department up to the specified level
-                        filtered_dept = '_'.join(dept_parts[:level_position])
-                    else:
-                        # If level not recognized or user doesn't have that level, use full department
-                        filtered_dept = user_department
-                else:
-                    # No level specified, use full user department hierarchy
-                    # Build list of all parent departments for flexible matching
-                    dept_hierarchy = []
-                    current = ""
-                    for part in dept_parts:
-                        current = f"{current}_{part}" if current else part
-                        dept_hierarchy.append(current)
-                    filtered_dept = None  # Will use hierarchy list instead
-                
-                # Create SQL condition - uses the selected column name (department or step_department)
-                if filtered_dept:
-                    # Single level filtering - match column that starts with the specified level
-                    if db_type.lower() in ["postgresql", "mssql"]:
-                        dept_filter_clause = f"{column_name} LIKE '{filtered_dept}%'"
-                    else:
-                        # ClickHouse uses LIKE
-                        dept_filter_clause = f"{column_name} LIKE '{filtered_dept}%'"
-                else:
-                    # Full hierarchy filtering - match any parent level
-                    dept_conditions = []
-                    for dept in dept_hierarchy:
-                        if db_type.lower() in ["postgresql", "mssql"]:
-                            dept_conditions.append(f"{column_name} LIKE '{dept}%'")
-                        else:
-                            dept_conditions.append(f"{column_name} LIKE '{dept}%'")
-                    dept_filter_clause = " OR ".join(dept_conditions)
-                
-                # Inject the department filter into the query
-                if "WHERE" in sql.upper():
-                    # If there's already a WHERE clause, add the department filter with AND
-                    sql = sql + f" AND ({dept_filter_clause})"
-                else:
-                    # If no WHERE clause exists, add one
-                    # We need to be careful here - check if there's a GROUP BY, ORDER BY, or LIMIT
-                    import re
-                    # Find position to insert WHERE clause (before GROUP BY, HAVING, ORDER BY, or LIMIT)
-                    match = re.search(r'\s+(GROUP\s+BY|HAVING|ORDER\s+BY|LIMIT)\s+', sql, re.IGNORECASE)
-                    if match:
-                        insert_pos = match.start()
-                        sql = sql[:insert_pos] + f" WHERE ({dept_filter_clause})" + sql[insert_pos:]
-                    else:
-                        # No GROUP BY, ORDER BY, or LIMIT - just append
-                        sql = sql + f" WHERE ({dept_filter_clause})"
-            print(f"[PERF] Apply department filter: {(time.time() - t1) * 1000:.2f}ms")
+        try:
+            # Apply report, global and department filters to the base SQL
+            sql, params = self.build_filtered_sql(
+                query, filter_values or [], db_type,
+                global_filters=global_filters,
+                filter_by_department=filter_by_department,
+                user_department=user_department,
+                department_filter_level=department_filter_level,
+                filter_by_step_department=filter_by_step_department
+            )
 
-            # Apply sorting if provided
+            keyset = pagination_mode == "keyset"
+            if keyset:
+                if not page_size:
+                    raise ValueError("Keyset pagination requires page_size")
+                keyset_direction = (sort_direction or "asc").strip().lower()
+                if keyset_direction not in ("asc", "desc"):
+                    raise ValueError(f"Invalid sort direction: {keyset_direction}. Must be 'asc' or 'desc'")
+                order_columns = list(dict.fromkeys(c.strip() for c in (sort_by, tiebreaker) if c and c.strip()))
+                if not order_columns:
+                    raise ValueError("Keyset pagination requires sort_by or tiebreaker")
+
+            # Apply sorting if provided (keyset pagination builds its own ORDER BY)
             t1 = time.time()
-            if sort_by and sort_direction:
+            if sort_by and sort_direction and not keyset:
                 try:
                     sql = self.apply_sorting_to_query(sql, sort_by, sort_direction)
                 except ValueError as e:
@@ -1358,196 +1880,178 @@ class ReportsService:
                     )
             print(f"[PERF] Apply sorting: {(time.time() - t1) * 1000:.2f}ms")
 
-            # Sanitize the query
-            t1 = time.time()
-            sanitized_sql = self.sanitize_sql_query(sql)
-            print(f"[PERF] Sanitize SQL: {(time.time() - t1) * 1000:.2f}ms")
-
-            start_time = time.time()
-            total_rows = 0
-
-            # Execute based on database type
-            if db_type == "clickhouse":
-                # Use ClickHouse client (existing logic)
-                if not self.clickhouse_client:
-                    raise ValueError("ClickHouse client not available")
-
-                # Handle pagination if both page_size and page_limit are provided
-                if page_size is not None and page_limit is not None:
-                    # First, get the total count for pagination info
-                    t1 = time.time()
-                    count_sql = f"SELECT COUNT(*) FROM ({sanitized_sql}) AS subquery"
-                    # Run blocking operation in thread pool to not block event loop
-                    count_result = await asyncio.to_thread(self.clickhouse_client.execute, count_sql)
-                    total_rows = count_result[0][0] if count_result and count_result[0] else 0
-                    print(f"[PERF] ClickHouse count query: {(time.time() - t1) * 1000:.2f}ms")
-
-                    # Calculate offset (page_limit is 1-based)
-                    offset = (page_limit - 1) * page_size
-
-                    # Add pagination to the main query
-                    t1 = time.time()
-                    paginated_sql = f"{sanitized_sql} LIMIT {page_size} OFFSET {offset}"
-                    # Run blocking operation in thread pool to not block event loop
-                    result = await asyncio.to_thread(self.clickhouse_client.execute, paginated_sql, with_column_types=True)
-                    print(f"[PERF] ClickHouse paginated query: {(time.time() - t1) * 1000:.2f}ms")
-                else:
-                    # Add limit only for table visualizations (non-paginated query)
-                    if visualization_type == 'table' and 'LIMIT' not in sanitized_sql.upper():
-                        sanitized_sql = f"{sanitized_sql} LIMIT {limit}"
-
-                    # Execute the query
-                    t1 = time.time()
-                    # Run blocking operation in thread pool to not block event loop
-                    result = await asyncio.to_thread(self.clickhouse_client.execute, sanitized_sql, with_column_types=True)
-                    print(f"[PERF] ClickHouse execute query: {(time.time() - t1) * 1000:.2f}ms")
-
-                # Process ClickHouse results
-                t1 = time.time()
-                if result and len(result) > 0:
-                    columns = [col[0] for col in result[1]] if len(result) > 1 else []
-                    data = result[0] if result[0] else []
-                else:
-                    columns = []
-                    data = []
-                print(f"[PERF] Process ClickHouse results: {(time.time() - t1) * 1000:.2f}ms")
+            # build_filtered_sql and apply_sorting_to_query only produce sanitized SQL
+            sanitized_sql = sql
 
-            elif db_type == "postgresql":
-                # Use PostgreSQL connection - prioritize report's db_config
-                t1 = time.time()
-                if db_config:
-                    # Use report's db_config with connection pool
-                    conn = await asyncio.to_thread(self._connection_pool.get_connection, db_config=db_config, db_type=db_type)
-                elif platform:
-                    # Fallback to platform's connection pool
-                    conn = await asyncio.to_thread(self._connection_pool.get_connection, platform=platform, db_type=db_type)
-                else:
-                    raise ValueError("Database configuration required for PostgreSQL queries")
-                cursor = conn.cursor()
-                print(f"[PERF] PostgreSQL get connection: {(time.time() - t1) * 1000:.2f}ms")
-
-                try:
-                    # Handle pagination if both page_size and page_limit are provided
-                    if page_size is not None and page_limit is not None:
-                        # Calculate offset (page_limit is 1-based)
-                        offset = (page_limit - 1) * page_size
-
-                        # Fetch page_size + 1 rows to check if there are more pages (no COUNT needed)
-                        t1 = time.time()
-                        paginated_sql = f"{sanitized_sql} LIMIT {page_size + 1} OFFSET {offset}"
-                        # Run blocking operation in thread pool
-                        await asyncio.to_thread(cursor.execute, paginated_sql)
-                        print(f"[PERF] PostgreSQL paginated query: {(time.time() - t1) * 1000:.2f}ms")
+            # Build the exact statement that will be sent to the database (pagination / row limit)
+            if keyset:
+                keyset_sql = self.strip_order_by(sanitized_sql).rstrip().rstrip(';')
+                fingerprint = keyset_fingerprint(keyset_sql, order_columns, keyset_direction, params)
+                after_values, keyset_total = decode_cursor(cursor, fingerprint) if cursor else (None, None)
+                final_sql = build_keyset_query(keyset_sql, db_type, order_columns, keyset_direction, page_size, after_values)
+            else:
+                final_sql = self.apply_limit_to_query(sanitized_sql, db_type, limit, page_size, page_limit, visualization_type)
+
+            # Line/area charts that opt in get fewer points than the SQL returns (never paginated results)
+            paginated = page_size is not None and (page_limit is not None or keyset)
+            downsample = None if paginated else downsampling_spec(query.visualization_config, target_points)
+
+            # Sliding date ranges only query the buckets missing from the bucket cache (see time_buckets)
+            incremental = None
+            spec = None if paginated or keyset or (sort_by and sort_direction) else incremental_spec(query.visualization_config)
+            window = requested_range(filter_values, spec) if spec else None
+            # filter_field has to be a date filter of the query or one of the report's global filters
+            if window and any(f.field_name == spec.filter_field and f.filter_type == "date" for f in self._get_query_template(query, global_filters).filters):
+                def render_range(start: date, end: date | None) -> tuple[str, QueryParams]:
+                    range_filters = [fv for fv in filter_values if fv.field_name != spec.filter_field]
+                    if end is None:
+                        range_filters.append(FilterValue(field_name=spec.filter_field, value=start.isoformat(), operator=">="))
                     else:
-                        # Add limit only for table visualizations (non-paginated query)
-                        if visualization_type == 'table' and 'LIMIT' not in sanitized_sql.upper():
-                            sanitized_sql = f"{sanitized_sql} LIMIT {limit}"
-
-                        # Execute the query
-                        t1 = time.time()
-                        # Run blocking operation in thread pool
-                        await asyncio.to_thread(cursor.execute, sanitized_sql)
-                        print(f"[PERF] PostgreSQL execute query: {(time.time() - t1) * 1000:.2f}ms")
-
-                    # Get columns and data
-                    t1 = time.time()
-                    columns = [desc[0] for desc in cursor.description] if cursor.description else []
-                    data = await asyncio.to_thread(cursor.fetchall)
-                    print(f"[PERF] PostgreSQL fetch results: {(time.time() - t1) * 1000:.2f}ms")
-
-                finally:
-                    cursor.close()
-                    # Return connection to pool
-                    await asyncio.to_thread(self._connection_pool.return_connection, conn, db_config=db_config, platform=platform, db_type=db_type)
-
-            elif db_type == "mssql":
-                # Use MSSQL connection - prioritize report's db_config
-                if db_config:
-                    # Use report's db_config with connection pool
-                    conn = await asyncio.to_thread(self._connection_pool.get_connection, db_config=db_config, db_type=db_type)
-                elif platform:
-                    # Fallback to platform's connection pool
-                    conn = await asyncio.to_thread(self._connection_pool.get_connection, platform=platform, db_type=db_type)
-                else:
-                    raise ValueError("Database configuration required for MSSQL queries")
-                cursor = conn.cursor()
-
-                try:
-                    # Handle pagination if both page_size and page_limit are provided
-                    if page_size is not None and page_limit is not None:
-                        # Calculate offset (page_limit is 1-based)
-                        offset = (page_limit - 1) * page_size
-
-                        # Fetch page_size + 1 rows to check if there are more pages (no COUNT needed)
-                        # MSSQL uses OFFSET/FETCH syntax
-                        paginated_sql = f"{sanitized_sql} OFFSET {offset} ROWS FETCH NEXT {page_size + 1} ROWS ONLY"
-                        # Run blocking operation in thread pool
-                        await asyncio.to_thread(cursor.execute, paginated_sql)
+                        range_filters.append(FilterValue(field_name=spec.filter_field, value=[start.isoformat(), end.isoformat()], operator="BETWEEN"))
+                    return self.build_filtered_sql(
+                        query, range_filters, db_type,
+                        global_filters=global_filters,
+                        filter_by_department=filter_by_department,
+                        user_department=user_department,
+                        department_filter_level=department_filter_level,
+                        filter_by_step_department=filter_by_step_department
+                    )
+                incremental = (spec, window, render_range)
+
+            # Serve identical reads from the result cache
+            ttl = settings.REPORT_RESULT_CACHE_DEFAULT_TTL_SECONDS if cache_ttl_seconds is None else cache_ttl_seconds
+            use_cache = settings.REPORT_RESULT_CACHE_ENABLED and ttl > 0
+            result_key = self._result_cache.build_key(self._get_db_target_key(db_type, db_config, platform), final_sql, params=params, downsample=downsample)
+            cache_key = result_key if use_cache else None
+            if use_cache:
+                cached_result = self._result_cache.get(cache_key)
+                if cached_result is not None:
+                    print(f"[PERF] Result cache hit: {(time.time() - t0) * 1000:.2f}ms\n")
+                    return cached_result.model_copy(update={"from_cache": True, "queue_time_ms": 0})
+
+            # The profile's settings go with every ClickHouse statement; its time limit applies to reports without one
+            clickhouse_settings = profile_settings(execution_profile, db_config or (platform.db_config if platform else None))
+            if max_execution_time is None:
+                max_execution_time = clickhouse_settings.get("max_execution_time", settings.REPORT_DEFAULT_MAX_EXECUTION_TIME_SECONDS)
+
+            async def run_query() -> QueryExecutionResult:
+                # Reject (or flag) statements whose plan exceeds the database's limits before they take a query slot
+                cost_warning = await self.check_query_cost(db_type, final_sql, db_config, platform, params) if check_cost else None
+
+                # Wait for a query slot on the target database (fair per-user queue, see admission_control)
+                db_target = self._get_db_target_key(db_type, db_config, platform)
+                admission_limit = self._admission_limit(db_config, platform)
+                async with self._admission.admit(db_target, username, admission_limit) as ticket:
+                    queue_time_ms = ticket.queue_time_ms
+                    if queue_time_ms:
+                        print(f"[PERF] Admission queue time: {queue_time_ms:.2f}ms")
+                    start_time = time.time()
+                    fetched = await self._execute_incremental(query, *incremental, db_type, db_config, platform, max_execution_time, clickhouse_settings) if incremental else None
+                    if fetched:
+                        columns, data, cached_buckets = fetched
+                        if visualization_type == 'table':
+                            data = data[:limit]
                     else:
-                        # Add TOP for table visualizations (non-paginated query)
-                        if visualization_type == 'table' and 'TOP' not in sanitized_sql.upper() and 'LIMIT' not in sanitized_sql.upper():
-                            # MSSQL uses TOP instead of LIMIT
-                            sanitized_sql = sanitized_sql.replace("SELECT", f"SELECT TOP {limit}", 1)
-
-                        # Execute the query
-                        # Run blocking operation in thread pool
-                        await asyncio.to_thread(cursor.execute, sanitized_sql)
+                        cached_buckets = None
+                        columns, data = await self._execute_sql(db_type, final_sql, db_config, platform, params, max_execution_time, clickhouse_settings)
 
-                    # Get columns and data
-                    columns = [column[0] for column in cursor.description] if cursor.description else []
-                    data = await asyncio.to_thread(cursor.fetchall)
+                execution_time_ms = (time.time() - start_time) * 1000
+                print(f"[PERF] Total DB execution time: {execution_time_ms:.2f}ms")
+                if stats is not None:
+                    stats.fetch_ms = round(execution_time_ms, 2)
 
-                finally:
-                    cursor.close()
-                    # Return connection to pool
-                    await asyncio.to_thread(self._connection_pool.return_connection, conn, db_config=db_config, platform=platform, db_type=db_type)
-            else:
-                raise ValueError(f"Unsupported database type: {db_type}")
-
-            execution_time_ms = (time.time() - start_time) * 1000
-            print(f"[PERF] Total DB execution time: {execution_time_ms:.2f}ms")
-
-            # Format data for JSON serialization (common for all database types)
-            t1 = time.time()
-            formatted_data = []
-            has_more = False
-
-            # If paginated, check if we got more rows than page_size
-            if page_size is not None and page_limit is not None:
-                has_more = len(data) > page_size
-                # Remove the extra row used for has_more check
-                data_to_format = data[:page_size]
-            else:
-                data_to_format = data
-
-            for row in data_to_format:
-                formatted_row = []
-                for item in row:
-                    if isinstance(item, (int, float, str, bool)) or item is None:
-                        formatted_row.append(item)
-                    else:
-                        # Handle datetime, date, and other types
-                        formatted_row.append(str(item))
-                formatted_data.append(formatted_row)
-            print(f"[PERF] Format data for JSON: {(time.time() - t1) * 1000:.2f}ms")
+                # Format data for JSON serialization (common for all database types)
+                t1 = time.time()
+                formatted_data = []
+                has_more = False
+
+                # If paginated, check if we got more rows than page_size
+                if paginated:
+                    has_more = len(data) > page_size
+                    # Remove the extra row used for has_more check
+                    data_to_format = data[:page_size]
+                else:
+                    data_to_format = data
+
+                # Downsample before formatting, while dates are still comparable values
+                downsampled_from = None
+                if downsample and len(data_to_format) > downsample.target_points:
+                    t2 = time.time()
+                    downsampled_from = len(data_to_format)
+                    data_to_format = downsample_rows(columns, data_to_format, downsample)
+                    print(f"[PERF] Downsample ({downsample.mode}) {downsampled_from} -> {len(data_to_format)} rows: {(time.time() - t2) * 1000:.2f}ms")
+
+                for row in data_to_format:
+                    formatted_row = []
+                    for item in row:
+                        if isinstance(item, (int, float, str, bool)) or item is None:
+                            formatted_row.append(item)
+                        else:
+                            # Handle datetime, date, and other types
+                            formatted_row.append(str(item))
+                    formatted_data.append(formatted_row)
+                print(f"[PERF] Format data for JSON: {(time.time() - t1) * 1000:.2f}ms")
+                if stats is not None:
+                    stats.serialize_ms = round((time.time() - t1) * 1000, 2)
+
+                # For paginated queries, we don't know exact total (no COUNT), just whether there are more pages
+                # For non-paginated queries, use data length
+                actual_total_rows = len(formatted_data)
+
+                # Keyset pages report the full count (computed once per filter set) and a cursor to the next page
+                next_cursor = None
+                if keyset:
+                    total = keyset_total
+                    if total is None:
+                        async with self._admission.admit(db_target, username, admission_limit) as ticket:
+                            queue_time_ms += ticket.queue_time_ms
+                            t2 = time.time()
+                            total = await self._count_rows(db_type, keyset_sql, db_config, platform, ttl if use_cache else 0, query.report_id, params, max_execution_time, clickhouse_settings)
+                            if stats is not None:
+                                stats.count_ms = round((time.time() - t2) * 1000, 2)
+                    actual_total_rows = total
+                    if has_more and data_to_format:
+                        # Driver values, not the formatted strings, so the next seek uses typed literals
+                        next_cursor = encode_cursor(next_cursor_values(columns, data_to_format[-1], order_columns), total, fingerprint)
+
+                print(f"[PERF] TOTAL execute_query time: {(time.time() - t0) * 1000:.2f}ms\n")
+
+                execution_result = QueryExecutionResult(
+                    query_id=query.id,
+                    query_name=query.name,
+                    columns=columns,
+                    data=formatted_data,
+                    total_rows=actual_total_rows,
+                    execution_time_ms=round(execution_time_ms, 2),
+                    success=True,
+                    message=f"Query executed successfully. Retrieved {len(formatted_data)} rows{f' of {actual_total_rows} total' if actual_total_rows > len(formatted_data) else ''}.",
+                    has_more=has_more,
+                    next_cursor=next_cursor,
+                    queue_time_ms=round(queue_time_ms, 2),
+                    downsampled_from=downsampled_from,
+                    cost_warning=cost_warning,
+                    cached_buckets=cached_buckets
+                )
 
-            # For paginated queries, we don't know exact total (no COUNT), just whether there are more pages
-            # For non-paginated queries, use data length
-            actual_total_rows = len(formatted_data)
+                # Only cache successful results that fit the per-entry row bound
+                if cache_key and len(formatted_data) <= settings.REPORT_RESULT_CACHE_MAX_ROWS:
+                    self._result_cache.set(cache_key, execution_result, ttl, report_id=query.report_id)
 
-            print(f"[PERF] TOTAL execute_query time: {(time.time() - t0) * 1000:.2f}ms\n")
+                return execution_result
 
-            return QueryExecutionResult(
-                query_id=query.id,
-                query_name=query.name,
-                columns=columns,
-                data=formatted_data,
-                total_rows=actual_total_rows,
-                execution_time_ms=round(execution_time_ms, 2),
-                success=True,
-                message=f"Query executed successfully. Retrieved {len(formatted_data)} rows{f' of {actual_total_rows} total' if actual_total_rows > len(formatted_data) else ''}.",
-                has_more=has_more
+            # Concurrent identical reads share one execution (see query_coalescing)
+            if not settings.REPORT_QUERY_COALESCING_ENABLED:
+                return await run_query()
+            # Users share a flight like they share cached results; the time limit and profile change how the statement runs
+            flight_key = self._result_cache.build_key(
+                self._get_db_target_key(db_type, db_config, platform), final_sql, params=params, downsample=downsample,
+                max_execution_time=max_execution_time, execution_profile=execution_profile
             )
+            execution_result, joined = await self._coalescer.run(flight_key, run_query)
+            if not joined:
+                return execution_result
+            print(f"[PERF] Joined an identical query in flight: {(time.time() - t0) * 1000:.2f}ms\n")
+            return execution_result.model_copy(update={"query_id": query.id, "query_name": query.name, "coalesced": True})
 
         except Exception as e:
             error_msg = str(e)
@@ -1565,56 +2069,112 @@ class ReportsService:
                 message=f"Query execution failed: {error_msg}"
             )
 
-    async def execute_report(self, request: ReportExecutionRequest, user: UserSchema) -> ReportExecutionResponse:
-        t0 = time.time()
-        print(f"\n[PERF] Starting execute_report for report_id={request.report_id}")
-        db_user = await UserService.get_user_by_username(self.db, user.username)
-        if not db_user:
-            raise ValueError("User not found")
-        print(f"[PERF] Get user: {(time.time() - t0) * 1000:.2f}ms")
+    async def _execute_incremental(self, query: ReportQuery, spec: IncrementalSpec, window: tuple[date, date | None], render_range: Callable[[date, date | None], tuple[str, QueryParams]], db_type: str, db_config: dict[str, Any] | None, platform: Platform | None, max_execution_time: int | None, clickhouse_settings: dict[str, Any] | None = None) -> tuple[list[str], list, int] | None:
+        """Fetch a date range bucket by bucket, reusing cached closed buckets (see time_buckets)
 
-        """Execute a full report or specific query"""
-        # Get the report with platform relationship
-        # Use joinedload for better performance - single query with JOINs instead of multiple queries
+        Returns:
+            (columns, rows, cached_buckets), or None when the range has no closed buckets or the
+            rows cannot be split into buckets and the query has to run over the full range
+        """
+        start, end = window
+        plan = plan_buckets(start, end, spec, date.today())
+        if not plan.closed:
+            return None
+
+        target = self._get_db_target_key(db_type, db_config, platform)
+        unsplittable_key = self._time_buckets.build_key(target, query.sql, query_id=query.id, column=spec.column, bucket=spec.bucket)
+        if self._time_buckets.get(unsplittable_key) is UNSPLITTABLE:
+            return None
+        keys = {}
+        rows_by_bucket = {}
+        columns = None
+        for bucket in plan.closed:
+            sql, params = render_range(*bucket_range(bucket, spec, start, end))
+            keys[bucket] = self._time_buckets.build_key(target, sql, params=params, column=spec.column, bucket=spec.bucket)
+            entry = self._time_buckets.get(keys[bucket])
+            if entry is not None:
+                columns, rows_by_bucket[bucket] = entry
+        cached_buckets = len(rows_by_bucket)
+
+        for run in missing_runs(plan.closed, set(rows_by_bucket)):
+            sql, params = render_range(bucket_range(run[0], spec, start, end)[0], bucket_range(run[-1], spec, start, end)[1])
+            columns, rows = await self._execute_sql(db_type, sql, db_config, platform, params, max_execution_time, clickhouse_settings)
+            grouped = split_rows(columns, rows, spec, run)
+            if grouped is None:
+                print(f"[PERF] Incremental query {query.id}: rows do not match {spec.bucket} buckets of '{spec.column}', running the full range")
+                self._time_buckets.set(unsplittable_key, UNSPLITTABLE, settings.REPORT_TIME_BUCKET_CACHE_TTL_SECONDS, report_id=query.report_id)
+                return None
+            for bucket, bucket_rows in grouped.items():
+                rows_by_bucket[bucket] = bucket_rows
+                if len(bucket_rows) <= settings.REPORT_RESULT_CACHE_MAX_ROWS:
+                    self._time_buckets.set(keys[bucket], (columns, bucket_rows), settings.REPORT_TIME_BUCKET_CACHE_TTL_SECONDS, report_id=query.report_id)
+
+        live_rows = []
+        if plan.live:
+            sql, params = render_range(*plan.live)
+            columns, live_rows = await self._execute_sql(db_type, sql, db_config, platform, params, max_execution_time, clickhouse_settings)
+
+        print(f"[PERF] Incremental query {query.id}: {cached_buckets}/{len(plan.closed)} closed {spec.bucket}s cached, live range {plan.live}")
+        data = [row for bucket in plan.closed for row in rows_by_bucket[bucket]]
+        data.extend(live_rows)
+        return columns, data, cached_buckets
+
+    async def _get_report_definition(self, report_id: int) -> ReportDefinition | None:
+        """Cached snapshot of a report with its queries, filters, tabs, owner and platform (see report_definitions)"""
+        definition = self._report_definitions.get(report_id)
+        if definition is not None:
+            return definition
+
+        t0 = time.time()
         stmt = select(Report).options(
-            joinedload(Report.queries).joinedload(ReportQuery.filters),
+            selectinload(Report.tabs).selectinload(ReportTab.queries).selectinload(ReportQuery.filters),
+            selectinload(Report.queries).selectinload(ReportQuery.filters),
+            joinedload(Report.owner),
             joinedload(Report.platform)
-        ).where(Report.id == request.report_id)
-        t2 = time.time()
+        ).where(Report.id == report_id)
         result = await self.db.execute(stmt)
-        print(f"[PERF] Fetch report with joinedload: {(time.time() - t2) * 1000:.2f}ms")
         report = result.unique().scalar_one_or_none()
+        if not report:
+            return None
+
+        definition = ReportDefinition(report)
+        self._report_definitions.set(report_id, definition, settings.REPORT_DEFINITION_CACHE_TTL_SECONDS, report_id=report_id)
+        print(f"[PERF] Load report definition: {(time.time() - t0) * 1000:.2f}ms")
+        return definition
 
+    async def _get_executable_report(self, report_id: int, user: UserSchema) -> ReportDefinition:
+        """Report definition with its queries, filters and platform, raising ValueError if the user may not run it"""
+        report = await self._get_report_definition(report_id)
         if not report:
             raise ValueError("Report not found or access denied")
-
-        is_admin = user.role and "miras:admin" in user.role
-        if is_admin:
-            has_access = True
-        else:
-            has_access = (
-                report.owner_id == db_user.id or 
-                report.is_public == True
-            )
-        
-        if not has_access:
-            # Check allowed users
-            if report.allowed_users and user.username in report.allowed_users:
-                has_access = True
-            
-            # Check allowed departments
-            if not has_access and report.allowed_departments and user.department:
-                # Check if user's department or any of its parents are in allowed_departments
-                user_dept_parts = user.department.split('_')
-                current_dept = ""
-                for part in user_dept_parts:
-                    current_dept = f"{current_dept}_{part}" if current_dept else part
-                    if current_dept in report.allowed_departments:
-                        has_access = True
-                        break
-
-        if not has_access:
+        if not await self.has_current_access(report_id, user):
             raise ValueError("Report access denied")
+        return report
+
+    async def has_current_access(self, report_id: int, user: UserSchema) -> bool:
+        """Check access against the report's ACL columns as stored now, not as cached in its definition
+
+        One primary-key lookup, so sharing changes and deletions made outside this process apply immediately.
+        """
+        stmt = select(
+            Report.is_public, Report.allowed_users, Report.allowed_departments, Report.deleted_at, User.username
+        ).join(User, Report.owner_id == User.id).where(Report.id == report_id)
+        row = (await self.db.execute(stmt)).one_or_none()
+        if row is None or row.deleted_at is not None:
+            return False
+        return acl_allows(user, row.username, row.is_public, row.allowed_users or [], row.allowed_departments or [])
+
+    async def execute_report(self, request: ReportExecutionRequest, user: UserSchema, on_query_done: Callable[[QueryExecutionResult], None] | None = None) -> ReportExecutionResponse:
+        """Execute a full report or specific query
+
+        on_query_done is called with each query's result as soon as it finishes (progress of background jobs).
+        """
+        t0 = time.time()
+        print(f"\n[PERF] Starting execute_report for report_id={request.report_id}")
+        if not request.query_id and (request.pagination_mode == "keyset" or request.cursor or request.tiebreaker):
+            # A cursor is issued for one query's SQL and sort columns
+            raise ValueError("Keyset pagination (pagination_mode 'keyset', cursor, tiebreaker) requires query_id")
+        report = await self._get_executable_report(request.report_id, user)
 
         # Get platform for database connection (used as fallback)
         platform = report.platform
@@ -1637,13 +2197,19 @@ class ReportsService:
         results = []
 
         try:
+            # Default-filter requests for snapshot-enabled reports are served from the scheduled snapshots
+            snapshots = await self._get_report_snapshots(report.id, request.query_id) if self._is_snapshot_request(report, request) else {}
+            if on_query_done:
+                for snapshot in snapshots.values():
+                    on_query_done(snapshot)
+
             if request.query_id:
                 # Execute specific query
                 query = next((q for q in report.queries if q.id == request.query_id), None)
                 if not query:
                     raise ValueError("Query not found in report")
 
-                result = await self.execute_query(
+                result = snapshots.get(query.id) or await self.execute_query(
                     query, merged_filters, request.limit,
                     request.page_size, request.page_limit,
                     request.sort_by, request.sort_direction,
@@ -1654,13 +2220,25 @@ class ReportsService:
                     filter_by_department=report.filter_by_department or False,
                     user_department=user.department,
                     department_filter_level=report.department_filter_level,
-                    filter_by_step_department=report.filter_by_step_department or False
+                    filter_by_step_department=report.filter_by_step_department or False,
+                    cache_ttl_seconds=report.cache_ttl_seconds,
+                    pagination_mode=request.pagination_mode,
+                    cursor=request.cursor,
+                    tiebreaker=request.tiebreaker,
+                    username=user.username,
+                    max_execution_time=report.max_execution_time_seconds,
+                    target_points=request.target_points,
+                    execution_profile=query.execution_profile or report.execution_profile
                 )
+                if on_query_done and query.id not in snapshots:
+                    on_query_done(result)
                 results.append(result)
             else:
                 # Execute all queries in parallel for better performance
                 tasks = []
                 for query in report.queries:
+                    if query.id in snapshots:
+                        continue
                     task = self.execute_query(
                         query, merged_filters, request.limit,
                         request.page_size, request.page_limit,
@@ -1672,12 +2250,24 @@ class ReportsService:
                         filter_by_department=report.filter_by_department or False,
                         user_department=user.department,
                         department_filter_level=report.department_filter_level,
-                        filter_by_step_department=report.filter_by_step_department or False
+                        filter_by_step_department=report.filter_by_step_department or False,
+                        cache_ttl_seconds=report.cache_ttl_seconds,
+                        # Keyset arguments belong to the one query being paged (query_id), never to a whole report
+                        pagination_mode=None,
+                        cursor=None,
+                        tiebreaker=None,
+                        username=user.username,
+                        max_execution_time=report.max_execution_time_seconds,
+                        target_points=request.target_points,
+                        execution_profile=query.execution_profile or report.execution_profile
                     )
+                    if on_query_done:
+                        task = self._notify_when_done(task, on_query_done)
                     tasks.append(task)
                 
                 # Execute all queries concurrently
-                results = await asyncio.gather(*tasks)
+                live_results = iter(await asyncio.gather(*tasks))
+                results = [snapshots.get(query.id) or next(live_results) for query in report.queries]
 
             total_execution_time = (time.time() - start_time) * 1000
             print(f"[PERF] Total execute_report time: {(time.time() - t0) * 1000:.2f}ms\n")
@@ -1703,46 +2293,187 @@ class ReportsService:
                 message=str(e)
             )
 
+    @staticmethod
+    async def _notify_when_done(task: Awaitable[QueryExecutionResult], on_query_done: Callable[[QueryExecutionResult], None]) -> QueryExecutionResult:
+        result = await task
+        on_query_done(result)
+        return result
+
+    @staticmethod
+    def _is_snapshot_request(report: ReportDefinition, request: ReportExecutionRequest) -> bool:
+        """True when the request asks for what the snapshot scheduler stores: no filter values, default limit, no paging, sorting or downsampling override"""
+        if not report.snapshot_enabled:
+            return False
+        if any(fv.value not in (None, "", []) for fv in request.filters or []):
+            return False
+        if request.page_size or request.page_limit or request.sort_by or request.sort_direction or request.cursor or request.pagination_mode or request.target_points:
+            return False
+        return request.limit == SNAPSHOT_ROW_LIMIT
+
+    async def _get_report_snapshots(self, report_id: int, query_id: int | None = None) -> dict[int, QueryExecutionResult]:
+        """Stored snapshot results of a report (or one of its queries), keyed by query id"""
+        stmt = select(ReportSnapshot).where(ReportSnapshot.report_id == report_id)
+        if query_id:
+            stmt = stmt.where(ReportSnapshot.query_id == query_id)
+        snapshots = {}
+        for snapshot in (await self.db.execute(stmt)).scalars():
+            result = QueryExecutionResult.model_validate(snapshot.result)
+            snapshots[snapshot.query_id] = result.model_copy(update={"from_cache": True, "snapshot_generated_at": snapshot.generated_at})
+        return snapshots
+
+    async def refresh_report_snapshots(self, report_id: int) -> int:
+        """Run a snapshot-enabled report's queries with default filters and store the successful results; returns how many were stored"""
+        report = await self._get_report_definition(report_id)
+        if not report or report.deleted_at or not report.snapshot_enabled:
+            return 0
+
+        t0 = time.time()
+        results = await asyncio.gather(*(
+            self.execute_query(
+                query, [], SNAPSHOT_ROW_LIMIT,
+                visualization_type=query.visualization_config.get('type', 'table'),
+                platform=report.platform,
+                global_filters=report.global_filters or [],
+                db_config=report.db_config,
+                cache_ttl_seconds=0,
+                username=SNAPSHOT_USERNAME,
+                max_execution_time=report.max_execution_time_seconds,
+                # Snapshots exist for reports too heavy to run on demand, and refresh in the background
+                check_cost=False,
+                execution_profile=query.execution_profile or report.execution_profile or "heavy"
+            )
+            for query in report.queries
+        ))
+
+        generated_at = datetime.now(timezone.utc)
+        stored = []
+        for query, result in zip(report.queries, results):
+            if result.success:
+                stored.append((query, result))
+            else:
+                # The query keeps its previous snapshot until a later run succeeds
+                print(f"[SNAPSHOT] Report {report_id} query {query.id} failed: {result.message}")
+
+        if stored:
+            await self.db.execute(delete(ReportSnapshot).where(ReportSnapshot.query_id.in_([query.id for query, _ in stored])))
+            for query, result in stored:
+                self.db.add(ReportSnapshot(
+                    report_id=report.id,
+                    query_id=query.id,
+                    result=result.model_dump(mode="json"),
+                    generated_at=generated_at
+                ))
+        await self.db.commit()
+        print(f"[PERF] Refresh snapshots for report {report_id}: {len(stored)}/{len(results)} queries in {(time.time() - t0) * 1000:.2f}ms")
+        return len(stored)
+
+    async def export_query(self, report_id: int, query_id: int, user: UserSchema, export_format: str = "csv", filter_values: list[FilterValue] | None = None, sort_by: str | None = None, sort_direction: str | None = None) -> tuple[AsyncIterator[bytes], str, str]:
+        """Stream the full filtered result of one report query as CSV, Parquet or XLSX
+
+        The query runs without a row limit through a server-side cursor; see report_export.
+        CSV streams as the body is read; Parquet and XLSX are complete before this returns.
+        The export holds a slot on the report admission gate while it reads the source
+        database, for CSV until the body has been streamed.
+
+        Returns:
+            (iterator of file bytes, media type, file name)
+        """
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {export_format}. Use one of: {', '.join(EXPORT_FORMATS)}")
+
+        report = await self._get_executable_report(report_id, user)
+        query = next((q for q in report.queries if q.id == query_id), None)
+        if not query:
+            raise ValueError("Query not found in report")
+
+        platform = report.platform
+        db_config = report.db_config
+        if db_config:
+            db_type = db_config.get('db_type', 'clickhouse').lower()
+        elif platform:
+            db_type = platform.db_type.lower()
+        else:
+            db_type = "clickhouse"
+
+        if db_type == "clickhouse":
+            pool_args = self._get_clickhouse_pool_args(db_config, platform)
+        elif db_config:
+            pool_args = {"db_config": db_config}
+        elif platform:
+            pool_args = {"platform": platform}
+        else:
+            raise ValueError("No database connection available for this report")
+
+        sql, params = self.build_filtered_sql(
+            query, filter_values or [], db_type,
+            global_filters=report.global_filters or [],
+            filter_by_department=report.filter_by_department or False,
+            user_department=user.department,
+            department_filter_level=report.department_filter_level,
+            filter_by_step_department=report.filter_by_step_department or False
+        )
+        if sort_by and sort_direction:
+            sql = self.apply_sorting_to_query(sql, sort_by, sort_direction)
+        sanitized_sql = sql
+
+        # Exports wait for a slot on the target's gate like report executions (see admission_control)
+        slot = contextlib.AsyncExitStack()
+        db_target = self._get_db_target_key(db_type, db_config, platform)
+        await slot.enter_async_context(self._admission.admit(db_target, user.username, self._admission_limit(db_config, platform)))
+        try:
+            # Exports always run with the low-priority export profile
+            clickhouse_settings = profile_settings("export", db_config or (platform.db_config if platform else None))
+            chunks = iter_query_chunks(self._connection_pool, db_type, sanitized_sql, pool_args, settings.REPORT_EXPORT_CHUNK_SIZE, params, clickhouse_settings)
+            # Run the query and fetch the first chunk before the response starts, so SQL errors still become a 400
+            first_chunk = await asyncio.to_thread(next, chunks)
+
+            # Parquet and XLSX are written out here, so type and row-limit errors also become a 400
+            body = await asyncio.to_thread(encode_export, itertools.chain([first_chunk], chunks), export_format)
+        except BaseException:
+            await slot.aclose()
+            raise
+        if export_format != "csv":
+            # The source query has been read to the end, only the spooled file is left to send
+            await slot.aclose()
+
+        media_type, extension = EXPORT_FORMATS[export_format]
+        filename = f"report_{report_id}_query_{query_id}.{extension}"
+        return self._stream_export(body, slot), media_type, filename
+
+    @staticmethod
+    async def _stream_export(body: Iterator[bytes], slot: contextlib.AsyncExitStack) -> AsyncIterator[bytes]:
+        """Read an export body on worker threads, releasing its admission slot when the response ends or is abandoned"""
+        try:
+            while (piece := await asyncio.to_thread(next, body, None)) is not None:
+                yield piece
+        finally:
+            await slot.aclose()
+
     async def get_filter_options(self, report_id: int, query_id: int, filter_field: str, user: UserSchema, page: int = 1, page_size: int = 50, search: str = "") -> dict[str, Any]:
         db_user = await UserService.get_user_by_username(self.db, user.username)
         if not db_user:
             raise ValueError("User not found")
 
         """Get dropdown options for a filter by report, query, and field name with pagination and search"""
-        # Get the filter along with report and platform
-        stmt = select(ReportQueryFilter).join(ReportQuery).join(Report).options(
-            selectinload(ReportQueryFilter.query).selectinload(ReportQuery.report).selectinload(Report.platform)
-        ).where(
-            and_(
-                Report.id == report_id,
-                ReportQuery.id == query_id,
-                ReportQueryFilter.field_name == filter_field
-            )
-        )
-        result = await self.db.execute(stmt)
-        db_filter = result.scalar_one_or_none()
-        
+        # Get the filter from the cached report definition
+        definition = await self._get_report_definition(report_id)
+        query = next((q for q in definition.queries if q.id == query_id), None) if definition else None
+        db_filter = next((f for f in query.filters if f.field_name == filter_field), None) if query else None
+
         if not db_filter:
             return {"options": [], "total": 0, "page": page, "page_size": page_size, "has_more": False}
-            
-        
 
         if not db_filter.dropdown_query:
             return {"options": [], "total": 0, "page": page, "page_size": page_size, "has_more": False}
 
         # Get report's db_config and platform (fallback)
-        report_db_config = db_filter.query.report.db_config if db_filter.query and db_filter.query.report else None
-        platform = db_filter.query.report.platform if db_filter.query and db_filter.query.report else None
+        report_db_config = definition.db_config
+        platform = definition.platform
 
         # Determine database type - prioritize report's db_config
-        if report_db_config:
-            db_type = report_db_config.get('db_type', 'clickhouse').lower()
-        elif platform:
-            db_type = platform.db_type.lower()
-        else:
-            db_type = "clickhouse"
-            if not self.clickhouse_client:
-                raise ValueError("Database client not available")
+        db_type = self._filter_db_type(report_db_config, platform)
+        if not report_db_config and not platform and not self.clickhouse_client:
+            raise ValueError("Database client not available")
 
         try:
             # Build the query with search and pagination
@@ -1750,82 +2481,45 @@ class ReportsService:
 
             # Remove trailing semicolon if present
             base_query = base_query.rstrip(';').strip()
+            offset = (page - 1) * page_size
 
-            # Add search filter if provided
+            # Serve search and pagination from the filter's cached option index
+            if settings.FILTER_OPTION_CACHE_ENABLED:
+                index = await self._get_filter_option_index(report_id, db_type, base_query, report_db_config, platform)
+                if index is not None:
+                    # Same matching as the search query below, which only looks at labels when the query has a WHERE
+                    options, total = index.search(search, offset, page_size, match_labels="WHERE" in base_query.upper())
+                    return {
+                        "options": options,
+                        "total": total,
+                        "page": page,
+                        "page_size": page_size,
+                        "has_more": (offset + len(options)) < total
+                    }
+
+            # Add search filter if provided (the search term is a bind parameter)
+            params = QueryParams()
             if search:
+                search_pattern = params.add(f"%{search}%")
                 # Wrap base query and add WHERE clause for search
                 # This assumes the first column is value and second is label
                 if "WHERE" in base_query.upper():
-                    base_query = f"SELECT * FROM ({base_query}) AS subquery WHERE CAST(subquery.value AS TEXT) ILIKE '%{search}%' OR CAST(subquery.label AS TEXT) ILIKE '%{search}%'"
+                    base_query = f"SELECT * FROM ({base_query}) AS subquery WHERE CAST(subquery.value AS TEXT) ILIKE {search_pattern} OR CAST(subquery.label AS TEXT) ILIKE {search_pattern}"
                 else:
                     # If no columns specified, search in all columns
-                    base_query = f"SELECT * FROM ({base_query}) AS subquery WHERE CAST(subquery.value AS TEXT) ILIKE '%{search}%'"
+                    base_query = f"SELECT * FROM ({base_query}) AS subquery WHERE CAST(subquery.value AS TEXT) ILIKE {search_pattern}"
 
             # Get total count
             count_query = f"SELECT COUNT(*) FROM ({base_query}) AS count_subquery"
 
             # Add pagination
-            offset = (page - 1) * page_size
             paginated_query = f"{base_query} LIMIT {page_size} OFFSET {offset}"
 
-            if db_type == "clickhouse":
-                if not self.clickhouse_client:
-                    raise ValueError("ClickHouse client not available")
-
-                # Get total count (run in thread pool to not block event loop)
-                total_result = await asyncio.to_thread(self.clickhouse_client.execute, count_query)
-                total = total_result[0][0] if total_result else 0
-
-                # Get paginated results (run in thread pool to not block event loop)
-                result = await asyncio.to_thread(self.clickhouse_client.execute, paginated_query)
-
-            elif db_type == "postgresql":
-                # Use report's db_config or fallback to platform
-                if report_db_config:
-                    conn = await asyncio.to_thread(self._connection_pool.get_connection, db_config=report_db_config, db_type=db_type)
-                elif platform:
-                    conn = await asyncio.to_thread(self._connection_pool.get_connection, platform=platform, db_type=db_type)
-                else:
-                    raise ValueError("Database configuration required for PostgreSQL queries")
-                
-                cursor = conn.cursor()
-                try:
-                    # Get total count (run in thread pool)
-                    await asyncio.to_thread(cursor.execute, count_query)
-                    total = cursor.fetchone()[0]
-
-                    # Get paginated results (run in thread pool)
-                    await asyncio.to_thread(cursor.execute, paginated_query)
-                    result = await asyncio.to_thread(cursor.fetchall)
-                finally:
-                    cursor.close()
-                    # Return connection to pool
-                    await asyncio.to_thread(self._connection_pool.return_connection, conn, db_config=report_db_config, platform=platform, db_type=db_type)
-
-            elif db_type == "mssql":
-                # Use report's db_config or fallback to platform
-                if report_db_config:
-                    conn = await asyncio.to_thread(self._connection_pool.get_connection, db_config=report_db_config, db_type=db_type)
-                elif platform:
-                    conn = await asyncio.to_thread(self._connection_pool.get_connection, platform=platform, db_type=db_type)
-                else:
-                    raise ValueError("Database configuration required for MSSQL queries")
-                
-                cursor = conn.cursor()
-                try:
-                    # Get total count (run in thread pool)
-                    await asyncio.to_thread(cursor.execute, count_query)
-                    total = cursor.fetchone()[0]
-
-                    # Get paginated results (run in thread pool)
-                    await asyncio.to_thread(cursor.execute, paginated_query)
-                    result = await asyncio.to_thread(cursor.fetchall)
-                finally:
-                    cursor.close()
-                    # Return connection to pool
-                    await asyncio.to_thread(self._connection_pool.return_connection, conn, db_config=report_db_config, platform=platform, db_type=db_type)
-            else:
-                raise ValueError(f"Unsupported database type: {db_type}")
+            total, result = await self._on_read_replica(
+                db_type, report_db_config, platform,
+                lambda target_config, target_platform: self._fetch_filter_option_page(db_type, count_query, paginated_query, params, target_config, target_platform),
+                read_only=is_read_only(paginated_query)
+            )
 
             # Format as value/label pairs
             options = []
@@ -1847,3 +2541,159 @@ class ReportsService:
 
         except Exception as e:
             raise ValueError(f"Failed to get filter options: {e!s}")
+
+    async def _fetch_filter_option_page(self, db_type: str, count_query: str, paginated_query: str, params: QueryParams, db_config: dict[str, Any] | None, platform: Platform | None) -> tuple[int, list]:
+        """Total and one page of a dropdown query that is not served from the option index"""
+        if db_type == "clickhouse":
+            pool_args = self._get_clickhouse_pool_args(db_config, platform)
+            client = await asyncio.to_thread(self._connection_pool.get_connection, db_type=db_type, **pool_args)
+            client_failed = False
+            try:
+                # Get total count (run in thread pool to not block event loop)
+                total_result = await asyncio.to_thread(client.execute, *bind_params(count_query, params, "clickhouse"))
+                total = total_result[0][0] if total_result else 0
+
+                # Get paginated results (run in thread pool to not block event loop)
+                result = await asyncio.to_thread(client.execute, *bind_params(paginated_query, params, "clickhouse"))
+            except Exception:
+                client_failed = True
+                raise
+            finally:
+                await asyncio.to_thread(self._connection_pool.return_connection, client, db_type=db_type, discard=client_failed, **pool_args)
+
+        elif db_type == "postgresql":
+            # Use report's db_config or fallback to platform
+            if not db_config and not platform:
+                raise ValueError("Database configuration required for PostgreSQL queries")
+            pg_pool = await self._connection_pool.get_asyncpg_pool(db_config=db_config, platform=platform)
+            async with pg_pool.acquire(timeout=settings.ASYNCPG_POOL_ACQUIRE_TIMEOUT_SECONDS) as conn:
+                count_sql, args = bind_params(count_query, params, "asyncpg")
+                total = await conn.fetchval(count_sql, *(args or []))
+                paginated_sql, args = bind_params(paginated_query, params, "asyncpg")
+                result = await conn.fetch(paginated_sql, *(args or []))
+
+        elif db_type == "mssql":
+            # Use report's db_config or fallback to platform
+            if db_config:
+                conn = await asyncio.to_thread(self._connection_pool.get_connection, db_config=db_config, db_type=db_type)
+            elif platform:
+                conn = await asyncio.to_thread(self._connection_pool.get_connection, platform=platform, db_type=db_type)
+            else:
+                raise ValueError("Database configuration required for MSSQL queries")
+
+            cursor = conn.cursor()
+            try:
+                # Get total count (run in thread pool)
+                count_sql, args = bind_params(count_query, params, "pyodbc")
+                await asyncio.to_thread(cursor.execute, count_sql, *(args or []))
+                total = cursor.fetchone()[0]
+
+                # Get paginated results (run in thread pool)
+                paginated_sql, args = bind_params(paginated_query, params, "pyodbc")
+                await asyncio.to_thread(cursor.execute, paginated_sql, *(args or []))
+                result = await asyncio.to_thread(cursor.fetchall)
+            finally:
+                cursor.close()
+                # Return connection to pool
+                await asyncio.to_thread(self._connection_pool.return_connection, conn, db_config=db_config, platform=platform, db_type=db_type)
+        else:
+            raise ValueError(f"Unsupported database type: {db_type}")
+        return total, result
+
+    @staticmethod
+    def _filter_db_type(db_config: dict[str, Any] | None, platform: Platform | None) -> str:
+        """Database type of a query target: report db_config, platform, or ClickHouse"""
+        if db_config:
+            return db_config.get('db_type', 'clickhouse').lower()
+        if platform:
+            return platform.db_type.lower()
+        return "clickhouse"
+
+    async def _get_filter_option_index(self, report_id: int, db_type: str, dropdown_sql: str, db_config: dict[str, Any] | None = None, platform: Platform | None = None) -> FilterOptionIndex | None:
+        """Cached option index of a dropdown query (see filter_option_cache), None when it has too many options"""
+        key = self._filter_options.build_key(self._get_db_target_key(db_type, db_config, platform), dropdown_sql)
+
+        async def load_rows(max_rows: int) -> list:
+            t0 = time.time()
+            rows = await self._on_read_replica(
+                db_type, db_config, platform,
+                lambda target_config, target_platform: self._fetch_filter_option_rows(db_type, dropdown_sql, target_config, target_platform, max_rows),
+                read_only=is_read_only(dropdown_sql)
+            )
+            print(f"[PERF] Load filter options ({len(rows)} rows): {(time.time() - t0) * 1000:.2f}ms")
+            return rows
+
+        return await self._filter_options.get_or_load(key, load_rows, settings.FILTER_OPTION_CACHE_TTL_SECONDS, report_id=report_id)
+
+    async def _fetch_filter_option_rows(self, db_type: str, sql: str, db_config: dict[str, Any] | None, platform: Platform | None, max_rows: int) -> list:
+        """Run a dropdown query as written (keeping its ORDER BY) and fetch at most max_rows rows"""
+        if db_type == "clickhouse":
+            pool_args = self._get_clickhouse_pool_args(db_config, platform)
+
+            def run_clickhouse():
+                client = self._connection_pool.get_connection(db_type=db_type, **pool_args)
+                client_failed = True
+                try:
+                    # The server stops once max_rows is exceeded (at block granularity, so possibly a few more rows)
+                    rows = client.execute(sql, settings={"max_result_rows": max_rows, "result_overflow_mode": "break"})
+                    client_failed = False
+                    return rows
+                finally:
+                    self._connection_pool.return_connection(client, db_type=db_type, discard=client_failed, **pool_args)
+
+            return await asyncio.to_thread(run_clickhouse)
+
+        if db_type == "postgresql":
+            if not db_config and not platform:
+                raise ValueError("Database configuration required for PostgreSQL queries")
+            pg_pool = await self._connection_pool.get_asyncpg_pool(db_config=db_config, platform=platform)
+            async with pg_pool.acquire(timeout=settings.ASYNCPG_POOL_ACQUIRE_TIMEOUT_SECONDS) as conn:
+                # Server-side cursor (needs a transaction): only max_rows rows are transferred
+                async with conn.transaction(readonly=True):
+                    cursor = await conn.cursor(sql)
+                    return await cursor.fetch(max_rows)
+
+        if db_type == "mssql":
+            if db_config:
+                pool_args = {"db_config": db_config}
+            elif platform:
+                pool_args = {"platform": platform}
+            else:
+                raise ValueError("Database configuration required for MSSQL queries")
+
+            def run_mssql():
+                conn = self._connection_pool.get_connection(db_type=db_type, **pool_args)
+                try:
+                    cursor = conn.cursor()
+                    try:
+                        cursor.execute(sql)
+                        return cursor.fetchmany(max_rows)
+                    finally:
+                        cursor.close()
+                finally:
+                    self._connection_pool.return_connection(conn, db_type=db_type, **pool_args)
+
+            return await asyncio.to_thread(run_mssql)
+
+        raise ValueError(f"Unsupported database type: {db_type}")
+
+    def _prewarm_filter_options(self, definition: ReportDefinition) -> None:
+        """Load the option indexes of a report's dropdown filters in the background (FILTER_OPTION_CACHE_PREWARM)"""
+        db_type = self._filter_db_type(definition.db_config, definition.platform)
+
+        async def prewarm():
+            # One filter at a time, so opening a report doesn't burst queries at its database
+            for query in definition.queries:
+                for db_filter in query.filters:
+                    if not db_filter.dropdown_query:
+                        continue
+                    try:
+                        dropdown_sql = self.sanitize_sql_query(db_filter.dropdown_query).rstrip(';').strip()
+                        await self._get_filter_option_index(definition.id, db_type, dropdown_sql, definition.db_config, definition.platform)
+                    except Exception as e:
+                        print(f"[PERF] Prewarm of filter options failed for query {query.id} filter {db_filter.field_name}: {e}")
+
+        task = asyncio.create_task(prewarm())
+        # Keep a reference until it finishes, the event loop only holds a weak one
+        _prewarm_tasks.add(task)
+        task.add_done_callback(_prewarm_tasks.discard)
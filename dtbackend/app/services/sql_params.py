@@ -0,0 +1,171 @@
+"""
+Bind parameters for report SQL.
+
+Filter values, department prefixes and search terms are never spliced into
+report SQL. While a statement is built each value is registered in a
+QueryParams map and a neutral marker is written in its place, so the same
+statement text can be wrapped (sorting, pagination, COUNT) without knowing
+the driver. Just before execution bind_params rewrites the markers into the
+driver's placeholder style:
+
+    asyncpg     $1, $2 ...         positional list
+    psycopg2    %(p0)s             dict (literal % in the SQL is doubled)
+    pyodbc      ?                  positional list, in order of appearance
+    clickhouse  {p0:String}        dict, substituted by the server
+
+The statement text then only changes when the filter *shape* changes, so the
+databases can reuse their plans across filter values.
+"""
+
+import datetime
+import decimal
+import re
+import uuid
+from typing import Any
+
+PARAM_STYLES = ("asyncpg", "psycopg2", "pyodbc", "clickhouse")
+
+_MARKER_RE = re.compile("\x00(p\\d+)\x00")
+
+
+class QueryParams(dict):
+    """Parameter map (name -> value) collected while rendering a statement"""
+
+    def add(self, value: Any) -> str:
+        """Register a value and return the marker to write into the SQL in its place"""
+        name = f"p{len(self)}"
+        self[name] = value
+        return f"\x00{name}\x00"
+
+
+def _clickhouse_type(value: Any) -> str:
+    if value is None:
+        return "Nullable(String)"
+    if isinstance(value, bool):
+        return "Bool"
+    if isinstance(value, int):
+        return "Int64"
+    if isinstance(value, float):
+        return "Float64"
+    return "String"
+
+
+def bind_params(sql: str, params: dict[str, Any] | None, style: str) -> tuple[str, Any]:
+    """Rewrite parameter markers into a driver's placeholder style
+
+    Returns:
+        (sql, args) where args is what the driver's execute takes for that style,
+        or None when the statement has no parameters
+    """
+    if style not in PARAM_STYLES:
+        raise ValueError(f"Unsupported parameter style: {style}")
+    if not params:
+        return sql, None
+
+    if style == "asyncpg":
+        positions: dict[str, int] = {}
+
+        def asyncpg_placeholder(match: re.Match) -> str:
+            return f"${positions.setdefault(match.group(1), len(positions) + 1)}"
+
+        bound_sql = _MARKER_RE.sub(asyncpg_placeholder, sql)
+        return bound_sql, [params[name] for name in positions]
+
+    if style == "psycopg2":
+        bound_sql = _MARKER_RE.sub(lambda m: f"%({m.group(1)})s", sql.replace("%", "%%"))
+        return bound_sql, dict(params)
+
+    if style == "pyodbc":
+        args = []
+
+        def pyodbc_placeholder(match: re.Match) -> str:
+            args.append(params[match.group(1)])
+            return "?"
+
+        bound_sql = _MARKER_RE.sub(pyodbc_placeholder, sql)
+        return bound_sql, args
+
+    bound_sql = _MARKER_RE.sub(lambda m: f"{{{m.group(1)}:{_clickhouse_type(params[m.group(1)])}}}", sql)
+    return bound_sql, {name: value if value is None or isinstance(value, (bool, int, float)) else str(value) for name, value in params.items()}
+
+
+def _parse_bool(value: Any) -> bool:
+    if isinstance(value, str):
+        lowered = value.strip().lower()
+        if lowered in ("true", "t", "1", "yes", "y"):
+            return True
+        if lowered in ("false", "f", "0", "no", "n"):
+            return False
+        raise ValueError(f"Invalid boolean value: {value}")
+    return bool(value)
+
+
+def _parse_datetime(value: Any) -> datetime.datetime:
+    if isinstance(value, datetime.datetime):
+        return value
+    if isinstance(value, datetime.date):
+        return datetime.datetime.combine(value, datetime.time())
+    return datetime.datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+
+
+def _parse_date(value: Any) -> datetime.date:
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    # Accept timestamps too, the date part is what a DATE parameter compares
+    return datetime.date.fromisoformat(str(value).strip()[:10])
+
+
+def _parse_time(value: Any) -> datetime.time:
+    if isinstance(value, datetime.time):
+        return value
+    return datetime.time.fromisoformat(str(value).strip())
+
+
+def _parse_timestamp(value: Any) -> datetime.datetime:
+    parsed = _parse_datetime(value)
+    return parsed.replace(tzinfo=None) if parsed.tzinfo else parsed
+
+
+def _parse_timestamptz(value: Any) -> datetime.datetime:
+    parsed = _parse_datetime(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=datetime.timezone.utc)
+
+
+_POSTGRES_COERCIONS = {
+    "int2": int, "int4": int, "int8": int, "oid": int,
+    "float4": float, "float8": float,
+    "numeric": lambda v: decimal.Decimal(str(v)),
+    "bool": _parse_bool,
+    "date": _parse_date,
+    "time": _parse_time,
+    "timestamp": _parse_timestamp,
+    "timestamptz": _parse_timestamptz,
+    "uuid": lambda v: v if isinstance(v, uuid.UUID) else uuid.UUID(str(v)),
+    "text": str, "varchar": str, "bpchar": str, "name": str, "char": str,
+}
+
+
+def coerce_postgres_args(parameter_types: tuple, args: list[Any]) -> list[Any]:
+    """Convert bound values to the parameter types PostgreSQL inferred for a prepared statement
+
+    Literals used to be spliced into the SQL as quoted strings and PostgreSQL cast them
+    to the column type; asyncpg encodes binary values strictly by type, so do the
+    same conversion here (e.g. a '5' from a dropdown compared to an integer column).
+
+    Args:
+        parameter_types: asyncpg PreparedStatement.get_parameters()
+        args: Values in $n order
+    """
+    coerced = []
+    for parameter_type, value in zip(parameter_types, args):
+        coerce = _POSTGRES_COERCIONS.get(parameter_type.name)
+        if value is None or coerce is None:
+            coerced.append(value)
+            continue
+        try:
+            coerced.append(coerce(value))
+        except (TypeError, ValueError, decimal.InvalidOperation) as e:
+            raise ValueError(f"Invalid value {value!r} for a {parameter_type.name} parameter") from e
+    return coerced
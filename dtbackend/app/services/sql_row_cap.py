@@ -0,0 +1,84 @@
+"""
+Row caps pushed into ad-hoc SQL (report previews and syntax checks).
+
+ClickHouse and PostgreSQL statements are wrapped,
+
+    SELECT * FROM (<statement>) AS capped_rows LIMIT n
+
+which caps any SELECT, including ones with their own larger LIMIT, UNION or
+WITH. SQL Server does not allow CTEs or ORDER BY inside a derived table, so
+there the outermost SELECT gets TOP n instead (keeping a smaller TOP the
+statement already has). A TOP n PERCENT clause is left as it is, since a
+percentage cannot be compared with n. For a UNION, and for PERCENT, the
+statement is not capped at n rows, so callers should still cut the fetched
+rows to n.
+"""
+
+import re
+
+# What may follow SELECT before the column list: DISTINCT and an existing TOP clause
+_SELECT_HEAD = re.compile(r"\s*(DISTINCT\s+)?(TOP\s*(?:\(\s*(\d+)\s*\)|(\d+))(\s+PERCENT)?(\s+WITH\s+TIES)?\s+)?", re.IGNORECASE)
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+def outer_select_position(sql: str) -> int | None:
+    """Offset of the outermost SELECT keyword: the first one outside parentheses, literals and comments"""
+    depth = 0
+    i = 0
+    while i < len(sql):
+        char = sql[i]
+        if char in "'\"[":
+            # Literals and quoted identifiers (a doubled quote just starts the next literal)
+            end = sql.find("]" if char == "[" else char, i + 1)
+            if end == -1:
+                return None
+            i = end + 1
+            continue
+        if sql.startswith("--", i):
+            end = sql.find("\n", i)
+            if end == -1:
+                return None
+            i = end + 1
+            continue
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif (
+            depth == 0
+            and sql[i:i + 6].upper() == "SELECT"
+            and (i == 0 or not _is_word_char(sql[i - 1]))
+            and (i + 6 == len(sql) or not _is_word_char(sql[i + 6]))
+        ):
+            return i
+        i += 1
+    return None
+
+
+def cap_rows(sql: str, db_type: str, max_rows: int) -> str:
+    """A sanitized SELECT/WITH statement limited to max_rows rows in the database's syntax
+
+    Raises:
+        ValueError: If the outermost SELECT of an MSSQL statement cannot be found
+    """
+    sql = sql.strip().rstrip(";").rstrip()
+    if db_type != "mssql":
+        # Newlines keep a trailing -- comment from swallowing the closing parenthesis
+        return f"SELECT * FROM (\n{sql}\n) AS capped_rows LIMIT {int(max_rows)}"
+
+    position = outer_select_position(sql)
+    if position is None:
+        raise ValueError("Could not find the query's SELECT to limit its rows")
+    head = _SELECT_HEAD.match(sql, position + 6)
+    if head is None:
+        raise ValueError("Could not find the query's SELECT to limit its rows")
+    distinct, existing, percent = head.group(1) or "", head.group(3) or head.group(4), head.group(5)
+    if percent:
+        # The caller's slice of the fetched rows enforces the cap
+        return sql
+    rows = min(int(max_rows), int(existing)) if existing else int(max_rows)
+    # WITH TIES could return more than the cap, so it is dropped
+    return f"{sql[:position + 6]} {distinct.upper().strip() + ' ' if distinct else ''}TOP {rows} {sql[head.end():]}"
@@ -0,0 +1,176 @@
+"""
+Incremental execution of time-range report queries.
+
+Reports that aggregate over a sliding date range (the last 90 days, this
+year, ...) recompute the whole range on every execution although only the
+current day's data is still changing. Queries can opt in with
+chart_options.incremental:
+
+    filter_field  field_name of the query's (or report's global) date filter
+                  that selects the range
+    column        result column holding each row's date (defaults to
+                  filter_field)
+    bucket        day (default) or month
+    lag_buckets   closed buckets before the current one that are still
+                  queried live, for sources that receive late data (default 0)
+
+When the request filters filter_field with BETWEEN (or >=, >), the range is
+split into buckets. Buckets that ended before the current one (less
+lag_buckets) are closed: their rows are kept in time_bucket_cache, keyed by
+the statement that would select that bucket alone, and only closed buckets
+missing from the cache are queried, one statement per run of consecutive
+missing buckets. The open buckets are always queried live, so a 90-day trend
+whose older days are cached only scans the current day. With >= or > the
+live range keeps the request's open end, so rows dated after today are
+still returned.
+
+This is only correct for queries whose rows each belong to a single bucket,
+i.e. that GROUP BY the date at bucket granularity (or finer) and return it
+in column. Rows are merged in bucket order, so charts should also ORDER BY
+it. A row whose date cannot be read or falls outside the requested range
+makes the execution fall back to a regular full-range query, and the query
+is remembered as unsplittable until its report is edited or the bucket TTL
+expires.
+"""
+
+import datetime
+from typing import Any, NamedTuple
+
+from app.core.config import settings
+from app.services.report_result_cache import ReportResultCache
+
+BUCKET_SIZES = ("day", "month")
+
+# Cached under a query's unsplittable_key once its rows could not be split into buckets
+UNSPLITTABLE = object()
+
+
+class IncrementalSpec(NamedTuple):
+    filter_field: str
+    column: str
+    bucket: str
+    lag_buckets: int
+
+
+class BucketPlan(NamedTuple):
+    """Closed buckets of a requested range and the range still queried live (open-ended when its end is None)"""
+    closed: list[datetime.date]
+    live: tuple[datetime.date, datetime.date | None] | None
+
+
+def incremental_spec(visualization_config: dict[str, Any] | None) -> IncrementalSpec | None:
+    """Incremental execution configured for a query, or None when it does not opt in"""
+    chart_options = (visualization_config or {}).get("chart_options") or {}
+    config = chart_options.get("incremental") or {}
+    filter_field = config.get("filter_field")
+    bucket = config.get("bucket") or "day"
+    if not filter_field or bucket not in BUCKET_SIZES:
+        return None
+    return IncrementalSpec(
+        filter_field=filter_field,
+        column=config.get("column") or filter_field,
+        bucket=bucket,
+        lag_buckets=max(int(config.get("lag_buckets") or 0), 0),
+    )
+
+
+def to_date(value: Any) -> datetime.date | None:
+    """A date filter value or result cell as a date, or None when it is not one"""
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    if isinstance(value, str) and len(value) >= 10:
+        try:
+            return datetime.date.fromisoformat(value[:10])
+        except ValueError:
+            return None
+    return None
+
+
+def bucket_start(day: datetime.date, bucket: str) -> datetime.date:
+    return day.replace(day=1) if bucket == "month" else day
+
+
+def next_bucket(start: datetime.date, bucket: str) -> datetime.date:
+    if bucket == "month":
+        return (start.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+    return start + datetime.timedelta(days=1)
+
+
+def requested_range(filter_values: list, spec: IncrementalSpec) -> tuple[datetime.date, datetime.date | None] | None:
+    """Inclusive date range the request selects on spec.filter_field (end None for >= and >), or None when it cannot be bucketed"""
+    filter_value = next((fv for fv in filter_values or [] if fv.field_name == spec.filter_field), None)
+    if filter_value is None:
+        return None
+
+    value, operator = filter_value.value, filter_value.operator or "="
+    if operator == "BETWEEN" and isinstance(value, list) and len(value) == 2:
+        start, end = to_date(value[0]), to_date(value[1])
+    elif operator in (">=", ">"):
+        start, end = to_date(value), None
+        if start is not None and operator == ">":
+            start += datetime.timedelta(days=1)
+    else:
+        return None
+    if start is None or (operator == "BETWEEN" and (end is None or start > end)):
+        return None
+    return start, end
+
+
+def plan_buckets(start: datetime.date, end: datetime.date | None, spec: IncrementalSpec, today: datetime.date) -> BucketPlan:
+    """Split [start, end] into the closed buckets it covers and the live remainder"""
+    # Buckets starting at or after live_from are still receiving data
+    live_from = bucket_start(today, spec.bucket)
+    for _ in range(spec.lag_buckets):
+        live_from = bucket_start(live_from - datetime.timedelta(days=1), spec.bucket)
+
+    closed = []
+    current = bucket_start(start, spec.bucket)
+    while current < live_from and (end is None or current <= end):
+        closed.append(current)
+        current = next_bucket(current, spec.bucket)
+    live = (max(start, live_from), end) if end is None or end >= live_from else None
+    return BucketPlan(closed, live)
+
+
+def bucket_range(bucket: datetime.date, spec: IncrementalSpec, start: datetime.date, end: datetime.date | None) -> tuple[datetime.date, datetime.date]:
+    """Dates of a bucket inside the requested range (the first and last buckets may be partial)"""
+    last = next_bucket(bucket, spec.bucket) - datetime.timedelta(days=1)
+    return max(bucket, start), last if end is None else min(last, end)
+
+
+def missing_runs(buckets: list[datetime.date], cached: set[datetime.date]) -> list[list[datetime.date]]:
+    """Consecutive uncached buckets, so each run can be fetched with one statement"""
+    runs: list[list[datetime.date]] = []
+    previous_missing = False
+    for bucket in buckets:
+        missing = bucket not in cached
+        if missing:
+            if previous_missing:
+                runs[-1].append(bucket)
+            else:
+                runs.append([bucket])
+        previous_missing = missing
+    return runs
+
+
+def split_rows(columns: list[str], rows: list, spec: IncrementalSpec, buckets: list[datetime.date]) -> dict[datetime.date, list] | None:
+    """Rows grouped by bucket (every bucket present, possibly empty), or None if a row's date is unusable"""
+    if spec.column not in columns:
+        return None
+    index = columns.index(spec.column)
+    grouped: dict[datetime.date, list] = {bucket: [] for bucket in buckets}
+    for row in rows:
+        day = to_date(row[index])
+        if day is None:
+            return None
+        rows_of_bucket = grouped.get(bucket_start(day, spec.bucket))
+        if rows_of_bucket is None:
+            return None
+        rows_of_bucket.append(row)
+    return grouped
+
+
+# Rows of closed buckets, plus UNSPLITTABLE markers
+time_bucket_cache = ReportResultCache(max_entries=settings.REPORT_TIME_BUCKET_CACHE_MAX_ENTRIES)
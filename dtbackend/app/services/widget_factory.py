@@ -1,5 +1,12 @@
+import uuid
 from typing import Any
 
+from .execution_profiles import profile_settings
+from .query_cancellation import (
+    register_clickhouse_query,
+    register_cursor,
+    unregister_query,
+)
 from .widget_strategies.base import WidgetStrategy
 from .widget_strategies.capacity_analysis import CapacityAnalysisWidgetStrategy
 from .widget_strategies.efficiency import EfficiencyWidgetStrategy
@@ -55,7 +62,8 @@ class WidgetFactory:
         cls,
         db_client,
         widget_type: str,
-        filters: dict[str, Any] | None = None
+        filters: dict[str, Any] | None = None,
+        db_config: dict[str, Any] | None = None
     ) -> dict[str, Any]:
         """Create widget data using appropriate strategy"""
         strategy = cls.get_strategy(widget_type)
@@ -63,7 +71,7 @@ class WidgetFactory:
         try:
             # Execute real query
             query = strategy.get_query(filters)
-            result = cls._execute_query(db_client, query)
+            result = cls._execute_query(db_client, query, strategy.execution_profile, db_config)
             print(result)
             return strategy.process_result(result, filters)
 
@@ -78,20 +86,34 @@ class WidgetFactory:
             }
 
     @classmethod
-    def _execute_query(cls, db_client, query: str) -> Any:
-        """Execute query on different database client types"""
+    def _execute_query(cls, db_client, query: str, execution_profile: str | None = None, db_config: dict[str, Any] | None = None) -> Any:
+        """Execute query on different database client types
+
+        Queries are registered in the request's cancel scope (see query_cancellation)
+        so they are stopped if the client disconnects. ClickHouse queries run with the
+        settings of the strategy's execution profile, including db_config's overrides
+        (see execution_profiles).
+        """
         # Detect client type and execute accordingly
         client_type = type(db_client).__name__
 
         if client_type == 'Client':  # ClickHouse client
-            return db_client.execute(query)
+            # Tag the query so it can be killed by id
+            query_id = uuid.uuid4().hex
+            handle = register_clickhouse_query(db_client, query_id)
+            try:
+                return db_client.execute(query, query_id=query_id, settings=profile_settings(execution_profile, db_config))
+            finally:
+                unregister_query(handle)
         elif client_type == 'Connection':  # pyodbc (MSSQL) or psycopg2 (PostgreSQL)
             cursor = db_client.cursor()
+            handle = register_cursor(cursor, db_client)
             try:
                 cursor.execute(query)
                 result = cursor.fetchall()
                 return result
             finally:
+                unregister_query(handle)
                 cursor.close()
         elif hasattr(db_client, 'execute'):
             return db_client.execute(query)
@@ -5,6 +5,9 @@ from typing import Any
 class WidgetStrategy(ABC):
     """Abstract base class for widget strategies"""
 
+    # ClickHouse settings profile the widget's query runs with (see execution_profiles)
+    execution_profile = "interactive"
+
     @abstractmethod
     def get_query(self, filters: dict[str, Any] | None = None) -> str:
         """Get the ClickHouse query for this widget type"""
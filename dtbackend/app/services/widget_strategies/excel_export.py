@@ -11,6 +11,8 @@ from .base import WidgetStrategy
 class ExcelExportWidgetStrategy(WidgetStrategy):
     """Strategy for Excel export widget - exports detailed test data to Excel"""
 
+    execution_profile = "export"
+
     def _extract_column_names_from_query(self, query: str) -> list:
         """Extract column names from SELECT statement"""
         try:
@@ -14,17 +14,35 @@ from app.core.config import settings
 from app.core.exception_handlers import unhandled_exception_handler
 from app.core.middleware import AuthMiddleware
 from app.core.platform_middleware import PlatformMiddleware
+from app.core.read_replicas import ReplicaHealthMonitor
 from app.services.csuite_history_scheduler import CSuiteHistoryScheduler
+from app.services.query_telemetry import QueryLogWriter
+from app.services.report_jobs import report_job_queue
+from app.services.report_snapshot_scheduler import ReportSnapshotScheduler
+from app.services.report_streams import report_streams
+from app.services.reports_service import ConnectionPool
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
     # Start background scheduler that writes one snapshot per company per ISO week.
     CSuiteHistoryScheduler.start()
+    # Refresh materialized snapshots of snapshot-enabled reports on their cron.
+    ReportSnapshotScheduler.start()
+    # Write report query telemetry to query_log when REPORT_QUERY_LOG_ENABLED is set.
+    QueryLogWriter.start()
+    # Check the read replicas listed in report database configs.
+    ReplicaHealthMonitor.start()
     try:
         yield
     finally:
         await CSuiteHistoryScheduler.stop()
+        await ReportSnapshotScheduler.stop()
+        await report_job_queue.stop()
+        await report_streams.stop()
+        await QueryLogWriter.stop()
+        await ReplicaHealthMonitor.stop()
+        await ConnectionPool().close_asyncpg_pools()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -47,6 +65,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets the frontend read the report list's next-page cursor
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Catch-all so unhandled exceptions return a real 500 WITH CORS headers
@@ -0,0 +1,112 @@
+"""Unit tests for per-database admission control. No DB.
+
+Run with: python -m unittest test_admission_control -v
+"""
+import asyncio
+import unittest
+
+from app.services.admission_control import AdmissionController, AdmissionTimeoutError
+
+
+async def _hold(controller, target, user, order, release, limit=None):
+    async with controller.admit(target, user, limit) as ticket:
+        order.append(user)
+        await release.wait()
+        return ticket.queue_time_ms
+
+
+class AdmissionControllerTest(unittest.TestCase):
+    def test_limit_is_enforced_per_target(self):
+        async def scenario():
+            controller = AdmissionController(default_limit=2, per_user_limit=0, queue_timeout=5)
+            release = asyncio.Event()
+            order = []
+            tasks = [asyncio.create_task(_hold(controller, "db1", f"u{i}", order, release)) for i in range(3)]
+            other = asyncio.create_task(_hold(controller, "db2", "x", order, release))
+            await asyncio.sleep(0.01)
+            # db1 is full, but db2 has its own slots
+            self.assertEqual(sorted(order), ["u0", "u1", "x"])
+            self.assertEqual(controller.stats()["db1"]["waiting"], 1)
+            release.set()
+            queue_times = await asyncio.gather(*tasks, other)
+            self.assertEqual(queue_times[:2], [0.0, 0.0])
+            self.assertGreater(queue_times[2], 0)
+            self.assertEqual(controller.stats()["db1"]["active"], 0)
+
+        asyncio.run(scenario())
+
+    def test_waiting_users_are_served_round_robin(self):
+        async def scenario():
+            controller = AdmissionController(default_limit=1, per_user_limit=0, queue_timeout=5)
+            order = []
+            gate_open = asyncio.Event()
+
+            async def query(user):
+                async with controller.admit("db", user):
+                    order.append(user)
+                    await gate_open.wait()
+
+            blocker = asyncio.create_task(query("first"))
+            await asyncio.sleep(0)
+            # "heavy" queues a whole report before "light" asks for one panel
+            tasks = [asyncio.create_task(query("heavy")) for _ in range(3)]
+            await asyncio.sleep(0)
+            tasks.append(asyncio.create_task(query("light")))
+            await asyncio.sleep(0.01)
+            gate_open.set()
+            await asyncio.gather(blocker, *tasks)
+            self.assertEqual(order, ["first", "heavy", "light", "heavy", "heavy"])
+
+        asyncio.run(scenario())
+
+    def test_per_user_limit_lets_other_users_through(self):
+        async def scenario():
+            controller = AdmissionController(default_limit=3, per_user_limit=1, queue_timeout=5)
+            release = asyncio.Event()
+            order = []
+            tasks = [asyncio.create_task(_hold(controller, "db", "heavy", order, release)) for _ in range(2)]
+            await asyncio.sleep(0)
+            tasks.append(asyncio.create_task(_hold(controller, "db", "light", order, release)))
+            await asyncio.sleep(0.01)
+            self.assertEqual(order, ["heavy", "light"])
+            release.set()
+            await asyncio.gather(*tasks)
+            self.assertEqual(order, ["heavy", "light", "heavy"])
+
+        asyncio.run(scenario())
+
+    def test_queue_timeout_raises_and_frees_the_waiter(self):
+        async def scenario():
+            controller = AdmissionController(default_limit=1, per_user_limit=0, queue_timeout=0.05)
+            release = asyncio.Event()
+            holder = asyncio.create_task(_hold(controller, "db", "a", [], release))
+            await asyncio.sleep(0)
+            with self.assertRaises(AdmissionTimeoutError):
+                async with controller.admit("db", "b"):
+                    pass
+            self.assertEqual(controller.stats()["db"]["waiting"], 0)
+            self.assertEqual(controller.stats()["db"]["timeouts"], 1)
+            release.set()
+            await holder
+
+        asyncio.run(scenario())
+
+    def test_config_limit_overrides_default(self):
+        self.assertEqual(AdmissionController.limit_from_config({"max_concurrent_queries": "3"}), 3)
+        self.assertIsNone(AdmissionController.limit_from_config({"host": "x"}))
+
+        async def scenario():
+            controller = AdmissionController(default_limit=1, per_user_limit=0, queue_timeout=5)
+            release = asyncio.Event()
+            order = []
+            tasks = [asyncio.create_task(_hold(controller, "db", f"u{i}", order, release, limit=3)) for i in range(3)]
+            await asyncio.sleep(0.01)
+            self.assertEqual(len(order), 3)
+            release.set()
+            await asyncio.gather(*tasks)
+
+        asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+"""Unit tests for the columnar and Arrow response formats. No DB.
+
+Run with: python -m unittest test_columnar_response -v
+"""
+import datetime
+import decimal
+import json
+import unittest
+from types import SimpleNamespace
+
+import pyarrow as pa
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+
+from app.schemas.reports import QueryExecutionResult, ReportExecutionResponse
+from app.services.columnar_response import (
+    ARROW_STREAM_MEDIA_TYPE,
+    check_report_response_format,
+    encode_column,
+    encode_report_execution,
+    encode_widget_data,
+    negotiate_response_format,
+)
+
+
+def make_response(rows, results=1):
+    result = QueryExecutionResult(
+        query_id=7, query_name="Trend", columns=["ts", "line", "value"], data=rows,
+        total_rows=len(rows), execution_time_ms=12.5, success=True,
+    )
+    return ReportExecutionResponse(report_id=1, report_name="R", results=[result] * results, total_execution_time_ms=13.0, success=True)
+
+
+def chart_rows(n):
+    start = datetime.datetime(2024, 1, 1)
+    return [[start + datetime.timedelta(minutes=i), f"line-{i % 4}", i / 4] for i in range(n)]
+
+
+class EncodeColumnTest(unittest.TestCase):
+    def test_typed_encodings(self):
+        self.assertEqual(encode_column([1, None, 3]), ("int", [1, None, 3]))
+        self.assertEqual(encode_column([1, 2.5, decimal.Decimal("0.5")]), ("float", [1.0, 2.5, 0.5]))
+        self.assertEqual(encode_column([True, False]), ("bool", [True, False]))
+        self.assertEqual(encode_column([datetime.datetime(1970, 1, 1, 0, 0, 1), None]), ("timestamp", [1000, None]))
+        self.assertEqual(encode_column([datetime.date(1970, 1, 3)]), ("date", [2]))
+        self.assertEqual(encode_column(["a", "b", "c"]), ("string", ["a", "b", "c"]))
+        self.assertEqual(encode_column(["a", "b", "a", "a"]), ("dictionary", {"dictionary": ["a", "b"], "indices": [0, 1, 0, 0]}))
+        self.assertEqual(encode_column([1, "x"]), ("json", [1, "x"]))
+
+
+class EncodeReportExecutionTest(unittest.TestCase):
+    def test_columnar_payload_is_smaller_than_rows(self):
+        response = make_response(chart_rows(2000))
+        body = encode_report_execution(response, "columnar").body
+        payload = json.loads(body)
+        result = payload["results"][0]
+        self.assertEqual(result["column_types"], ["timestamp", "dictionary", "float"])
+        self.assertEqual(result["data"][2][:3], [0.0, 0.25, 0.5])
+        self.assertEqual(result["total_rows"], 2000)
+        self.assertEqual(payload["report_name"], "R")
+
+        # Same compact separators as JSONResponse
+        rows_body = json.dumps(jsonable_encoder(response), separators=(",", ":")).encode()
+        self.assertLess(len(body), len(rows_body) * 0.6)
+
+    def test_arrow_stream_round_trips(self):
+        response = encode_report_execution(make_response(chart_rows(10)), "arrow")
+        self.assertEqual(response.media_type, ARROW_STREAM_MEDIA_TYPE)
+        table = pa.ipc.open_stream(response.body).read_all()
+        self.assertEqual(table.column_names, ["ts", "line", "value"])
+        self.assertTrue(pa.types.is_dictionary(table.schema.field("line").type))
+        self.assertEqual(table.num_rows, 10)
+        self.assertEqual(json.loads(table.schema.metadata[b"result"])["query_id"], 7)
+
+    def test_arrow_needs_a_single_result(self):
+        with self.assertRaises(HTTPException) as ctx:
+            encode_report_execution(make_response(chart_rows(2), results=2), "arrow")
+        self.assertEqual(ctx.exception.status_code, 406)
+
+    def test_arrow_for_a_whole_report_is_rejected_up_front(self):
+        with self.assertRaises(HTTPException) as ctx:
+            check_report_response_format("arrow", None)
+        self.assertEqual(ctx.exception.status_code, 406)
+        check_report_response_format("arrow", 7)
+        check_report_response_format("columnar", None)
+
+
+class EncodeWidgetDataTest(unittest.TestCase):
+    def test_records_are_encoded_by_column(self):
+        data = {"data": [{"machine": "M1", "oee": 0.5}, {"machine": "M2", "oee": 0.75, "note": "x"}], "total_records": 2}
+        payload = json.loads(encode_widget_data(data, "columnar").body)
+        self.assertEqual(payload["columns"], ["machine", "oee", "note"])
+        self.assertEqual(payload["data"], [["M1", "M2"], [0.5, 0.75], [None, "x"]])
+        self.assertEqual(payload["total_records"], 2)
+
+    def test_other_shapes_are_returned_unchanged(self):
+        data = {"data": {"summary": 1}}
+        self.assertIs(encode_widget_data(data, "columnar"), data)
+
+
+class NegotiateResponseFormatTest(unittest.TestCase):
+    def test_query_parameter_then_accept_header(self):
+        arrow_request = SimpleNamespace(headers={"accept": ARROW_STREAM_MEDIA_TYPE})
+        self.assertEqual(negotiate_response_format(arrow_request), "arrow")
+        self.assertEqual(negotiate_response_format(arrow_request, "columnar"), "columnar")
+        self.assertEqual(negotiate_response_format(SimpleNamespace(headers={"accept": "application/json"})), "rows")
+
+
+if __name__ == "__main__":
+    unittest.main()
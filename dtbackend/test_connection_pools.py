@@ -0,0 +1,125 @@
+"""Unit tests for the bounded report connection pools. No DB: connections are
+plain objects produced by a counting factory.
+
+Run with: python -m unittest test_connection_pools -v
+"""
+import threading
+import time
+import unittest
+
+from app.services.connection_pools import BoundedConnectionPool, PoolTimeoutError
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.closed = False
+
+
+def _make_pool(**kwargs):
+    created = []
+
+    def factory():
+        conn = FakeConnection(len(created) + 1)
+        created.append(conn)
+        return conn
+
+    def close(conn):
+        conn.closed = True
+
+    return BoundedConnectionPool(factory=factory, close=close, **kwargs), created
+
+
+class BoundedConnectionPoolTest(unittest.TestCase):
+    def test_concurrent_checkouts_get_distinct_connections(self):
+        pool, created = _make_pool(max_size=3)
+        conns = [pool.checkout() for _ in range(3)]
+        self.assertEqual(len({id(c) for c in conns}), 3)
+        self.assertEqual(len(created), 3)
+
+    def test_checkin_reuses_connection(self):
+        pool, created = _make_pool(max_size=3)
+        conn = pool.checkout()
+        pool.checkin(conn)
+        self.assertIs(pool.checkout(), conn)
+        self.assertEqual(len(created), 1)
+
+    def test_discard_closes_and_frees_slot(self):
+        pool, created = _make_pool(max_size=1)
+        conn = pool.checkout()
+        pool.checkin(conn, discard=True)
+        self.assertTrue(conn.closed)
+        self.assertIsNot(pool.checkout(), conn)
+        self.assertEqual(len(created), 2)
+
+    def test_checkout_times_out_when_exhausted(self):
+        pool, _ = _make_pool(max_size=1, checkout_timeout=0.05)
+        pool.checkout()
+        with self.assertRaises(PoolTimeoutError):
+            pool.checkout()
+        self.assertEqual(pool.stats()["timeouts"], 1)
+
+    def test_waiter_receives_returned_connection_and_wait_is_recorded(self):
+        pool, _ = _make_pool(max_size=1, checkout_timeout=5)
+        conn = pool.checkout()
+        received = []
+        waiter = threading.Thread(target=lambda: received.append(pool.checkout()))
+        waiter.start()
+        time.sleep(0.05)
+        pool.checkin(conn)
+        waiter.join(timeout=2)
+        self.assertEqual(received, [conn])
+        stats = pool.stats()
+        self.assertEqual(stats["waited_checkouts"], 1)
+        self.assertGreater(stats["max_wait_ms"], 0)
+
+    def test_idle_connections_are_evicted(self):
+        pool, _ = _make_pool(max_size=2, idle_timeout=0.01)
+        conn = pool.checkout()
+        pool.checkin(conn)
+        time.sleep(0.03)
+        self.assertIsNot(pool.checkout(), conn)
+        self.assertTrue(conn.closed)
+
+    def test_min_size_is_prefilled_and_survives_idle_eviction(self):
+        pool, created = _make_pool(max_size=3, min_size=1, idle_timeout=0.01)
+        pool.prefill()
+        self.assertEqual(len(created), 1)
+        time.sleep(0.03)
+        self.assertIs(pool.checkout(), created[0])
+        self.assertFalse(created[0].closed)
+
+    def test_failed_validation_replaces_connection(self):
+        def validate(conn):
+            if conn.number == 1:
+                raise RuntimeError("connection reset by peer")
+
+        pool, created = _make_pool(max_size=2, validate=validate)
+        conn = pool.checkout()
+        pool.checkin(conn)
+        replacement = pool.checkout()
+        self.assertIsNot(replacement, conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.stats()["validation_failures"], 1)
+
+    def test_connection_recycled_after_max_uses(self):
+        pool, created = _make_pool(max_size=1, max_uses=2)
+        for _ in range(2):
+            pool.checkin(pool.checkout())
+        self.assertTrue(created[0].closed)
+        self.assertIsNot(pool.checkout(), created[0])
+        self.assertEqual(pool.stats()["recycled"], 1)
+
+    def test_failed_reset_discards_connection(self):
+        def reset(conn):
+            raise RuntimeError("rollback failed")
+
+        pool, created = _make_pool(max_size=1, reset=reset)
+        conn = pool.checkout()
+        pool.checkin(conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.stats()["size"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+"""Unit tests for line/area chart downsampling. No DB.
+
+Run with: python -m unittest test_downsampling -v
+"""
+import datetime
+import math
+import unittest
+
+from app.services.downsampling import (
+    DownsamplingSpec,
+    downsample_rows,
+    downsampling_spec,
+    lttb_indices,
+    min_max_indices,
+)
+
+
+def sine_rows(n, spike_at=None):
+    start = datetime.datetime(2024, 1, 1)
+    rows = [[start + datetime.timedelta(seconds=i), math.sin(i / 50), f"note {i}"] for i in range(n)]
+    if spike_at is not None:
+        rows[spike_at][1] = 100.0
+    return rows
+
+
+class DownsamplingSpecTest(unittest.TestCase):
+    def test_only_line_and_area_charts_that_opt_in(self):
+        config = {"type": "line", "x_axis": "ts", "y_axis": "value", "chart_options": {"downsampling": "lttb", "target_points": 200}}
+        self.assertEqual(downsampling_spec(config), DownsamplingSpec("lttb", 200, "ts", "value", None))
+        # The request's target_points wins over the configured one
+        self.assertEqual(downsampling_spec(config, 50).target_points, 50)
+        self.assertIsNone(downsampling_spec({**config, "type": "bar"}))
+        self.assertIsNone(downsampling_spec({"type": "line", "chart_options": {}}))
+        self.assertIsNone(downsampling_spec(None))
+
+
+class AlgorithmTest(unittest.TestCase):
+    def test_lttb_keeps_endpoints_and_target_count(self):
+        xs = [float(i) for i in range(1000)]
+        ys = [math.sin(i / 30) for i in range(1000)]
+        indices = lttb_indices(xs, ys, 100)
+        self.assertEqual(len(indices), 100)
+        self.assertEqual((indices[0], indices[-1]), (0, 999))
+        self.assertEqual(indices, sorted(set(indices)))
+
+    def test_small_inputs_are_unchanged(self):
+        self.assertEqual(lttb_indices([0.0, 1.0, 2.0], [1.0, 2.0, 3.0], 10), [0, 1, 2])
+        self.assertEqual(min_max_indices([1.0, None], 10), [0, 1])
+
+    def test_min_max_keeps_spikes(self):
+        ys = [0.0] * 1000
+        ys[537] = 50.0
+        ys[538] = -50.0
+        indices = min_max_indices(ys, 20)
+        self.assertIn(537, indices)
+        self.assertIn(538, indices)
+        self.assertLessEqual(len(indices), 22)
+
+
+class DownsampleRowsTest(unittest.TestCase):
+    columns = ["ts", "value", "note"]
+
+    def test_whole_rows_are_kept_in_order(self):
+        rows = sine_rows(5000, spike_at=1234)
+        kept = downsample_rows(self.columns, rows, DownsamplingSpec("lttb", 300, "ts", "value", None))
+        self.assertEqual(len(kept), 300)
+        self.assertIn(rows[1234], kept)
+        self.assertEqual(kept, sorted(kept, key=lambda row: row[0]))
+
+    def test_each_series_is_downsampled_separately(self):
+        rows = [[i // 2, float(i % 7), "a" if i % 2 else "b"] for i in range(4000)]
+        kept = downsample_rows(["x", "y", "series"], rows, DownsamplingSpec("minmax", 100, "x", "y", "series"))
+        self.assertEqual({row[2] for row in kept}, {"a", "b"})
+        self.assertLessEqual(len(kept), 2 * 102)
+
+    def test_non_numeric_y_is_left_alone(self):
+        rows = [[i, "x"] for i in range(100)]
+        self.assertEqual(downsample_rows(["x", "y"], rows, DownsamplingSpec("lttb", 10, None, None, None)), rows)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+"""Unit tests for ClickHouse execution profiles. No DB: the database call and
+ClickHouse client are in-memory fakes.
+
+Run with: python -m unittest test_execution_profiles -v
+"""
+import asyncio
+import unittest
+
+from app.services.execution_profiles import (
+    DEFAULT_PROFILE,
+    profile_settings,
+    resolve_profile,
+)
+from app.services.report_definitions import ReportDefinition
+from app.services.reports_service import ReportsService
+from app.services.widget_factory import WidgetFactory
+from test_report_definitions import make_report
+
+
+class ProfileSettingsTest(unittest.TestCase):
+    def test_resolution_and_overrides(self):
+        self.assertEqual(resolve_profile(None, "heavy"), "heavy")
+        self.assertEqual(resolve_profile("unknown", None), DEFAULT_PROFILE)
+        self.assertEqual(profile_settings(None)["priority"], profile_settings("interactive")["priority"])
+        self.assertLess(profile_settings("interactive")["priority"], profile_settings("export")["priority"])
+
+        db_config = {"execution_profiles": {"heavy": {"max_threads": 32, "max_execution_time": 600}}}
+        heavy = profile_settings("heavy", db_config)
+        self.assertEqual((heavy["max_threads"], heavy["max_execution_time"]), (32, 600))
+        self.assertNotIn("max_threads", profile_settings("heavy"))
+
+
+class ExecuteQueryProfileTest(unittest.TestCase):
+    def run_query(self, report, **kwargs):
+        definition = ReportDefinition(report)
+        service = ReportsService(None)
+        calls = []
+
+        async def execute_sql(db_type, sql, db_config, platform, params, max_execution_time, clickhouse_settings):
+            calls.append((max_execution_time, clickhouse_settings))
+            return ["id"], [(1,)]
+
+        service._execute_sql = execute_sql
+        asyncio.run(service.execute_query(definition.queries[0], [], platform=definition.platform, cache_ttl_seconds=0, check_cost=False, **kwargs))
+        return calls[0]
+
+    def test_profile_settings_are_sent(self):
+        _, query_settings = self.run_query(make_report())
+        self.assertEqual(query_settings, profile_settings("interactive"))
+        _, query_settings = self.run_query(make_report(), execution_profile="export")
+        self.assertEqual(query_settings["priority"], profile_settings("export")["priority"])
+
+    def test_profile_time_limit_applies_to_reports_without_one(self):
+        report = make_report()
+        report.platform.db_config = {"host": "ch", "execution_profiles": {"heavy": {"max_execution_time": 300}}}
+        self.assertEqual(self.run_query(report, execution_profile="heavy")[0], 300)
+        self.assertEqual(self.run_query(report, execution_profile="heavy", max_execution_time=20)[0], 20)
+
+
+class Client:
+    """Stands in for clickhouse_driver.Client (WidgetFactory dispatches on the class name)"""
+
+    def __init__(self):
+        self.calls = []
+
+    def execute(self, query, **kwargs):
+        self.calls.append(kwargs)
+        return []
+
+
+class WidgetProfileTest(unittest.TestCase):
+    def test_widget_queries_use_the_strategy_profile(self):
+        client = Client()
+        WidgetFactory._execute_query(client, "SELECT 1", "export")
+        self.assertEqual(client.calls[0]["settings"], profile_settings("export"))
+
+        # The platform's own overrides of the profile apply too
+        db_config = {"execution_profiles": {"export": {"max_threads": 2}}}
+        WidgetFactory._execute_query(client, "SELECT 1", "export", db_config)
+        self.assertEqual(client.calls[1]["settings"]["max_threads"], 2)
+        self.assertEqual(WidgetFactory.get_strategy("excel_export").execution_profile, "export")
+        self.assertEqual(WidgetFactory.get_strategy("efficiency").execution_profile, "interactive")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+"""Unit tests for cached dropdown filter options. No DB: option rows come from
+in-memory loaders.
+
+Run with: python -m unittest test_filter_option_cache -v
+"""
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from app.services.filter_option_cache import FilterOptionCache, FilterOptionIndex
+from app.services.reports_service import ReportsService
+from test_report_definitions import FakeSession, make_report
+
+ROWS = [
+    ("IST", "Istanbul"),
+    ("ANK", "Ankara"),
+    ("IZM", "Izmir"),
+    ("ANK", "Ankara (duplicate)"),
+    ("ADN", "Adana"),
+    ("KAN", "Kastamonu - Ankara yolu"),
+]
+
+
+class FilterOptionIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = FilterOptionIndex.from_rows(ROWS)
+
+    def labels(self, term, offset=0, limit=10):
+        options, total = self.index.search(term, offset, limit)
+        return [option["label"] for option in options], total
+
+    def test_rows_keep_query_order_and_duplicates(self):
+        self.assertEqual(len(self.index), 6)
+        self.assertEqual(self.labels(""), (["Istanbul", "Ankara", "Izmir", "Ankara (duplicate)", "Adana", "Kastamonu - Ankara yolu"], 6))
+        self.assertEqual(FilterOptionIndex.from_rows([(1,), (2,)]).options, [{"value": 1, "label": "1"}, {"value": 2, "label": "2"}])
+
+    def test_matches_values_in_query_order(self):
+        self.assertEqual(self.labels("AN"), (["Ankara", "Ankara (duplicate)", "Kastamonu - Ankara yolu"], 3))
+        # Only Istanbul's label contains "bul"
+        self.assertEqual(self.labels("bul"), ([], 0))
+
+    def test_matches_labels_when_asked(self):
+        options, total = self.index.search("bul", 0, 10, match_labels=True)
+        self.assertEqual(([o["value"] for o in options], total), (["IST"], 1))
+        options, total = self.index.search("an", 0, 10, match_labels=True)
+        self.assertEqual(([o["value"] for o in options], total), (["IST", "ANK", "ANK", "ADN", "KAN"], 5))
+
+    def test_typing_narrows_to_the_same_results_as_a_fresh_search(self):
+        for term in ["a", "an", "ank", "anka"]:
+            self.index.search(term, 0, 10, match_labels=True)
+        fresh = FilterOptionIndex.from_rows(ROWS)
+        self.assertEqual(self.index.search("ankar", 0, 10, match_labels=True), fresh.search("ankar", 0, 10, match_labels=True))
+        self.assertEqual(self.labels("ank"), (["Ankara", "Ankara (duplicate)"], 2))
+
+    def test_pagination(self):
+        self.assertEqual(self.labels("a", offset=1, limit=2), (["Ankara (duplicate)", "Adana"], 4))
+        self.assertEqual(self.labels("a", offset=10, limit=2), ([], 4))
+
+
+class FilterOptionCacheTest(unittest.TestCase):
+    def test_concurrent_misses_share_one_load(self):
+        cache = FilterOptionCache(max_filters=4, max_options=10)
+        loads = []
+
+        async def load_rows(max_rows):
+            loads.append(max_rows)
+            await asyncio.sleep(0.01)
+            return ROWS
+
+        async def scenario():
+            return await asyncio.gather(*(cache.get_or_load("k", load_rows, 60, report_id=1) for _ in range(3)))
+
+        indexes = asyncio.run(scenario())
+        self.assertEqual(loads, [11])
+        self.assertTrue(all(index is indexes[0] for index in indexes))
+
+        cache.invalidate_report(1)
+        asyncio.run(cache.get_or_load("k", load_rows, 60, report_id=1))
+        self.assertEqual(len(loads), 2)
+
+    def test_filters_with_too_many_options_are_not_indexed(self):
+        cache = FilterOptionCache(max_filters=4, max_options=3)
+        loads = []
+
+        async def load_rows(max_rows):
+            loads.append(max_rows)
+            return ROWS[:max_rows]
+
+        self.assertIsNone(asyncio.run(cache.get_or_load("k", load_rows, 60)))
+        # Remembered, so later searches go straight to the database
+        self.assertIsNone(asyncio.run(cache.get_or_load("k", load_rows, 60)))
+        self.assertEqual(loads, [4])
+
+
+class ReportsServiceFilterOptionsTest(unittest.TestCase):
+    def setUp(self):
+        report = make_report()
+        report.queries[0].filters[0].dropdown_query = "SELECT code, name FROM cities ORDER BY name;"
+        self.service = ReportsService(FakeSession(report))
+        for cache in (self.service._report_definitions, self.service._filter_options):
+            cache.clear()
+            self.addCleanup(cache.clear)
+        patcher = mock.patch("app.services.reports_service.UserService.get_user_by_username", mock.AsyncMock(return_value=object()))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_searches_are_served_from_the_index(self):
+        fetch = mock.AsyncMock(return_value=ROWS)
+        user = SimpleNamespace(username="owner", department=None, role=None)
+
+        async def scenario():
+            with mock.patch.object(ReportsService, "_fetch_filter_option_rows", fetch):
+                first = await self.service.get_filter_options(1, 5, "status", user, page=1, page_size=2)
+                second = await self.service.get_filter_options(1, 5, "status", user, page=1, page_size=2, search="ank")
+            return first, second
+
+        first, second = asyncio.run(scenario())
+        self.assertEqual(fetch.await_count, 1)
+        self.assertEqual(fetch.await_args.args[:2], ("clickhouse", "SELECT code, name FROM cities ORDER BY name"))
+        self.assertEqual((len(first["options"]), first["total"], first["has_more"]), (2, 6, True))
+        self.assertEqual([o["value"] for o in second["options"]], ["ANK", "ANK"])
+        self.assertEqual(second["total"], 2)
+        self.assertFalse(second["has_more"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+"""Unit tests for keyset pagination SQL and cursor tokens. No DB.
+
+Run with: python -m unittest test_keyset_pagination -v
+"""
+import asyncio
+import datetime
+import decimal
+import unittest
+from types import SimpleNamespace
+
+from app.schemas.reports import ReportExecutionRequest
+from app.services.keyset_pagination import (
+    build_keyset_query,
+    decode_cursor,
+    encode_cursor,
+    keyset_fingerprint,
+    next_cursor_values,
+    sql_literal,
+)
+from app.services.report_definitions import ReportDefinition
+from app.services.reports_service import ReportsService
+from test_report_definitions import make_report
+
+BASE_SQL = "SELECT id, name, created_at FROM orders WHERE status = 'open'"
+
+
+class KeysetQueryTest(unittest.TestCase):
+    def test_first_page_orders_and_fetches_one_extra_row(self):
+        sql = build_keyset_query(BASE_SQL, "postgresql", ["created_at", "id"], "desc", 50)
+        self.assertEqual(
+            sql,
+            f'SELECT * FROM ({BASE_SQL}) AS keyset_page ORDER BY "created_at" DESC, "id" DESC LIMIT 51',
+        )
+
+    def test_next_page_seeks_with_row_comparison(self):
+        sql = build_keyset_query(BASE_SQL, "clickhouse", ["created_at", "id"], "asc", 10, ["2024-01-01 00:00:00", 7])
+        self.assertIn("WHERE (\"created_at\", \"id\") > ('2024-01-01 00:00:00', 7)", sql)
+
+    def test_mssql_expands_row_comparison_and_uses_top(self):
+        sql = build_keyset_query(BASE_SQL, "mssql", ["name", "id"], "desc", 10, ["b", 3])
+        self.assertTrue(sql.startswith("SELECT TOP 11 * FROM"))
+        self.assertIn("WHERE (\"name\" < N'b') OR (\"name\" = N'b' AND \"id\" < 3)", sql)
+
+    def test_string_literals_are_escaped(self):
+        self.assertEqual(sql_literal("O'Brien", "postgresql"), "'O''Brien'")
+        self.assertEqual(sql_literal("a\\' OR 1=1", "clickhouse"), "'a\\\\\\' OR 1=1'")
+
+    def test_typed_values_render_as_typed_literals(self):
+        created = datetime.datetime(2024, 1, 2, 3, 4, 5, 123456)
+        self.assertEqual(sql_literal(created, "mssql"), "CAST('2024-01-02T03:04:05.123456' AS datetime2(7))")
+        self.assertEqual(sql_literal(created, "postgresql"), "TIMESTAMP '2024-01-02 03:04:05.123456'")
+        aware = created.replace(tzinfo=datetime.timezone(datetime.timedelta(hours=3)))
+        self.assertEqual(sql_literal(aware, "clickhouse"), "toDateTime64('2024-01-02 00:04:05.123456', 6, 'UTC')")
+        self.assertEqual(sql_literal(aware, "mssql"), "CAST('2024-01-02T03:04:05.123456+03:00' AS datetimeoffset(7))")
+        self.assertEqual(sql_literal(decimal.Decimal("1.250"), "clickhouse"), "toDecimal128('1.250', 3)")
+        self.assertEqual(sql_literal(decimal.Decimal("1.25"), "mssql"), "1.25")
+        self.assertEqual(sql_literal(datetime.date(2024, 1, 2), "postgresql"), "DATE '2024-01-02'")
+
+
+class KeysetCursorTest(unittest.TestCase):
+    def setUp(self):
+        self.fingerprint = keyset_fingerprint(BASE_SQL, ["created_at", "id"], "asc")
+
+    def test_round_trip(self):
+        token = encode_cursor(["2024-01-01", 42], 1000, self.fingerprint)
+        self.assertEqual(decode_cursor(token, self.fingerprint), (["2024-01-01", 42], 1000))
+
+    def test_typed_values_survive_the_token(self):
+        values = [datetime.datetime(2024, 1, 2, 3, 4, 5, 123456, tzinfo=datetime.timezone.utc), decimal.Decimal("1.25"), datetime.date(2024, 1, 2), 7]
+        token = encode_cursor(values, None, self.fingerprint)
+        self.assertEqual(decode_cursor(token, self.fingerprint), (values, None))
+
+    def test_cursor_from_other_filters_is_rejected(self):
+        token = encode_cursor([1], 10, self.fingerprint)
+        other = keyset_fingerprint(BASE_SQL + " AND id > 5", ["created_at", "id"], "asc")
+        with self.assertRaises(ValueError):
+            decode_cursor(token, other)
+
+    def test_garbage_cursor_is_rejected(self):
+        with self.assertRaises(ValueError):
+            decode_cursor("not-a-cursor", self.fingerprint)
+
+    def test_next_cursor_values_match_output_columns(self):
+        values = next_cursor_values(["ID", "Name"], [5, "x"], ['"Name"', "t.id"])
+        self.assertEqual(values, ["x", 5])
+
+
+class ExecuteReportKeysetTest(unittest.TestCase):
+    def setUp(self):
+        self.service = ReportsService(None)
+        self.calls = []
+        definition = ReportDefinition(make_report())
+
+        async def get_executable_report(report_id, _user):
+            return definition
+
+        async def execute_query(query, *args, **kwargs):
+            self.calls.append((query.id, kwargs["pagination_mode"], kwargs["cursor"]))
+            raise RuntimeError("not executed")
+
+        self.service._get_executable_report = get_executable_report
+        self.service.execute_query = execute_query
+        self.user = SimpleNamespace(username="owner", department=None, role=None)
+
+    def test_cursor_applies_to_the_paged_query_only(self):
+        request = ReportExecutionRequest(report_id=1, query_id=5, pagination_mode="keyset", cursor="abc", sort_by="id", page_size=10)
+        asyncio.run(self.service.execute_report(request, self.user))
+        self.assertEqual(self.calls, [(5, "keyset", "abc")])
+
+    def test_cursor_without_query_id_is_rejected(self):
+        request = ReportExecutionRequest(report_id=1, pagination_mode="keyset", cursor="abc", sort_by="id", page_size=10)
+        with self.assertRaises(ValueError):
+            asyncio.run(self.service.execute_report(request, self.user))
+        self.assertEqual(self.calls, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+"""Unit tests for query cancellation on client disconnect. No DB: the request
+and the running queries are in-memory fakes.
+
+Run with: python -m unittest test_query_cancellation -v
+"""
+import asyncio
+import threading
+import unittest
+from unittest import mock
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.services.query_cancellation import (
+    QueryCancelledError,
+    QueryCancelScope,
+    current_cancel_scope,
+    register_cursor,
+    run_until_disconnected,
+    unregister_query,
+)
+
+
+class FakeRequest:
+    def __init__(self, disconnect_after_checks=None):
+        self.checks = 0
+        self.disconnect_after_checks = disconnect_after_checks
+
+    async def is_disconnected(self):
+        self.checks += 1
+        return self.disconnect_after_checks is not None and self.checks > self.disconnect_after_checks
+
+
+class FakeCursor:
+    def __init__(self):
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def execute(self):
+        # Blocks like a long-running statement until cancelled
+        self.cancelled.wait(5)
+
+
+class QueryCancelScopeTest(unittest.TestCase):
+    def test_cancel_runs_registered_cancellers_only(self):
+        scope = QueryCancelScope()
+        calls = []
+        scope.register(lambda: calls.append("a"))
+        finished = scope.register(lambda: calls.append("b"))
+        scope.unregister(finished)
+        asyncio.run(scope.cancel())
+        self.assertEqual(calls, ["a"])
+
+    def test_register_after_cancel_raises(self):
+        scope = QueryCancelScope()
+        asyncio.run(scope.cancel())
+        with self.assertRaises(QueryCancelledError):
+            scope.register(lambda: None)
+
+    def test_registration_outside_a_scope_is_a_no_op(self):
+        self.assertIsNone(current_cancel_scope.get())
+        self.assertIsNone(register_cursor(FakeCursor()))
+        unregister_query(None)
+
+
+class RunUntilDisconnectedTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(settings, "REPORT_DISCONNECT_POLL_SECONDS", 0.01)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_result_is_returned_when_client_stays(self):
+        async def work():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        self.assertEqual(asyncio.run(run_until_disconnected(FakeRequest(), work)), "done")
+
+    def test_disconnect_cancels_queries_on_worker_threads(self):
+        cursor = FakeCursor()
+
+        def blocking_query():
+            handle = register_cursor(cursor)
+            try:
+                cursor.execute()
+            finally:
+                unregister_query(handle)
+
+        async def work():
+            await asyncio.to_thread(blocking_query)
+            return "done"
+
+        async def scenario():
+            with self.assertRaises(HTTPException) as ctx:
+                await run_until_disconnected(FakeRequest(disconnect_after_checks=2), work)
+            self.assertEqual(ctx.exception.status_code, 499)
+
+        asyncio.run(scenario())
+        self.assertTrue(cursor.cancelled.is_set())
+
+
+if __name__ == "__main__":
+    unittest.main()
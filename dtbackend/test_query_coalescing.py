@@ -0,0 +1,119 @@
+"""Unit tests for in-flight deduplication of identical report queries. No DB:
+the database call is replaced by a slow in-memory coroutine.
+
+Run with: python -m unittest test_query_coalescing -v
+"""
+import asyncio
+import unittest
+
+from app.services.query_cancellation import current_cancel_scope
+from app.services.query_coalescing import QueryCoalescer
+from app.services.report_definitions import ReportDefinition
+from app.services.reports_service import ReportsService
+from test_report_definitions import make_report
+
+
+class QueryCoalescerTest(unittest.TestCase):
+    def test_concurrent_callers_share_one_execution(self):
+        coalescer = QueryCoalescer()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "rows"
+
+        async def scenario():
+            results = await asyncio.gather(*(coalescer.run("k", work) for _ in range(5)))
+            self.assertEqual([r for r, _ in results], ["rows"] * 5)
+            self.assertEqual(sorted(joined for _, joined in results), [False, True, True, True, True])
+            self.assertEqual(len(coalescer), 0)
+            # Finished flights are not cached
+            await coalescer.run("k", work)
+
+        asyncio.run(scenario())
+        self.assertEqual(len(calls), 2)
+
+    def test_errors_are_shared(self):
+        coalescer = QueryCoalescer()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("Code: 241. Memory limit exceeded")
+
+        async def scenario():
+            return await asyncio.gather(coalescer.run("k", work), coalescer.run("k", work), return_exceptions=True)
+
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in asyncio.run(scenario())))
+
+    def test_execution_outlives_a_cancelled_caller_but_not_all_of_them(self):
+        coalescer = QueryCoalescer()
+        finished = []
+        scopes = []
+
+        async def work():
+            scopes.append(current_cancel_scope.get())
+            await asyncio.sleep(0.05)
+            finished.append(1)
+            return "rows"
+
+        async def scenario():
+            first = asyncio.ensure_future(coalescer.run("k", work))
+            second = asyncio.ensure_future(coalescer.run("k", work))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            self.assertEqual(await second, ("rows", True))
+
+            third = asyncio.ensure_future(coalescer.run("k", work))
+            await asyncio.sleep(0.01)
+            third.cancel()
+            await asyncio.sleep(0.01)
+            self.assertTrue(scopes[-1].cancelled)
+            self.assertEqual(len(coalescer), 0)
+
+        asyncio.run(scenario())
+        self.assertEqual(len(finished), 1)
+
+
+class ExecuteQueryCoalescingTest(unittest.TestCase):
+    def test_identical_queries_run_once(self):
+        definition = ReportDefinition(make_report())
+        query = definition.queries[0]
+        service = ReportsService(None)
+        executed = []
+
+        async def execute_sql(db_type, sql, *args, **kwargs):
+            executed.append(sql)
+            await asyncio.sleep(0.02)
+            return ["id"], [(1,), (2,)]
+
+        service._execute_sql = execute_sql
+
+        def run(**kwargs):
+            return service.execute_query(query, [], 1000, platform=definition.platform, cache_ttl_seconds=0, **kwargs)
+
+        async def identical():
+            return await asyncio.gather(*(run(username="ayse") for _ in range(5)))
+
+        results = asyncio.run(identical())
+        self.assertEqual(len(executed), 1)
+        self.assertTrue(all(r.success and r.data == [[1], [2]] for r in results))
+        self.assertEqual(sum(bool(r.coalesced) for r in results), 4)
+
+        async def shared_link():
+            return await asyncio.gather(run(username="ayse"), run(username="mehmet"), run(username="zeynep"))
+
+        results = asyncio.run(shared_link())
+        self.assertEqual(len(executed), 2)
+        self.assertEqual(sum(bool(r.coalesced) for r in results), 2)
+
+        async def different():
+            return await asyncio.gather(run(username="ayse"), run(username="ayse", max_execution_time=5), run(username="ayse", execution_profile="export"))
+
+        results = asyncio.run(different())
+        self.assertEqual(len(executed), 5)
+        self.assertFalse(any(r.coalesced for r in results))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+"""Unit tests for the EXPLAIN cost guard. No DB: plans are canned EXPLAIN output.
+
+Run with: python -m unittest test_query_cost_guard -v
+"""
+import asyncio
+import json
+import unittest
+
+from app.services.query_cost_guard import (
+    CostEstimate,
+    CostLimits,
+    QueryCostExceededError,
+    check_estimate,
+    cost_limits,
+    parse_clickhouse_estimate,
+    parse_postgres_plan,
+    parse_showplan_xml,
+)
+from app.services.reports_service import ReportsService
+
+POSTGRES_PLAN = json.dumps([{"Plan": {
+    "Node Type": "Limit", "Total Cost": 1250.5, "Plan Rows": 1000,
+    "Plans": [{"Node Type": "Seq Scan", "Total Cost": 98000.0, "Plan Rows": 4200000}],
+}}])
+
+SHOWPLAN_XML = """<ShowPlanXML xmlns="http://schemas.microsoft.com/sqlserver/2004/07/showplan">
+  <BatchSequence><Batch><Statements>
+    <StmtSimple StatementEstRows="100" StatementSubTreeCost="52.75">
+      <QueryPlan>
+        <RelOp EstimateRows="100" PhysicalOp="Top">
+          <RelOp EstimateRows="100" EstimatedRowsRead="9000000" PhysicalOp="Clustered Index Scan"/>
+        </RelOp>
+      </QueryPlan>
+    </StmtSimple>
+  </Statements></Batch></BatchSequence>
+</ShowPlanXML>"""
+
+
+class ParsePlanTest(unittest.TestCase):
+    def test_clickhouse_estimate_sums_rows_per_table(self):
+        columns = ["database", "table", "parts", "rows", "marks"]
+        rows = [("db", "events", 12, 3_000_000, 370), ("db", "machines", 1, 500, 1)]
+        self.assertEqual(parse_clickhouse_estimate(columns, rows), CostEstimate(3_000_500.0, None))
+        self.assertEqual(parse_clickhouse_estimate(["explain"], []), CostEstimate(None, None))
+
+    def test_postgres_plan_uses_root_cost_and_largest_node(self):
+        self.assertEqual(parse_postgres_plan(POSTGRES_PLAN), CostEstimate(4200000.0, 1250.5))
+
+    def test_showplan_xml(self):
+        self.assertEqual(parse_showplan_xml(SHOWPLAN_XML), CostEstimate(9000000.0, 52.75))
+
+
+class CostLimitsTest(unittest.TestCase):
+    def test_db_config_overrides(self):
+        limits = cost_limits({"cost_guard_mode": "warn", "max_estimated_rows": "1000000", "max_estimated_cost": None})
+        self.assertEqual((limits.mode, limits.max_rows), ("warn", 1_000_000))
+        self.assertTrue(limits.active)
+        self.assertFalse(cost_limits({"cost_guard_mode": "off", "max_estimated_rows": 10}).active)
+
+    def test_check_estimate(self):
+        limits = CostLimits("reject", 1_000_000, 0)
+        self.assertIsNone(check_estimate(CostEstimate(10, 99999999), limits))
+        self.assertIsNone(check_estimate(CostEstimate(None, None), limits))
+        self.assertIn("3,000,500 estimated rows", check_estimate(CostEstimate(3_000_500, None), limits))
+
+
+class CheckQueryCostTest(unittest.TestCase):
+    def setUp(self):
+        self.service = ReportsService(None)
+        self.service._explain_cache.clear()
+        self.addCleanup(self.service._explain_cache.clear)
+        self.explained = []
+
+    def estimate(self, result):
+        async def estimate_query_cost(db_type, sql, db_config, platform, params):
+            self.explained.append(sql)
+            if isinstance(result, Exception):
+                raise result
+            return result
+        self.service._estimate_query_cost = estimate_query_cost
+
+    def test_reject_warn_and_cache(self):
+        self.estimate(CostEstimate(5_000_000, None))
+        config = {"db_type": "clickhouse", "host": "ch", "max_estimated_rows": 1_000_000}
+
+        async def scenario():
+            with self.assertRaises(QueryCostExceededError):
+                await self.service.check_query_cost("clickhouse", "SELECT * FROM events", config)
+            warning = await self.service.check_query_cost("clickhouse", "SELECT * FROM events", {**config, "cost_guard_mode": "warn"})
+            self.assertIn("estimated rows", warning)
+
+        asyncio.run(scenario())
+        # Same target and statement: EXPLAIN ran once
+        self.assertEqual(self.explained, ["SELECT * FROM events"])
+
+    def test_no_limits_and_unreadable_plans_allow_the_query(self):
+        self.estimate(RuntimeError("EXPLAIN ESTIMATE is not supported for this table"))
+        config = {"db_type": "clickhouse", "host": "ch"}
+        self.assertIsNone(asyncio.run(self.service.check_query_cost("clickhouse", "SELECT 1", config)))
+        self.assertEqual(self.explained, [])
+
+        self.assertIsNone(asyncio.run(self.service.check_query_cost("clickhouse", "SELECT 1", {**config, "max_estimated_rows": 1})))
+        self.assertEqual(self.explained, ["SELECT 1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
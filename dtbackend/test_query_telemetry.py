@@ -0,0 +1,104 @@
+"""Unit tests for report query telemetry. No DB: the database call is replaced
+by an in-memory coroutine.
+
+Run with: python -m unittest test_query_telemetry -v
+"""
+import asyncio
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from app.services.query_telemetry import (
+    QueryTelemetry,
+    QueryTelemetryRecord,
+    estimate_json_bytes,
+    latency_summary,
+)
+from app.services.report_definitions import ReportDefinition
+from app.services.reports_service import ReportsService
+from test_report_definitions import make_report
+
+NOW = datetime(2026, 10, 17, 12, 0, tzinfo=timezone.utc)
+
+
+def record(total_ms, query_id=5, report_id=1, created_at=NOW, **values):
+    values.setdefault("success", True)
+    return QueryTelemetryRecord(created_at=created_at, report_id=report_id, query_id=query_id, query_name=f"Q{query_id}", total_ms=total_ms, rows=10, **values)
+
+
+class LatencySummaryTest(unittest.TestCase):
+    def test_nearest_rank_percentiles(self):
+        summary = latency_summary(range(1, 101))
+        self.assertEqual((summary["count"], summary["p50"], summary["p95"], summary["p99"], summary["max"]), (100, 50, 95, 99, 100))
+        self.assertEqual(latency_summary([7.0])["p90"], 7.0)
+        self.assertEqual(latency_summary([]), {"count": 0})
+
+    def test_bytes_are_extrapolated_from_a_sample(self):
+        rows = [[1, "ab"]] * 1000
+        self.assertEqual(estimate_json_bytes(rows[:100]) * 10, estimate_json_bytes(rows))
+        self.assertEqual(estimate_json_bytes([]), 2)
+
+
+class QueryTelemetryTest(unittest.TestCase):
+    def test_ring_buffer_keeps_the_newest_records(self):
+        telemetry = QueryTelemetry(buffer_size=3)
+        for ms in (1, 2, 3, 4):
+            telemetry.record(record(ms))
+        self.assertEqual([r.total_ms for r in telemetry.records()], [2, 3, 4])
+        # Nothing is queued for query_log unless it is enabled
+        self.assertEqual(telemetry.take_pending(), [])
+
+    def test_slow_queries_rank_calls_and_queries(self):
+        telemetry = QueryTelemetry(log_enabled=True)
+        for ms in (10, 20, 30):
+            telemetry.record(record(ms, query_id=5))
+        telemetry.record(record(500, query_id=6, success=False, error="timeout"))
+        telemetry.record(record(900, query_id=6, cache_hit=True))
+        telemetry.record(record(800, query_id=7, created_at=NOW - timedelta(hours=2)))
+
+        view = telemetry.slow_queries(limit=2, since=NOW - timedelta(hours=1))
+        self.assertEqual([q["query_id"] for q in view["queries"]], [6, 5])
+        self.assertEqual(view["queries"][0]["failures"], 1)
+        self.assertEqual([r["total_ms"] for r in view["slowest"]], [500, 30])
+        self.assertEqual(view["overall"]["count"], 4)
+
+        self.assertEqual(telemetry.slow_queries(include_cached=True)["slowest"][0]["total_ms"], 900)
+        self.assertEqual(telemetry.slow_queries(report_id=2)["overall"], {"count": 0})
+        self.assertEqual(len(telemetry.take_pending()), 6)
+        self.assertEqual(telemetry.take_pending(), [])
+
+
+class ExecuteQueryTelemetryTest(unittest.TestCase):
+    def test_each_execution_is_recorded(self):
+        definition = ReportDefinition(make_report())
+        query = definition.queries[0]
+        service = ReportsService(None)
+        service._telemetry = QueryTelemetry()
+        failing = []
+
+        async def execute_sql(db_type, sql, *args, **kwargs):
+            if failing:
+                raise RuntimeError("Code: 241. Memory limit exceeded")
+            return ["id"], [(1,), (2,)]
+
+        service._execute_sql = execute_sql
+        asyncio.run(service.execute_query(query, [], 1000, platform=definition.platform, cache_ttl_seconds=0, username="ayse", check_cost=False))
+
+        [entry] = service._telemetry.records()
+        self.assertEqual((entry.report_id, entry.query_id, entry.username, entry.success), (1, 5, "ayse", True))
+        self.assertEqual((entry.rows, entry.total_rows, entry.bytes), (2, 2, len("[[1],[2]]")))
+        self.assertEqual(entry.db_type, definition.platform.db_type.lower())
+        self.assertIsNotNone(entry.fetch_ms)
+        self.assertIsNotNone(entry.serialize_ms)
+        self.assertIsNone(entry.count_ms)
+        self.assertGreaterEqual(entry.total_ms, entry.fetch_ms)
+
+        failing.append(1)
+        result = asyncio.run(service.execute_query(query, [], 1000, platform=definition.platform, cache_ttl_seconds=0, check_cost=False))
+        self.assertFalse(result.success)
+        failed = service._telemetry.records()[-1]
+        self.assertEqual((failed.success, failed.rows), (False, 0))
+        self.assertIn("Memory limit exceeded", failed.error)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+"""Unit tests for compiled report query templates. No DB.
+
+Run with: python -m unittest test_query_templates -v
+"""
+import datetime
+import unittest
+
+from app.schemas.reports import FilterValue
+from app.services.query_templates import CompiledFilter, CompiledQueryTemplate
+from app.services.reports_service import ReportsService
+from app.services.sql_params import QueryParams, bind_params
+
+
+class FakeFilter:
+    def __init__(self, field_name, filter_type, required=False, sql_expression=None):
+        self.field_name = field_name
+        self.display_name = field_name
+        self.filter_type = filter_type
+        self.required = required
+        self.sql_expression = sql_expression
+
+
+class FakeQuery:
+    def __init__(self, sql, filters, query_id=1):
+        self.id = query_id
+        self.report_id = 10
+        self.sql = sql
+        self.filters = filters
+        self.created_at = datetime.datetime(2024, 1, 1)
+        self.updated_at = None
+
+
+class CompiledQueryTemplateTest(unittest.TestCase):
+    def test_placeholder_is_replaced_with_conditions(self):
+        template = CompiledQueryTemplate(
+            "SELECT * FROM t WHERE 1=1 {{dynamic_filters}} ORDER BY id",
+            [CompiledFilter.from_definition(FakeFilter("status", "dropdown"))],
+        )
+        params = QueryParams()
+        sql, conditions = template.render_filters([FilterValue(field_name="status", value="open")], "postgresql", params)
+        self.assertEqual(bind_params(sql, params, "psycopg2"), ("SELECT * FROM t WHERE 1=1  AND status = %(p0)s ORDER BY id", {"p0": "open"}))
+        self.assertEqual(len(conditions), 1)
+
+    def test_no_values_reuses_base_sql(self):
+        template = CompiledQueryTemplate("SELECT * FROM t {{dynamic_filters}}", [])
+        sql, conditions = template.render_filters([], "clickhouse", QueryParams())
+        self.assertIs(sql, template.base_sql)
+        self.assertEqual(conditions, [])
+
+    def test_where_is_added_when_missing(self):
+        template = CompiledQueryTemplate("SELECT * FROM t", [CompiledFilter.from_definition(FakeFilter("Amount", "number"))])
+        params = QueryParams()
+        sql, _ = template.render_filters([FilterValue(field_name="Amount", value="5", operator=">")], "postgresql", params)
+        self.assertEqual(bind_params(sql, params, "asyncpg"), ('SELECT * FROM t WHERE "Amount" > $1', [5]))
+
+    def test_condition_is_inserted_before_group_by(self):
+        template = CompiledQueryTemplate("SELECT dept, count() FROM t GROUP BY dept", [])
+        self.assertEqual(
+            template.add_condition(template.base_sql, "dept LIKE 'A%'"),
+            "SELECT dept, count() FROM t WHERE (dept LIKE 'A%') GROUP BY dept",
+        )
+
+    def test_missing_required_filter_raises(self):
+        template = CompiledQueryTemplate("SELECT * FROM t", [CompiledFilter.from_definition(FakeFilter("a", "text", required=True))])
+        with self.assertRaises(ValueError):
+            template.render_filters([FilterValue(field_name="b", value="x")], "postgresql", QueryParams())
+
+    def test_invalid_number_and_operator_are_not_written_into_sql(self):
+        template = CompiledQueryTemplate("SELECT * FROM t", [
+            CompiledFilter.from_definition(FakeFilter("n", "number")),
+            CompiledFilter.from_definition(FakeFilter("d", "date")),
+        ])
+        with self.assertRaises(ValueError):
+            template.render_filters([FilterValue(field_name="n", value="1 OR 1=1")], "postgresql", QueryParams())
+        params = QueryParams()
+        sql, _ = template.render_filters([FilterValue(field_name="d", value="2024-01-01", operator="= '' OR 1=1 --")], "clickhouse", params)
+        self.assertEqual(bind_params(sql, params, "clickhouse")[0], "SELECT * FROM t WHERE toDate(d) = toDate({p0:String})")
+
+
+class ReportsServiceTemplateTest(unittest.TestCase):
+    def setUp(self):
+        self.service = ReportsService(None)
+        self.service._query_templates.clear()
+
+    def test_template_is_compiled_once_per_query_version(self):
+        query = FakeQuery("SELECT * FROM t {{dynamic_filters}}", [FakeFilter("a", "text")])
+        first = self.service._get_query_template(query)
+        self.assertIs(self.service._get_query_template(query), first)
+        query.updated_at = datetime.datetime(2024, 2, 1)
+        self.assertIsNot(self.service._get_query_template(query), first)
+
+    def test_global_filters_are_part_of_the_template(self):
+        query = FakeQuery("SELECT * FROM t", [])
+        global_filters = [{"fieldName": "region", "displayName": "Region", "type": "dropdown"}]
+        sql, params = self.service.build_filtered_sql(query, [FilterValue(field_name="region", value="EU")], "clickhouse", global_filters=global_filters)
+        self.assertEqual(bind_params(sql, params, "clickhouse"), ("SELECT * FROM t WHERE region = {p0:String}", {"p0": "EU"}))
+
+    def test_filter_values_are_bound_not_spliced(self):
+        query = FakeQuery("SELECT * FROM t", [FakeFilter("a", "dropdown")])
+        value = "x'; DROP TABLE t; --"
+        sql, params = self.service.build_filtered_sql(query, [FilterValue(field_name="a", value=value)], "postgresql")
+        self.assertNotIn("DROP", sql)
+        self.assertEqual(list(params.values()), [value])
+
+    def test_department_prefixes_are_bound(self):
+        query = FakeQuery("SELECT * FROM t GROUP BY department", [])
+        sql, params = self.service.build_filtered_sql(query, [], "mssql", filter_by_department=True, user_department="A_B")
+        self.assertEqual(
+            bind_params(sql, params, "pyodbc"),
+            ("SELECT * FROM t WHERE (department LIKE ? OR department LIKE ?) GROUP BY department", ["A%", "A_B%"]),
+        )
+
+    def test_dangerous_template_is_rejected_from_cache_too(self):
+        query = FakeQuery("SELECT * FROM t /* hidden */", [])
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                self.service.build_filtered_sql(query, [], "postgresql")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+"""Unit tests for read-replica routing. No DB: health checks are recorded
+directly and the database call is an in-memory coroutine.
+
+Run with: python -m unittest test_read_replicas -v
+"""
+import asyncio
+import random
+import unittest
+
+from app.core.read_replicas import ReplicaRouter, is_connection_error, is_read_only
+from app.services.reports_service import ReportsService
+
+PRIMARY = {
+    "db_type": "postgresql", "host": "pg-primary", "port": 5432, "database": "mes", "user": "app",
+    "read_replicas": [{"host": "pg-replica-1", "weight": 3}, {"host": "pg-replica-2", "user": "reader"}],
+    "max_replication_lag_seconds": 10,
+}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class StatementClassificationTest(unittest.TestCase):
+    def test_read_only_statements(self):
+        self.assertTrue(is_read_only("SELECT * FROM orders"))
+        self.assertTrue(is_read_only("  (SELECT last_update FROM t)"))
+        self.assertTrue(is_read_only("WITH x AS (SELECT 1) SELECT * FROM x"))
+        self.assertFalse(is_read_only("SELECT * INTO #tmp FROM orders"))
+        self.assertFalse(is_read_only("SELECT * FROM orders FOR UPDATE"))
+        self.assertFalse(is_read_only("WITH d AS (DELETE FROM t RETURNING *) SELECT * FROM d"))
+        self.assertFalse(is_read_only("UPDATE orders SET status = 1"))
+
+    def test_connection_errors(self):
+        class PostgresError(Exception):
+            def __init__(self, sqlstate):
+                super().__init__("error")
+                self.sqlstate = sqlstate
+
+        self.assertTrue(is_connection_error(ConnectionRefusedError()))
+        self.assertTrue(is_connection_error(PostgresError("08006")))
+        self.assertTrue(is_connection_error(Exception("08S01", "[08S01] Communication link failure")))
+        self.assertFalse(is_connection_error(PostgresError("57014")))
+        self.assertFalse(is_connection_error(Exception("HYT00", "[HYT00] Query timeout expired")))
+        self.assertFalse(is_connection_error(RuntimeError("syntax error")))
+
+
+class ReplicaRouterTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.router = ReplicaRouter(stale_after_seconds=60, clock=self.clock, rng=random.Random(7))  # noqa: S311 — seeded for reproducible picks
+        self.first, self.second = self.router.replicas_of("postgresql", PRIMARY)
+
+    def test_replica_configs_override_the_primary(self):
+        self.assertEqual((self.first.db_config["host"], self.first.db_config["user"]), ("pg-replica-1", "app"))
+        self.assertEqual(self.second.db_config["user"], "reader")
+        self.assertNotIn("read_replicas", self.first.db_config)
+        self.assertEqual((self.first.weight, self.second.weight, self.first.max_lag), (3, 1, 10))
+        # Same primary config, same registered replicas
+        self.assertEqual(self.router.replicas_of("postgresql", dict(PRIMARY)), [self.first, self.second])
+        self.assertEqual(self.router.replicas_of("clickhouse", PRIMARY), [])
+
+    def test_only_healthy_fresh_replicas_within_lag_are_chosen(self):
+        # Unchecked replicas are not used
+        self.assertIsNone(self.router.choose("postgresql", PRIMARY))
+
+        self.router.record_check(self.first, True, lag=2)
+        self.router.record_check(self.second, True, lag=30)
+        self.assertEqual({self.router.choose("postgresql", PRIMARY).name for _ in range(20)}, {self.first.name})
+
+        self.router.record_check(self.second, True, lag=1)
+        picks = [self.router.choose("postgresql", PRIMARY) for _ in range(400)]
+        self.assertGreater(picks.count(self.first), 2 * picks.count(self.second))
+
+        self.router.mark_failed(self.first, OSError("refused"))
+        self.assertIs(self.router.choose("postgresql", PRIMARY), self.second)
+
+        # Checks older than stale_after no longer count
+        self.clock.now += 61
+        self.assertIsNone(self.router.choose("postgresql", PRIMARY))
+
+    def test_replica_sets_no_longer_targeted_are_dropped(self):
+        edited = {**PRIMARY, "read_replicas": [PRIMARY["read_replicas"][1]]}
+        self.assertEqual(self.router.replicas_of("postgresql", edited), [self.second])
+        self.clock.now += 1800
+        self.router.replicas_of("postgresql", edited)
+        self.assertEqual(self.router.prune(), 0)
+
+        # The old config's set goes, with the replica only it listed
+        self.clock.now += 1801
+        self.assertEqual(self.router.prune(), 1)
+        self.assertEqual(self.router.replicas(), [self.second])
+
+
+class ExecuteSqlRoutingTest(unittest.TestCase):
+    def setUp(self):
+        self.router = ReplicaRouter(rng=random.Random(1))  # noqa: S311 — seeded for reproducible picks
+        self.service = ReportsService(None)
+        self.service._replicas = self.router
+        for replica in self.router.replicas_of("postgresql", PRIMARY):
+            self.router.record_check(replica, True, lag=0)
+        self.targets = []
+
+    def run_sql(self, error=None):
+        async def execute_on_target(db_type, sql, db_config, platform, *args):
+            self.targets.append(db_config["host"])
+            if error is not None and db_config["host"] != "pg-primary":
+                raise error
+            return ["n"], [(1,)]
+
+        self.service._execute_on_target = execute_on_target
+        return asyncio.run(self.service._execute_sql("postgresql", "SELECT 1", PRIMARY))
+
+    def test_reads_go_to_a_replica(self):
+        self.assertEqual(self.run_sql(), (["n"], [(1,)]))
+        self.assertTrue(self.targets[0].startswith("pg-replica"))
+
+    def test_writes_stay_on_the_primary(self):
+        async def execute_on_target(db_type, sql, db_config, platform, *args):
+            self.targets.append(db_config["host"])
+            return ["n"], [(1,)]
+
+        self.service._execute_on_target = execute_on_target
+        asyncio.run(self.service._execute_sql("postgresql", "WITH moved AS (DELETE FROM jobs RETURNING id) SELECT count(*) FROM moved", PRIMARY))
+        asyncio.run(self.service._execute_sql("postgresql", "SELECT id FROM jobs FOR UPDATE", PRIMARY))
+        self.assertEqual(self.targets, ["pg-primary", "pg-primary"])
+
+    def test_unreachable_replica_falls_back_to_the_primary(self):
+        self.assertEqual(self.run_sql(ConnectionRefusedError("refused")), (["n"], [(1,)]))
+        self.assertEqual(self.targets[1], "pg-primary")
+        failed = next(r for r in self.router.replicas() if r.db_config["host"] == self.targets[0])
+        self.assertFalse(failed.healthy)
+
+    def test_sql_errors_are_not_retried(self):
+        with self.assertRaises(ValueError):
+            self.run_sql(ValueError("column does not exist"))
+        self.assertEqual(len(self.targets), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
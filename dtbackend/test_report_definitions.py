@@ -0,0 +1,164 @@
+"""Unit tests for cached report definitions. No DB: reports are transient ORM
+objects and the session is an in-memory fake.
+
+Run with: python -m unittest test_report_definitions -v
+"""
+import asyncio
+import datetime
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from app.models.postgres_models import (
+    Platform,
+    Report,
+    ReportQuery,
+    ReportQueryFilter,
+    User,
+)
+from app.services.report_definitions import ReportDefinition
+from app.services.reports_service import ReportsService
+
+CREATED = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def make_report(**overrides):
+    query = ReportQuery(
+        id=5, report_id=1, name="Orders", sql="SELECT * FROM orders {{dynamic_filters}}",
+        visualization_config={"type": "table"}, order_index=0, created_at=CREATED,
+    )
+    query.filters = [ReportQueryFilter(
+        id=9, query_id=5, field_name="status", display_name="Status", filter_type="dropdown",
+        required=False, created_at=CREATED,
+    )]
+    values = dict(
+        id=1, name="Sales", owner_id=3, is_public=False, tags=[], global_filters=[], layout_config=[],
+        color="#3B82F6", allowed_departments=["A_B"], allowed_users=["ayse"], is_direct_link=False,
+        filter_by_department=False, filter_by_step_department=False, created_at=CREATED,
+    )
+    values.update(overrides)
+    report = Report(**values)
+    report.owner = User(id=3, username="owner", name="Owner")
+    report.platform = Platform(id=2, code="deriniz", db_type="clickhouse", db_config={"host": "ch"})
+    report.queries = [query]
+    report.tabs = []
+    return report
+
+
+def user(username, department=None, role=None):
+    return SimpleNamespace(username=username, department=department, role=role)
+
+
+class ReportDefinitionTest(unittest.TestCase):
+    def test_snapshot_keeps_execution_fields_and_response(self):
+        definition = ReportDefinition(make_report())
+        self.assertEqual(definition.platform.db_config, {"host": "ch"})
+        self.assertEqual(definition.queries[0].filters[0].field_name, "status")
+        self.assertEqual(definition.response.owner_name, "Owner")
+        self.assertEqual(definition.response.queries[0].filters[0].field_name, "status")
+
+    def test_access_rules(self):
+        definition = ReportDefinition(make_report())
+        self.assertTrue(definition.is_accessible_by(user("owner")))
+        self.assertTrue(definition.is_accessible_by(user("ayse")))
+        self.assertTrue(definition.is_accessible_by(user("x", department="A_B_C")))
+        self.assertTrue(definition.is_accessible_by(user("x", role=["miras:admin"])))
+        self.assertFalse(definition.is_accessible_by(user("x", department="A_C")))
+        self.assertTrue(ReportDefinition(make_report(is_public=True)).is_accessible_by(user("x")))
+
+
+class FakeResult:
+    def __init__(self, report):
+        self.report = report
+
+    def unique(self):
+        return self
+
+    def scalar_one_or_none(self):
+        return self.report
+
+    def one_or_none(self):
+        # The current-ACL lookup: the stored row, which tests may change behind the cached definition
+        report = self.report
+        return SimpleNamespace(
+            is_public=report.is_public, allowed_users=report.allowed_users, allowed_departments=report.allowed_departments,
+            deleted_at=report.deleted_at, username=report.owner.username,
+        )
+
+
+class FakeSession:
+    """Serves the report graph (counted in executed) and the ACL lookup from the same stored report"""
+
+    def __init__(self, report):
+        self.report = report
+        self.executed = 0
+        self.statements = 0
+
+    async def execute(self, stmt):
+        self.statements += 1
+        if stmt.column_descriptions[0]["name"] == "Report":
+            self.executed += 1
+        return FakeResult(self.report)
+
+
+class ReportsServiceDefinitionCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.session = FakeSession(make_report())
+        self.service = ReportsService(self.session)
+        self.service._report_definitions.clear()
+        self.addCleanup(self.service._report_definitions.clear)
+
+    def test_definition_is_loaded_once_until_invalidated(self):
+        async def scenario():
+            first = await self.service._get_executable_report(1, user("owner"))
+            self.assertIs(await self.service._get_executable_report(1, user("ayse")), first)
+            self.assertEqual(self.session.executed, 1)
+
+            self.service._report_definitions.invalidate_report(1)
+            await self.service._get_executable_report(1, user("owner"))
+            self.assertEqual(self.session.executed, 2)
+
+        asyncio.run(scenario())
+
+    def test_access_is_checked_on_cached_definitions(self):
+        async def scenario():
+            self.assertIsNotNone(await self.service.get_report(1, user("owner")))
+            self.assertIsNone(await self.service.get_report(1, user("stranger")))
+            with self.assertRaises(ValueError):
+                await self.service._get_executable_report(1, user("stranger"))
+            self.assertEqual(self.session.executed, 1)
+
+        asyncio.run(scenario())
+
+    def test_deleted_report_is_hidden_from_get_report(self):
+        self.session.report = make_report(deleted_at=CREATED)
+        self.assertIsNone(asyncio.run(self.service.get_report(1, user("owner"))))
+
+    def test_revoked_access_stops_execution_immediately(self):
+        async def scenario():
+            self.assertIsNotNone(await self.service.get_report(1, user("ayse")))
+            # Edited outside this process: the cached definition still lists ayse
+            self.session.report = make_report(allowed_users=[])
+            with self.assertRaises(ValueError):
+                await self.service._get_executable_report(1, user("ayse"))
+            # A write through ReportsService drops the definition, which get_report then reloads
+            self.service._report_definitions.invalidate_report(1)
+            self.assertIsNone(await self.service.get_report(1, user("ayse")))
+            self.assertEqual(self.session.executed, 2)
+
+        asyncio.run(scenario())
+
+    def test_cached_get_report_runs_no_queries(self):
+        async def scenario():
+            await self.service.get_report(1, user("owner"))
+            statements = self.session.statements
+            self.assertIsNotNone(await self.service.get_report(1, user("ayse")))
+            self.assertIsNone(await self.service.get_report(1, user("stranger")))
+            return self.session.statements - statements
+
+        with mock.patch("app.services.reports_service.UserService.get_user_by_username") as get_user:
+            self.assertEqual(asyncio.run(scenario()), 0)
+        get_user.assert_not_called()
+
+if __name__ == "__main__":
+    unittest.main()
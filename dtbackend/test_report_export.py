@@ -0,0 +1,202 @@
+"""Unit tests for streaming report exports. No DB: cursors and the connection
+pool are in-memory fakes.
+
+Run with: python -m unittest test_report_export -v
+"""
+import asyncio
+import datetime
+import decimal
+import io
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from openpyxl import load_workbook
+
+from app.services.admission_control import AdmissionController
+from app.services.report_export import (
+    ResultChunk,
+    clickhouse_column_type,
+    encode_export,
+    iter_query_chunks,
+    mssql_column_type,
+)
+from app.services.reports_service import ReportsService
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.description = [("id", int, None, 10, 10, 0, False), ("name", str, None, 50, 50, 0, True)]
+        self.fetch_sizes = []
+        self.closed = False
+
+    def execute(self, sql):
+        self.sql = sql
+
+    def fetchmany(self, size):
+        self.fetch_sizes.append(size)
+        chunk, self.rows = self.rows[:size], self.rows[size:]
+        return chunk
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.cursor_obj = FakeCursor(rows)
+
+    def cursor(self):
+        return self.cursor_obj
+
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+        self.returned = []
+
+    def get_connection(self, **kwargs):
+        return self.conn
+
+    def return_connection(self, conn, discard=False, **kwargs):
+        self.returned.append(discard)
+
+
+def _chunks(*chunks):
+    return [(["id", "name"], list(rows)) for rows in chunks]
+
+
+class IterQueryChunksTest(unittest.TestCase):
+    def test_mssql_rows_are_fetched_in_chunks(self):
+        pool = FakePool(FakeConnection([(i, f"row{i}") for i in range(5)]))
+        chunks = list(iter_query_chunks(pool, "mssql", "SELECT 1", {"db_config": {}}, chunk_size=2))
+        self.assertEqual([len(chunk.rows) for chunk in chunks], [2, 2, 1])
+        self.assertEqual(chunks[0][0], ["id", "name"])
+        self.assertEqual(pool.returned, [False])
+
+    def test_empty_result_still_yields_header_chunk(self):
+        pool = FakePool(FakeConnection([]))
+        chunks = list(iter_query_chunks(pool, "mssql", "SELECT 1", {"db_config": {}}, chunk_size=2))
+        self.assertEqual(chunks, [(["id", "name"], [], ["int64", "string"])])
+
+    def test_abandoned_stream_discards_connection(self):
+        pool = FakePool(FakeConnection([(i, "x") for i in range(5)]))
+        chunks = iter_query_chunks(pool, "mssql", "SELECT 1", {"db_config": {}}, chunk_size=2)
+        next(chunks)
+        chunks.close()
+        self.assertEqual(pool.returned, [True])
+
+
+class EncodeExportTest(unittest.TestCase):
+    def test_csv_has_single_header_and_all_rows(self):
+        body = b"".join(encode_export(_chunks([(1, "Çorum")], [(2, None)]), "csv"))
+        text = body.decode("utf-8-sig")
+        self.assertEqual(text.splitlines(), ["id,name", "1,Çorum", "2,"])
+
+    def test_xlsx_round_trip(self):
+        created = datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)
+        body = b"".join(encode_export([(["id", "created"], [(1, created), (2, None)])], "xlsx"))
+        sheet = load_workbook(io.BytesIO(body)).active
+        rows = list(sheet.iter_rows(values_only=True))
+        self.assertEqual(rows[0], ("id", "created"))
+        self.assertEqual(rows[1], (1, created.replace(tzinfo=None)))
+        self.assertEqual(len(rows), 3)
+
+    def test_parquet_keeps_first_chunk_schema(self):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            self.skipTest("pyarrow is not installed")
+        body = b"".join(encode_export(_chunks([(1, None)], [(2, "b")]), "parquet"))
+        table = pq.read_table(io.BytesIO(body))
+        self.assertEqual(table.column_names, ["id", "name"])
+        self.assertEqual(table.column("id").to_pylist(), [1, 2])
+        self.assertEqual(table.column("name").to_pylist(), [None, "b"])
+
+    def test_parquet_uses_driver_column_types(self):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            self.skipTest("pyarrow is not installed")
+        types = ["int64", ("decimal", 10, 2), "string"]
+        chunks = [
+            ResultChunk(["id", "amount", "code"], [(1, decimal.Decimal("1"), None)], types),
+            ResultChunk(["id", "amount", "code"], [(2, decimal.Decimal("1.25"), 5)], types),
+        ]
+        table = pq.read_table(io.BytesIO(b"".join(encode_export(chunks, "parquet"))))
+        self.assertEqual(table.column("amount").to_pylist(), [decimal.Decimal("1.00"), decimal.Decimal("1.25")])
+        self.assertEqual(table.column("code").to_pylist(), [None, "5"])
+        self.assertEqual(str(table.schema.field("amount").type), "decimal128(10, 2)")
+
+    def test_lossy_parquet_values_fail_before_streaming(self):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            self.skipTest("pyarrow is not installed")
+        with self.assertRaises(ValueError):
+            encode_export(_chunks([(1, "a")], [(3.5, "b")]), "parquet")
+        chunks = [ResultChunk(["id"], [(1,)], ["int64"]), ResultChunk(["id"], [(decimal.Decimal("1.25"),)], ["int64"])]
+        with self.assertRaises(ValueError):
+            encode_export(chunks, "parquet")
+
+    def test_xlsx_row_limit_fails_before_streaming(self):
+        with mock.patch("app.services.report_export.XLSX_MAX_ROWS", 2):
+            with self.assertRaises(ValueError):
+                encode_export(_chunks([(1, "a"), (2, "b")], [(3, "c")]), "xlsx")
+
+    def test_driver_type_mapping(self):
+        self.assertEqual(clickhouse_column_type("Nullable(Decimal(18, 4))"), ("decimal", 18, 4))
+        self.assertEqual(clickhouse_column_type("LowCardinality(String)"), "string")
+        self.assertEqual(clickhouse_column_type("DateTime64(3, 'Europe/Istanbul')"), "timestamp_tz")
+        self.assertIsNone(clickhouse_column_type("Array(UInt8)"))
+        self.assertEqual(mssql_column_type(("amount", decimal.Decimal, None, 12, 12, 3, True)), ("decimal", 12, 3))
+
+    def test_unknown_format_is_rejected(self):
+        with self.assertRaises(ValueError):
+            encode_export(_chunks([]), "json")
+
+
+class ExportAdmissionTest(unittest.TestCase):
+    def setUp(self):
+        self.config = {"db_type": "mssql", "host": "mssql"}
+        report = SimpleNamespace(
+            queries=[SimpleNamespace(id=2)], platform=None, db_config=self.config, global_filters=[],
+            filter_by_department=False, department_filter_level=None, filter_by_step_department=False,
+        )
+        self.service = ReportsService(None)
+        self.service._admission = AdmissionController(default_limit=1, per_user_limit=0, queue_timeout=5, enabled=True)
+        self.service._connection_pool = FakePool(FakeConnection([(1, "a"), (2, "b")]))
+        self.service._get_executable_report = mock.AsyncMock(return_value=report)
+        self.service.build_filtered_sql = mock.Mock(return_value=("SELECT id, name FROM t", {}))
+        self.service._get_db_target_key = mock.Mock(return_value="mssql:test")
+        self.target = "mssql:test"
+
+    def test_export_waits_for_a_slot_and_holds_it_while_streaming(self):
+        user = SimpleNamespace(username="ayse", department=None)
+
+        async def scenario():
+            async with self.service._admission.admit(self.target, "mehmet"):
+                export = asyncio.ensure_future(self.service.export_query(1, 2, user, "csv"))
+                await asyncio.sleep(0.05)
+                waited = not export.done()
+            body, _, _ = await export
+            active_while_streaming = self.service._admission.stats()[self.target]["active"]
+            data = b"".join([piece async for piece in body])
+            return waited, active_while_streaming, data, self.service._admission.stats()[self.target]["active"]
+
+        waited, active_while_streaming, data, active_after = asyncio.run(scenario())
+        self.assertTrue(waited)
+        self.assertEqual(active_while_streaming, 1)
+        self.assertIn(b"2,b", data)
+        self.assertEqual(active_after, 0)
+
+    def test_failed_export_releases_its_slot(self):
+        user = SimpleNamespace(username="ayse", department=None)
+        self.service._connection_pool.conn.cursor_obj.execute = mock.Mock(side_effect=RuntimeError("Invalid column name"))
+        with self.assertRaises(RuntimeError):
+            asyncio.run(self.service.export_query(1, 2, user, "csv"))
+        self.assertEqual(self.service._admission.stats()[self.target]["active"], 0)
+
+if __name__ == "__main__":
+    unittest.main()
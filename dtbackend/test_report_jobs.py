@@ -0,0 +1,152 @@
+"""Unit tests for background report jobs. No DB: jobs run an in-memory execute.
+
+Run with: python -m unittest test_report_jobs -v
+"""
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+from app.schemas.reports import (
+    QueryExecutionResult,
+    ReportExecutionRequest,
+    ReportExecutionResponse,
+)
+from app.services.report_definitions import ReportDefinition
+from app.services.report_jobs import (
+    JOB_COMPLETED,
+    JOB_FAILED,
+    JOB_QUEUED,
+    ReportJob,
+    ReportJobLimitError,
+    ReportJobQueue,
+)
+from app.services.reports_service import ReportsService
+from test_report_definitions import CREATED, make_report
+
+
+def query_result(query_id, success=True):
+    return QueryExecutionResult(
+        query_id=query_id, query_name=f"Q{query_id}", columns=["x"], data=[[1]], total_rows=1,
+        execution_time_ms=5, success=success, message=None if success else "Query execution failed: boom",
+    )
+
+
+def make_job(username="ayse", query_ids=(5, 6)):
+    user = SimpleNamespace(username=username, department=None, role=None)
+    return ReportJob(ReportExecutionRequest(report_id=1), user, {q: f"Q{q}" for q in query_ids})
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ReportJobQueueTest(unittest.TestCase):
+    def test_job_reports_progress_and_result(self):
+        async def scenario():
+            gate = asyncio.Event()
+
+            async def execute(job):
+                job.query_done(query_result(5))
+                await gate.wait()
+                job.query_done(query_result(6, success=False))
+                return ReportExecutionResponse(report_id=1, report_name="Sales", results=[query_result(5), query_result(6, False)], total_execution_time_ms=9, success=False, message="Some queries failed")
+
+            queue = ReportJobQueue(workers=1, execute=execute)
+            job = queue.submit(make_job())
+            self.assertEqual(job.status_response().status, JOB_QUEUED)
+
+            await asyncio.sleep(0.01)
+            status = queue.get(job.id).status_response()
+            self.assertEqual((status.status, status.completed_queries, status.total_queries), ("running", 1, 2))
+
+            gate.set()
+            await asyncio.sleep(0.01)
+            status = queue.get(job.id).status_response()
+            self.assertEqual((status.status, status.completed_queries), (JOB_COMPLETED, 2))
+            self.assertEqual([q.status for q in status.queries], [JOB_COMPLETED, JOB_FAILED])
+            self.assertEqual(job.result.report_name, "Sales")
+            await queue.stop()
+
+        asyncio.run(scenario())
+
+    def test_errors_fail_the_job(self):
+        async def execute(job):
+            raise ValueError("Report access denied")
+
+        async def scenario():
+            queue = ReportJobQueue(execute=execute)
+            job = queue.submit(make_job())
+            await asyncio.sleep(0.01)
+            self.assertEqual((job.status, job.message), (JOB_FAILED, "Report access denied"))
+            await queue.stop()
+
+        asyncio.run(scenario())
+
+    def test_limits_and_expiry(self):
+        clock = FakeClock()
+
+        async def scenario():
+            blocker = asyncio.Event()
+
+            async def execute(job):
+                if job.username == "slow":
+                    await blocker.wait()
+                return ReportExecutionResponse(report_id=1, report_name="Sales", results=[], total_execution_time_ms=0, success=True)
+
+            queue = ReportJobQueue(workers=1, max_jobs=3, max_per_user=2, result_ttl_seconds=60, execute=execute, clock=clock)
+            queue.submit(make_job("slow"))
+            queue.submit(make_job("slow"))
+            with self.assertRaises(ReportJobLimitError):
+                queue.submit(make_job("slow"))
+
+            # The queue is full of unfinished jobs
+            queue.submit(make_job("fast"))
+            with self.assertRaises(ReportJobLimitError):
+                queue.submit(make_job("other"))
+
+            blocker.set()
+            await asyncio.sleep(0.01)
+            finished = queue.submit(make_job("other"))
+            await asyncio.sleep(0.01)
+            self.assertIs(queue.get(finished.id), finished)
+            clock.now = 61
+            self.assertIsNone(queue.get(finished.id))
+            await queue.stop()
+
+        asyncio.run(scenario())
+
+
+class ExecuteReportProgressTest(unittest.TestCase):
+    def test_each_query_is_reported_when_it_finishes(self):
+        report = make_report()
+        second = type(report.queries[0])(id=6, report_id=1, name="Trend", sql="SELECT 1", visualization_config={"type": "line"}, order_index=1, created_at=CREATED)
+        second.filters = []
+        report.queries = [report.queries[0], second]
+        definition = ReportDefinition(report)
+
+        service = ReportsService(None)
+        finished = []
+
+        async def get_executable_report(report_id, _user):
+            return definition
+
+        async def execute_query(query, *args, **kwargs):
+            # The second query finishes first
+            await asyncio.sleep(0.02 if query.id == 5 else 0)
+            return query_result(query.id)
+
+        service._get_executable_report = get_executable_report
+        service.execute_query = execute_query
+
+        user = SimpleNamespace(username="owner", department=None, role=None)
+        response = asyncio.run(service.execute_report(ReportExecutionRequest(report_id=1), user, on_query_done=lambda r: finished.append(r.query_id)))
+        self.assertEqual([r.query_id for r in response.results], [5, 6])
+        self.assertEqual(finished, [6, 5])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+"""Unit tests for the keyset-paginated report list and the stored query count.
+No DB: the session is an in-memory fake that returns canned rows and records
+the statements it was given.
+
+Run with: python -m unittest test_report_list -v
+"""
+import asyncio
+import datetime
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from sqlalchemy.dialects import postgresql
+
+from app.services.reports_service import ReportsService
+
+CHANGED = datetime.datetime(2026, 10, 17, 12, 0, tzinfo=datetime.timezone.utc)
+USER = SimpleNamespace(username="viewer", department="A_B", role=None)
+
+
+def report_row(report_id, minutes_ago):
+    changed_at = CHANGED - datetime.timedelta(minutes=minutes_ago)
+    return SimpleNamespace(
+        id=report_id, name=f"Report {report_id}", description=None, is_public=True, owner_id=3,
+        created_at=changed_at, updated_at=None, tags=[], color="#3B82F6", is_direct_link=False,
+        direct_link=None, query_count=2, changed_at=changed_at,
+    )
+
+
+class Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class FakeSession:
+    """Answers the list query with the canned report rows, owner and favorite lookups with nothing"""
+
+    def __init__(self, report_rows, scalar=None):
+        self.report_rows = report_rows
+        self.scalar_value = scalar
+        self.statements = []
+
+    async def execute(self, stmt):
+        self.statements.append(stmt)
+        return Result(self.report_rows if len(self.statements) == 1 else [])
+
+    async def scalar(self, stmt):
+        self.statements.append(stmt)
+        return self.scalar_value
+
+    async def flush(self):
+        pass
+
+
+def compiled(stmt):
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+class ReportListTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch("app.services.reports_service.UserService.get_user_by_username", mock.AsyncMock(return_value=SimpleNamespace(id=7)))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def list_page(self, rows, **kwargs):
+        session = FakeSession(rows)
+        reports, next_cursor = asyncio.run(ReportsService(session).get_reports_list(USER, limit=2, **kwargs))
+        return reports, next_cursor, compiled(session.statements[0])
+
+    def test_pages_by_keyset_on_last_change(self):
+        reports, next_cursor, sql = self.list_page([report_row(9, 0), report_row(4, 5), report_row(8, 5)])
+        self.assertEqual([r.id for r in reports], [9, 4])
+        self.assertEqual(reports[0].query_count, 2)
+        self.assertIsNotNone(next_cursor)
+        self.assertIn("ORDER BY coalesce(reports.updated_at, reports.created_at) DESC, reports.id DESC", sql)
+        self.assertNotIn("report_queries", sql)
+        self.assertNotIn("GROUP BY", sql)
+
+        _, last_cursor, sql = self.list_page([report_row(8, 5)], cursor=next_cursor, skip=50)
+        self.assertIsNone(last_cursor)
+        self.assertIn("(coalesce(reports.updated_at, reports.created_at), reports.id) < (", sql)
+        self.assertNotIn("OFFSET", sql)
+
+    def test_cursor_is_bound_to_the_filters(self):
+        _, next_cursor, _ = self.list_page([report_row(9, 0), report_row(4, 5), report_row(8, 5)])
+        with self.assertRaises(ValueError):
+            self.list_page([], cursor=next_cursor, subplatform="quality")
+        with self.assertRaises(ValueError):
+            self.list_page([], cursor="not-a-cursor")
+
+    def test_query_count_is_stored_on_write(self):
+        report = SimpleNamespace(id=1, query_count=0)
+        session = FakeSession([], scalar=3)
+        asyncio.run(ReportsService(session)._sync_query_count(report))
+        self.assertEqual(report.query_count, 3)
+        self.assertIn("count(report_queries.id)", compiled(session.statements[0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
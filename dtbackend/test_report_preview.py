@@ -0,0 +1,130 @@
+"""Unit tests for report previews. No DB: the database call is replaced by an
+in-memory coroutine.
+
+Run with: python -m unittest test_report_preview -v
+"""
+import asyncio
+import unittest
+
+from app.core.config import settings
+from app.services.admission_control import AdmissionController
+from app.services.query_cancellation import QueryCancelScope, current_cancel_scope
+from app.services.reports_service import ReportsService
+from app.services.sql_row_cap import cap_rows, outer_select_position
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, *args):
+        self.conn.timeouts_seen.append(self.conn.timeout)
+        self.conn.cancellable_during.append(len(current_cancel_scope.get()._cancellers))
+
+    def fetchall(self):
+        return [("plan",)]
+
+    def cancel(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.timeout = 0
+        self.timeouts_seen = []
+        self.cancellable_during = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def get_connection(self, **kwargs):
+        return self.conn
+
+    def return_connection(self, conn, **kwargs):
+        pass
+
+
+class RowCapTest(unittest.TestCase):
+    def test_statements_are_wrapped(self):
+        self.assertEqual(
+            cap_rows("SELECT * FROM t LIMIT 1000000;", "clickhouse", 100),
+            "SELECT * FROM (\nSELECT * FROM t LIMIT 1000000\n) AS capped_rows LIMIT 100",
+        )
+
+    def test_mssql_outer_select_gets_top(self):
+        self.assertEqual(cap_rows("SELECT a FROM t ORDER BY a", "mssql", 50), "SELECT TOP 50 a FROM t ORDER BY a")
+        self.assertEqual(cap_rows("SELECT DISTINCT TOP (10) a FROM t", "mssql", 50), "SELECT DISTINCT TOP 10 a FROM t")
+        self.assertEqual(cap_rows("SELECT TOP 10 PERCENT a FROM t", "mssql", 50), "SELECT TOP 10 PERCENT a FROM t")
+        self.assertEqual(
+            cap_rows("WITH x AS (SELECT a FROM t) SELECT * FROM x", "mssql", 50),
+            "WITH x AS (SELECT a FROM t) SELECT TOP 50 * FROM x",
+        )
+
+    def test_outer_select_skips_literals_and_comments(self):
+        sql = "WITH [select] AS (SELECT 1 AS a) -- SELECT\n SELECT 'SELECT' FROM [select]"
+        self.assertEqual(outer_select_position(sql), sql.index(" SELECT 'SELECT'") + 1)
+
+
+class PreviewQueryTest(unittest.TestCase):
+    def setUp(self):
+        self.service = ReportsService(None)
+        self.service._preview_admission = AdmissionController(default_limit=4, per_user_limit=1, queue_timeout=5, enabled=True)
+        self.calls = []
+
+        async def execute_sql(db_type, sql, db_config=None, platform=None, params=None, max_execution_time=None, clickhouse_settings=None):
+            self.calls.append((sql, max_execution_time))
+            await asyncio.sleep(0.01)
+            return ["a"], [(1,), (2,), (3,)]
+
+        async def no_cost_check(*args):
+            return None
+
+        self.service._execute_sql = execute_sql
+        self.service.check_query_cost = no_cost_check
+
+    def test_preview_is_capped_and_time_limited(self):
+        db_type, columns, rows, _ = asyncio.run(self.service.preview_query("SELECT a FROM t", {"db_type": "postgresql", "host": "pg"}, limit=2, username="ayse"))
+        self.assertEqual((db_type, columns), ("postgresql", ["a"]))
+        self.assertIn("LIMIT 2", self.calls[0][0])
+        self.assertEqual(self.calls[0][1], settings.REPORT_PREVIEW_MAX_EXECUTION_TIME_SECONDS)
+        # Rows beyond the cap (e.g. from an MSSQL UNION) are cut
+        self.assertEqual(rows, [(1,), (2,)])
+
+    def test_previews_of_one_user_wait_for_each_other(self):
+        async def scenario():
+            config = {"db_type": "clickhouse", "host": "ch"}
+            await asyncio.gather(*(self.service.preview_query("SELECT a FROM t", config, username="ayse") for _ in range(3)))
+            gate = next(iter(self.service._preview_admission.stats().values()))
+            return gate["queued"]
+
+        self.assertEqual(asyncio.run(scenario()), 2)
+
+
+class ShowplanTimeoutTest(unittest.TestCase):
+    def test_syntax_check_is_time_limited_and_cancellable(self):
+        conn = FakeConnection()
+        service = ReportsService(None)
+        service._connection_pool = FakePool(conn)
+        scope = QueryCancelScope()
+        token = current_cancel_scope.set(scope)
+        try:
+            rows = service._mssql_showplan_rows("SELECT 1", {"db_type": "mssql"}, None, None, "SHOWPLAN_TEXT", 7)
+        finally:
+            current_cancel_scope.reset(token)
+        self.assertEqual(rows, [("plan",)])
+        self.assertEqual(conn.timeouts_seen, [7, 7, 7])
+        self.assertEqual(conn.cancellable_during, [1, 1, 1])
+        self.assertEqual(conn.timeout, 0)
+        self.assertEqual(scope._cancellers, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+"""Unit tests for the report query result cache. No DB.
+
+Run with: python -m unittest test_report_result_cache -v
+"""
+import unittest
+
+from app.services.report_result_cache import ReportResultCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class ReportResultCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = ReportResultCache(max_entries=3, clock=self.clock)
+
+    def test_key_depends_on_target_and_sql(self):
+        key = ReportResultCache.build_key("postgresql_1", "SELECT 1")
+        self.assertEqual(key, ReportResultCache.build_key("postgresql_1", "SELECT 1"))
+        self.assertNotEqual(key, ReportResultCache.build_key("postgresql_2", "SELECT 1"))
+        self.assertNotEqual(key, ReportResultCache.build_key("postgresql_1", "SELECT 1 LIMIT 10"))
+
+    def test_hit_before_ttl_and_miss_after(self):
+        self.cache.set("k", "value", ttl_seconds=30, report_id=1)
+        self.clock.now += 29
+        self.assertEqual(self.cache.get("k"), "value")
+        self.clock.now += 2
+        self.assertIsNone(self.cache.get("k"))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_zero_ttl_is_not_stored(self):
+        self.cache.set("k", "value", ttl_seconds=0, report_id=1)
+        self.assertIsNone(self.cache.get("k"))
+
+    def test_lru_eviction_keeps_recently_used(self):
+        for key in ("a", "b", "c"):
+            self.cache.set(key, key, ttl_seconds=60, report_id=1)
+        self.cache.get("a")
+        self.cache.set("d", "d", ttl_seconds=60, report_id=1)
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("a"), "a")
+        self.assertEqual(self.cache.get("d"), "d")
+
+    def test_invalidate_report_only_drops_its_entries(self):
+        self.cache.set("a", 1, ttl_seconds=60, report_id=1)
+        self.cache.set("b", 2, ttl_seconds=60, report_id=1)
+        self.cache.set("c", 3, ttl_seconds=60, report_id=2)
+        self.assertEqual(self.cache.invalidate_report(1), 2)
+        self.assertIsNone(self.cache.get("a"))
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("c"), 3)
+        self.assertEqual(self.cache.invalidate_report(1), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
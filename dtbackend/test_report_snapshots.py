@@ -0,0 +1,125 @@
+"""Unit tests for scheduled report snapshots and their cron schedules. No DB.
+
+Run with: python -m unittest test_report_snapshots -v
+"""
+import asyncio
+import datetime
+import unittest
+
+from pydantic import ValidationError
+
+from app.core.cron_schedule import CronSchedule
+from app.schemas.reports import (
+    QueryExecutionResult,
+    ReportExecutionRequest,
+    ReportUpdate,
+)
+from app.services.report_definitions import ReportDefinition
+from app.services.report_snapshot_scheduler import snapshot_is_due
+from app.services.reports_service import ReportsService
+from test_report_definitions import make_report, user
+
+GENERATED = datetime.datetime(2024, 1, 1, 6, 0, tzinfo=datetime.timezone.utc)
+
+
+class CronScheduleTest(unittest.TestCase):
+    def test_next_after(self):
+        hourly = CronSchedule("0 * * * *")
+        self.assertEqual(hourly.next_after(datetime.datetime(2024, 1, 1, 10, 0)), datetime.datetime(2024, 1, 1, 11, 0))
+        self.assertEqual(hourly.next_after(datetime.datetime(2024, 1, 1, 23, 30)), datetime.datetime(2024, 1, 2, 0, 0))
+
+        # Weekdays at 07:30; 2024-01-06 is a Saturday
+        weekdays = CronSchedule("30 7 * * 1-5")
+        self.assertEqual(weekdays.next_after(datetime.datetime(2024, 1, 5, 8, 0)), datetime.datetime(2024, 1, 8, 7, 30))
+        self.assertEqual(CronSchedule("*/15 8-9 * * *").next_after(datetime.datetime(2024, 1, 1, 9, 50)), datetime.datetime(2024, 1, 2, 8, 0))
+
+    def test_day_fields_match_either_when_both_are_restricted(self):
+        # The 15th of the month or any Sunday (2024-01-07)
+        schedule = CronSchedule("0 0 15 * 0")
+        self.assertEqual(schedule.next_after(datetime.datetime(2024, 1, 1)), datetime.datetime(2024, 1, 7))
+        self.assertTrue(schedule.matches(datetime.datetime(2024, 1, 15)))
+        self.assertTrue(CronSchedule("0 0 * * 7").matches(datetime.datetime(2024, 1, 7)))
+
+    def test_impossible_and_invalid_expressions(self):
+        self.assertIsNone(CronSchedule("0 0 31 2 *").next_after(datetime.datetime(2024, 1, 1)))
+        for expression in ("0 * * *", "60 * * * *", "* * * * 1-8", "*/0 * * * *", "a * * * *"):
+            with self.assertRaises(ValueError):
+                CronSchedule(expression)
+
+    def test_schema_validates_snapshot_cron(self):
+        self.assertEqual(ReportUpdate(snapshotCron=" 0  *  * * * ").snapshot_cron, "0 * * * *")
+        with self.assertRaises(ValidationError):
+            ReportUpdate(snapshotCron="every hour")
+        # Sent empty, it clears the schedule; left out, it keeps it
+        cleared = ReportUpdate(snapshotCron="")
+        self.assertIsNone(cleared.snapshot_cron)
+        self.assertIn("snapshot_cron", cleared.model_fields_set)
+        self.assertNotIn("snapshot_cron", ReportUpdate(name="x").model_fields_set)
+
+
+class SnapshotIsDueTest(unittest.TestCase):
+    def test_due_once_the_cron_fires_after_the_latest_snapshot(self):
+        local = GENERATED.astimezone().replace(tzinfo=None)
+        self.assertTrue(snapshot_is_due("0 * * * *", None, local))
+        self.assertFalse(snapshot_is_due("0 * * * *", GENERATED, local + datetime.timedelta(minutes=59)))
+        self.assertTrue(snapshot_is_due("0 * * * *", GENERATED, local + datetime.timedelta(minutes=60)))
+        self.assertFalse(snapshot_is_due("not a cron", GENERATED, local + datetime.timedelta(days=1)))
+
+
+class SnapshotRequestTest(unittest.TestCase):
+    definition = ReportDefinition(make_report(snapshot_enabled=True, snapshot_cron="0 * * * *"))
+
+    def test_only_default_requests_are_served_from_snapshots(self):
+        is_snapshot = ReportsService._is_snapshot_request
+        self.assertTrue(is_snapshot(self.definition, ReportExecutionRequest(report_id=1)))
+        self.assertTrue(is_snapshot(self.definition, ReportExecutionRequest(report_id=1, filters=[{"field_name": "status", "value": ""}])))
+        self.assertFalse(is_snapshot(self.definition, ReportExecutionRequest(report_id=1, filters=[{"field_name": "status", "value": "open"}])))
+        self.assertFalse(is_snapshot(self.definition, ReportExecutionRequest(report_id=1, page_size=50, page_limit=1)))
+        self.assertFalse(is_snapshot(self.definition, ReportExecutionRequest(report_id=1, sort_by="id")))
+        self.assertFalse(is_snapshot(self.definition, ReportExecutionRequest(report_id=1, sort_direction="desc")))
+        self.assertFalse(is_snapshot(self.definition, ReportExecutionRequest(report_id=1, limit=1000000)))
+
+    def test_department_filtered_reports_have_no_snapshots(self):
+        definition = ReportDefinition(make_report(snapshot_enabled=True, snapshot_cron="0 * * * *", filter_by_department=True))
+        self.assertFalse(definition.snapshot_enabled)
+        self.assertFalse(ReportDefinition(make_report(snapshot_enabled=True)).snapshot_enabled)
+
+
+class ExecuteReportSnapshotTest(unittest.TestCase):
+    def test_snapshot_results_are_merged_with_live_queries(self):
+        report = make_report(snapshot_enabled=True, snapshot_cron="0 * * * *")
+        live_query = report.queries[0]
+        snapshot_query = type(live_query)(
+            id=6, report_id=1, name="Trend", sql="SELECT 1", visualization_config={"type": "line"}, order_index=1, created_at=GENERATED,
+        )
+        snapshot_query.filters = []
+        report.queries = [snapshot_query, live_query]
+        definition = ReportDefinition(report)
+
+        service = ReportsService(None)
+        live_runs = []
+
+        async def get_executable_report(report_id, _user):
+            return definition
+
+        async def get_report_snapshots(report_id, query_id=None):
+            result = QueryExecutionResult(query_id=6, query_name="Trend", columns=["x"], data=[[1]], total_rows=1, execution_time_ms=20000, success=True)
+            return {6: result.model_copy(update={"from_cache": True, "snapshot_generated_at": GENERATED})}
+
+        async def execute_query(query, *args, **kwargs):
+            live_runs.append(query.id)
+            return QueryExecutionResult(query_id=query.id, query_name=query.name, columns=[], data=[], total_rows=0, execution_time_ms=1, success=True)
+
+        service._get_executable_report = get_executable_report
+        service._get_report_snapshots = get_report_snapshots
+        service.execute_query = execute_query
+
+        response = asyncio.run(service.execute_report(ReportExecutionRequest(report_id=1), user("owner")))
+        self.assertTrue(response.success)
+        self.assertEqual([r.query_id for r in response.results], [6, 5])
+        self.assertEqual(response.results[0].snapshot_generated_at, GENERATED)
+        self.assertEqual(live_runs, [5])
+
+
+if __name__ == "__main__":
+    unittest.main()
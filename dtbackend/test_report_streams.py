@@ -0,0 +1,193 @@
+"""Unit tests for live report streams. No DB: execute_report is replaced by
+an in-memory coroutine.
+
+Run with: python -m unittest test_report_streams -v
+"""
+import asyncio
+import json
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from app.core.config import settings
+from app.schemas.reports import (
+    FilterValue,
+    QueryExecutionResult,
+    ReportExecutionRequest,
+    ReportExecutionResponse,
+)
+from app.services.report_streams import (
+    ReportStreamHub,
+    apply_row_delta,
+    next_events,
+    row_delta,
+    stream_key,
+)
+
+
+def response(*queries):
+    results = [
+        QueryExecutionResult(query_id=query_id, query_name=f"Q{query_id}", columns=["id", "n"], data=rows, total_rows=len(rows), execution_time_ms=1.0, success=True)
+        for query_id, rows in queries
+    ]
+    return ReportExecutionResponse(report_id=1, report_name="Orders", results=results, total_execution_time_ms=1.0, success=True)
+
+
+def rows(count, changed=()):
+    return [[i, i * 10 + (1 if i in changed else 0)] for i in range(count)]
+
+
+class RowDeltaTest(unittest.TestCase):
+    def test_splices_reproduce_the_new_rows(self):
+        old = rows(100)
+        new = rows(100, changed={3, 70})[1:] + [[100, 1000]]
+        ops = row_delta(old, new, max_rows=1000)
+        self.assertEqual(apply_row_delta(old, ops), new)
+        self.assertEqual(sum(len(r) for _, _, r in ops), 3)
+
+    def test_mostly_changed_or_large_results_are_sent_whole(self):
+        self.assertIsNone(row_delta(rows(10), rows(10, changed=set(range(6))), max_rows=1000))
+        self.assertIsNone(row_delta(rows(10), rows(11), max_rows=5))
+
+
+class NextEventsTest(unittest.TestCase):
+    def test_only_changed_queries_are_sent(self):
+        state, event = next_events(None, response((1, rows(50)), (2, rows(5))), 1000)
+        self.assertEqual(event[0], "snapshot")
+
+        state, event = next_events(state, response((1, rows(50)), (2, rows(5))), 1000)
+        self.assertIsNone(event)
+
+        state, event = next_events(state, response((1, rows(50, changed={7})), (2, rows(5))), 1000)
+        name, data = event
+        [change] = json.loads(data)["queries"]
+        self.assertEqual((name, change["query_id"]), ("update", 1))
+        self.assertNotIn("data", change["result"])
+        self.assertEqual(apply_row_delta(rows(50), change["ops"]), rows(50, changed={7}))
+
+        # A query added to the report resyncs everybody
+        _, event = next_events(state, response((1, rows(50)), (2, rows(5)), (3, [])), 1000)
+        self.assertEqual(event[0], "snapshot")
+
+
+async def allow_all(report_id, users):
+    return [True] * len(users)
+
+
+class ReportStreamHubTest(unittest.TestCase):
+    def test_viewers_share_one_execution_schedule(self):
+        async def scenario():
+            executions = []
+
+            async def execute(request, user):
+                executions.append(request.report_id)
+                return response((1, rows(3, changed={len(executions)})))
+
+            hub = ReportStreamHub(execute=execute, check_access=allow_all)
+            request = ReportExecutionRequest(report_id=1, filters=[FilterValue(field_name="day", value="2026-10-17")])
+            first, first_queue = hub.subscribe(request, user=None)
+            self.assertEqual((await asyncio.wait_for(first_queue.get(), 1))[0], "snapshot")
+
+            second, second_queue = hub.subscribe(request.model_copy(), user=None)
+            self.assertIs(first, second)
+            self.assertEqual(second_queue.get_nowait()[0], "snapshot")
+            self.assertEqual((executions, hub.stream_count()), ([1], 1))
+
+            hub.unsubscribe(first, first_queue)
+            hub.unsubscribe(second, second_queue)
+            await asyncio.sleep(0)
+            self.assertEqual(hub.stream_count(), 0)
+            self.assertTrue(first.task.done())
+
+        asyncio.run(scenario())
+
+    def test_failed_execution_ends_the_stream(self):
+        async def scenario():
+            async def execute(request, user):
+                raise ValueError("Report access denied")
+
+            hub = ReportStreamHub(execute=execute, check_access=allow_all)
+            stream, queue = hub.subscribe(ReportExecutionRequest(report_id=1), user=None)
+            events = [event async for event in hub.events(stream, queue)]
+            self.assertEqual(len(events), 1)
+            self.assertTrue(events[0].startswith("event: error\n"))
+            self.assertEqual(hub.stream_count(), 0)
+
+        asyncio.run(scenario())
+
+    def test_viewers_who_lost_access_are_dropped(self):
+        async def scenario():
+            revoked = set()
+
+            async def execute(request, user):
+                return response((1, rows(3)))
+
+            async def check_access(report_id, users):
+                return [user.username not in revoked for user in users]
+
+            hub = ReportStreamHub(execute=execute, check_access=check_access)
+            request = ReportExecutionRequest(report_id=1)
+            stream, owner_queue = hub.subscribe(request, user=SimpleNamespace(username="owner"), interval=1)
+            await asyncio.wait_for(owner_queue.get(), 1)
+            _, viewer_queue = hub.subscribe(request, user=SimpleNamespace(username="ayse"), interval=1)
+            self.assertEqual(viewer_queue.get_nowait()[0], "snapshot")
+
+            revoked.add("ayse")
+            name, data = await asyncio.wait_for(viewer_queue.get(), 5)
+            self.assertEqual((name, json.loads(data)["message"]), ("error", "Report access denied"))
+            self.assertEqual(len(stream.viewers), 1)
+
+            hub.unsubscribe(stream, owner_queue)
+
+        with mock.patch.object(settings, "REPORT_STREAM_MIN_INTERVAL_SECONDS", 0.01):
+            asyncio.run(scenario())
+
+    def test_stream_outlives_its_first_viewer_losing_access(self):
+        async def scenario():
+            revoked = set()
+            executed_as = []
+
+            async def execute(request, user):
+                if user.username in revoked:
+                    raise ValueError("Report access denied")
+                executed_as.append(user.username)
+                return response((1, rows(3, changed={len(executed_as) % 3})))
+
+            async def check_access(report_id, users):
+                return [user.username not in revoked for user in users]
+
+            hub = ReportStreamHub(execute=execute, check_access=check_access)
+            request = ReportExecutionRequest(report_id=1)
+            stream, owner_queue = hub.subscribe(request, user=SimpleNamespace(username="owner"), interval=0.01)
+            await asyncio.wait_for(owner_queue.get(), 1)
+            _, viewer_queue = hub.subscribe(request, user=SimpleNamespace(username="ayse"), interval=0.01)
+            self.assertEqual(viewer_queue.get_nowait()[0], "snapshot")
+
+            revoked.add("owner")
+            while (await asyncio.wait_for(owner_queue.get(), 5))[0] != "error":
+                pass
+            runs = len(executed_as)
+            await asyncio.sleep(0.1)
+            names = set()
+            while not viewer_queue.empty():
+                names.add(viewer_queue.get_nowait()[0])
+            self.assertIn("update", names)
+            self.assertNotIn("error", names)
+            self.assertEqual(set(executed_as[runs:]), {"ayse"})
+            self.assertEqual((stream.user.username, hub.stream_count()), ("ayse", 1))
+
+            hub.unsubscribe(stream, viewer_queue)
+
+        with mock.patch.object(settings, "REPORT_STREAM_MIN_INTERVAL_SECONDS", 0.01):
+            asyncio.run(scenario())
+
+    def test_department_and_filters_separate_streams(self):
+        request = ReportExecutionRequest(report_id=1, filters=[FilterValue(field_name="day", value="2026-10-17")])
+        self.assertEqual(stream_key(request), stream_key(request.model_copy()))
+        self.assertNotEqual(stream_key(request), stream_key(request, "Kalite"))
+        self.assertNotEqual(stream_key(request), stream_key(ReportExecutionRequest(report_id=1)))
+        self.assertGreaterEqual(settings.REPORT_STREAM_INTERVAL_SECONDS, settings.REPORT_STREAM_MIN_INTERVAL_SECONDS)
+
+
+if __name__ == "__main__":
+    unittest.main()
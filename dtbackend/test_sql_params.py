@@ -0,0 +1,75 @@
+"""Unit tests for report SQL bind parameters. No DB.
+
+Run with: python -m unittest test_sql_params -v
+"""
+import datetime
+import decimal
+import unittest
+
+from app.services.sql_params import QueryParams, bind_params, coerce_postgres_args
+
+
+class FakeType:
+    def __init__(self, name):
+        self.name = name
+
+
+def _statement():
+    params = QueryParams()
+    sql = f"SELECT * FROM t WHERE a = {params.add('x')} AND b LIKE {params.add('50%')} AND c = {params.add(7)} OR a = {params.add('x')}"
+    return sql, params
+
+
+class BindParamsTest(unittest.TestCase):
+    def test_asyncpg_uses_numbered_placeholders(self):
+        sql, params = _statement()
+        self.assertEqual(
+            bind_params(sql, params, "asyncpg"),
+            ("SELECT * FROM t WHERE a = $1 AND b LIKE $2 AND c = $3 OR a = $4", ["x", "50%", 7, "x"]),
+        )
+
+    def test_psycopg2_doubles_literal_percent(self):
+        params = QueryParams()
+        sql = f"SELECT '100%' FROM t WHERE a = {params.add('x')}"
+        self.assertEqual(bind_params(sql, params, "psycopg2"), ("SELECT '100%%' FROM t WHERE a = %(p0)s", {"p0": "x"}))
+
+    def test_pyodbc_repeats_values_in_order_of_appearance(self):
+        params = QueryParams()
+        first, second = params.add("a"), params.add("b")
+        sql = f"SELECT * FROM t WHERE x = {second} OR x = {first} OR y = {second}"
+        self.assertEqual(bind_params(sql, params, "pyodbc"), ("SELECT * FROM t WHERE x = ? OR x = ? OR y = ?", ["b", "a", "b"]))
+
+    def test_clickhouse_uses_typed_server_side_parameters(self):
+        sql, params = _statement()
+        bound_sql, args = bind_params(sql, params, "clickhouse")
+        self.assertEqual(bound_sql, "SELECT * FROM t WHERE a = {p0:String} AND b LIKE {p1:String} AND c = {p2:Int64} OR a = {p3:String}")
+        self.assertEqual(args, {"p0": "x", "p1": "50%", "p2": 7, "p3": "x"})
+
+    def test_statement_without_parameters_is_unchanged(self):
+        self.assertEqual(bind_params("SELECT '%'", QueryParams(), "psycopg2"), ("SELECT '%'", None))
+
+    def test_unknown_style_is_rejected(self):
+        with self.assertRaises(ValueError):
+            bind_params("SELECT 1", {}, "sqlite")
+
+
+class CoercePostgresArgsTest(unittest.TestCase):
+    def test_strings_are_converted_to_inferred_types(self):
+        types = [FakeType("int4"), FakeType("numeric"), FakeType("date"), FakeType("timestamptz"), FakeType("text"), FakeType("jsonb")]
+        args = ["5", "1.5", "2024-01-02T10:00:00", "2024-01-02 10:00:00", 3, "{}"]
+        self.assertEqual(coerce_postgres_args(types, args), [
+            5,
+            decimal.Decimal("1.5"),
+            datetime.date(2024, 1, 2),
+            datetime.datetime(2024, 1, 2, 10, tzinfo=datetime.timezone.utc),
+            "3",
+            "{}",
+        ])
+
+    def test_invalid_value_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            coerce_postgres_args([FakeType("int8")], ["abc"])
+
+
+if __name__ == "__main__":
+    unittest.main()
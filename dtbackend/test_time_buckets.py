@@ -0,0 +1,141 @@
+"""Unit tests for incremental time-bucket execution. No DB: the database call
+is replaced by an in-memory table of daily rows.
+
+Run with: python -m unittest test_time_buckets -v
+"""
+import asyncio
+import datetime
+import unittest
+
+from app.models.postgres_models import ReportQuery, ReportQueryFilter
+from app.schemas.reports import FilterValue
+from app.services.report_definitions import ReportDefinition
+from app.services.report_result_cache import ReportResultCache
+from app.services.reports_service import ReportsService
+from app.services.time_buckets import (
+    IncrementalSpec,
+    incremental_spec,
+    missing_runs,
+    plan_buckets,
+    requested_range,
+    split_rows,
+)
+from test_report_definitions import CREATED, make_report
+
+TODAY = datetime.date.today()
+DAY = datetime.timedelta(days=1)
+SPEC = IncrementalSpec(filter_field="day", column="day", bucket="day", lag_buckets=0)
+
+
+class BucketPlanningTest(unittest.TestCase):
+    def test_spec_comes_from_chart_options(self):
+        config = {"type": "line", "chart_options": {"incremental": {"filter_field": "order_date", "bucket": "month", "lag_buckets": 1}}}
+        self.assertEqual(incremental_spec(config), IncrementalSpec("order_date", "order_date", "month", 1))
+        self.assertIsNone(incremental_spec({"type": "line", "chart_options": {"incremental": None}}))
+        self.assertIsNone(incremental_spec({"type": "line", "chart_options": {"incremental": {"filter_field": "d", "bucket": "hour"}}}))
+
+    def test_requested_range(self):
+        between = [FilterValue(field_name="day", value=["2026-10-01", "2026-10-17T23:59:59"], operator="BETWEEN")]
+        self.assertEqual(requested_range(between, SPEC), (datetime.date(2026, 10, 1), datetime.date(2026, 10, 17)))
+        since = [FilterValue(field_name="day", value="2026-10-10", operator=">")]
+        self.assertEqual(requested_range(since, SPEC), (datetime.date(2026, 10, 11), None))
+        self.assertIsNone(requested_range([FilterValue(field_name="day", value="2026-10-10")], SPEC))
+        self.assertIsNone(requested_range([], SPEC))
+
+    def test_closed_and_live_buckets(self):
+        today = datetime.date(2026, 10, 17)
+        plan = plan_buckets(datetime.date(2026, 10, 14), datetime.date(2026, 10, 20), SPEC, today)
+        self.assertEqual(plan.closed, [datetime.date(2026, 10, d) for d in (14, 15, 16)])
+        self.assertEqual(plan.live, (today, datetime.date(2026, 10, 20)))
+
+        monthly = SPEC._replace(bucket="month", lag_buckets=1)
+        plan = plan_buckets(datetime.date(2026, 7, 15), datetime.date(2026, 10, 17), monthly, today)
+        self.assertEqual(plan.closed, [datetime.date(2026, 7, 1), datetime.date(2026, 8, 1)])
+        self.assertEqual(plan.live, (datetime.date(2026, 9, 1), today))
+
+        self.assertIsNone(plan_buckets(datetime.date(2026, 1, 1), datetime.date(2026, 1, 31), SPEC, today).live)
+
+        # An open end stays open on the live range
+        plan = plan_buckets(datetime.date(2026, 10, 15), None, SPEC, today)
+        self.assertEqual(plan.closed, [datetime.date(2026, 10, 15), datetime.date(2026, 10, 16)])
+        self.assertEqual(plan.live, (today, None))
+
+    def test_missing_runs_and_split(self):
+        days = [datetime.date(2026, 10, d) for d in range(1, 7)]
+        cached = {days[2], days[3]}
+        self.assertEqual(missing_runs(days, cached), [days[:2], days[4:]])
+
+        rows = [("2026-10-01", 3), (datetime.datetime(2026, 10, 2, 8), 4)]
+        self.assertEqual(split_rows(["day", "n"], rows, SPEC, days[:3]), {days[0]: [rows[0]], days[1]: [rows[1]], days[2]: []})
+        self.assertIsNone(split_rows(["day", "n"], [("2026-11-01", 1)], SPEC, days[:3]))
+        self.assertIsNone(split_rows(["d", "n"], rows, SPEC, days[:3]))
+
+
+class IncrementalExecutionTest(unittest.TestCase):
+    def setUp(self):
+        report = make_report()
+        query = ReportQuery(
+            id=7, report_id=1, name="Daily orders", sql="SELECT day, count() AS n FROM orders WHERE 1 = 1 {{dynamic_filters}} GROUP BY day ORDER BY day",
+            visualization_config={"type": "line", "chart_options": {"incremental": {"filter_field": "day"}}}, order_index=0, created_at=CREATED,
+        )
+        query.filters = [ReportQueryFilter(id=11, query_id=7, field_name="day", display_name="Day", filter_type="date", required=False, created_at=CREATED)]
+        report.queries = [query]
+        self.definition = ReportDefinition(report)
+        self.service = ReportsService(None)
+        self.service._time_buckets = ReportResultCache()
+        self.ranges = []
+
+        async def execute_sql(db_type, sql, db_config, platform, params, *args):
+            # An open-ended range also returns a row dated tomorrow
+            values = [datetime.date.fromisoformat(v) for v in params.values()]
+            start, end = values if len(values) == 2 else (values[0], None)
+            self.ranges.append((start, end))
+            rows = []
+            day = start
+            while day <= (end or TODAY + DAY):
+                rows.append((day, day.day))
+                day += DAY
+            return ["day", "n"], rows
+
+        self.service._execute_sql = execute_sql
+
+    def execute(self, days):
+        filters = [FilterValue(field_name="day", value=[(TODAY - days * DAY).isoformat(), TODAY.isoformat()], operator="BETWEEN")]
+        return asyncio.run(self.service.execute_query(self.definition.queries[0], filters, platform=self.definition.platform, cache_ttl_seconds=0, check_cost=False))
+
+    def test_closed_days_are_queried_once(self):
+        first = self.execute(5)
+        self.assertEqual(self.ranges, [(TODAY - 5 * DAY, TODAY - DAY), (TODAY, TODAY)])
+        self.assertEqual((first.cached_buckets, first.total_rows), (0, 6))
+
+        self.ranges.clear()
+        second = self.execute(7)
+        self.assertEqual(self.ranges, [(TODAY - 7 * DAY, TODAY - 6 * DAY), (TODAY, TODAY)])
+        self.assertEqual(second.cached_buckets, 5)
+        self.assertEqual([row[0] for row in second.data], [str(TODAY - d * DAY) for d in range(7, -1, -1)])
+
+    def test_open_ended_ranges_keep_future_rows(self):
+        filters = [FilterValue(field_name="day", value=(TODAY - 3 * DAY).isoformat(), operator=">=")]
+        result = asyncio.run(self.service.execute_query(self.definition.queries[0], filters, platform=self.definition.platform, cache_ttl_seconds=0, check_cost=False))
+        self.assertEqual(self.ranges, [(TODAY - 3 * DAY, TODAY - DAY), (TODAY, None)])
+        self.assertEqual([row[0] for row in result.data][-1], str(TODAY + DAY))
+
+    def test_rows_outside_their_bucket_fall_back_to_the_full_range(self):
+        async def execute_sql(db_type, sql, db_config, platform, params, *args):
+            self.ranges.append(tuple(params.values()))
+            return ["day", "n"], [("not a date", 1)]
+
+        self.service._execute_sql = execute_sql
+        result = self.execute(3)
+        self.assertTrue(result.success)
+        self.assertIsNone(result.cached_buckets)
+        self.assertEqual(self.ranges, [((TODAY - 3 * DAY).isoformat(), (TODAY - DAY).isoformat()), ((TODAY - 3 * DAY).isoformat(), TODAY.isoformat())])
+
+        # Remembered: later executions go straight to the full range
+        self.ranges.clear()
+        self.execute(3)
+        self.assertEqual(self.ranges, [((TODAY - 3 * DAY).isoformat(), TODAY.isoformat())])
+
+
+if __name__ == "__main__":
+    unittest.main()